@@ -0,0 +1,34 @@
+-- ======================================================================
+-- IST DATE / HOUR GENERATED COLUMNS ON transaction_detail
+-- Lets analytics group by local (Asia/Kolkata) date and hour without
+-- CONVERT_TZ (no timezone tables needed, indexes usable).
+-- trans_date is stored in UTC; IST is a fixed +05:30 (330 minutes).
+-- Equivalent to: python manage.py install_ist_columns
+-- Then set TRANSACTION_IST_COLUMNS=True for the API.
+-- ======================================================================
+
+USE sabpaisa2;
+
+-- VIRTUAL columns: instant to add, only the indexes are materialised
+ALTER TABLE transaction_detail
+  ADD COLUMN trans_date_ist_date DATE AS (DATE(trans_date + INTERVAL 330 MINUTE)) VIRTUAL,
+  ADD COLUMN trans_date_ist_hour TINYINT AS (HOUR(trans_date + INTERVAL 330 MINUTE)) VIRTUAL;
+
+-- Daily group-bys per merchant / status
+CREATE INDEX idx_txn_ist_date_client_status
+  ON transaction_detail (trans_date_ist_date, client_code, status);
+
+-- Hourly group-bys
+CREATE INDEX idx_txn_ist_date_hour
+  ON transaction_detail (trans_date_ist_date, trans_date_ist_hour, client_code);
+
+-- Check: both columns must agree with Django's local time
+SELECT txn_id, trans_date, trans_date_ist_date, trans_date_ist_hour
+FROM transaction_detail ORDER BY trans_date DESC LIMIT 10;
+
+-- ======================================================================
+-- ROLLBACK
+-- ======================================================================
+-- DROP INDEX idx_txn_ist_date_hour ON transaction_detail;
+-- DROP INDEX idx_txn_ist_date_client_status ON transaction_detail;
+-- ALTER TABLE transaction_detail DROP COLUMN trans_date_ist_hour, DROP COLUMN trans_date_ist_date;
@@ -0,0 +1,39 @@
+-- ======================================================================
+-- CREATE ANALYTICS CUBE TABLES
+-- Storage for apps.transactions.cube (CubeCell / CubeBuild models)
+-- Populate with: python manage.py build_analytics_cube --days 90
+-- ======================================================================
+
+USE sabpaisa2;
+
+-- ======================================================================
+-- 1. CUBE CELLS (one row per cuboid, day and dimension key)
+-- ======================================================================
+CREATE TABLE IF NOT EXISTS cube_cell (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    cuboid VARCHAR(64) NOT NULL,
+    date DATE NOT NULL,
+    hour INT NULL,
+    client_code VARCHAR(255) NOT NULL DEFAULT '',
+    payment_mode VARCHAR(255) NOT NULL DEFAULT '',
+    pg_name VARCHAR(255) NOT NULL DEFAULT '',
+    status VARCHAR(50) NOT NULL DEFAULT '',
+    settlement_status VARCHAR(255) NOT NULL DEFAULT '',
+    measures JSON NOT NULL,
+    last_updated DATETIME(6) NOT NULL,
+    INDEX cube_cell_cuboid_date (cuboid, date),
+    INDEX cube_cell_cuboid_client_date (cuboid, client_code, date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- ======================================================================
+-- 2. CUBE BUILD LOG (a day is read from cube_cell only once built)
+-- ======================================================================
+CREATE TABLE IF NOT EXISTS cube_build (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    cuboid VARCHAR(64) NOT NULL,
+    date DATE NOT NULL,
+    cell_count INT NOT NULL DEFAULT 0,
+    measure_names JSON NOT NULL,
+    built_at DATETIME(6) NOT NULL,
+    UNIQUE KEY cube_build_cuboid_date (cuboid, date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
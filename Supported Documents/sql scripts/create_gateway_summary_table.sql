@@ -0,0 +1,35 @@
+-- ======================================================================
+-- CREATE GATEWAY DAILY SUMMARY TABLE
+-- Storage for GatewayDailySummary (apps.transactions.models_aggregations)
+-- Per day, merchant, pg_name and payment mode; read by AggregationRouter
+-- for pg_name grouped analytics
+-- Populate with the update_gateway_summaries task (one transaction date)
+-- ======================================================================
+
+USE sabpaisa2;
+
+CREATE TABLE IF NOT EXISTS gateway_daily_summary (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    date DATE NOT NULL,
+    client_code VARCHAR(255) NOT NULL,
+    pg_name VARCHAR(255) NOT NULL,
+    payment_mode VARCHAR(255) NOT NULL,
+    total_count INT NOT NULL DEFAULT 0,
+    success_count INT NOT NULL DEFAULT 0,
+    failed_count INT NOT NULL DEFAULT 0,
+    pending_count INT NOT NULL DEFAULT 0,
+    total_amount DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    success_amount DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    failed_amount DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    settled_count INT NOT NULL DEFAULT 0,
+    settled_amount DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    success_settled_count INT NOT NULL DEFAULT 0,
+    success_settled_amount DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    last_updated DATETIME(6) NOT NULL,
+    UNIQUE KEY gateway_summary_key (date, client_code, pg_name, payment_mode),
+    INDEX gateway_summary_date (date),
+    INDEX gateway_summary_client (client_code),
+    INDEX gateway_summary_pg (pg_name),
+    INDEX gateway_summary_date_pg (date, pg_name),
+    INDEX gateway_summary_client_date_pg (client_code, date, pg_name)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,93 @@
+-- ======================================================================
+-- LIVE TRANSACTION COUNTERS (trigger maintained)
+-- One row per IST date / hour / client_code / payment_mode / status with
+-- the transaction count and paid_amount, kept current by triggers on
+-- transaction_detail. Today's analytics read these instead of scanning.
+-- trans_date is stored in UTC; IST is a fixed +05:30 (330 minutes).
+-- Equivalent to: python manage.py live_counter_triggers install
+-- Then set LIVE_COUNTERS=triggers for the API.
+-- ======================================================================
+
+USE sabpaisa2;
+
+CREATE TABLE IF NOT EXISTS live_transaction_counter (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    date DATE NOT NULL,
+    hour SMALLINT NOT NULL,
+    client_code VARCHAR(255) NOT NULL DEFAULT '',
+    payment_mode VARCHAR(255) NOT NULL DEFAULT '',
+    status VARCHAR(50) NOT NULL DEFAULT '',
+    txn_count INT NOT NULL DEFAULT 0,
+    amount DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    last_updated DATETIME(6) NOT NULL,
+    UNIQUE KEY live_counter_key (date, hour, client_code, payment_mode, status),
+    INDEX live_counter_date_client (date, client_code)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+DELIMITER $$
+
+CREATE TRIGGER trg_txn_live_counter_insert AFTER INSERT ON transaction_detail FOR EACH ROW
+BEGIN
+  IF NEW.trans_date IS NOT NULL THEN
+    INSERT INTO live_transaction_counter
+      (date, hour, client_code, payment_mode, status, txn_count, amount, last_updated)
+    VALUES (DATE(NEW.trans_date + INTERVAL 330 MINUTE), HOUR(NEW.trans_date + INTERVAL 330 MINUTE),
+            IFNULL(NEW.client_code, ''), IFNULL(NEW.payment_mode, ''), IFNULL(NEW.status, ''),
+            1, IFNULL(NEW.paid_amount, 0), NOW(6))
+    ON DUPLICATE KEY UPDATE txn_count = txn_count + 1,
+      amount = amount + IFNULL(NEW.paid_amount, 0), last_updated = NOW(6);
+  END IF;
+END$$
+
+-- Status transitions (PENDING -> SUCCESS etc.) move the row between counters
+CREATE TRIGGER trg_txn_live_counter_update AFTER UPDATE ON transaction_detail FOR EACH ROW
+BEGIN
+  IF NOT (OLD.trans_date <=> NEW.trans_date AND OLD.client_code <=> NEW.client_code
+          AND OLD.payment_mode <=> NEW.payment_mode AND OLD.status <=> NEW.status
+          AND OLD.paid_amount <=> NEW.paid_amount) THEN
+    IF OLD.trans_date IS NOT NULL THEN
+      UPDATE live_transaction_counter
+      SET txn_count = txn_count - 1, amount = amount - IFNULL(OLD.paid_amount, 0), last_updated = NOW(6)
+      WHERE date = DATE(OLD.trans_date + INTERVAL 330 MINUTE)
+        AND hour = HOUR(OLD.trans_date + INTERVAL 330 MINUTE)
+        AND client_code = IFNULL(OLD.client_code, '') AND payment_mode = IFNULL(OLD.payment_mode, '')
+        AND status = IFNULL(OLD.status, '');
+    END IF;
+    IF NEW.trans_date IS NOT NULL THEN
+      INSERT INTO live_transaction_counter
+        (date, hour, client_code, payment_mode, status, txn_count, amount, last_updated)
+      VALUES (DATE(NEW.trans_date + INTERVAL 330 MINUTE), HOUR(NEW.trans_date + INTERVAL 330 MINUTE),
+              IFNULL(NEW.client_code, ''), IFNULL(NEW.payment_mode, ''), IFNULL(NEW.status, ''),
+              1, IFNULL(NEW.paid_amount, 0), NOW(6))
+      ON DUPLICATE KEY UPDATE txn_count = txn_count + 1,
+        amount = amount + IFNULL(NEW.paid_amount, 0), last_updated = NOW(6);
+    END IF;
+  END IF;
+END$$
+
+CREATE TRIGGER trg_txn_live_counter_delete AFTER DELETE ON transaction_detail FOR EACH ROW
+BEGIN
+  IF OLD.trans_date IS NOT NULL THEN
+    UPDATE live_transaction_counter
+    SET txn_count = txn_count - 1, amount = amount - IFNULL(OLD.paid_amount, 0), last_updated = NOW(6)
+    WHERE date = DATE(OLD.trans_date + INTERVAL 330 MINUTE)
+      AND hour = HOUR(OLD.trans_date + INTERVAL 330 MINUTE)
+      AND client_code = IFNULL(OLD.client_code, '') AND payment_mode = IFNULL(OLD.payment_mode, '')
+      AND status = IFNULL(OLD.status, '');
+  END IF;
+END$$
+
+DELIMITER ;
+
+-- Seed / repair a day from transaction_detail (run after installing):
+--   python manage.py live_counter_triggers rebuild --date YYYY-MM-DD
+-- Check counters against raw data:
+--   python manage.py live_counter_triggers check --date YYYY-MM-DD
+
+-- ======================================================================
+-- ROLLBACK
+-- ======================================================================
+-- DROP TRIGGER IF EXISTS trg_txn_live_counter_insert;
+-- DROP TRIGGER IF EXISTS trg_txn_live_counter_update;
+-- DROP TRIGGER IF EXISTS trg_txn_live_counter_delete;
+-- DROP TABLE live_transaction_counter;
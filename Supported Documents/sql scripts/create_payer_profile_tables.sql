@@ -0,0 +1,65 @@
+-- ======================================================================
+-- CREATE PAYER PROFILE TABLES
+-- Storage for PayerProfile / PayerProfileDay (apps.transactions.models_aggregations)
+-- Populate with: python manage.py build_payer_profiles
+-- ======================================================================
+
+USE sabpaisa2;
+
+-- ======================================================================
+-- 1. PAYER PROFILES (one row per merchant and payer key)
+-- ======================================================================
+CREATE TABLE IF NOT EXISTS payer_profile (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    client_code VARCHAR(255) NOT NULL,
+    payer_key VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NULL,
+    mobile VARCHAR(20) NULL,
+    first_seen DATETIME(6) NOT NULL,
+    last_seen DATETIME(6) NOT NULL,
+    txn_count INT NOT NULL DEFAULT 0,
+    success_count INT NOT NULL DEFAULT 0,
+    success_volume DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    mode_counts JSON NOT NULL,
+    preferred_payment_mode VARCHAR(255) NOT NULL DEFAULT '',
+    last_updated DATETIME(6) NOT NULL,
+    UNIQUE KEY payer_profile_key (client_code, payer_key),
+    INDEX payer_profile_payer_key (payer_key),
+    INDEX payer_profile_mobile (mobile),
+    INDEX payer_profile_client_volume (client_code, success_volume),
+    INDEX payer_profile_client_last_seen (client_code, last_seen)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- ======================================================================
+-- 2. APPLIED DAYS (folded in date order; recent days are re-folded)
+-- ======================================================================
+CREATE TABLE IF NOT EXISTS payer_profile_day (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    date DATE NOT NULL,
+    payers INT NOT NULL DEFAULT 0,
+    merchant_counts JSON NOT NULL,
+    applied_at DATETIME(6) NOT NULL,
+    UNIQUE KEY payer_profile_day_date (date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- ======================================================================
+-- 3. PER-PAYER DAY TOTALS (kept for the re-folded days, PAYER_REFOLD_DAYS)
+-- ======================================================================
+CREATE TABLE IF NOT EXISTS payer_profile_day_payer (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    date DATE NOT NULL,
+    client_code VARCHAR(255) NOT NULL,
+    payer_key VARCHAR(255) NOT NULL,
+    txn_count INT NOT NULL DEFAULT 0,
+    success_count INT NOT NULL DEFAULT 0,
+    success_volume DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    mode_counts JSON NOT NULL,
+    UNIQUE KEY payer_profile_day_payer_key (date, client_code, payer_key)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- ======================================================================
+-- 4. STAGING TABLES (filled by build_payer_profiles --rebuild, then swapped in)
+-- ======================================================================
+CREATE TABLE IF NOT EXISTS payer_profile_build LIKE payer_profile;
+CREATE TABLE IF NOT EXISTS payer_profile_day_build LIKE payer_profile_day;
+CREATE TABLE IF NOT EXISTS payer_profile_day_payer_build LIKE payer_profile_day_payer;
@@ -0,0 +1,24 @@
+-- ======================================================================
+-- CREATE DAILY PAYER SKETCH TABLE
+-- Storage for DailyPayerSketch (apps.transactions.models_aggregations)
+-- HyperLogLog sketches of payer emails / mobiles per day and merchant
+-- (client_code '*' holds the all-merchant sketch)
+-- Populate with the update_payer_sketches task (one transaction date)
+-- ======================================================================
+
+USE sabpaisa2;
+
+CREATE TABLE IF NOT EXISTS daily_payer_sketch (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    date DATE NOT NULL,
+    client_code VARCHAR(255) NOT NULL,
+    email_sketch LONGBLOB NOT NULL,
+    mobile_sketch LONGBLOB NOT NULL,
+    email_count INT NOT NULL DEFAULT 0,
+    mobile_count INT NOT NULL DEFAULT 0,
+    last_updated DATETIME(6) NOT NULL,
+    UNIQUE KEY payer_sketch_key (date, client_code),
+    INDEX payer_sketch_date (date),
+    INDEX payer_sketch_client (client_code),
+    INDEX payer_sketch_client_date (client_code, date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
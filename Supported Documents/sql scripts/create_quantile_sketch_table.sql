@@ -0,0 +1,24 @@
+-- ======================================================================
+-- CREATE DAILY QUANTILE SKETCH TABLE
+-- Storage for DailyQuantileSketch (apps.transactions.models_aggregations)
+-- t-digests of SUCCESS paid_amount and settlement TAT per day and merchant
+-- (client_code '*' holds the all-merchant digests)
+-- Populate with the update_quantile_sketches task (one transaction date)
+-- ======================================================================
+
+USE sabpaisa2;
+
+CREATE TABLE IF NOT EXISTS daily_quantile_sketch (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    date DATE NOT NULL,
+    client_code VARCHAR(255) NOT NULL,
+    amount_digest LONGBLOB NOT NULL,
+    tat_digest LONGBLOB NOT NULL,
+    amount_count INT NOT NULL DEFAULT 0,
+    tat_count INT NOT NULL DEFAULT 0,
+    last_updated DATETIME(6) NOT NULL,
+    UNIQUE KEY quantile_sketch_key (date, client_code),
+    INDEX quantile_sketch_date (date),
+    INDEX quantile_sketch_client (client_code),
+    INDEX quantile_sketch_client_date (client_code, date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,26 @@
+-- ======================================================================
+-- CREATE DAILY REFUND REASON SUMMARY TABLE
+-- Storage for DailyRefundReasonSummary (apps.transactions.models_aggregations)
+-- Refund / chargeback totals per transaction date, merchant and normalised
+-- reason code (apps.transactions.refund_reasons), read by RefundSummaryRouter
+-- Populate with the update_refund_summaries task (one transaction date)
+-- ======================================================================
+
+USE sabpaisa2;
+
+CREATE TABLE IF NOT EXISTS daily_refund_reason_summary (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    date DATE NOT NULL,
+    client_code VARCHAR(255) NOT NULL,
+    reason_code VARCHAR(64) NOT NULL,
+    refund_date DATE NULL,
+    chargeback_date DATE NULL,
+    refund_count INT NOT NULL DEFAULT 0,
+    refund_amount DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    chargeback_count INT NOT NULL DEFAULT 0,
+    chargeback_amount DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    last_updated DATETIME(6) NOT NULL,
+    INDEX refund_summary_date (date),
+    INDEX refund_summary_date_client (date, client_code),
+    INDEX refund_summary_client_date (client_code, date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,24 @@
+-- ======================================================================
+-- CREATE AGGREGATION SCHEDULER TABLE
+-- Storage for ScheduledJobRun (apps.transactions.models_aggregations)
+-- One row per attempt at a job's scheduled slot; written by
+-- python manage.py run_aggregation_scheduler
+-- ======================================================================
+
+USE sabpaisa2;
+
+CREATE TABLE IF NOT EXISTS scheduled_job_run (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    job VARCHAR(64) NOT NULL,
+    slot DATETIME(6) NOT NULL,
+    attempt SMALLINT NOT NULL DEFAULT 1,
+    status VARCHAR(16) NOT NULL DEFAULT 'running',
+    node VARCHAR(255) NOT NULL DEFAULT '',
+    started_at DATETIME(6) NOT NULL,
+    finished_at DATETIME(6) NULL,
+    duration_seconds DOUBLE NULL,
+    result JSON NULL,
+    error LONGTEXT NOT NULL,
+    UNIQUE KEY scheduled_job_run_key (job, slot, attempt),
+    INDEX scheduled_job_run_job_status_slot (job, status, slot)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
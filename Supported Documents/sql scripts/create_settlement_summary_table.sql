@@ -0,0 +1,30 @@
+-- ======================================================================
+-- CREATE DAILY SETTLEMENT SUMMARY TABLE
+-- Storage for DailySettlementSummary (apps.transactions.models_aggregations)
+-- Settled totals keyed by settlement date, read by SettlementSummaryRouter
+-- Populate with the update_settlement_summaries task (one settlement date)
+-- ======================================================================
+
+USE sabpaisa2;
+
+CREATE TABLE IF NOT EXISTS daily_settlement_summary (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    settlement_date DATE NOT NULL,
+    client_code VARCHAR(255) NOT NULL,
+    client_name VARCHAR(255) NULL,
+    settlement_status VARCHAR(255) NOT NULL DEFAULT '',
+    pg_name VARCHAR(255) NOT NULL DEFAULT '',
+    settled_count INT NOT NULL DEFAULT 0,
+    gross_amount DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    convcharges DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    ep_charges DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    gst DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    charges_amount DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    effective_amount DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    last_updated DATETIME(6) NOT NULL,
+    UNIQUE KEY settlement_summary_key (settlement_date, client_code, settlement_status, pg_name),
+    INDEX settlement_summary_date (settlement_date),
+    INDEX settlement_summary_client (client_code),
+    INDEX settlement_summary_date_client (settlement_date, client_code),
+    INDEX settlement_summary_client_date (client_code, settlement_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,24 @@
+-- ======================================================================
+-- CREATE DAILY TOP LIST TABLE
+-- Storage for DailyTopList (apps.transactions.models_aggregations)
+-- Exact top-K per day by SUCCESS volume, merged as Space-Saving summaries
+-- kind 'merchant' (client_code '*') / 'customer' (per merchant and '*')
+-- Populate with the update_top_lists task (one transaction date)
+-- ======================================================================
+
+USE sabpaisa2;
+
+CREATE TABLE IF NOT EXISTS daily_top_list (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    date DATE NOT NULL,
+    kind VARCHAR(20) NOT NULL,
+    client_code VARCHAR(255) NOT NULL,
+    entries JSON NOT NULL,
+    floor DOUBLE NOT NULL DEFAULT 0,
+    key_count INT NOT NULL DEFAULT 0,
+    labels JSON NOT NULL,
+    last_updated DATETIME(6) NOT NULL,
+    UNIQUE KEY top_list_key (date, kind, client_code),
+    INDEX top_list_date (date),
+    INDEX top_list_kind_client_date (kind, client_code, date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
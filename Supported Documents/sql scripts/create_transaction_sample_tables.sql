@@ -0,0 +1,42 @@
+-- ======================================================================
+-- CREATE TRANSACTION SAMPLE TABLES
+-- Storage for TransactionSample / TransactionSampleDay (apps.transactions.models_aggregations)
+-- Deterministic 1% sample for approximate analytics (apps.transactions.sampling)
+-- Populate with the update_transaction_sample task (one transaction date)
+-- ======================================================================
+
+USE sabpaisa2;
+
+-- ======================================================================
+-- 1. SAMPLED ROWS
+-- ======================================================================
+CREATE TABLE IF NOT EXISTS transaction_sample (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    txn_id VARCHAR(255) NOT NULL,
+    bucket SMALLINT NOT NULL,
+    trans_date DATETIME(6) NOT NULL,
+    date DATE NOT NULL,
+    hour SMALLINT NOT NULL,
+    client_code VARCHAR(255) NOT NULL DEFAULT '',
+    payment_mode VARCHAR(255) NOT NULL DEFAULT '',
+    pg_name VARCHAR(255) NOT NULL DEFAULT '',
+    status VARCHAR(50) NOT NULL DEFAULT '',
+    paid_amount DOUBLE NOT NULL DEFAULT 0,
+    is_settled BOOL NOT NULL DEFAULT 0,
+    settlement_amount DOUBLE NOT NULL DEFAULT 0,
+    UNIQUE KEY transaction_sample_txn_id (txn_id),
+    INDEX transaction_sample_date_bucket (date, bucket),
+    INDEX transaction_sample_client_date_bucket (client_code, date, bucket)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- ======================================================================
+-- 2. BUILT DAYS (only these are answered from the sample)
+-- ======================================================================
+CREATE TABLE IF NOT EXISTS transaction_sample_day (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    date DATE NOT NULL,
+    `rows` INT NOT NULL DEFAULT 0,
+    population INT NOT NULL DEFAULT 0,
+    built_at DATETIME(6) NOT NULL,
+    UNIQUE KEY transaction_sample_day_date (date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
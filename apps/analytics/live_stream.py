@@ -0,0 +1,383 @@
+"""
+Live dashboard stream (Server-Sent Events)
+One producer per environment computes a compact frame of today's numbers
+every LIVE_STREAM_INTERVAL seconds - totals, per payment mode, per merchant
+and the newest transactions - and stores it in Redis. Merchants with an open
+stream register in a Redis set, and the frame also carries their own
+per-payment-mode numbers and newest transactions. Each worker runs a
+single hub thread that picks the frame up and wakes its connected streams,
+which send their scoped snapshot once and then only what changed. Open screens therefore cost one computation per
+tick in total, not one dashboard request each.
+
+The producer is whichever worker holds the Redis producer lock while it
+has subscribers, so nothing is computed when nobody is watching. Today's
+numbers come through the AggregationRouter and so read the live counters
+(settings.LIVE_COUNTERS) when they are configured.
+
+Each open stream holds a worker thread: serve it from threaded workers
+(gunicorn --worker-class gthread --threads N).
+"""
+from contextlib import contextmanager
+from datetime import datetime, time
+import json
+import logging
+import os
+import socket
+import threading
+import time as time_module
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.renderers import BaseRenderer
+
+logger = logging.getLogger('apps.analytics')
+
+FRAME_KEY = 'sabpaisa:live:stream:frame'
+PRODUCER_LOCK_KEY = 'sabpaisa:live:stream:producer'
+# Sorted set of client codes with an open stream, scored by expiry time
+WATCHED_KEY = 'sabpaisa:live:stream:watched'
+
+# Newest transactions carried per frame, platform-wide and per watched merchant
+LATEST_LIMIT = 50
+LATEST_FIELDS = ('txn_id', 'client_code', 'client_name', 'paid_amount', 'status', 'payment_mode', 'trans_date')
+
+# Seconds a stream's registration in WATCHED_KEY lasts without a refresh
+WATCHED_TTL = 60
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets DRF negotiate 'Accept: text/event-stream'; error responses are sent as JSON text
+    """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, default=str).encode(self.charset)
+
+
+def _redis():
+    from django_redis import get_redis_connection
+    return get_redis_connection("default")
+
+
+def _rate(successful, total):
+    return round(successful * 100.0 / total, 2) if total else 0.0
+
+
+def _latest_entry(txn):
+    return {
+        'id': txn['txn_id'],
+        'client_code': txn['client_code'],
+        'merchant': txn['client_name'] or txn['client_code'] or 'Unknown',
+        'amount': float(txn['paid_amount'] or 0),
+        'status': txn['status'],
+        'mode': txn['payment_mode'] or 'Unknown',
+        'date': txn['trans_date'].isoformat(),
+    }
+
+
+def build_frame(watched=()):
+    """
+    Today's platform-wide numbers plus the newest transactions, and per
+    payment mode numbers and newest transactions for each `watched` merchant
+    """
+    from django.db.models import Count, Q, Sum
+
+    from apps.transactions.aggregation_router import AggregateQuery, AggregationRouter
+    from apps.transactions.models import TransactionDetail
+
+    now = timezone.now()
+    today = timezone.localdate()
+    day_start = timezone.make_aware(datetime.combine(today, time.min), timezone.get_current_timezone())
+    queryset = TransactionDetail.objects.filter(trans_date__gte=day_start, trans_date__lte=now)
+    router = AggregationRouter(AggregateQuery(day_start, now), queryset)
+    measures = ['total_count', 'success_count', 'success_amount']
+
+    def section(row):
+        return {
+            'transactions': row['total_count'],
+            'successful': row['success_count'],
+            'volume': round(float(row['success_amount'] or 0), 2),
+            'success_rate': _rate(row['success_count'], row['total_count']),
+        }
+
+    totals = router.aggregate(measures)
+    modes = {
+        row['payment_mode'] or 'Unknown': section(row)
+        for row in router.aggregate(measures, group_by='payment_mode') if row['total_count']
+    }
+    merchants = {
+        row['client_code']: section(row)
+        for row in router.aggregate(measures, group_by='client_code')
+        if row['client_code'] and row['total_count']
+    }
+
+    latest = queryset.order_by('-trans_date').values(*LATEST_FIELDS)[:LATEST_LIMIT]
+
+    # Only merchants with an open stream and activity today; each is a
+    # range read on the (client_code, trans_date) index
+    watched = sorted(code for code in watched if code in merchants)
+    merchant_modes = {code: {} for code in watched}
+    merchant_latest = {}
+    if watched:
+        mode_rows = queryset.filter(client_code__in=watched).values('client_code', 'payment_mode').annotate(
+            total_count=Count('txn_id'),
+            success_count=Count('txn_id', filter=Q(status='SUCCESS')),
+            success_amount=Sum('paid_amount', filter=Q(status='SUCCESS')),
+        ).order_by()
+        for row in mode_rows:
+            merchant_modes[row['client_code']][row['payment_mode'] or 'Unknown'] = section(row)
+        for code in watched:
+            newest = queryset.filter(client_code=code).order_by('-trans_date').values(*LATEST_FIELDS)
+            merchant_latest[code] = [_latest_entry(txn) for txn in newest[:LATEST_LIMIT]]
+
+    return {
+        'date': today.isoformat(),
+        'generated_at': now.isoformat(),
+        'totals': section(totals),
+        'payment_modes': modes,
+        'merchants': merchants,
+        'latest': [_latest_entry(txn) for txn in latest],
+        'merchant_modes': merchant_modes,
+        'merchant_latest': merchant_latest,
+    }
+
+
+# Frame sections only used to build merchants' scoped frames
+PER_MERCHANT_SECTIONS = ('merchant_modes', 'merchant_latest')
+
+
+def scope_frame(frame, client_codes=None):
+    """
+    The part of a frame one subscriber may see - the platform-wide numbers
+    for admins (client_codes None), otherwise only the given merchants'
+    numbers, payment modes and newest transactions
+    """
+    if client_codes is None:
+        return {key: value for key, value in frame.items() if key not in PER_MERCHANT_SECTIONS}
+
+    merchants = {code: frame['merchants'][code] for code in client_codes if code in frame['merchants']}
+    total = sum(m['transactions'] for m in merchants.values())
+    successful = sum(m['successful'] for m in merchants.values())
+
+    merchant_modes = {code: frame.get('merchant_modes', {}).get(code, {}) for code in merchants}
+    modes = {}
+    for code_modes in merchant_modes.values():
+        for mode, numbers in code_modes.items():
+            combined = modes.setdefault(mode, {'transactions': 0, 'successful': 0, 'volume': 0.0})
+            combined['transactions'] += numbers['transactions']
+            combined['successful'] += numbers['successful']
+            combined['volume'] += numbers['volume']
+    for combined in modes.values():
+        combined['volume'] = round(combined['volume'], 2)
+        combined['success_rate'] = _rate(combined['successful'], combined['transactions'])
+
+    # A merchant not yet in the frame's watched set falls back to the
+    # platform-wide newest transactions until the next tick
+    latest = []
+    for code in merchants:
+        if code in frame.get('merchant_latest', {}):
+            latest.extend(frame['merchant_latest'][code])
+        else:
+            latest.extend(txn for txn in frame['latest'] if txn['client_code'] == code)
+    latest.sort(key=lambda txn: txn['date'], reverse=True)
+
+    return {
+        'date': frame['date'],
+        'generated_at': frame['generated_at'],
+        'totals': {
+            'transactions': total,
+            'successful': successful,
+            'volume': round(sum(m['volume'] for m in merchants.values()), 2),
+            'success_rate': _rate(successful, total),
+        },
+        'payment_modes': modes,
+        'merchants': merchants,
+        'merchant_modes': merchant_modes,
+        'latest': latest[:LATEST_LIMIT],
+    }
+
+
+def frame_delta(previous, current):
+    """
+    Changed parts of a scoped frame: scalars and sections when they differ,
+    per-key entries of the dict sections and transactions not sent before
+    """
+    if previous is None or previous['date'] != current['date']:
+        return current
+
+    delta = {}
+    for key, value in current.items():
+        if key == 'generated_at':
+            continue
+        if key == 'latest':
+            sent = {txn['id'] for txn in previous['latest']}
+            new = [txn for txn in value if txn['id'] not in sent]
+            if new:
+                delta[key] = new
+        elif isinstance(value, dict) and key in ('payment_modes', 'merchants', 'merchant_modes'):
+            changed = {k: v for k, v in value.items() if previous[key].get(k) != v}
+            if changed:
+                delta[key] = changed
+        elif previous.get(key) != value:
+            delta[key] = value
+    return delta
+
+
+class LiveStreamHub:
+    """
+    Per-process fan-out of the shared frame to open streams
+
+    Usage:
+        hub = LiveStreamHub.instance()
+        with hub.subscription():
+            seq, frame = hub.wait(last_seq, timeout=15)
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.condition = threading.Condition()
+        self.seq = 0
+        self.frame = None
+        self.subscribers = 0
+        self.thread = None
+
+    @classmethod
+    def instance(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(settings.LIVE_STREAM_INTERVAL)
+            return cls._instance
+
+    def has_capacity(self):
+        """
+        Room for another stream in this process (LIVE_STREAM_MAX_CONNECTIONS)
+        """
+        return self.subscribers < settings.LIVE_STREAM_MAX_CONNECTIONS
+
+    @contextmanager
+    def subscription(self):
+        """
+        Count an open stream; the hub thread runs while there are any
+        """
+        with self.condition:
+            self.subscribers += 1
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='live-stream-hub', daemon=True)
+                self.thread.start()
+        try:
+            yield self
+        finally:
+            with self.condition:
+                self.subscribers -= 1
+
+    def wait(self, last_seq, timeout):
+        """
+        (seq, frame) once a frame newer than last_seq is available, or
+        (last_seq, None) after `timeout` seconds
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.seq != last_seq and self.frame is not None, timeout=timeout)
+            if self.seq == last_seq or self.frame is None:
+                return last_seq, None
+            return self.seq, self.frame
+
+    def _run(self):
+        from django.db import connection
+
+        while True:
+            with self.condition:
+                if self.subscribers <= 0:
+                    # A later subscriber must not be handed this stale frame
+                    self.thread, self.frame = None, None
+                    break
+            try:
+                conn = _redis()
+                if self._hold_lock(conn):
+                    frame = build_frame(self._watched(conn))
+                    conn.set(FRAME_KEY, json.dumps(frame), ex=max(int(self.interval * 10), 30))
+                self._publish(conn.get(FRAME_KEY))
+            except Exception as e:
+                logger.error(f"Live stream hub tick failed: {e}")
+            finally:
+                connection.close()
+            time_module.sleep(self.interval)
+
+    def _hold_lock(self, conn):
+        ttl = max(int(self.interval * 3), 5)
+        if conn.set(PRODUCER_LOCK_KEY, self.owner, nx=True, ex=ttl):
+            return True
+        holder = conn.get(PRODUCER_LOCK_KEY)
+        if holder is not None and holder.decode() == self.owner:
+            conn.expire(PRODUCER_LOCK_KEY, ttl)
+            return True
+        return False
+
+    def watch(self, client_codes):
+        """
+        Register (or refresh) merchants with an open stream for WATCHED_TTL seconds
+        """
+        if not client_codes:
+            return
+        try:
+            expires = time_module.time() + WATCHED_TTL
+            _redis().zadd(WATCHED_KEY, {code: expires for code in client_codes})
+        except Exception as e:
+            logger.warning(f"Live stream watch registration failed: {e}")
+
+    @staticmethod
+    def _watched(conn):
+        now = time_module.time()
+        conn.zremrangebyscore(WATCHED_KEY, '-inf', now)
+        return [code.decode() for code in conn.zrangebyscore(WATCHED_KEY, now, '+inf')]
+
+    def _publish(self, raw):
+        if raw is None:
+            return
+        frame = json.loads(raw)
+        with self.condition:
+            if self.frame is not None and frame['generated_at'] == self.frame['generated_at']:
+                return
+            self.frame = frame
+            self.seq += 1
+            self.condition.notify_all()
+
+
+def event_stream(client_codes=None):
+    """
+    SSE byte stream for one subscriber: a 'snapshot' event, then 'delta'
+    events; comments keep idle connections open. Ends after
+    LIVE_STREAM_MAX_SECONDS - EventSource reconnects on its own
+    """
+    hub = LiveStreamHub.instance()
+    deadline = time_module.monotonic() + settings.LIVE_STREAM_MAX_SECONDS
+    keepalive = 15
+
+    yield f"retry: {int(hub.interval * 1000)}\n\n"
+    with hub.subscription():
+        seq, sent = 0, None
+        watched_at = None
+        while time_module.monotonic() < deadline:
+            if watched_at is None or time_module.monotonic() - watched_at >= WATCHED_TTL / 3:
+                hub.watch(client_codes)
+                watched_at = time_module.monotonic()
+            seq, frame = hub.wait(seq, timeout=keepalive)
+            if frame is None:
+                yield ": keepalive\n\n"
+                continue
+
+            scoped = scope_frame(frame, client_codes)
+            if sent is None or sent['date'] != scoped['date']:
+                event, data = 'snapshot', scoped
+            else:
+                event, data = 'delta', frame_delta(sent, scoped)
+                if not data:
+                    continue
+                data['generated_at'] = scoped['generated_at']
+            sent = scoped
+            yield f"id: {scoped['generated_at']}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
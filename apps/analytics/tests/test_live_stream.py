@@ -0,0 +1,76 @@
+"""
+Tests for scoping the live dashboard frame to a subscriber
+"""
+from django.test import SimpleTestCase
+
+from apps.analytics.live_stream import frame_delta, scope_frame
+
+
+def numbers(transactions, successful, volume):
+    return {
+        'transactions': transactions,
+        'successful': successful,
+        'volume': volume,
+        'success_rate': round(successful * 100.0 / transactions, 2),
+    }
+
+
+def txn(txn_id, client_code, date):
+    return {
+        'id': txn_id, 'client_code': client_code, 'merchant': client_code, 'amount': 10.0,
+        'status': 'SUCCESS', 'mode': 'UPI', 'date': date,
+    }
+
+
+FRAME = {
+    'date': '2024-03-10',
+    'generated_at': '2024-03-10T12:00:00+05:30',
+    'totals': numbers(40, 30, 3000.0),
+    'payment_modes': {'UPI': numbers(30, 25, 2500.0), 'Card': numbers(10, 5, 500.0)},
+    'merchants': {'A': numbers(10, 8, 800.0), 'B': numbers(20, 15, 1500.0), 'C': numbers(10, 7, 700.0)},
+    # A busy merchant C fills the platform-wide list
+    'latest': [txn('c2', 'C', '2024-03-10T11:59:00+05:30'), txn('c1', 'C', '2024-03-10T11:58:00+05:30')],
+    'merchant_modes': {
+        'A': {'UPI': numbers(6, 5, 500.0), 'Card': numbers(4, 3, 300.0)},
+        'B': {'UPI': numbers(20, 15, 1500.0)},
+    },
+    'merchant_latest': {
+        'A': [txn('a1', 'A', '2024-03-10T09:00:00+05:30')],
+        'B': [txn('b1', 'B', '2024-03-10T10:00:00+05:30')],
+    },
+}
+
+
+class ScopeFrameTests(SimpleTestCase):
+
+    def test_admin_gets_platform_sections_only(self):
+        scoped = scope_frame(FRAME)
+        self.assertEqual(scoped['payment_modes'], FRAME['payment_modes'])
+        self.assertNotIn('merchant_modes', scoped)
+        self.assertNotIn('merchant_latest', scoped)
+
+    def test_merchant_payment_modes(self):
+        scoped = scope_frame(FRAME, ['A'])
+        self.assertEqual(scoped['payment_modes'], FRAME['merchant_modes']['A'])
+        self.assertEqual(scoped['merchant_modes'], {'A': FRAME['merchant_modes']['A']})
+
+    def test_payment_modes_combine_merchants(self):
+        scoped = scope_frame(FRAME, ['A', 'B'])
+        self.assertEqual(scoped['payment_modes']['UPI'], numbers(26, 20, 2000.0))
+        self.assertEqual(scoped['payment_modes']['Card'], numbers(4, 3, 300.0))
+
+    def test_latest_comes_from_the_merchant_list(self):
+        scoped = scope_frame(FRAME, ['A', 'B'])
+        self.assertEqual([t['id'] for t in scoped['latest']], ['b1', 'a1'])
+
+    def test_unwatched_merchant_falls_back_to_platform_latest(self):
+        scoped = scope_frame(FRAME, ['C'])
+        self.assertEqual([t['id'] for t in scoped['latest']], ['c2', 'c1'])
+        self.assertEqual(scoped['payment_modes'], {})
+
+    def test_delta_carries_changed_merchant_modes(self):
+        previous = scope_frame(FRAME, ['A', 'B'])
+        changed = dict(FRAME, merchant_modes=dict(FRAME['merchant_modes'], B={'UPI': numbers(21, 16, 1600.0)}))
+        delta = frame_delta(previous, scope_frame(changed, ['A', 'B']))
+        self.assertEqual(delta['merchant_modes'], {'B': {'UPI': numbers(21, 16, 1600.0)}})
+        self.assertEqual(delta['payment_modes'], {'UPI': numbers(27, 21, 2100.0)})
@@ -8,7 +8,11 @@ from .views import (
     SettlementAnalyticsView,
     RefundChargebackAnalyticsView,
     ComparativeAnalyticsView,
-    ExecutiveDashboardView
+    ExecutiveDashboardView,
+    CubeAnalyticsView,
+    CustomerProfileView,
+    LiveStreamTicketView,
+    LiveDashboardStreamView
 )
 
 app_name = 'analytics'
@@ -21,4 +25,8 @@ urlpatterns = [
     path('refund-chargeback/', RefundChargebackAnalyticsView.as_view(), name='refund-chargeback'),
     path('comparative/', ComparativeAnalyticsView.as_view(), name='comparative'),
     path('executive-dashboard/', ExecutiveDashboardView.as_view(), name='executive-dashboard'),
+    path('cube/', CubeAnalyticsView.as_view(), name='cube'),
+    path('customers/', CustomerProfileView.as_view(), name='customers'),
+    path('live-stream/ticket/', LiveStreamTicketView.as_view(), name='live-stream-ticket'),
+    path('live-stream/', LiveDashboardStreamView.as_view(), name='live-stream'),
 ]
\ No newline at end of file
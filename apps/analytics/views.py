@@ -4,16 +4,31 @@ Analytics views for business intelligence and reporting
 from rest_framework import views, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q, Sum, Count, Avg, F, Value, CharField
-from django.db.models.functions import TruncDate, TruncMonth, TruncHour, Concat
+from rest_framework.renderers import JSONRenderer
+from django.db.models import Q, Sum, Count, Value, CharField
+from django.db.models.functions import TruncMonth, TruncHour, Concat
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from datetime import datetime, timedelta
+import copy
 import json
 
+from apps.authentication.backends import StreamTicketAuthentication
 from apps.core.permissions import IsAdmin, IsMerchant
-from apps.core.cache import CacheDecorator
+from apps.core.cache import CacheDecorator, CacheMetrics, CacheTags, SingleFlight, StaleWhileRevalidate
 from apps.transactions.models import TransactionDetail, ClientDataTable
 from apps.transactions.filters import TransactionSearchFilter
+from apps.transactions.aggregation_router import (
+    AggregateQuery, AggregationRouter, RefundSummaryRouter, SettlementSummaryRouter
+)
+from apps.transactions.cube import Cube, CubeError, DIMENSIONS
+from apps.analytics.live_stream import EventStreamRenderer, LiveStreamHub, event_stream
+from apps.transactions.live_counters import live_cache_timeout
+from apps.transactions.local_time import LocalHour
+from apps.transactions.payer_profiles import PayerProfileBuilder, PayerProfileStore
+from apps.transactions.refund_reasons import NOT_SPECIFIED, reason_label
+from apps.transactions.sampling import SampledAggregator, approx_requested
+from apps.transactions.sketch_summaries import UniquePayerEstimator, QuantileEstimator, TopListEstimator
 
 
 class MerchantAnalyticsView(views.APIView):
@@ -23,7 +38,7 @@ class MerchantAnalyticsView(views.APIView):
     """
     permission_classes = [IsAuthenticated]
 
-    @CacheDecorator.cache_result(timeout=1800)  # Cache for 30 minutes
+    @CacheDecorator.cache_response(timeout=1800, hard_timeout=3600)  # Fresh 30 min, served stale up to 1 h
     def get(self, request):
         # Validate filters
         filter_errors = TransactionSearchFilter.validate_filters(request.query_params)
@@ -44,6 +59,8 @@ class MerchantAnalyticsView(views.APIView):
             request.user
         )
 
+        aggregate_query = AggregateQuery.from_request(request.query_params, request.user)
+
         # Determine the date range for analytics
         date_filter = request.query_params.get('date_filter', 'month')
         date_from = request.query_params.get('date_from')
@@ -70,63 +87,88 @@ class MerchantAnalyticsView(views.APIView):
                 trans_date__gte=start_date,
                 trans_date__lte=end_date
             )
+            aggregate_query.restrict(start_date, end_date)
 
         # Calculate days in period
         days = (end_date.date() - start_date.date()).days + 1 if hasattr(end_date, 'date') else 1
 
+        # Closed days are served from summary tables, only the rest is scanned;
+        # approx=true estimates them from the transaction sample instead
+        approx = approx_requested(request.query_params)
+        if approx:
+            router = SampledAggregator(aggregate_query, transactions)
+        else:
+            router = AggregationRouter(aggregate_query, transactions)
+
         # Calculate KPIs
-        total_transactions = transactions.count()
-        successful_transactions = transactions.filter(status='SUCCESS').count()
-        failed_transactions = transactions.filter(status='FAILED').count()
+        kpi_totals = router.aggregate([
+            'total_count', 'success_count', 'failed_count', 'success_amount', 'settled_amount'
+        ] + (['pending_settlement_amount'] if approx else []))
+        total_transactions = kpi_totals['total_count']
+        successful_transactions = kpi_totals['success_count']
+        failed_transactions = kpi_totals['failed_count']
 
         success_rate = (successful_transactions / total_transactions * 100) if total_transactions > 0 else 0
 
         # Financial metrics
-        total_volume = transactions.filter(status='SUCCESS').aggregate(
-            Sum('paid_amount'))['paid_amount__sum'] or 0
-        avg_transaction_value = transactions.filter(status='SUCCESS').aggregate(
-            Avg('paid_amount'))['paid_amount__avg'] or 0
+        total_volume = kpi_totals['success_amount']
+        avg_transaction_value = (total_volume / successful_transactions) if successful_transactions > 0 else 0
 
         # Settlement metrics
-        settled_amount = transactions.filter(
-            is_settled=True
-        ).aggregate(Sum('settlement_amount'))['settlement_amount__sum'] or 0
-
-        pending_settlement = transactions.filter(
-            status='SUCCESS', is_settled=False
-        ).aggregate(Sum('paid_amount'))['paid_amount__sum'] or 0
+        settled_amount = kpi_totals['settled_amount']
 
-        # Payment mode distribution
-        payment_modes = transactions.filter(status='SUCCESS').values('payment_mode').annotate(
-            count=Count('txn_id'),
-            volume=Sum('paid_amount')
-        ).order_by('-volume')[:5]
+        if approx:
+            pending_settlement = kpi_totals['pending_settlement_amount']
+        else:
+            pending_settlement = transactions.filter(
+                status='SUCCESS', is_settled=False
+            ).aggregate(Sum('paid_amount'))['paid_amount__sum'] or 0
+
+        # Payment mode distribution (modes with successful transactions only)
+        payment_modes = sorted(
+            [
+                {'payment_mode': pm['payment_mode'], 'count': pm['success_count'], 'volume': pm['success_amount']}
+                for pm in router.aggregate(['success_count', 'success_amount'], group_by='payment_mode')
+                if pm['success_count'] > 0
+            ],
+            key=lambda pm: pm['volume'],
+            reverse=True
+        )[:5]
 
         # Daily trend
-        daily_trend = transactions.values(
-            date=TruncDate('trans_date')
-        ).annotate(
-            total=Count('txn_id'),
-            successful=Count('txn_id', filter=Q(status='SUCCESS')),
-            volume=Sum('paid_amount', filter=Q(status='SUCCESS'))
-        ).order_by('date')
-
-        # Hourly distribution - using Extract instead of TruncHour to avoid timezone issues
-        from django.db.models import F
-        from django.db.models.functions import Extract
-        hourly_dist = transactions.filter(status='SUCCESS').annotate(
-            hour=Extract('trans_date', 'hour')
-        ).values('hour').annotate(
-            count=Count('txn_id')
-        ).order_by('hour')
-
-        # Top customers
-        top_customers = transactions.filter(status='SUCCESS').values(
-            'payee_email'
-        ).annotate(
-            transaction_count=Count('txn_id'),
-            total_amount=Sum('paid_amount')
-        ).order_by('-total_amount')[:10]
+        daily_trend = [
+            {'date': dt['date'], 'total': dt['total_count'], 'successful': dt['success_count'],
+             'volume': dt['success_amount'], 'margin': dt.get('margin')}
+            for dt in router.aggregate(['total_count', 'success_count', 'success_amount'], group_by='date')
+        ]
+
+        # Hourly distribution by IST hour
+        if approx:
+            hourly_dist = [
+                {'hour': hd['hour'], 'count': hd['success_count']}
+                for hd in router.aggregate(['success_count'], group_by='hour')
+            ]
+        else:
+            hourly_dist = transactions.filter(status='SUCCESS').annotate(
+                hour=LocalHour('trans_date')
+            ).values('hour').annotate(
+                count=Count('txn_id')
+            ).order_by('hour')
+
+        # Unique payers - merged day sketches plus live rows for the rest
+        unique_payers = UniquePayerEstimator(aggregate_query, transactions).estimate()
+
+        # Ticket size percentiles (SUCCESS) from the day digests
+        ticket_size = QuantileEstimator(aggregate_query, transactions).percentiles('amount')
+
+        # Top customers - merged daily top lists plus live rows for the rest,
+        # with lifetime details from the payer profiles
+        top_customers = TopListEstimator(aggregate_query, transactions).top_customers(10)
+        profiles = PayerProfileStore.summaries(
+            [customer['email'] for customer in top_customers], aggregate_query.client_codes
+        )
+        for customer in top_customers:
+            customer['profile'] = profiles.get(customer['email'])
 
         analytics_data = {
             'kpis': {
@@ -160,13 +202,17 @@ class MerchantAnalyticsView(views.APIView):
                     'count': hd['count']
                 } for hd in hourly_dist
             ],
-            'top_customers': [
-                {
-                    'email': tc['payee_email'],
-                    'transaction_count': tc['transaction_count'],
-                    'total_amount': float(tc['total_amount'] or 0)
-                } for tc in top_customers if tc['payee_email']
-            ],
+            'unique_payers': {
+                'emails': unique_payers['unique_emails'],
+                'mobiles': unique_payers['unique_mobiles'],
+                'relative_error': unique_payers['relative_error']
+            },
+            'ticket_size': {
+                'p50': ticket_size['p50'],
+                'p90': ticket_size['p90'],
+                'p99': ticket_size['p99']
+            },
+            'top_customers': top_customers,
             'period': {
                 'start_date': start_date.isoformat(),
                 'end_date': end_date.isoformat(),
@@ -174,6 +220,25 @@ class MerchantAnalyticsView(views.APIView):
             }
         }
 
+        if approx:
+            margin = kpi_totals['margin']
+            analytics_data['kpis']['margin'] = {
+                'total_transactions': margin['total_count'],
+                'successful_transactions': margin['success_count'],
+                'failed_transactions': margin['failed_count'],
+                'success_rate': margin['success_rate'],
+                'total_volume': margin['success_amount'],
+                'settled_amount': margin['settled_amount'],
+                'pending_settlement': margin['pending_settlement_amount'],
+            }
+            for entry, dt in zip(analytics_data['daily_trend'], daily_trend):
+                entry['margin'] = {
+                    'total': dt['margin']['total_count'],
+                    'successful': dt['margin']['success_count'],
+                    'volume': dt['margin']['success_amount'],
+                }
+            analytics_data['approximation'] = router.describe()
+
         return Response({
             'success': True,
             'data': analytics_data
@@ -187,7 +252,7 @@ class PaymentModeAnalyticsView(views.APIView):
     """
     permission_classes = [IsAuthenticated]
 
-    @CacheDecorator.cache_result(timeout=900, key_prefix='payment_mode_analytics')  # 15 min cache
+    @CacheDecorator.cache_response(timeout=900, key_prefix='payment_mode_analytics')  # 15 min cache
     def get(self, request):
         # Validate filters
         filter_errors = TransactionSearchFilter.validate_filters(request.query_params)
@@ -212,10 +277,13 @@ class PaymentModeAnalyticsView(views.APIView):
             request.user
         )
 
+        aggregate_query = AggregateQuery.from_request(request.query_params, request.user)
+
         # If no payment mode specified, default to UPI
         payment_mode = request.query_params.get('payment_mode', 'UPI')
         if not request.query_params.get('payment_mode'):
             queryset = queryset.filter(payment_mode__icontains=payment_mode)
+            aggregate_query.payment_mode_contains = payment_mode
 
         # If no date filter specified, default to last 7 days
         if not request.query_params.get('date_filter') and not request.query_params.get('date_from'):
@@ -225,64 +293,94 @@ class PaymentModeAnalyticsView(views.APIView):
                 trans_date__gte=start_date,
                 trans_date__lte=end_date
             )
+            aggregate_query.restrict(start_date, end_date)
+
+        approx = approx_requested(request.query_params)
+        if approx:
+            router = SampledAggregator(aggregate_query, queryset)
+        else:
+            router = AggregationRouter(aggregate_query, queryset)
 
         # Calculate metrics
-        total = queryset.count()
-        successful = queryset.filter(status='SUCCESS').count()
-        failed = queryset.filter(status='FAILED').count()
+        totals = router.aggregate(['total_count', 'success_count', 'failed_count', 'success_amount'])
+        total = totals['total_count']
+        successful = totals['success_count']
+        failed = totals['failed_count']
 
-        volume = queryset.filter(status='SUCCESS').aggregate(
-            Sum('paid_amount'))['paid_amount__sum'] or 0
+        volume = totals['success_amount']
 
-        avg_amount = queryset.filter(status='SUCCESS').aggregate(
-            Avg('paid_amount'))['paid_amount__avg'] or 0
+        avg_amount = (volume / successful) if successful > 0 else 0
 
         # Success rate by bank/gateway
-        gateway_stats = queryset.values('pg_name').annotate(
-            total=Count('txn_id'),
-            successful=Count('txn_id', filter=Q(status='SUCCESS')),
-            volume=Sum('paid_amount', filter=Q(status='SUCCESS'))
-        ).order_by('-volume')
+        gateway_stats = sorted(
+            router.aggregate(['total_count', 'success_count', 'success_amount'], group_by='pg_name'),
+            key=lambda row: row['success_amount'],
+            reverse=True
+        )
 
         # Trend analysis
-        trend = queryset.values(
-            date=TruncDate('trans_date')
-        ).annotate(
-            count=Count('txn_id'),
-            success_count=Count('txn_id', filter=Q(status='SUCCESS')),
-            volume=Sum('paid_amount', filter=Q(status='SUCCESS'))
-        ).order_by('date')
+        trend = [
+            {'date': t['date'], 'count': t['total_count'], 'success_count': t['success_count'],
+             'volume': t['success_amount'], 'margin': t.get('margin')}
+            for t in router.aggregate(['total_count', 'success_count', 'success_amount'], group_by='date')
+        ]
+
+        data = {
+            'payment_mode': payment_mode,
+            'metrics': {
+                'total_transactions': total,
+                'successful': successful,
+                'failed': failed,
+                'success_rate': round((successful/total*100) if total > 0 else 0, 2),
+                'total_volume': float(volume),
+                'avg_transaction': float(avg_amount)
+            },
+            'gateway_performance': [
+                {
+                    'gateway': gs['pg_name'] or 'Unknown',
+                    'total': gs['total_count'],
+                    'successful': gs['success_count'],
+                    'success_rate': round((gs['success_count']/gs['total_count']*100) if gs['total_count'] > 0 else 0, 2),
+                    'volume': float(gs['success_amount'])
+                } for gs in gateway_stats
+            ],
+            'daily_trend': [
+                {
+                    'date': t['date'].isoformat() if t['date'] else None,
+                    'count': t['count'],
+                    'successful': t['success_count'],
+                    'volume': float(t['volume'] or 0)
+                } for t in trend
+            ]
+        }
+
+        if approx:
+            margin = totals['margin']
+            data['metrics']['margin'] = {
+                'total_transactions': margin['total_count'],
+                'successful': margin['success_count'],
+                'failed': margin['failed_count'],
+                'success_rate': margin['success_rate'],
+                'total_volume': margin['success_amount'],
+            }
+            for entry, gs in zip(data['gateway_performance'], gateway_stats):
+                entry['margin'] = {
+                    'total': gs['margin']['total_count'],
+                    'successful': gs['margin']['success_count'],
+                    'success_rate': gs['margin']['success_rate'],
+                    'volume': gs['margin']['success_amount'],
+                }
+            for entry, t in zip(data['daily_trend'], trend):
+                entry['margin'] = {
+                    'count': t['margin']['total_count'],
+                    'successful': t['margin']['success_count'],
+                    'volume': t['margin']['success_amount'],
+                }
+            data['approximation'] = router.describe()
 
         return Response({
             'success': True,
-            'data': {
-                'payment_mode': payment_mode,
-                'metrics': {
-                    'total_transactions': total,
-                    'successful': successful,
-                    'failed': failed,
-                    'success_rate': round((successful/total*100) if total > 0 else 0, 2),
-                    'total_volume': float(volume),
-                    'avg_transaction': float(avg_amount)
-                },
-                'gateway_performance': [
-                    {
-                        'gateway': gs['pg_name'] or 'Unknown',
-                        'total': gs['total'],
-                        'successful': gs['successful'],
-                        'success_rate': round((gs['successful']/gs['total']*100) if gs['total'] > 0 else 0, 2),
-                        'volume': float(gs['volume'] or 0)
-                    } for gs in gateway_stats
-                ],
-                'daily_trend': [
-                    {
-                        'date': t['date'].isoformat() if t['date'] else None,
-                        'count': t['count'],
-                        'successful': t['success_count'],
-                        'volume': float(t['volume'] or 0)
-                    } for t in trend
-                ]
-            }
+            'data': data
         })
 
 
@@ -293,7 +391,7 @@ class SettlementAnalyticsView(views.APIView):
     """
     permission_classes = [IsAuthenticated]
 
-    @CacheDecorator.cache_result(timeout=900, key_prefix='settlement_analytics')  # 15 min cache
+    @CacheDecorator.cache_response(timeout=900, key_prefix='settlement_analytics')  # 15 min cache
     def get(self, request):
         # Validate filters
         filter_errors = TransactionSearchFilter.validate_filters(request.query_params)
@@ -319,6 +417,22 @@ class SettlementAnalyticsView(views.APIView):
             request.user
         )
 
+        # Transaction-date totals (SUCCESS only) routed through the summaries
+        aggregate_query = AggregateQuery.from_request(request.query_params, request.user)
+        if aggregate_query.statuses and 'SUCCESS' not in aggregate_query.statuses:
+            aggregate_query.unsupported.append('status')
+        aggregate_query.statuses = ['SUCCESS']
+
+        # Settlements made in the period (by settlement date) for the timeline
+        settlement_params = TransactionSearchFilter.resolve_date_filter(request.query_params)
+        settled_queryset = TransactionSearchFilter.apply_filters(
+            TransactionDetail.objects.filter(is_settled=True),
+            settlement_params,
+            request.user,
+            date_field='settlement_date'
+        )
+        settlement_query = AggregateQuery.from_request(settlement_params, request.user)
+
         # If no date filter specified, default to last 30 days
         if not request.query_params.get('date_filter') and not request.query_params.get('date_from'):
             end_date = timezone.now()
@@ -327,6 +441,12 @@ class SettlementAnalyticsView(views.APIView):
                 trans_date__gte=start_date,
                 trans_date__lte=end_date
             )
+            settled_queryset = settled_queryset.filter(
+                settlement_date__gte=start_date,
+                settlement_date__lte=end_date
+            )
+            settlement_query.restrict(start_date, end_date)
+            aggregate_query.restrict(start_date, end_date)
 
         # Settlement metrics
         total_success = queryset.aggregate(Sum('paid_amount'))['paid_amount__sum'] or 0
@@ -335,41 +455,26 @@ class SettlementAnalyticsView(views.APIView):
         pending_settlement = queryset.filter(is_settled=False).aggregate(
             Sum('paid_amount'))['paid_amount__sum'] or 0
 
-        # Settlement timeline
-        settlement_timeline = queryset.filter(is_settled=True).values(
-            date=TruncDate('settlement_date')
-        ).annotate(
-            count=Count('txn_id'),
-            amount=Sum('settlement_amount')
-        ).order_by('-date')[:30]
-
-        # Settlement TAT (Turn Around Time)
-        from django.db.models import ExpressionWrapper, DurationField
-        tat_data = queryset.filter(
-            is_settled=True,
-            settlement_date__isnull=False
-        ).annotate(
-            tat=ExpressionWrapper(
-                F('settlement_date') - F('trans_complete_date'),
-                output_field=DurationField()
-            )
-        )
-
-        # Calculate average TAT in hours
-        avg_tat_seconds = 0
-        tat_count = 0
-        for txn in tat_data[:1000]:  # Sample for performance
-            if txn.tat:
-                avg_tat_seconds += txn.tat.total_seconds()
-                tat_count += 1
+        # Settlement timeline (latest 30 settlement days)
+        settlement_days = SettlementSummaryRouter(settled_queryset, settlement_query).grouped('date')
+        settlement_timeline = [row for row in reversed(settlement_days) if row['date'] is not None][:30]
 
-        avg_tat_hours = (avg_tat_seconds / tat_count / 3600) if tat_count > 0 else 0
+        # Settlement TAT (Turn Around Time) and ticket size percentiles over
+        # every settled transaction - merged day digests plus live rows
+        quantiles = QuantileEstimator(aggregate_query, queryset)
+        tat_hours = quantiles.percentiles('tat', scale=1 / 3600)
+        ticket_size = quantiles.percentiles('amount')
 
         # Bank-wise settlement (using pg_name as proxy for bank)
-        bank_settlements = queryset.filter(is_settled=True).values('pg_name').annotate(
-            count=Count('txn_id'),
-            amount=Sum('settlement_amount')
-        ).order_by('-amount')
+        bank_settlements = sorted(
+            [
+                row for row in AggregationRouter(aggregate_query, queryset).aggregate(
+                    ['settled_count', 'settled_amount'], group_by='pg_name'
+                ) if row['settled_count'] > 0
+            ],
+            key=lambda row: row['settled_amount'],
+            reverse=True
+        )
 
         return Response({
             'success': True,
@@ -379,20 +484,33 @@ class SettlementAnalyticsView(views.APIView):
                     'total_settled': float(total_settled),
                     'pending_settlement': float(pending_settlement),
                     'settlement_rate': round((total_settled/total_success*100) if total_success > 0 else 0, 2),
-                    'avg_settlement_tat_hours': round(avg_tat_hours, 2)
+                    'avg_settlement_tat_hours': tat_hours['mean'] or 0
+                },
+                'settlement_tat_hours': {
+                    'p50': tat_hours['p50'],
+                    'p90': tat_hours['p90'],
+                    'p99': tat_hours['p99'],
+                    'settled_transactions': tat_hours['count']
+                },
+                'ticket_size': {
+                    'p50': ticket_size['p50'],
+                    'p90': ticket_size['p90'],
+                    'p99': ticket_size['p99']
                 },
                 'settlement_timeline': [
                     {
-                        'date': st['date'].isoformat() if st['date'] else None,
-                        'count': st['count'],
-                        'amount': float(st['amount'] or 0)
+                        'date': st['date'].isoformat(),
+                        'count': st['total_count'],
+                        'amount': round(st['total_amount'], 2),
+                        'charges': round(st['total_charges'], 2),
+                        'effective_amount': round(st['total_effective'], 2)
                     } for st in settlement_timeline
                 ],
                 'bank_wise_settlement': [
                     {
                         'bank': bs['pg_name'] or 'Unknown',
-                        'count': bs['count'],
-                        'amount': float(bs['amount'] or 0)
+                        'count': bs['settled_count'],
+                        'amount': float(bs['settled_amount'])
                     } for bs in bank_settlements
                 ]
             }
@@ -406,7 +524,7 @@ class RefundChargebackAnalyticsView(views.APIView):
     """
     permission_classes = [IsAuthenticated]
 
-    @CacheDecorator.cache_result(timeout=1800, key_prefix='refund_chargeback_analytics')  # 30 min cache
+    @CacheDecorator.cache_response(timeout=1800, key_prefix='refund_chargeback_analytics')  # 30 min cache
     def get(self, request):
         # Validate filters
         filter_errors = TransactionSearchFilter.validate_filters(request.query_params)
@@ -434,6 +552,9 @@ class RefundChargebackAnalyticsView(views.APIView):
             request.user
         )
 
+        # Closed days come from the refund reason summary
+        aggregate_query = AggregateQuery.from_request(request.query_params, request.user)
+
         # If no date filter specified, default to last 30 days
         if not request.query_params.get('date_filter') and not request.query_params.get('date_from'):
             end_date = timezone.now()
@@ -442,87 +563,56 @@ class RefundChargebackAnalyticsView(views.APIView):
                 trans_date__gte=start_date,
                 trans_date__lte=end_date
             )
-
-        # Refund metrics (no refund_amount or refunded_amount fields exist)
-        # Using refund_date and refund_status_code to identify refunds
-        total_refunds = queryset.filter(
-            Q(refund_date__isnull=False) | Q(refund_status_code__isnull=False)
-        ).count()
-
-        # Calculate refund amount using paid_amount as proxy
-        refund_transactions = queryset.filter(
-            Q(refund_date__isnull=False) | Q(refund_status_code__isnull=False)
-        )
-        refund_amount = refund_transactions.aggregate(
-            total=Sum('paid_amount')  # Using paid_amount as proxy for refund amount
-        )
-
-        # Chargeback metrics (is_charge_back field doesn't exist)
-        total_chargebacks = queryset.filter(
-            Q(charge_back_amount__gt=0) | Q(charge_back_status__isnull=False)
-        ).count()
-
-        chargeback_amount = queryset.filter(
-            Q(charge_back_amount__gt=0) | Q(charge_back_status__isnull=False)
-        ).aggregate(Sum('charge_back_amount'))['charge_back_amount__sum'] or 0
-
-        # Refund trend
-        refund_trend = queryset.filter(
-            Q(refund_date__isnull=False) | Q(refund_status_code__isnull=False)
-        ).values(
-            date=TruncDate('refund_date')
-        ).annotate(
-            count=Count('txn_id'),
-            amount=Sum('paid_amount')  # Using paid_amount as proxy
-        ).order_by('date')
-
-        # Chargeback trend
-        chargeback_trend = queryset.filter(
-            Q(charge_back_amount__gt=0) | Q(charge_back_status__isnull=False)
-        ).values(
-            date=TruncDate('charge_back_date')
-        ).annotate(
-            count=Count('txn_id'),
-            amount=Sum('charge_back_amount')
-        ).order_by('date')
-
-        # Refund reasons (using refund_message and refund_request_from as proxies)
-        # Group by refund_message to get top reasons
-        refund_reasons = queryset.filter(
-            Q(refund_message__isnull=False) | Q(refund_request_from__isnull=False)
-        ).values('refund_message').annotate(
-            count=Count('txn_id')
-        ).order_by('-count')[:10]
+            aggregate_query.restrict(start_date, end_date)
+
+        # Refunds are identified by refund_date / refund_status_code and
+        # valued at paid_amount (there is no refund amount column);
+        # chargebacks by charge_back_amount / charge_back_status
+        router = RefundSummaryRouter(queryset, aggregate_query)
+        totals = router.grouped()
+        refund_trend = [row for row in router.grouped('refund_date') if row['refund_count']]
+        chargeback_trend = [row for row in router.grouped('chargeback_date') if row['chargeback_count']]
+
+        # Top refund reasons by normalised reason code
+        refund_reasons = sorted(
+            [
+                row for row in router.grouped('reason')
+                if row['refund_count'] and row['reason_code'] != NOT_SPECIFIED
+            ],
+            key=lambda row: row['refund_count'],
+            reverse=True
+        )[:10]
 
         return Response({
             'success': True,
             'data': {
                 'summary': {
-                    'total_refunds': total_refunds,
-                    'total_refund_amount': float(refund_amount['total'] or 0),
-                    'refunded_amount': float(refund_amount['total'] or 0),  # Same as total since we don't have separate field
-                    'total_chargebacks': total_chargebacks,
-                    'total_chargeback_amount': float(chargeback_amount)
+                    'total_refunds': totals['refund_count'],
+                    'total_refund_amount': float(totals['refund_amount']),
+                    'refunded_amount': float(totals['refund_amount']),  # Same as total since we don't have separate field
+                    'total_chargebacks': totals['chargeback_count'],
+                    'total_chargeback_amount': float(totals['chargeback_amount'])
                 },
                 'refund_trend': [
                     {
-                        'date': rt['date'].isoformat() if rt['date'] else None,
-                        'count': rt['count'],
-                        'amount': float(rt['amount'] or 0)
-                    } for rt in refund_trend if rt['date']
+                        'date': rt['refund_date'].isoformat(),
+                        'count': rt['refund_count'],
+                        'amount': float(rt['refund_amount'])
+                    } for rt in refund_trend if rt['refund_date']
                 ],
                 'chargeback_trend': [
                     {
-                        'date': ct['date'].isoformat() if ct['date'] else None,
-                        'count': ct['count'],
-                        'amount': float(ct['amount'] or 0)
-                    } for ct in chargeback_trend if ct['date']
+                        'date': ct['chargeback_date'].isoformat(),
+                        'count': ct['chargeback_count'],
+                        'amount': float(ct['chargeback_amount'])
+                    } for ct in chargeback_trend if ct['chargeback_date']
                 ],
                 'top_refund_reasons': [
                     {
-                        'reason': rr['refund_message'] or 'Not specified',
-                        'count': rr['count']
-                    } for rr in refund_reasons if rr['refund_message']
+                        'reason': reason_label(rr['reason_code']),
+                        'reason_code': rr['reason_code'],
+                        'count': rr['refund_count']
+                    } for rr in refund_reasons
                 ]
             }
         })
@@ -535,7 +625,7 @@ class ComparativeAnalyticsView(views.APIView):
     """
     permission_classes = [IsAuthenticated, IsAdmin]
 
-    @CacheDecorator.cache_result(timeout=1800, key_prefix='comparative_analytics')  # 30 min cache
+    @CacheDecorator.cache_response(timeout=1800, key_prefix='comparative_analytics')  # 30 min cache
     def get(self, request):
         comparison_type = request.query_params.get('type', 'period')  # period or merchant
 
@@ -557,6 +647,9 @@ class ComparativeAnalyticsView(views.APIView):
         previous_end = current_start
         previous_start = previous_end - timedelta(days=current_days)
 
+        approx = approx_requested(request.query_params)
+        approximation = {}
+
         # Get metrics for both periods
         def get_period_metrics(start_date, end_date):
             queryset = TransactionDetail.objects.filter(
@@ -566,6 +659,23 @@ class ComparativeAnalyticsView(views.APIView):
                 'txn_id', 'trans_date', 'status', 'paid_amount'
             )
 
+            if approx:
+                aggregator = SampledAggregator(AggregateQuery(start_date, end_date), queryset)
+                totals = aggregator.aggregate(['total_count', 'success_count', 'success_amount'])
+                approximation[start_date] = aggregator.describe()
+                return {
+                    'total_transactions': totals['total_count'],
+                    'successful_transactions': totals['success_count'],
+                    'success_rate': totals['success_rate'],
+                    'total_volume': totals['success_amount'],
+                    'margin': {
+                        'total_transactions': totals['margin']['total_count'],
+                        'successful_transactions': totals['margin']['success_count'],
+                        'success_rate': totals['margin']['success_rate'],
+                        'total_volume': totals['margin']['success_amount'],
+                    }
+                }
+
             total = queryset.count()
             successful = queryset.filter(status='SUCCESS').count()
             volume = queryset.filter(status='SUCCESS').aggregate(
@@ -593,21 +703,26 @@ class ComparativeAnalyticsView(views.APIView):
                 else:
                     changes[f'{key}_change'] = 100 if curr_val > 0 else 0
 
+        data = {
+            'current_period': {
+                'start': current_start.isoformat(),
+                'end': current_end.isoformat(),
+                'metrics': current_metrics
+            },
+            'previous_period': {
+                'start': previous_start.isoformat(),
+                'end': previous_end.isoformat(),
+                'metrics': previous_metrics
+            },
+            'changes': changes
+        }
+        if approx:
+            data['current_period']['approximation'] = approximation[current_start]
+            data['previous_period']['approximation'] = approximation[previous_start]
+
         return Response({
             'success': True,
-            'data': {
-                'current_period': {
-                    'start': current_start.isoformat(),
-                    'end': current_end.isoformat(),
-                    'metrics': current_metrics
-                },
-                'previous_period': {
-                    'start': previous_start.isoformat(),
-                    'end': previous_end.isoformat(),
-                    'metrics': previous_metrics
-                },
-                'changes': changes
-            }
+            'data': data
         })
 
     def compare_merchants(self, request):
@@ -625,6 +740,9 @@ class ComparativeAnalyticsView(views.APIView):
         end_date = timezone.now()
         start_date = end_date - timedelta(days=days)
 
+        if approx_requested(request.query_params):
+            return self.compare_merchants_approx(merchant_codes, start_date, end_date)
+
         merchant_data = []
         for code in merchant_codes[:5]:  # Limit to 5 merchants
             queryset = TransactionDetail.objects.filter(
@@ -663,6 +781,63 @@ class ComparativeAnalyticsView(views.APIView):
             }
         })
 
+    def compare_merchants_approx(self, merchant_codes, start_date, end_date):
+        """
+        compare_merchants from the transaction sample, one grouped query for
+        all merchants
+        """
+        codes = [code.strip() for code in merchant_codes[:5]]  # Limit to 5 merchants
+        queryset = TransactionDetail.objects.filter(
+            client_code__in=codes,
+            trans_date__gte=start_date,
+            trans_date__lte=end_date
+        ).only(
+            'txn_id', 'client_code', 'trans_date', 'status', 'paid_amount'
+        )
+        aggregator = SampledAggregator(AggregateQuery(start_date, end_date, client_codes=codes), queryset)
+        rows = {
+            row['client_code']: row
+            for row in aggregator.aggregate(['total_count', 'success_count', 'success_amount'], group_by='client_code')
+        }
+
+        # Merchants without transactions in the period
+        empty = {'total_count': 0, 'success_count': 0, 'success_rate': 0, 'success_amount': 0}
+        empty['margin'] = dict(empty)
+
+        merchant_data = []
+        for code in codes:
+            row = rows.get(code, empty)
+            successful = row['success_count']
+            merchant_data.append({
+                'merchant_code': code,
+                'total_transactions': row['total_count'],
+                'successful_transactions': successful,
+                'success_rate': row['success_rate'],
+                'total_volume': row['success_amount'],
+                'avg_transaction': round(row['success_amount'] / successful, 2) if successful > 0 else 0,
+                'margin': {
+                    'total_transactions': row['margin']['total_count'],
+                    'successful_transactions': row['margin']['success_count'],
+                    'success_rate': row['margin']['success_rate'],
+                    'total_volume': row['margin']['success_amount'],
+                }
+            })
+
+        # Sort by volume
+        merchant_data.sort(key=lambda x: x['total_volume'], reverse=True)
+
+        return Response({
+            'success': True,
+            'data': {
+                'period': {
+                    'start': start_date.isoformat(),
+                    'end': end_date.isoformat()
+                },
+                'merchants': merchant_data,
+                'approximation': aggregator.describe()
+            }
+        })
+
 
 class ExecutiveDashboardView(views.APIView):
     """
@@ -672,6 +847,10 @@ class ExecutiveDashboardView(views.APIView):
     """
     permission_classes = [IsAuthenticated, IsAdmin]
 
+    # Cached dashboards are served stale (refreshing in the background) for
+    # this many times their fresh TTL
+    STALE_FACTOR = 3
+
     def get(self, request):
         import logging
         from django.core.cache import cache
@@ -697,15 +876,46 @@ class ExecutiveDashboardView(views.APIView):
         local_date = local_now.date()
 
         # PERFORMANCE: Cache dashboard data for 5 minutes
-        cache_key = f'executive_dashboard_{date_filter}_{local_date}'
-        cached_response = cache.get(cache_key)
+        # Keyed by the generations of its tags so invalidation (CacheTags) reaches it
+        generation = CacheTags.version(CacheTags.for_request(request))
+        cache_key = f'executive_dashboard_{date_filter}_{local_date}_{generation}'
+        cached_response, stale = StaleWhileRevalidate.unwrap(cache.get(cache_key))
 
         if cached_response:
-            logger.info(f"Cache HIT for {cache_key} - Returning cached data")
+            if stale:
+                # Serve it and let one background refresh recalculate
+                CacheMetrics.incr('stale_hit')
+                logger.info(f"Stale cache HIT for {cache_key} - Returning cached data, refreshing")
+                view = copy.copy(self)
+                StaleWhileRevalidate.refresh(
+                    cache_key, lambda: view._calculate(request, date_filter, local_now, cache_key)
+                )
+            else:
+                CacheMetrics.incr('hit')
+                logger.info(f"Cache HIT for {cache_key} - Returning cached data")
             return Response(cached_response)
 
+        CacheMetrics.incr('miss')
         logger.info(f"Cache MISS for {cache_key} - Calculating fresh data")
 
+        # Requests missing together wait for one calculation (the dashboard
+        # takes seconds, so waiters get longer than the default)
+        cached_response = SingleFlight.claim(
+            cache_key, lambda: StaleWhileRevalidate.unwrap(cache.get(cache_key))[0], wait_timeout=30, lock_ttl=60
+        )
+        if cached_response:
+            logger.info(f"Coalesced {cache_key} - Returning data calculated by another request")
+            return Response(cached_response)
+        try:
+            return self._calculate(request, date_filter, local_now, cache_key)
+        finally:
+            SingleFlight.release(cache_key)
+
+    def _calculate(self, request, date_filter, local_now, cache_key):
+        import logging
+        from django.core.cache import cache
+        logger = logging.getLogger(__name__)
+
         # Calculate date range based on filter
         # Convert to local timezone (Asia/Kolkata) to match database
         from datetime import datetime
@@ -742,9 +952,10 @@ class ExecutiveDashboardView(views.APIView):
         logger.debug(f"Range Start: {range_start}")
         logger.debug(f"Range End: {range_end}")
 
-        # Count total transactions in DB
-        total_in_db = TransactionDetail.objects.count()
-        logger.debug(f"Total transactions in database: {total_in_db}")
+        # Count total transactions in DB (full table count - debug only)
+        if logger.isEnabledFor(logging.DEBUG):
+            total_in_db = TransactionDetail.objects.count()
+            logger.debug(f"Total transactions in database: {total_in_db}")
 
         # Optimized: Use only required fields to reduce query size
         base_fields = ['txn_id', 'trans_date', 'status', 'paid_amount', 'client_code', 'client_name', 'payment_mode']
@@ -755,8 +966,42 @@ class ExecutiveDashboardView(views.APIView):
             trans_date__lte=range_end
         )
 
+        # Closed days come from summary tables, only today/partial days are scanned
+        router = AggregationRouter(AggregateQuery(range_start, range_end), base_queryset)
+
+        # ============================================================================
+        # OPTIMIZED: Range totals from summaries + live remainder
+        # ============================================================================
+        try:
+            import time
+            start_time = time.time()
+
+            range_totals = router.aggregate(['total_count', 'success_count', 'success_amount'])
+
+            elapsed = (time.time() - start_time) * 1000
+            logger.debug(f"Range totals execution time: {elapsed:.2f}ms")
+
+            range_stats = {
+                'total_transactions': range_totals['total_count'],
+                'success_transactions': range_totals['success_count'],
+                'total_volume': float(range_totals['success_amount'] or 0)
+            }
+        except Exception as e:
+            logger.error(f"Routed range totals failed: {str(e)[:200]}")
+            logger.info("Falling back to ORM...")
+            range_stats = base_queryset.aggregate(
+                total_transactions=Count('txn_id'),
+                success_transactions=Count('txn_id', filter=Q(status='SUCCESS')),
+                total_volume=Sum('paid_amount', filter=Q(status='SUCCESS'))
+            )
+            range_stats = {
+                'total_transactions': range_stats['total_transactions'] or 0,
+                'success_transactions': range_stats['success_transactions'] or 0,
+                'total_volume': float(range_stats['total_volume'] or 0)
+            }
+
         # Get total count
-        total_records = base_queryset.count()
+        total_records = range_stats['total_transactions']
         logger.debug(f"Total transactions in range: {total_records}")
 
         logger.debug("=" * 80)
@@ -799,65 +1044,6 @@ class ExecutiveDashboardView(views.APIView):
         logger.info(f"Found {total_records:,} transactions in date range")
         logger.debug("="*80)
 
-        # ============================================================================
-        # OPTIMIZED: Use raw SQL for faster aggregation on large datasets
-        # ============================================================================
-
-        try:
-            import time
-            from django.db import connection
-
-            # Ensure connection is alive and reconnect if needed
-            try:
-                connection.ensure_connection()
-                if connection.connection:
-                    connection.connection.ping()
-            except Exception:
-                # Force reconnect if ping fails
-                connection.close()
-                connection.connect()
-
-            with connection.cursor() as cursor:
-                # Single optimized query to get all range stats
-                sql_query = """
-                    SELECT
-                        COUNT(*) as total_transactions,
-                        COUNT(CASE WHEN status = 'SUCCESS' THEN 1 END) as success_transactions,
-                        COALESCE(SUM(CASE WHEN status = 'SUCCESS' THEN paid_amount END), 0) as total_volume
-                    FROM transaction_detail
-                    WHERE trans_date >= %s AND trans_date <= %s
-                """
-                logger.debug(f"EXECUTING SQL QUERY (selected_range)")
-                logger.debug(f"Query: {sql_query.strip()}")
-                logger.debug(f"Params: range_start={range_start}, range_end={range_end}")
-                logger.debug(f"Estimated records in range: checking...")
-
-                start_time = time.time()
-                cursor.execute(sql_query, [range_start, range_end])
-                row = cursor.fetchone()
-                elapsed = (time.time() - start_time) * 1000
-                logger.debug(f"Query execution time: {elapsed:.2f}ms")
-                logger.debug(f"Records found: {row[0] or 0}")
-
-                range_stats = {
-                    'total_transactions': row[0] or 0,
-                    'success_transactions': row[1] or 0,
-                    'total_volume': float(row[2] or 0)
-                }
-        except Exception as e:
-            logger.error(f"Raw SQL failed: {str(e)[:200]}")
-            logger.info("Falling back to ORM...")
-            range_stats = base_queryset.aggregate(
-                total_transactions=Count('txn_id'),
-                success_transactions=Count('txn_id', filter=Q(status='SUCCESS')),
-                total_volume=Sum('paid_amount', filter=Q(status='SUCCESS'))
-            )
-            range_stats = {
-                'total_transactions': range_stats['total_transactions'] or 0,
-                'success_transactions': range_stats['success_transactions'] or 0,
-                'total_volume': float(range_stats['total_volume'] or 0)
-            }
-
         range_metrics = {
             'transactions': range_stats['total_transactions'] or 0,
             'volume': float(range_stats['total_volume'] or 0),
@@ -894,27 +1080,25 @@ class ExecutiveDashboardView(views.APIView):
         except Exception as e:
             logger.warning(f"Reconnection warning: {e}")
 
-        # Active merchants - based on selected date range (today/week/month/year)
+        # Active merchants for the range (closed days from summaries, today scanned)
         try:
             import time
-            from django.db import connection
 
-            logger.debug(f"Fetching active merchants count (for {date_filter} range)...")
+            logger.debug(f"Fetching merchant totals (for {date_filter} range)...")
             start_time = time.time()
 
-            # Use raw SQL for faster DISTINCT count
-            with connection.cursor() as cursor:
-                cursor.execute("""
-                    SELECT COUNT(DISTINCT client_code)
-                    FROM transaction_detail
-                    WHERE trans_date >= %s AND trans_date <= %s
-                """, [range_start, range_end])
-                active_merchants = cursor.fetchone()[0] or 0
+            merchant_rows = router.aggregate(['total_count', 'success_count', 'success_amount'], group_by='client_code')
+            merchants_prebuilt = router.last_plan['raw_windows'] is None
+            active_merchants = sum(
+                1 for row in merchant_rows
+                if row['client_code'] is not None and row['total_count'] > 0
+            )
 
             elapsed = (time.time() - start_time) * 1000
             logger.debug(f"Active merchants in {date_filter}: {active_merchants} ({elapsed:.2f}ms)")
         except Exception as e:
-            logger.error(f"Active merchants query failed: {e}")
+            logger.error(f"Merchant totals query failed: {e}")
+            merchant_rows, merchants_prebuilt = [], False
             active_merchants = 0
 
         # Total merchants - cached count
@@ -935,38 +1119,18 @@ class ExecutiveDashboardView(views.APIView):
         # These use aggregates + LIMIT, so they're fast even on large datasets
         # ============================================================================
 
-        # Top performing merchants from ALL records (limited to top 10)
+        # Top performing merchants by success volume (limited to top 10)
         try:
             import time
             logger.debug("Fetching top merchants...")
             start_time = time.time()
 
-            # Use raw SQL with optimized index hint for maximum performance
-            # idx_status_date_client_amount is faster because status='SUCCESS' filter comes first
-            with connection.cursor() as cursor:
-                cursor.execute("""
-                    SELECT
-                        client_code,
-                        client_name,
-                        SUM(paid_amount) as volume,
-                        COUNT(*) as count
-                    FROM transaction_detail USE INDEX (idx_status_date_client_amount)
-                    WHERE status = 'SUCCESS'
-                        AND trans_date >= %s AND trans_date <= %s
-                    GROUP BY client_code, client_name
-                    ORDER BY volume DESC
-                    LIMIT 10
-                """, [range_start, range_end])
-
-                top_merchants = [
-                    {
-                        'client_code': row[0],
-                        'client_name': row[1],
-                        'volume': float(row[2]) if row[2] else 0,
-                        'count': row[3]
-                    }
-                    for row in cursor.fetchall()
-                ]
+            if merchants_prebuilt:
+                # Whole range from summaries / live counters - rank the totals already read
+                top_merchants = TopListEstimator.rank_merchants(merchant_rows, 10)
+            else:
+                # Candidates from the merged daily top lists, re-totalled exactly
+                top_merchants = TopListEstimator(AggregateQuery(range_start, range_end), base_queryset).top_merchants(10)
 
             elapsed = (time.time() - start_time) * 1000
             logger.debug(f"Top merchants fetched: {len(top_merchants)} ({elapsed:.2f}ms)")
@@ -974,36 +1138,25 @@ class ExecutiveDashboardView(views.APIView):
             logger.error(f"Top merchants query failed: {e}")
             top_merchants = []
 
-        # Payment mode performance from ALL records (limited to top 10 modes)
+        # Payment mode performance (limited to top 10 modes)
         try:
             import time
             logger.debug("Fetching payment performance...")
             start_time = time.time()
 
-            # Use raw SQL with index hint for optimal performance
-            with connection.cursor() as cursor:
-                cursor.execute("""
-                    SELECT
-                        payment_mode,
-                        COUNT(*) as total,
-                        SUM(CASE WHEN status = 'SUCCESS' THEN 1 ELSE 0 END) as successful,
-                        (SUM(CASE WHEN status = 'SUCCESS' THEN 1 ELSE 0 END) * 100.0 / COUNT(*)) as success_rate
-                    FROM transaction_detail USE INDEX (idx_trans_date_payment_status)
-                    WHERE trans_date >= %s AND trans_date <= %s
-                    GROUP BY payment_mode
-                    ORDER BY total DESC
-                    LIMIT 10
-                """, [range_start, range_end])
-
-                payment_performance = [
-                    {
-                        'payment_mode': row[0],
-                        'total': row[1],
-                        'successful': row[2],
-                        'success_rate': float(row[3]) if row[3] else 0
-                    }
-                    for row in cursor.fetchall()
-                ]
+            payment_performance = [
+                {
+                    'payment_mode': row['payment_mode'],
+                    'total': row['total_count'],
+                    'successful': row['success_count'],
+                    'success_rate': (row['success_count'] * 100.0 / row['total_count']) if row['total_count'] else 0
+                }
+                for row in sorted(
+                    router.aggregate(['total_count', 'success_count'], group_by='payment_mode'),
+                    key=lambda row: row['total_count'],
+                    reverse=True
+                )[:10]
+            ]
 
             elapsed = (time.time() - start_time) * 1000
             logger.debug(f"Payment performance fetched: {len(payment_performance)} modes ({elapsed:.2f}ms)")
@@ -1011,34 +1164,22 @@ class ExecutiveDashboardView(views.APIView):
             logger.error(f"Payment performance query failed: {e}")
             payment_performance = []
 
-        # Daily trend from ALL records (grouped by date - typically 1-365 rows)
+        # Daily trend (grouped by date - typically 1-365 rows)
+        # Closed days from daily summaries, only today is scanned
         try:
             import time
 
             logger.debug("Fetching daily trend data...")
             start_time = time.time()
 
-            # Use raw SQL with index hint for optimal performance
-            with connection.cursor() as cursor:
-                cursor.execute("""
-                    SELECT
-                        DATE(trans_date) as date_only,
-                        COUNT(*) as transactions,
-                        SUM(CASE WHEN status = 'SUCCESS' THEN paid_amount ELSE 0 END) as volume
-                    FROM transaction_detail USE INDEX (idx_date_status_amount)
-                    WHERE trans_date >= %s AND trans_date <= %s
-                    GROUP BY DATE(trans_date)
-                    ORDER BY date_only
-                """, [range_start, range_end])
-
-                daily_trend = [
-                    {
-                        'date': row[0],
-                        'transactions': row[1],
-                        'volume': float(row[2]) if row[2] else 0
-                    }
-                    for row in cursor.fetchall()
-                ]
+            daily_trend = [
+                {
+                    'date': row['date'],
+                    'transactions': row['total_count'],
+                    'volume': float(row['success_amount'] or 0)
+                }
+                for row in router.aggregate(['total_count', 'success_amount'], group_by='date')
+            ]
 
             elapsed = (time.time() - start_time) * 1000
             logger.debug(f"Daily trend fetched: {len(daily_trend)} data points ({elapsed:.2f}ms)")
@@ -1127,13 +1268,210 @@ class ExecutiveDashboardView(views.APIView):
             }
         }
 
-        # PERFORMANCE: Cache the response for 5 minutes (300 seconds)
-        cache.set(cache_key, response_data, timeout=300)
-        logger.info(f"Cached response for {cache_key} (5 min TTL)")
+        # PERFORMANCE: Cache the response for 5 minutes (300 seconds) - seconds
+        # for 'today' while live counters keep today current. Kept three times
+        # as long so later requests get the stale copy while it refreshes
+        cache_timeout = live_cache_timeout(300) if date_filter == 'today' else 300
+        cache.set(
+            cache_key, StaleWhileRevalidate.wrap(response_data, cache_timeout),
+            timeout=cache_timeout * self.STALE_FACTOR
+        )
+        logger.info(f"Cached response for {cache_key} ({cache_timeout}s TTL, served stale up to {cache_timeout * self.STALE_FACTOR}s)")
 
         return Response(response_data)
 
     def _calculate_success_rate(self, queryset):
         total = queryset.count()
         successful = queryset.filter(status='SUCCESS').count()
-        return round((successful/total*100) if total > 0 else 0, 2)
\ No newline at end of file
+        return round((successful/total*100) if total > 0 else 0, 2)
+
+
+class CubeAnalyticsView(views.APIView):
+    """
+    Ad-hoc analytics over the OLAP cube
+    GET /api/v1/analytics/cube/?measures=txn_count,amount&group_by=date,payment_mode
+    Dimension filters: client_code, payment_mode, pg_name, status, settlement_status, hour
+    (comma separated). Dates: date_from / date_to (default last 7 days)
+    """
+    permission_classes = [IsAuthenticated]
+
+    @CacheDecorator.cache_response(timeout=900, key_prefix='cube_analytics')  # 15 min cache
+    def get(self, request):
+        filter_errors = TransactionSearchFilter.validate_filters(request.query_params)
+        if filter_errors:
+            return Response({
+                'success': False,
+                'message': 'Invalid filter parameters',
+                'errors': filter_errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        measures = [m.strip() for m in request.query_params.get('measures', 'txn_count,amount').split(',') if m.strip()]
+        group_by = [d.strip() for d in request.query_params.get('group_by', 'date').split(',') if d.strip()]
+
+        filters = {}
+        for dimension in DIMENSIONS:
+            value = request.query_params.get(dimension)
+            if dimension != 'date' and value and value != 'ALL':
+                filters[dimension] = [v.strip() for v in value.split(',')]
+        if 'hour' in filters:
+            try:
+                filters['hour'] = [int(h) for h in filters['hour']]
+            except ValueError:
+                return Response({
+                    'success': False,
+                    'message': 'hour must be a comma separated list of integers'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Merchants only ever see their own data
+        if request.user.role != 'ADMIN':
+            filters['client_code'] = [request.user.client_code or '']
+
+        date_from = request.query_params.get('date_from')
+        date_to = request.query_params.get('date_to')
+        end_date = (
+            timezone.make_aware(datetime.strptime(date_to, '%Y-%m-%d').replace(hour=23, minute=59, second=59))
+            if date_to else timezone.now()
+        )
+        start_date = (
+            timezone.make_aware(datetime.strptime(date_from, '%Y-%m-%d'))
+            if date_from else end_date - timedelta(days=7)
+        )
+
+        cube = Cube()
+        try:
+            result = cube.query(measures, group_by=group_by, filters=filters, start=start_date, end=end_date)
+        except CubeError as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if group_by:
+            for row in result:
+                if row.get('date') is not None:
+                    row['date'] = row['date'].strftime('%Y-%m-%d')
+
+        return Response({
+            'success': True,
+            'data': {
+                'measures': measures,
+                'group_by': group_by,
+                'filters': filters,
+                'date_range': {
+                    'from': start_date.isoformat(),
+                    'to': end_date.isoformat()
+                },
+                'cuboid': cube.last_plan['cuboid'],
+                'results': result
+            }
+        })
+
+
+class CustomerProfileView(views.APIView):
+    """
+    Payer (customer) profiles from the precomputed payer_profile table
+    GET /api/v1/analytics/customers/?email=... or ?mobile=...  - one payer
+    GET /api/v1/analytics/customers/?order=volume|count|recent&limit=20  - ranking
+    Admins may pass merchant_code / client_code; merchants see their own payers
+    """
+    permission_classes = [IsAuthenticated]
+
+    @CacheDecorator.cache_response(timeout=900, key_prefix='customer_profiles', tables=('payer_profile',))  # 15 min cache
+    def get(self, request):
+        if request.user.role == 'ADMIN':
+            merchant_code = request.query_params.get('merchant_code') or request.query_params.get('client_code')
+            client_codes = [merchant_code] if merchant_code and merchant_code != 'ALL' else None
+        else:
+            client_codes = [request.user.client_code or '']
+
+        email = request.query_params.get('email')
+        mobile = request.query_params.get('mobile')
+        if email or mobile:
+            return Response({
+                'success': True,
+                'data': {
+                    'profiles': PayerProfileStore.lookup(email=email, mobile=mobile, client_codes=client_codes)
+                }
+            })
+
+        order = request.query_params.get('order', 'volume')
+        if order not in PayerProfileStore.ORDERINGS:
+            return Response({
+                'success': False,
+                'message': f"order must be one of {', '.join(PayerProfileStore.ORDERINGS)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            return Response({
+                'success': False,
+                'message': 'limit must be an integer'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'success': True,
+            'data': {
+                'order': order,
+                'profiles_as_of': PayerProfileBuilder.last_applied(),
+                'customers': PayerProfileStore.top(client_codes, order=order, limit=limit)
+            }
+        })
+
+
+class LiveStreamTicketView(views.APIView):
+    """
+    Ticket for the live dashboard stream
+    POST /api/v1/analytics/live-stream/ticket/
+    Returns a signed ticket, valid for LIVE_STREAM_TICKET_SECONDS, to open
+    /live-stream/?ticket=<ticket> - EventSource can't send the access token
+    as a header, and the token must not end up in URLs and access logs.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        return Response({
+            'success': True,
+            'data': {
+                'ticket': StreamTicketAuthentication.issue(request.user),
+                'expires_in': StreamTicketAuthentication.lifetime(),
+            }
+        })
+
+
+class LiveDashboardStreamView(views.APIView):
+    """
+    Live dashboard stream (Server-Sent Events)
+    GET /api/v1/analytics/live-stream/?ticket=<ticket from live-stream/ticket/>
+    Events: 'snapshot' (today's totals, payment modes, merchants, newest
+    transactions), then 'delta' with only the parts that changed.
+    Admins see every merchant (optionally client_code=A,B); merchants their own.
+    Only stream tickets are accepted. A reconnect after the ticket expired
+    gets 401: request a new ticket and reopen the stream.
+    """
+    permission_classes = [IsAuthenticated]
+    # EventSource can't send an Authorization header
+    authentication_classes = [StreamTicketAuthentication]
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+
+    def get(self, request):
+        if request.user.role == 'ADMIN':
+            codes = request.query_params.get('client_code')
+            client_codes = [code.strip() for code in codes.split(',') if code.strip()] if codes else None
+        elif getattr(request.user, 'client_code', None):
+            client_codes = [request.user.client_code]
+        else:
+            return Response({
+                'success': False,
+                'message': 'No merchant assigned to this user'
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        if not LiveStreamHub.instance().has_capacity():
+            return Response({
+                'success': False,
+                'message': 'Too many live streams open - retry shortly'
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        response = StreamingHttpResponse(event_stream(client_codes), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
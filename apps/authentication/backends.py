@@ -1,6 +1,10 @@
 """
 Custom authentication backend for JWT
 """
+from django.conf import settings
+from django.core import signing
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from django.contrib.auth.models import AnonymousUser
@@ -132,4 +136,45 @@ class CustomJWTAuthentication(JWTAuthentication):
             logger.error(f"JWT get_user error: {e}")
             # Raise InvalidToken to properly signal authentication failure
             from rest_framework_simplejwt.exceptions import InvalidToken
-            raise InvalidToken("Unable to authenticate with provided token")
\ No newline at end of file
+            raise InvalidToken("Unable to authenticate with provided token")
+
+
+class StreamTicketAuthentication(BaseAuthentication):
+    """
+    Short-lived signed ticket from the ?ticket= query parameter, for
+    EventSource streams that can't send headers. Issued by
+    LiveStreamTicketView to an authenticated user and accepted only by
+    views listing this class, so the access token never goes in a URL
+    """
+    SALT = 'sabpaisa.live-stream-ticket'
+    CLAIMS = ('username', 'login_master_id', 'role_id', 'role', 'client_id', 'client_code', 'is_parent_merchant')
+
+    @classmethod
+    def issue(cls, user):
+        """Signed ticket carrying the user's claims"""
+        claims = {claim: getattr(user, claim, None) for claim in cls.CLAIMS}
+        return signing.dumps(claims, salt=cls.SALT, compress=True)
+
+    @staticmethod
+    def lifetime():
+        return getattr(settings, 'LIVE_STREAM_TICKET_SECONDS', 60)
+
+    def authenticate(self, request):
+        ticket = request.query_params.get('ticket')
+        if not ticket:
+            return None
+
+        try:
+            claims = signing.loads(ticket, salt=self.SALT, max_age=self.lifetime())
+        except signing.SignatureExpired:
+            raise AuthenticationFailed('Stream ticket expired - request a new one')
+        except signing.BadSignature:
+            raise AuthenticationFailed('Invalid stream ticket')
+
+        username = claims.pop('username')
+        login_master_id = claims.pop('login_master_id')
+        return SimpleUser(username, login_master_id=login_master_id, **claims), None
+
+    def authenticate_header(self, request):
+        # 401 (not 403) when the ticket is missing
+        return 'Ticket'
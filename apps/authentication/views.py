@@ -11,7 +11,6 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenRefreshView as BaseTokenRefreshView
 from django.utils import timezone
 from django.db import connections
-from django.core.cache import cache
 import logging
 import hashlib
 
@@ -24,6 +23,7 @@ from .serializers import (
     UserSessionSerializer,
     AuditLogSerializer,
 )
+from apps.core.cache import CacheTags, RedisService
 from apps.core.permissions import IsAdmin, IsMerchant
 
 # Configure multiple loggers for different purposes
@@ -39,7 +39,7 @@ def get_cached_login_master_columns():
     Caches for 24 hours to avoid repeated SHOW COLUMNS queries.
     """
     cache_key = 'auth:schema:login_master_columns'
-    columns = cache.get(cache_key)
+    columns = RedisService.get(cache_key)
 
     if columns is None:
         try:
@@ -47,7 +47,7 @@ def get_cached_login_master_columns():
                 cursor.execute("SHOW COLUMNS FROM login_master")
                 columns = [col[0] for col in cursor.fetchall()]
                 # Cache for 24 hours (86400 seconds)
-                cache.set(cache_key, columns, 86400)
+                RedisService.set(cache_key, columns, 86400)
                 logger.info(f"Cached login_master columns: {len(columns)} columns")
         except Exception as e:
             logger.error(f"Error fetching login_master columns: {e}")
@@ -65,7 +65,7 @@ def get_cached_role_name(role_id):
         return None
 
     cache_key = 'auth:roles:mapping'
-    role_mapping = cache.get(cache_key)
+    role_mapping = RedisService.get(cache_key)
 
     if role_mapping is None:
         try:
@@ -74,7 +74,7 @@ def get_cached_role_name(role_id):
                 roles = cursor.fetchall()
                 role_mapping = {role[0]: role[1] for role in roles}
                 # Cache for 1 hour (3600 seconds)
-                cache.set(cache_key, role_mapping, 3600)
+                RedisService.set(cache_key, role_mapping, 3600)
                 logger.info(f"Cached {len(role_mapping)} roles")
         except Exception as e:
             logger.error(f"Error fetching roles: {e}")
@@ -621,6 +621,9 @@ class ProfileView(APIView):
                 affected_rows = cursor.rowcount
 
                 if affected_rows > 0:
+                    # Cached responses that show the user's own details
+                    CacheTags.invalidate(users=[login_master_id or username])
+
                     # Fetch updated user data
                     cursor.execute(
                         f"SELECT * FROM login_master WHERE {auth_col} = %s",
@@ -1172,7 +1175,7 @@ class RoleListView(APIView):
         """Get all roles from lookup_role table with caching (PERFORMANCE OPTIMIZED)"""
         try:
             cache_key = 'auth:roles:list'
-            role_list = cache.get(cache_key)
+            role_list = RedisService.get(cache_key)
 
             if role_list is None:
                 with connections["user_management"].cursor() as cursor:
@@ -1193,7 +1196,7 @@ class RoleListView(APIView):
                             role_list.append(role_dict)
 
                         # Cache for 1 hour
-                        cache.set(cache_key, role_list, 3600)
+                        RedisService.set(cache_key, role_list, 3600)
                         logger.info(f"Cached role list: {len(role_list)} roles")
                     else:
                         return Response(
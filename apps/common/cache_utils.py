@@ -12,6 +12,8 @@ from django.http import JsonResponse
 from rest_framework.response import Response
 import logging
 
+from apps.core.cache import CacheTags, cache_scope, canonical_params
+
 logger = logging.getLogger(__name__)
 
 
@@ -36,7 +38,7 @@ def generate_cache_key(prefix: str, **kwargs) -> str:
     return f"{prefix}_{param_hash}"
 
 
-def cache_response(timeout: int = 300, key_prefix: str = 'api'):
+def cache_response(timeout: int = 300, key_prefix: str = 'api', per_user: bool = False, tables: tuple = None):
     """
     Decorator to cache API responses with Redis
 
@@ -48,6 +50,9 @@ def cache_response(timeout: int = 300, key_prefix: str = 'api'):
     Args:
         timeout: Cache timeout in seconds (default: 5 minutes)
         key_prefix: Prefix for cache key
+        per_user: Key by user instead of the user's data scope
+        tables: Tables the response is read from, for invalidation
+            (default transaction_detail)
     """
     def decorator(view_func: Callable) -> Callable:
         @wraps(view_func)
@@ -55,15 +60,18 @@ def cache_response(timeout: int = 300, key_prefix: str = 'api'):
             # Extract cache key parameters from request
             cache_params = {}
 
-            # Add query parameters
+            # Add query parameters (canonical form, relative dates resolved)
             if hasattr(request, 'query_params'):
-                cache_params.update(request.query_params.dict())
+                cache_params.update(canonical_params(request.query_params))
             elif hasattr(request, 'GET'):
-                cache_params.update(request.GET.dict())
+                cache_params.update(canonical_params(request.GET))
 
-            # Add user information
-            if hasattr(request, 'user') and request.user.is_authenticated:
-                cache_params['user_id'] = request.user.id
+            # Add the data scope - users with the same scope share entries
+            user = getattr(request, 'user', None)
+            if per_user and user is not None and user.is_authenticated:
+                cache_params['user_id'] = user.id
+            else:
+                cache_params['scope'] = cache_scope(user)
 
             # Add URL path parameters
             if args:
@@ -71,6 +79,9 @@ def cache_response(timeout: int = 300, key_prefix: str = 'api'):
             if kwargs:
                 cache_params.update(kwargs)
 
+            # Generations of the response's invalidation tags
+            cache_params['gen'] = CacheTags.version(CacheTags.for_request(request, tables, per_user))
+
             # Generate cache key
             cache_key = generate_cache_key(key_prefix, **cache_params)
 
@@ -101,44 +112,35 @@ def cache_response(timeout: int = 300, key_prefix: str = 'api'):
     return decorator
 
 
-def invalidate_cache_pattern(pattern: str) -> int:
+def invalidate_cache(merchants=(), days=(), tables=()) -> bool:
     """
-    Invalidate all cache keys matching a pattern
+    Invalidate cached responses for merchants, days or tables
+
+    Bumps the generation counters mixed into the cache keys (CacheTags),
+    so this is a handful of INCRs whatever the number of cached entries.
 
     Args:
-        pattern: Cache key pattern (e.g., 'transactions_*')
+        merchants: Merchant client codes
+        days: Dates whose data changed
+        tables: Table names (e.g., 'transaction_detail')
 
     Returns:
-        Number of keys deleted
+        True when the generations were bumped
     """
-    try:
-        from django_redis import get_redis_connection
-        redis_conn = get_redis_connection("default")
-
-        # Get all keys matching pattern
-        keys = redis_conn.keys(f"sabpaisa:{pattern}")
-
-        if keys:
-            count = redis_conn.delete(*keys)
-            logger.info(f"Invalidated {count} cache keys matching '{pattern}'")
-            return count
-        return 0
-    except Exception as e:
-        logger.error(f"Cache invalidation error: {e}")
-        return 0
+    return CacheTags.invalidate(merchants=merchants, days=days, tables=tables)
 
 
-def clear_user_cache(user_id: int) -> int:
+def clear_user_cache(user_id: int) -> bool:
     """
-    Clear all cache entries for a specific user
+    Clear the per-user cache entries of a specific user
 
     Args:
         user_id: User ID
 
     Returns:
-        Number of keys deleted
+        True when the user's generation was bumped
     """
-    return invalidate_cache_pattern(f"*user_id*{user_id}*")
+    return CacheTags.invalidate(users=[user_id])
 
 
 def get_cache_stats() -> dict:
@@ -3,13 +3,313 @@ Redis caching service for intelligent cache management
 """
 from django.core.cache import cache
 from django.conf import settings
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import wraps
+import copy
+import gzip
 import hashlib
 import json
 import logging
+import os
+import pickle
+import socket
+import threading
+import time
+import uuid
+
+from apps.core.redis_breaker import RedisCircuitBreaker
 
 logger = logging.getLogger(__name__)
 
 
+class LocalCache:
+    """
+    Per-worker LRU in front of Redis (L1) for small, hot values
+
+    Bounded by entry count and approximate bytes, thread-safe, with a TTL
+    per key family (FAMILIES). Changes are broadcast to every worker by
+    InvalidationBus; while this worker is not connected to it, values are
+    only kept for the family's short TTL, so they are at most that old.
+    Values are shared between threads and must not be mutated by callers.
+    """
+
+    # family: (seconds kept with the invalidation bus connected, without)
+    FAMILIES = {
+        'reference': (3600, 300),   # login_master columns, role names and list
+        'generation': (60, 2),      # CacheTags generations
+        'response': (60, 10),       # ResponseCache payloads (fresh ones only)
+    }
+
+    # RedisService keys kept in L1, by prefix
+    KEY_FAMILIES = (
+        ('auth:schema:', 'reference'),
+        ('auth:roles:', 'reference'),
+    )
+
+    MAX_ENTRIES = 10000
+    MAX_BYTES = 64 * 1024 * 1024
+    # Larger values are not kept (they would evict everything else)
+    MAX_VALUE_BYTES = 4 * 1024 * 1024
+    # Bytes per family - a family over budget evicts its own oldest entries,
+    # so large responses cannot push out the small hot reference keys
+    FAMILY_BYTES = {
+        'reference': 8 * 1024 * 1024,
+        'generation': 1024 * 1024,
+        'response': 48 * 1024 * 1024,
+    }
+
+    _lock = threading.Lock()
+    _entries = OrderedDict()    # (family, key) -> (expires, size, value)
+    _bytes = 0
+    _family_bytes = {}
+    _stats = {}
+    # Bumped by every eviction - see epoch()
+    _epoch = 0
+
+    @classmethod
+    def family_of(cls, key):
+        for prefix, family in cls.KEY_FAMILIES:
+            if key.startswith(prefix):
+                return family
+        return None
+
+    @classmethod
+    def _size(cls, value):
+        if isinstance(value, (bytes, str)):
+            return len(value)
+        try:
+            return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            return cls.MAX_VALUE_BYTES
+
+    @classmethod
+    def _count(cls, family, name):
+        counts = cls._stats.setdefault(family, {'hits': 0, 'misses': 0, 'evictions': 0})
+        counts[name] += 1
+
+    @classmethod
+    def get(cls, family, key):
+        """
+        Value or None (missing or expired)
+        """
+        with cls._lock:
+            entry = cls._entries.get((family, key))
+            if entry is not None and entry[0] > time.monotonic():
+                cls._entries.move_to_end((family, key))
+                cls._count(family, 'hits')
+                return entry[2]
+            if entry is not None:
+                cls._drop(family, key)
+            cls._count(family, 'misses')
+            return None
+
+    @classmethod
+    def epoch(cls):
+        """
+        Eviction counter: read it before fetching a value from Redis and
+        pass it to set(), which then skips values an eviction may have
+        overtaken
+        """
+        return cls._epoch
+
+    @classmethod
+    def ttl(cls, family):
+        return cls.FAMILIES[family][0 if InvalidationBus.connected() else 1]
+
+    @classmethod
+    def set(cls, family, key, value, ttl=None, epoch=None):
+        """
+        Keep value for the family's TTL (or ttl, if shorter)
+        """
+        InvalidationBus.ensure_listening()
+        ttl = min(ttl, cls.ttl(family)) if ttl is not None else cls.ttl(family)
+        size = cls._size(value)
+        if value is None or ttl <= 0 or size > cls.MAX_VALUE_BYTES:
+            cls.delete(family, key)
+            return
+
+        with cls._lock:
+            if epoch is not None and epoch != cls._epoch:
+                return
+            cls._drop(family, key)
+            cls._entries[(family, key)] = (time.monotonic() + ttl, size, value)
+            cls._bytes += size
+            cls._family_bytes[family] = cls._family_bytes.get(family, 0) + size
+
+            budget = cls.FAMILY_BYTES.get(family, cls.MAX_BYTES)
+            if cls._family_bytes[family] > budget:
+                for entry_family, entry_key in list(cls._entries):
+                    if cls._family_bytes[family] <= budget:
+                        break
+                    if entry_family == family and entry_key != key:
+                        cls._drop(family, entry_key)
+                        cls._count(family, 'evictions')
+            while len(cls._entries) > cls.MAX_ENTRIES or cls._bytes > cls.MAX_BYTES:
+                evicted_family, evicted_key = next(iter(cls._entries))
+                cls._drop(evicted_family, evicted_key)
+                cls._count(evicted_family, 'evictions')
+
+    @classmethod
+    def _drop(cls, family, key):
+        # Caller holds _lock
+        entry = cls._entries.pop((family, key), None)
+        if entry is not None:
+            cls._bytes -= entry[1]
+            cls._family_bytes[family] -= entry[1]
+
+    @classmethod
+    def delete(cls, family, key):
+        cls.evict(family, [key])
+
+    @classmethod
+    def evict(cls, family, keys=None):
+        """
+        Drop keys of a family (all of the family when keys is None)
+        """
+        with cls._lock:
+            cls._epoch += 1
+            if keys is None:
+                keys = [key for entry_family, key in cls._entries if entry_family == family]
+            for key in keys:
+                cls._drop(family, key)
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._epoch += 1
+            cls._entries.clear()
+            cls._bytes = 0
+            cls._family_bytes = {}
+
+    @classmethod
+    def stats(cls):
+        """
+        Hit / miss / eviction counts per family and current size (this worker)
+        """
+        with cls._lock:
+            families = {}
+            for family, counts in cls._stats.items():
+                lookups = counts['hits'] + counts['misses']
+                families[family] = {
+                    **counts,
+                    'hit_rate': round(counts['hits'] / lookups * 100, 2) if lookups else 0,
+                    'bytes': cls._family_bytes.get(family, 0),
+                    'budget_bytes': cls.FAMILY_BYTES.get(family, cls.MAX_BYTES),
+                }
+            return {
+                'entries': len(cls._entries),
+                'bytes': cls._bytes,
+                'bus_connected': InvalidationBus.connected(),
+                'families': families,
+            }
+
+
+class InvalidationBus:
+    """
+    Cross-worker invalidation of LocalCache over Redis pub/sub
+
+    publish() evicts entries locally and broadcasts the eviction; every
+    worker runs one daemon thread (started with its first LocalCache
+    entry) subscribed to CHANNEL that evicts them there too. Messages sent
+    while a worker is disconnected are lost, so it drops its whole L1 on
+    (re)connecting and LocalCache falls back to short TTLs meanwhile.
+    """
+
+    CHANNEL = 'sabpaisa:cache:invalidate'
+    RECONNECT_DELAY = 5
+
+    _lock = threading.Lock()
+    _thread = None
+    _connected = threading.Event()
+
+    @staticmethod
+    def connection():
+        from django_redis import get_redis_connection
+        return get_redis_connection("default")
+
+    @staticmethod
+    def origin():
+        # Per process (not computed at import - workers fork)
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    @classmethod
+    def connected(cls):
+        return cls._connected.is_set()
+
+    @classmethod
+    def ensure_listening(cls):
+        """
+        Start this process's subscriber thread unless it is running
+        """
+        thread = cls._thread
+        if thread is not None and thread.is_alive():
+            return
+        with cls._lock:
+            if cls._thread is None or not cls._thread.is_alive():
+                # A thread object inherited through fork is not running here
+                cls._connected.clear()
+                cls._thread = threading.Thread(target=cls._listen, name='cache-invalidation-bus', daemon=True)
+                cls._thread.start()
+
+    @classmethod
+    def publish(cls, family, keys=None):
+        """
+        Evict keys of a LocalCache family (all when keys is None) in every
+        worker. Returns True when broadcast
+        """
+        LocalCache.evict(family, keys)
+        message = json.dumps({'origin': cls.origin(), 'family': family, 'keys': keys})
+        try:
+            cls.connection().publish(cls.CHANNEL, message)
+            return True
+        except Exception as e:
+            logger.error(f"Cache invalidation publish error: {e}")
+            return False
+
+    @classmethod
+    def handle(cls, raw):
+        message = json.loads(raw)
+        if message.get('origin') == cls.origin():
+            return
+        if message.get('family') in LocalCache.FAMILIES:
+            LocalCache.evict(message['family'], message.get('keys'))
+
+    @classmethod
+    def _listen(cls):
+        while True:
+            pubsub = None
+            try:
+                pubsub = cls.connection().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(cls.CHANNEL)
+                # Whatever was published while not subscribed is lost
+                LocalCache.clear()
+                cls._connected.set()
+                logger.info(f"Cache invalidation bus connected ({cls.origin()})")
+                while True:
+                    # Short waits - the client's socket timeout would end a blocking listen()
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message['type'] == 'message':
+                        try:
+                            cls.handle(message['data'])
+                        except (ValueError, KeyError, TypeError) as e:
+                            logger.warning(f"Ignoring malformed cache invalidation message: {e}")
+            except Exception as e:
+                logger.warning(f"Cache invalidation bus disconnected: {e}")
+            finally:
+                cls._connected.clear()
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+            time.sleep(cls.RECONNECT_DELAY)
+
+
 class RedisService:
     """
     Intelligent Redis caching service with predictive warming
@@ -32,10 +332,18 @@ class RedisService:
     @staticmethod
     def get(key, default=None):
         """
-        Get value from cache
+        Get value from cache (the in-process L1 first for LocalCache families)
         """
+        family = LocalCache.family_of(key)
+        if family:
+            value = LocalCache.get(family, key)
+            if value is not None:
+                return value
+        epoch = LocalCache.epoch()
         try:
             value = cache.get(key, default)
+            if family and value is not None and value is not default:
+                LocalCache.set(family, key, value, epoch=epoch)
             if value is not None:
                 logger.debug(f"Cache hit: {key}")
             else:
@@ -57,6 +365,11 @@ class RedisService:
                 timeout = default_cache.get('TIMEOUT', 3600) if isinstance(default_cache, dict) else 3600
 
             cache.set(key, value, timeout)
+            family = LocalCache.family_of(key)
+            if family:
+                # Other workers drop their copy and read the new value
+                InvalidationBus.publish(family, [key])
+                LocalCache.set(family, key, value, timeout)
             logger.debug(f"Cache set: {key} (timeout: {timeout}s)")
             return True
         except Exception as e:
@@ -68,8 +381,11 @@ class RedisService:
         """
         Delete key from cache
         """
+        family = LocalCache.family_of(key)
         try:
             cache.delete(key)
+            if family:
+                InvalidationBus.publish(family, [key])
             logger.debug(f"Cache delete: {key}")
             return True
         except Exception as e:
@@ -103,14 +419,9 @@ class RedisService:
     @staticmethod
     def invalidate_merchant_cache(merchant_id):
         """
-        Invalidate all cache entries for a specific merchant
+        Invalidate all cache entries for a specific merchant (CacheTags)
         """
-        patterns = [
-            f"*merchant:{merchant_id}:*",
-            f"*client_code:{merchant_id}:*"
-        ]
-        for pattern in patterns:
-            RedisService.delete_pattern(pattern)
+        return CacheTags.invalidate(merchants=[merchant_id])
 
     @staticmethod
     def warm_cache_for_merchant(merchant_id):
@@ -122,49 +433,820 @@ class RedisService:
         # Implementation would preload frequently accessed data
 
 
+def scope_merchants(user):
+    """
+    Merchant codes a user's data is limited to, or None for every merchant
+    """
+    if user is None or not getattr(user, 'is_authenticated', False):
+        return None
+    if str(getattr(user, 'role', '') or '') == 'ADMIN':
+        return None
+
+    codes = {getattr(user, 'client_code', None)}
+    if getattr(user, 'is_parent_merchant', False) and hasattr(user, 'get_child_merchants'):
+        codes.update(merchant.client_code for merchant in user.get_child_merchants())
+    return sorted(code for code in codes if code)
+
+
+def cache_scope(user):
+    """
+    Data scope of a user for cache keys - what the cached data depends on
+    instead of who asked: 'ADMIN' for admins (every admin sees the same
+    data), otherwise the role with the merchant codes the user is limited
+    to (children included for parent merchants) and the zone, if any
+    """
+    if user is None or not getattr(user, 'is_authenticated', False):
+        return 'anonymous'
+
+    role = str(getattr(user, 'role', '') or '')
+    if role == 'ADMIN':
+        return 'ADMIN'
+
+    scope = f"{role}:{','.join(scope_merchants(user))}"
+
+    zone = getattr(user, 'zone_id', None)
+    if zone:
+        scope += f":zone:{zone}"
+    return scope
+
+
+def canonical_params(query_params):
+    """
+    Request parameters as a sorted list of (name, value) for cache keys
+
+    Empty values are dropped (views treat them as absent) and relative
+    date_filter presets are resolved to the concrete dates they cover, so
+    'today' rolls over with the day. Requests without any date parameter
+    use the views' default of today and are keyed by today's date as well.
+    Values are otherwise kept verbatim - several responses echo them back.
+    """
+    from apps.transactions.filters import TransactionSearchFilter
+
+    params = {}
+    for name in query_params:
+        if hasattr(query_params, 'getlist'):
+            values = query_params.getlist(name)
+        else:
+            values = query_params[name]
+            values = values if isinstance(values, (list, tuple)) else [values]
+        values = [str(value) for value in values if value is not None and str(value).strip() != '']
+        if values:
+            params[name] = values[0] if len(values) == 1 else values
+
+    # Day boundaries as TransactionSearchFilter draws them (timezone.now())
+    date_filter = params.get('date_filter')
+    if date_filter and date_filter != 'custom':
+        start, end = TransactionSearchFilter.get_date_range(date_filter)
+        if start is not None:
+            params['date_filter'] = f"{date_filter}:{start.date()}:{end.date()}"
+    elif not params.get('date_from') and not params.get('date_to'):
+        params['as_of'] = str(timezone.now().date())
+
+    return sorted(params.items())
+
+
+class CacheTags:
+    """
+    Tag-based cache invalidation with generation counters
+
+    Every tag (merchant:<code>, day:<date>, month:<yyyy-mm>, table:<name>,
+    user:<id>) has a counter in Redis, and cache keys include the current
+    counters of the tags their data depends on. Invalidating a tag is an
+    INCR: keys built afterwards differ, and the old entries are never read
+    again and expire on their TTL - no KEYS scans or pattern deletes.
+
+    Entries over every merchant carry merchant:* and entries without a
+    bounded date range carry day:*, which are bumped together with any
+    merchant / day. Ranges longer than MAX_DAY_TAGS days are tagged by
+    month (bumped with each of their days).
+    """
+
+    PREFIX = 'sabpaisa:gen:'
+    ALL_MERCHANTS = 'merchant:*'
+    ALL_DAYS = 'day:*'
+    DEFAULT_TABLES = ('transaction_detail',)
+    MAX_DAY_TAGS = 31
+
+    # Tags whose INCR failed (this worker)
+    _pending = set()
+    _pending_lock = threading.Lock()
+
+    @staticmethod
+    def merchant(code):
+        return f"merchant:{code}"
+
+    @staticmethod
+    def day(value):
+        return f"day:{value}"
+
+    @staticmethod
+    def month(value):
+        return f"month:{value:%Y-%m}"
+
+    @staticmethod
+    def table(name):
+        return f"table:{name}"
+
+    @staticmethod
+    def user(user_id):
+        return f"user:{user_id}"
+
+    @staticmethod
+    def connection():
+        from django_redis import get_redis_connection
+        return get_redis_connection("default")
+
+    @classmethod
+    def for_dates(cls, start, end):
+        """
+        Tags for the days start..end (dates; None for unbounded), widened by
+        a day on each side - ranges may be drawn in UTC, summaries by local day
+        """
+        if start is None or end is None or end < start:
+            return [cls.ALL_DAYS]
+        start, end = start - timedelta(days=1), end + timedelta(days=1)
+        days = (end - start).days + 1
+        if days <= cls.MAX_DAY_TAGS:
+            return [cls.day(start + timedelta(days=offset)) for offset in range(days)]
+
+        months, current = [], start.replace(day=1)
+        while current <= end:
+            months.append(cls.month(current))
+            current = (current + timedelta(days=32)).replace(day=1)
+        return months
+
+    @classmethod
+    def request_dates(cls, query_params):
+        """
+        (first, last) date a request's date parameters cover, or
+        (None, None) when the view picks its own range
+        """
+        from django.utils.dateparse import parse_date
+        from apps.transactions.filters import TransactionSearchFilter
+
+        date_filter = query_params.get('date_filter')
+        if date_filter and date_filter != 'custom':
+            start, end = TransactionSearchFilter.get_date_range(date_filter)
+            start, end = (start and start.date()), (end and end.date())
+        else:
+            try:
+                start = parse_date(query_params.get('date_from') or '')
+                end = parse_date(query_params.get('date_to') or '')
+            except ValueError:
+                return None, None
+            if start is not None and end is None:
+                end = timezone.now().date()
+
+        if start is None or end is None:
+            return None, None
+        return start, end
+
+    @classmethod
+    def for_request(cls, request, tables=None, per_user=False):
+        """
+        Tags of a cached DRF response: merchant scope, dates and tables
+        """
+        user = getattr(request, 'user', None)
+        codes = scope_merchants(user)
+        tags = [cls.ALL_MERCHANTS] if codes is None else [cls.merchant(code) for code in codes]
+        query_params = getattr(request, 'query_params', None)
+        tags += cls.for_dates(*cls.request_dates(request.GET if query_params is None else query_params))
+        tags += [cls.table(name) for name in (tables or cls.DEFAULT_TABLES)]
+        if per_user and user is not None and user.is_authenticated:
+            tags.append(cls.user(user.id))
+        return tags
+
+    @classmethod
+    def version(cls, tags):
+        """
+        Current generations of tags, for mixing into a cache key (one MGET
+        for those not in LocalCache)
+        """
+        generations = {tag: LocalCache.get('generation', tag) for tag in tags}
+        missing = [tag for tag, generation in generations.items() if generation is None]
+        if missing:
+            epoch = LocalCache.epoch()
+            try:
+                values = cls.connection().mget([cls.PREFIX + tag for tag in missing])
+            except Exception as e:
+                logger.error(f"Cache generation read error: {e}")
+                # Unknown generations - a key nothing else will read
+                return uuid.uuid4().hex
+            for tag, value in zip(missing, values):
+                generation = (value.decode() if isinstance(value, bytes) else str(value)) if value else '0'
+                generations[tag] = generation
+                LocalCache.set('generation', tag, generation, epoch=epoch)
+        return '.'.join(generations[tag] for tag in tags)
+
+    @classmethod
+    def invalidate(cls, merchants=(), days=(), tables=(), users=()):
+        """
+        Invalidate every entry carrying one of the tags (an INCR each)
+        Days are dates; returns True when the counters were bumped
+        """
+        tags = {cls.merchant(code) for code in merchants}
+        tags.update(cls.table(name) for name in tables)
+        tags.update(cls.user(user_id) for user_id in users)
+        for value in days:
+            tags.update((cls.day(value), cls.month(value)))
+        if merchants:
+            tags.add(cls.ALL_MERCHANTS)
+        if days:
+            tags.add(cls.ALL_DAYS)
+        if not tags:
+            return False
+        return cls._bump(tags)
+
+    @classmethod
+    def replay(cls):
+        """
+        Bump the tags of invalidations that failed (called when the Redis
+        circuit closes)
+        """
+        return cls._bump(set())
+
+    @classmethod
+    def _bump(cls, tags):
+        with cls._pending_lock:
+            tags = tags | cls._pending
+            cls._pending.clear()
+        if not tags:
+            return False
+
+        try:
+            pipe = cls.connection().pipeline(transaction=False)
+            for tag in sorted(tags):
+                pipe.incr(cls.PREFIX + tag)
+            pipe.execute()
+            InvalidationBus.publish('generation', sorted(tags))
+        except Exception as e:
+            logger.error(f"Cache invalidation error: {e}")
+            # Retried with the next invalidation or when Redis is back -
+            # entries cached before the change must not be served after it
+            with cls._pending_lock:
+                cls._pending.update(tags)
+            return False
+        logger.info(f"Cache invalidated for tags: {', '.join(sorted(tags))}")
+        return True
+
+
+class ResponseCache:
+    """
+    Rendered HTTP responses in Redis
+
+    Entries are raw bytes written with the Redis client directly - no
+    pickling and no django-redis compressor: one JSON header line (status,
+    content type, encoding) followed by the rendered body, gzip-compressed
+    once at write time when it is large enough. A hit is returned as-is to
+    clients accepting gzip and only inflated for the others, so nothing is
+    unpickled or re-rendered.
+
+    Entries larger than CHUNK_BYTES are split: the head key holds the header
+    (naming the chunks) and the body is stored in chunk keys read back with
+    one MGET, so no single value holds up the connection or pushes out many
+    small keys at once. Entries larger than the family's maximum
+    (FAMILY_MAX_BYTES, else MAX_BYTES) are not cached at all.
+    """
+
+    PREFIX = 'sabpaisa:resp:'
+
+    # Bodies smaller than this are stored uncompressed
+    COMPRESS_MIN_BYTES = 1024
+    COMPRESS_LEVEL = 6
+
+    CHUNK_BYTES = 256 * 1024
+    MAX_BYTES = 4 * 1024 * 1024
+    # Largest entry per family (cache_response key_prefix / view method)
+    FAMILY_MAX_BYTES = {
+        'admin_txn_history': 16 * 1024 * 1024,
+        'merchant_txn_history': 16 * 1024 * 1024,
+        'txn_search': 16 * 1024 * 1024,
+    }
+
+    @staticmethod
+    def connection():
+        from django_redis import get_redis_connection
+        return get_redis_connection("default")
+
+    @classmethod
+    def redis_key(cls, key):
+        # Keys from RedisService.generate_cache_key are 'sabpaisa:<hash>'
+        return cls.PREFIX + key.rsplit(':', 1)[-1]
+
+    @classmethod
+    def encode(cls, response, fresh_until=None):
+        """
+        Stored form of a rendered response
+        """
+        body = response.content
+        encoding = None
+        if len(body) >= cls.COMPRESS_MIN_BYTES:
+            body = gzip.compress(body, compresslevel=cls.COMPRESS_LEVEL, mtime=0)
+            encoding = 'gzip'
+        header = {
+            'status': response.status_code,
+            'content_type': response.get('Content-Type'),
+            'encoding': encoding,
+            'fresh_until': fresh_until,
+        }
+        return json.dumps(header, separators=(',', ':')).encode() + b'\n' + body
+
+    @staticmethod
+    def decode(payload, accept_encoding=''):
+        """
+        HttpResponse for a stored entry, still compressed when the client
+        accepts gzip
+        """
+        header, _, body = payload.partition(b'\n')
+        header = json.loads(header)
+        encoding = header['encoding']
+        if encoding and encoding not in accept_encoding:
+            body = gzip.decompress(body)
+            encoding = None
+
+        response = HttpResponse(body, status=header['status'], content_type=header['content_type'])
+        if encoding:
+            response['Content-Encoding'] = encoding
+        if header['encoding']:
+            patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    @classmethod
+    def fetch(cls, key, request):
+        """
+        (cached response or None, whether it is past its soft TTL)
+        """
+        redis_key = cls.redis_key(key)
+        payload = LocalCache.get('response', redis_key)
+        from_redis = payload is None
+        if from_redis:
+            epoch = LocalCache.epoch()
+            try:
+                payload = cls._read(redis_key)
+            except Exception as e:
+                logger.error(f"Response cache get error: {e}")
+                return None, False
+            if payload is None:
+                return None, False
+
+        fresh_until = json.loads(payload.partition(b'\n')[0]).get('fresh_until')
+        stale = fresh_until is not None and time.time() > fresh_until
+        if from_redis and not stale:
+            # Stale entries stay out, so their refresh shows up right away
+            LocalCache.set(
+                'response', redis_key, payload, None if fresh_until is None else fresh_until - time.time(), epoch
+            )
+        return cls.decode(payload, request.META.get('HTTP_ACCEPT_ENCODING', '')), stale
+
+    @classmethod
+    def _read(cls, redis_key):
+        """
+        Stored payload, with the chunks of a chunked entry joined (None
+        when it or any chunk is missing)
+        """
+        conn = cls.connection()
+        payload = conn.get(redis_key)
+        if payload is None:
+            return None
+        header, _, body = payload.partition(b'\n')
+        chunks = json.loads(header).get('chunks')
+        if not chunks:
+            return payload
+
+        token, count = chunks
+        parts = conn.mget([f"{redis_key}:{token}:{index}" for index in range(count)])
+        if any(part is None for part in parts):
+            # A chunk was evicted - treat the entry as missing
+            return None
+        return header + b'\n' + b''.join(parts)
+
+    @classmethod
+    def get(cls, key, request):
+        """
+        Cached response for key, or None
+        """
+        return cls.fetch(key, request)[0]
+
+    @classmethod
+    def set(cls, key, response, timeout, hard_timeout=None, family=None):
+        """
+        Store a rendered response for timeout seconds, or - with a longer
+        hard_timeout - fresh for timeout and kept (stale) until hard_timeout
+        """
+        fresh_until = None
+        if hard_timeout and hard_timeout > timeout:
+            fresh_until = time.time() + timeout
+            timeout = hard_timeout
+        payload = cls.encode(response, fresh_until)
+
+        family = family or 'other'
+        CacheMetrics.record_size(family, len(payload))
+        max_bytes = cls.FAMILY_MAX_BYTES.get(family, cls.MAX_BYTES)
+        if len(payload) > max_bytes:
+            CacheMetrics.incr('skipped_large')
+            logger.warning(f"Not caching {family} response of {len(payload)} bytes (limit {max_bytes})")
+            return False
+
+        redis_key = cls.redis_key(key)
+        try:
+            conn = cls.connection()
+            if len(payload) <= cls.CHUNK_BYTES:
+                conn.set(redis_key, payload, ex=timeout)
+            else:
+                header, _, body = payload.partition(b'\n')
+                # Chunk keys are named per write, so a reader never mixes two writes
+                token = uuid.uuid4().hex[:8]
+                chunks = [body[offset:offset + cls.CHUNK_BYTES] for offset in range(0, len(body), cls.CHUNK_BYTES)]
+                head = json.loads(header)
+                head['chunks'] = [token, len(chunks)]
+
+                pipe = conn.pipeline(transaction=False)
+                for index, chunk in enumerate(chunks):
+                    pipe.set(f"{redis_key}:{token}:{index}", chunk, ex=timeout)
+                # Head last - it only points at chunks already written
+                pipe.set(redis_key, json.dumps(head, separators=(',', ':')).encode() + b'\n', ex=timeout)
+                pipe.execute()
+                CacheMetrics.incr('chunked')
+            LocalCache.set('response', redis_key, payload, timeout if fresh_until is None else fresh_until - time.time())
+            return True
+        except Exception as e:
+            logger.error(f"Response cache set error: {e}")
+            return False
+
+
+class SingleFlight:
+    """
+    Single-flight computation of cache entries (stampede protection)
+
+    On a miss the first caller takes a short Redis lock for the key and
+    computes; concurrent callers poll the cache until the value appears. The
+    lock expires on its own if its holder dies, and waiters stop waiting
+    after wait_timeout and compute themselves, so nobody blocks for long.
+
+    Usage:
+        value = SingleFlight.run(key, read=lambda: cache.get(key), compute=build_and_store)
+
+    or around an existing get / compute / set sequence:
+        value = SingleFlight.claim(key, read)   # None: compute, then release
+        ...
+        SingleFlight.release(key)
+    """
+
+    LOCK_PREFIX = 'sabpaisa:lock:'
+
+    # Lock lifetime - longer than a normal computation, short enough to
+    # recover quickly from a holder that died
+    LOCK_TTL = 30
+
+    # Longest a waiter waits before computing itself
+    WAIT_TIMEOUT = 10
+
+    POLL_INITIAL = 0.05
+    POLL_MAX = 0.5
+
+    # Delete the lock only if we still hold it
+    RELEASE_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
+
+    _held = threading.local()
+
+    @staticmethod
+    def connection():
+        from django_redis import get_redis_connection
+        return get_redis_connection("default")
+
+    @classmethod
+    def _tokens(cls):
+        if not hasattr(cls._held, 'tokens'):
+            cls._held.tokens = {}
+        return cls._held.tokens
+
+    @classmethod
+    def acquire(cls, key, lock_ttl=None):
+        """
+        Take the lock for key without waiting. Returns its token, or None
+        when someone else holds it
+        """
+        token = uuid.uuid4().hex
+        if cls.connection().set(cls.LOCK_PREFIX + key, token, nx=True, px=int((lock_ttl or cls.LOCK_TTL) * 1000)):
+            return token
+        return None
+
+    @classmethod
+    def claim(cls, key, read, wait_timeout=None, lock_ttl=None):
+        """
+        The value another caller computed for key while we waited, or None
+        when this caller should compute it (holding the lock, or after the
+        wait timed out / Redis is unavailable) and then call release()
+        """
+        wait_timeout = cls.WAIT_TIMEOUT if wait_timeout is None else wait_timeout
+        deadline = time.monotonic() + wait_timeout
+        delay = cls.POLL_INITIAL
+
+        try:
+            while True:
+                token = cls.acquire(key, lock_ttl)
+                if token:
+                    cls._tokens()[key] = token
+                    # The previous holder may have stored the value just before releasing
+                    value = read()
+                    if value is not None:
+                        cls.release(key)
+                    return value
+
+                if time.monotonic() >= deadline:
+                    logger.warning(f"Single-flight wait for {key} timed out after {wait_timeout}s - computing")
+                    return None
+                time.sleep(delay)
+                delay = min(delay * 2, cls.POLL_MAX)
+
+                value = read()
+                if value is not None:
+                    logger.debug(f"Single-flight: {key} computed by another request")
+                    return value
+        except Exception as e:
+            logger.error(f"Single-flight lock error for {key}: {e}")
+            return None
+
+    @classmethod
+    def release(cls, key, token=None):
+        """
+        Drop the lock taken by claim() in this thread, or by acquire() when
+        its token is given (no-op when not holding it)
+        """
+        token = token or cls._tokens().pop(key, None)
+        if token is None:
+            return
+        try:
+            cls.connection().eval(cls.RELEASE_SCRIPT, 1, cls.LOCK_PREFIX + key, token)
+        except Exception as e:
+            logger.error(f"Single-flight release error for {key}: {e}")
+
+    @classmethod
+    def run(cls, key, read, compute, wait_timeout=None, lock_ttl=None):
+        """
+        read() if another caller produced the value meanwhile, else compute()
+        (which should store it) under the lock
+        """
+        value = cls.claim(key, read, wait_timeout, lock_ttl)
+        if value is not None:
+            return value
+        try:
+            return compute()
+        finally:
+            cls.release(key)
+
+
+class CacheMetrics:
+    """
+    Response cache counters (hit, stale_hit, miss, refresh_*)
+    Counted in-process and added to a Redis hash every FLUSH_INTERVAL
+    seconds, so the totals cover every worker without a Redis write per hit
+    """
+
+    KEY = 'sabpaisa:cache:metrics'
+    FLUSH_INTERVAL = 10
+
+    _lock = threading.Lock()
+    _pending = {}
+    _flushed_at = time.monotonic()
+
+    @classmethod
+    def incr(cls, name, amount=1):
+        with cls._lock:
+            cls._pending[name] = cls._pending.get(name, 0) + amount
+            due = time.monotonic() - cls._flushed_at >= cls.FLUSH_INTERVAL
+        if due:
+            cls.flush()
+
+    # Upper bounds of the value size histogram
+    SIZE_BUCKETS = (
+        (1024, '1k'),
+        (16 * 1024, '16k'),
+        (128 * 1024, '128k'),
+        (1024 * 1024, '1m'),
+        (8 * 1024 * 1024, '8m'),
+    )
+
+    @classmethod
+    def record_size(cls, family, size):
+        """
+        Count a stored value in its family's size histogram
+        """
+        bucket = next((label for limit, label in cls.SIZE_BUCKETS if size <= limit), 'more')
+        cls.incr(f"size:{family}:{bucket}")
+        cls.incr(f"bytes:{family}", size)
+
+    @classmethod
+    def flush(cls):
+        with cls._lock:
+            pending, cls._pending = cls._pending, {}
+            cls._flushed_at = time.monotonic()
+        if not pending:
+            return
+        try:
+            pipe = SingleFlight.connection().pipeline(transaction=False)
+            for name, amount in pending.items():
+                pipe.hincrby(cls.KEY, name, amount)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Cache metrics flush error: {e}")
+
+    @classmethod
+    def snapshot(cls):
+        """
+        Totals across workers (this worker's unflushed counts included)
+        """
+        cls.flush()
+        try:
+            stored = SingleFlight.connection().hgetall(cls.KEY)
+        except Exception as e:
+            logger.error(f"Cache metrics read error: {e}")
+            stored = {}
+        totals = {
+            (name.decode() if isinstance(name, bytes) else name): int(value) for name, value in stored.items()
+        }
+        for name, amount in cls._pending.items():
+            totals[name] = totals.get(name, 0) + amount
+
+        # Size histogram per family: {family: {'1k': n, ..., 'bytes': total}}
+        sizes = {}
+        for name in [name for name in totals if name.startswith(('size:', 'bytes:'))]:
+            parts = name.split(':')
+            family = sizes.setdefault(parts[1], {})
+            family[parts[2] if parts[0] == 'size' else 'bytes'] = totals.pop(name)
+        totals['value_sizes'] = sizes
+
+        lookups = sum(totals.get(name, 0) for name in ('hit', 'stale_hit', 'miss'))
+        totals['hit_rate'] = round(
+            (totals.get('hit', 0) + totals.get('stale_hit', 0)) / lookups * 100, 2
+        ) if lookups else 0
+        totals['refreshes_running'] = StaleWhileRevalidate.running()
+        return totals
+
+
+class StaleWhileRevalidate:
+    """
+    Background refresh of stale cache entries
+
+    Entries have a soft TTL (fresh until) and a hard TTL (the Redis
+    expiry). Between the two the cached value is still served and exactly
+    one refresh is started - guarded by the SingleFlight lock - on a
+    bounded thread pool; when the pool is busy the refresh is left to the
+    next stale hit.
+    """
+
+    MAX_WORKERS = 4
+    MAX_QUEUED = 16
+
+    _executor = None
+    _lock = threading.Lock()
+    _queued = 0
+
+    @classmethod
+    def running(cls):
+        return cls._queued
+
+    @staticmethod
+    def wrap(value, timeout):
+        """
+        Entry for a plain cache.set() holding value fresh for timeout seconds
+        (store it with a longer hard timeout)
+        """
+        return {'value': value, 'fresh_until': time.time() + timeout}
+
+    @staticmethod
+    def unwrap(entry):
+        """
+        (value, stale) of an entry made by wrap(); (None, False) for none
+        """
+        if not isinstance(entry, dict) or 'fresh_until' not in entry:
+            return entry, False
+        return entry['value'], time.time() > entry['fresh_until']
+
+    @classmethod
+    def _pool(cls):
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(max_workers=cls.MAX_WORKERS, thread_name_prefix='cache-refresh')
+        return cls._executor
+
+    @classmethod
+    def refresh(cls, key, job):
+        """
+        Run job() (recompute and store key) in the background unless a
+        refresh for key is already running. Returns True when started
+        """
+        try:
+            token = SingleFlight.acquire(key)
+        except Exception as e:
+            logger.error(f"Stale refresh lock error for {key}: {e}")
+            return False
+        if token is None:
+            return False
+
+        with cls._lock:
+            if cls._queued >= cls.MAX_QUEUED:
+                full = True
+            else:
+                full = False
+                cls._queued += 1
+                pool = cls._pool()
+        if full:
+            SingleFlight.release(key, token)
+            CacheMetrics.incr('refresh_skipped')
+            return False
+
+        def run():
+            from django.db import connections
+
+            started = time.monotonic()
+            try:
+                job()
+                CacheMetrics.incr('refresh_ok')
+                logger.info(f"Refreshed stale cache entry {key} in {time.monotonic() - started:.2f}s")
+            except Exception as e:
+                CacheMetrics.incr('refresh_failed')
+                logger.error(f"Stale refresh of {key} failed: {e}", exc_info=True)
+            finally:
+                SingleFlight.release(key, token)
+                # Connections opened by this pool thread
+                connections.close_all()
+                with cls._lock:
+                    cls._queued -= 1
+
+        CacheMetrics.incr('refresh_started')
+        pool.submit(run)
+        return True
+
+
 class CacheDecorator:
     """
     Decorator for caching function results (Enhanced for DRF views)
     """
 
     @staticmethod
-    def cache_result(timeout=3600, key_prefix=None):
+    def build_key(func, key_prefix, args, kwargs, per_user=False, tables=None):
+        """
+        Cache key for a call - canonical query parameters and the user's data
+        scope (cache_scope) for DRF views, the arguments otherwise.
+        per_user keys by the user instead, for responses that contain
+        something of the user's own (name, private lists). The generations
+        of the entry's tags (CacheTags) are part of the key
+        """
+        # Extract request object (DRF views pass 'self' and 'request')
+        request = None
+        if len(args) > 1 and hasattr(args[1], 'query_params'):
+            request = args[1]
+
+        # Generate cache key
+        if key_prefix:
+            cache_key = f"{key_prefix}:{func.__name__}"
+        else:
+            cache_key = func.__name__
+
+        # Add arguments to cache key
+        key_parts = [cache_key]
+
+        # Add request query parameters if available
+        if request:
+            key_parts.extend(f"{k}:{v}" for k, v in canonical_params(request.query_params))
+            # URL path parameters
+            key_parts.extend(f"{k}:{v}" for k, v in sorted(kwargs.items()))
+            user = getattr(request, 'user', None)
+            if per_user and user is not None and user.is_authenticated:
+                key_parts.append(f"user_id:{user.id}")
+            else:
+                key_parts.append(f"scope:{cache_scope(user)}")
+            tags = CacheTags.for_request(request, tables, per_user)
+        else:
+            # Fallback to args/kwargs
+            key_parts.extend(str(arg) for arg in args[1:])  # Skip 'self'
+            key_parts.extend(f"{k}:{v}" for k, v in sorted(kwargs.items()))
+            tags = [CacheTags.table(name) for name in (tables or CacheTags.DEFAULT_TABLES)]
+        key_parts.append(f"gen:{CacheTags.version(tags)}")
+
+        return RedisService.generate_cache_key(*key_parts)
+
+    @staticmethod
+    def cache_result(timeout=3600, key_prefix=None, per_user=False, tables=None):
         """
         Decorator to cache function results - handles DRF requests
 
         Args:
-            timeout: Cache TTL in seconds
+            timeout: Cache TTL in seconds, or a callable returning it
             key_prefix: Optional prefix for cache key
+            per_user: Key by user instead of data scope (see build_key)
+            tables: Tables the result is read from, for invalidation
+                (CacheTags; default transaction_detail)
         """
         def decorator(func):
+            @wraps(func)
             def wrapper(*args, **kwargs):
-                # Extract request object (DRF views pass 'self' and 'request')
-                request = None
-                if len(args) > 1 and hasattr(args[1], 'query_params'):
-                    request = args[1]
-
-                # Generate cache key
-                if key_prefix:
-                    cache_key = f"{key_prefix}:{func.__name__}"
-                else:
-                    cache_key = func.__name__
-
-                # Add arguments to cache key
-                key_parts = [cache_key]
-
-                # Add request query parameters if available
-                if request:
-                    query_params = dict(request.query_params)
-                    # Add user ID if authenticated
-                    if hasattr(request, 'user') and request.user.is_authenticated:
-                        query_params['user_id'] = request.user.id
-                    key_parts.extend(f"{k}:{v}" for k, v in sorted(query_params.items()))
-                else:
-                    # Fallback to args/kwargs
-                    key_parts.extend(str(arg) for arg in args[1:])  # Skip 'self'
-                    key_parts.extend(f"{k}:{v}" for k, v in sorted(kwargs.items()))
-
-                final_key = RedisService.generate_cache_key(*key_parts)
+                final_key = CacheDecorator.build_key(func, key_prefix, args, kwargs, per_user, tables)
 
                 # Try to get from cache
                 result = RedisService.get(final_key)
@@ -174,14 +1256,77 @@ class CacheDecorator:
 
                 logger.info(f"✗ Cache MISS: {func.__name__} - Computing fresh data...")
 
-                # Compute result
-                result = func(*args, **kwargs)
+                def compute():
+                    result = func(*args, **kwargs)
 
-                # Store in cache (only cache successful responses)
-                if hasattr(result, 'status_code') and result.status_code == 200:
-                    RedisService.set(final_key, result, timeout)
-                    logger.info(f"✓ Cached: {func.__name__} (TTL: {timeout}s)")
+                    # Store in cache (only cache successful responses)
+                    if hasattr(result, 'status_code') and result.status_code == 200:
+                        ttl = timeout() if callable(timeout) else timeout
+                        RedisService.set(final_key, result, ttl)
+                        logger.info(f"✓ Cached: {func.__name__} (TTL: {ttl}s)")
+                    return result
 
-                return result
+                # Concurrent misses wait for one computation
+                return SingleFlight.run(final_key, lambda: RedisService.get(final_key), compute)
             return wrapper
-        return decorator
\ No newline at end of file
+        return decorator
+
+    @staticmethod
+    def cache_response(timeout=3600, key_prefix=None, per_user=False, hard_timeout=None, tables=None):
+        """
+        Decorator caching a DRF view method's rendered response (ResponseCache)
+
+        Same keys and arguments as cache_result, but the response is rendered
+        on a miss and its bytes stored, so hits skip unpickling and JSON
+        rendering. Only successful responses are cached.
+
+        With hard_timeout (seconds or a callable, longer than timeout) the
+        entry stays stale-but-servable between the two: such hits are served
+        as-is while one background refresh recomputes the entry
+        (StaleWhileRevalidate).
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(view, request, *args, **kwargs):
+                final_key = CacheDecorator.build_key(
+                    func, key_prefix, (view, request) + args, kwargs, per_user, tables
+                )
+
+                def compute(view=view):
+                    response = func(view, request, *args, **kwargs)
+                    if getattr(response, 'status_code', None) != 200 or not hasattr(response, 'render'):
+                        return response
+
+                    # Render now (finalize_response would otherwise do it after we return)
+                    response.accepted_renderer = request.accepted_renderer
+                    response.accepted_media_type = request.accepted_media_type
+                    response.renderer_context = view.get_renderer_context()
+                    response.render()
+
+                    ttl = timeout() if callable(timeout) else timeout
+                    hard_ttl = hard_timeout() if callable(hard_timeout) else hard_timeout
+                    if ResponseCache.set(final_key, response, ttl, hard_ttl, key_prefix or func.__name__):
+                        logger.info(f"✓ Cached: {func.__name__} (TTL: {ttl}s, {len(response.content)} bytes)")
+                    return response
+
+                cached, stale = ResponseCache.fetch(final_key, request)
+                if cached is not None:
+                    if stale:
+                        CacheMetrics.incr('stale_hit')
+                        logger.info(f"✓ Cache STALE HIT: {func.__name__} (key: {final_key[:20]}...)")
+                        StaleWhileRevalidate.refresh(final_key, lambda: compute(copy.copy(view)))
+                    else:
+                        CacheMetrics.incr('hit')
+                        logger.info(f"✓ Cache HIT: {func.__name__} (key: {final_key[:20]}...)")
+                    return cached
+
+                CacheMetrics.incr('miss')
+                logger.info(f"✗ Cache MISS: {func.__name__} - Computing fresh data...")
+
+                # Concurrent misses wait for one computation
+                return SingleFlight.run(final_key, lambda: ResponseCache.get(final_key, request), compute)
+            return wrapper
+        return decorator
+
+
+RedisCircuitBreaker.on_recovery(CacheTags.replay)
@@ -0,0 +1,251 @@
+"""
+Cache value codec for django-redis (CACHES['default'] SERIALIZER)
+
+Values are packed with msgpack - datetimes, dates, times, Decimals, UUIDs
+and sets as extension types - and compressed with zstd (or lz4 / zlib)
+once they reach a size threshold; smaller values stay uncompressed.
+Values msgpack cannot represent (model instances, arbitrary objects) are
+pickled instead. Every entry starts with a 4-byte header naming its
+serializer and compression, so the settings can change without flushing
+Redis.
+
+Entries written before the codec (django-redis pickle + ZlibCompressor)
+have no header and are still decoded, so a rollout needs no flush. The
+codec compresses itself: use it with the IdentityCompressor.
+
+msgpack has no tuple type - tuples come back as lists. Values with map
+keys that would not come back as the same hashable key (tuples and other
+objects) are pickled instead. An entry that cannot be decoded is logged
+and read as a miss.
+
+OPTIONS:
+    CODEC_COMPRESSION           'zstd' (default), 'lz4', 'zlib' or 'none'
+    CODEC_COMPRESS_MIN_BYTES    smaller values are stored uncompressed (1024)
+    CODEC_COMPRESS_LEVEL        compression level (codec default when unset)
+"""
+from datetime import date, datetime, time
+from decimal import Decimal
+import logging
+import pickle
+import uuid
+import zlib
+
+import msgpack
+from django_redis.serializers.base import BaseSerializer
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+try:
+    import lz4.frame
+    HAS_LZ4 = True
+except ImportError:
+    HAS_LZ4 = False
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'SC'
+
+# Header bytes
+MSGPACK = b'm'
+PICKLE = b'p'
+COMPRESSIONS = {
+    'none': b'-',
+    'zstd': b'z',
+    'lz4': b'l',
+    'zlib': b'd',
+}
+
+# msgpack extension type codes
+EXT_DATETIME = 1
+EXT_DATE = 2
+EXT_TIME = 3
+EXT_DECIMAL = 4
+EXT_UUID = 5
+EXT_SET = 6
+
+
+# Map keys msgpack returns unchanged (tuple keys would come back as lists)
+SAFE_KEY_TYPES = (str, int, float, bool, type(None), bytes)
+CONTAINER_TYPES = (dict, list, tuple, set, frozenset)
+
+
+def _safe_keys(value):
+    """
+    True when every map key and set member in value (at any depth) survives
+    a round trip - tuple / frozenset members would come back unhashable
+    """
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            for key, child in item.items():
+                if not isinstance(key, SAFE_KEY_TYPES):
+                    return False
+                if isinstance(child, CONTAINER_TYPES):
+                    stack.append(child)
+        elif isinstance(item, (set, frozenset)):
+            if any(isinstance(member, CONTAINER_TYPES) for member in item):
+                return False
+        elif isinstance(item, CONTAINER_TYPES):
+            stack.extend(child for child in item if isinstance(child, CONTAINER_TYPES))
+    return True
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return msgpack.ExtType(EXT_DATETIME, value.isoformat().encode())
+    if isinstance(value, date):
+        return msgpack.ExtType(EXT_DATE, value.isoformat().encode())
+    if isinstance(value, time):
+        return msgpack.ExtType(EXT_TIME, value.isoformat().encode())
+    if isinstance(value, Decimal):
+        return msgpack.ExtType(EXT_DECIMAL, str(value).encode())
+    if isinstance(value, uuid.UUID):
+        return msgpack.ExtType(EXT_UUID, value.bytes)
+    if isinstance(value, (set, frozenset)):
+        return msgpack.ExtType(EXT_SET, _pack(list(value)))
+    raise TypeError(f"Cannot pack {type(value).__name__}")
+
+
+def _ext_hook(code, data):
+    if code == EXT_DATETIME:
+        return datetime.fromisoformat(data.decode())
+    if code == EXT_DATE:
+        return date.fromisoformat(data.decode())
+    if code == EXT_TIME:
+        return time.fromisoformat(data.decode())
+    if code == EXT_DECIMAL:
+        return Decimal(data.decode())
+    if code == EXT_UUID:
+        return uuid.UUID(bytes=data)
+    if code == EXT_SET:
+        return set(_unpack(data))
+    return msgpack.ExtType(code, data)
+
+
+def _pack(value):
+    return msgpack.packb(value, default=_default, use_bin_type=True, datetime=False)
+
+
+def _unpack(data):
+    return msgpack.unpackb(data, ext_hook=_ext_hook, raw=False, strict_map_key=False)
+
+
+class Compression:
+    """
+    Compress / decompress by header byte
+    """
+
+    @staticmethod
+    def available(name):
+        if name == 'zstd':
+            return HAS_ZSTD
+        if name == 'lz4':
+            return HAS_LZ4
+        return name in COMPRESSIONS
+
+    @staticmethod
+    def compress(name, data, level=None):
+        if name == 'zstd':
+            return zstandard.ZstdCompressor(level=level or 3).compress(data)
+        if name == 'lz4':
+            return lz4.frame.compress(data, compression_level=level or 0)
+        if name == 'zlib':
+            return zlib.compress(data, 6 if level is None else level)
+        return data
+
+    @staticmethod
+    def decompress(flag, data):
+        if flag == COMPRESSIONS['zstd']:
+            if not HAS_ZSTD:
+                raise ValueError("Cache entry is zstd-compressed but zstandard is not installed")
+            return zstandard.ZstdDecompressor().decompress(data)
+        if flag == COMPRESSIONS['lz4']:
+            if not HAS_LZ4:
+                raise ValueError("Cache entry is lz4-compressed but lz4 is not installed")
+            return lz4.frame.decompress(data)
+        if flag == COMPRESSIONS['zlib']:
+            return zlib.decompress(data)
+        return data
+
+
+class CacheCodec:
+    """
+    encode(value) -> bytes and decode(bytes) -> value
+    """
+
+    def __init__(self, compression='zstd', min_compress_bytes=1024, level=None):
+        if not Compression.available(compression):
+            fallback = 'lz4' if Compression.available('lz4') else 'zlib'
+            logger.warning(f"Cache codec: {compression} is not available, compressing with {fallback}")
+            compression = fallback
+        self.compression = compression
+        self.min_compress_bytes = min_compress_bytes
+        self.level = level
+
+    def encode(self, value):
+        try:
+            if not _safe_keys(value):
+                raise TypeError("Map keys would not round-trip through msgpack")
+            serializer, data = MSGPACK, _pack(value)
+        except (TypeError, ValueError, OverflowError):
+            serializer, data = PICKLE, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+        compression = 'none'
+        if self.compression != 'none' and len(data) >= self.min_compress_bytes:
+            compression = self.compression
+            data = Compression.compress(compression, data, self.level)
+        return MAGIC + serializer + COMPRESSIONS[compression] + data
+
+    @staticmethod
+    def decode(payload):
+        payload = bytes(payload)
+        if not payload.startswith(MAGIC):
+            return CacheCodec.decode_legacy(payload)
+
+        serializer, flag, data = payload[2:3], payload[3:4], payload[4:]
+        data = Compression.decompress(flag, data)
+        if serializer == MSGPACK:
+            return _unpack(data)
+        return pickle.loads(data)
+
+    @staticmethod
+    def decode_legacy(payload):
+        """
+        Entry written by django-redis PickleSerializer + ZlibCompressor
+        (values up to 15 bytes were not compressed)
+        """
+        try:
+            payload = zlib.decompress(payload)
+        except zlib.error:
+            pass
+        return pickle.loads(payload)
+
+
+class CacheCodecSerializer(BaseSerializer):
+    """
+    django-redis serializer using CacheCodec (configured from OPTIONS)
+    """
+
+    def __init__(self, options):
+        super().__init__(options)
+        self.codec = CacheCodec(
+            compression=options.get('CODEC_COMPRESSION', 'zstd'),
+            min_compress_bytes=options.get('CODEC_COMPRESS_MIN_BYTES', 1024),
+            level=options.get('CODEC_COMPRESS_LEVEL'),
+        )
+
+    def dumps(self, value):
+        return self.codec.encode(value)
+
+    def loads(self, value):
+        try:
+            return self.codec.decode(value)
+        except Exception as e:
+            # Read as a miss - the entry is recomputed and overwritten
+            logger.error(f"Cache codec decode error: {e}")
+            return None
@@ -0,0 +1,97 @@
+"""
+Management command to benchmark cache value codecs
+Encodes the data of real responses - an admin-history page, merchant
+analytics and payment mode analytics - with the previous django-redis
+format (pickle + zlib) and with apps.core.cache_codec (msgpack with zstd,
+lz4, zlib or no compression) and reports encode / decode time and bytes
+"""
+from datetime import timedelta
+import pickle
+import statistics
+import time
+import zlib
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.analytics.views import MerchantAnalyticsView, PaymentModeAnalyticsView
+from apps.authentication.backends import SimpleUser
+from apps.core.cache_codec import CacheCodec, Compression
+from apps.transactions.views import GetAdminTxnHistoryView
+
+
+class Command(BaseCommand):
+    help = 'Benchmark pickle + zlib against msgpack + zstd / lz4 on cached response data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Page size of the admin-history page')
+        parser.add_argument('--days', type=int, default=30, help='Days (ending today) the payloads cover')
+        parser.add_argument('--iterations', type=int, default=50, help='Encodes / decodes timed per codec')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        dates = {'date_from': str(today - timedelta(days=options['days'])), 'date_to': str(today)}
+        payloads = [
+            ('admin-history page', GetAdminTxnHistoryView, 'list', {'page_size': str(options['rows']), **dates}),
+            ('merchant analytics', MerchantAnalyticsView, 'get', dates),
+            ('payment mode analytics', PaymentModeAnalyticsView, 'get', dates),
+        ]
+
+        codecs = [('pickle + zlib (previous)', self.legacy_encode, self.legacy_decode)]
+        for compression in ('zstd', 'lz4', 'zlib', 'none'):
+            if Compression.available(compression):
+                codec = CacheCodec(compression=compression)
+                codecs.append((f"msgpack + {compression}", codec.encode, codec.decode))
+
+        for label, view_class, method, params in payloads:
+            try:
+                data = self.response_data(view_class, method, params)
+            except Exception as e:
+                self.stderr.write(f"{label}: {e}")
+                continue
+            if data is None:
+                self.stderr.write(f"{label}: view did not return 200")
+                continue
+
+            self.stdout.write(f"{label}")
+            for name, encode, decode in codecs:
+                encode_ms, payload = self.timed(lambda: encode(data), options['iterations'])
+                decode_ms, _ = self.timed(lambda: decode(payload), options['iterations'])
+                self.stdout.write(
+                    f"  {name:<26} | encode {encode_ms:7.2f}ms | decode {decode_ms:7.2f}ms | {len(payload):>9} bytes"
+                )
+
+    @staticmethod
+    def legacy_encode(value):
+        # django-redis PickleSerializer + ZlibCompressor
+        return zlib.compress(pickle.dumps(value, pickle.HIGHEST_PROTOCOL), 6)
+
+    @staticmethod
+    def legacy_decode(payload):
+        return pickle.loads(zlib.decompress(payload))
+
+    @staticmethod
+    def timed(func, iterations):
+        """
+        (median milliseconds, last result)
+        """
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            result = func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), result
+
+    @staticmethod
+    def response_data(view_class, method, params):
+        """
+        Data of an uncached response of the view
+        """
+        uncached = getattr(view_class, method).__wrapped__
+        view = type('BenchmarkView', (view_class,), {method: uncached}).as_view()
+
+        request = APIRequestFactory().get('/benchmark/', params)
+        force_authenticate(request, user=SimpleUser('codec-benchmark', role='ADMIN', role_id=1))
+        response = view(request)
+        return response.data if response.status_code == 200 else None
@@ -0,0 +1,99 @@
+"""
+Management command to benchmark the rendered response cache
+Serves the same admin-history page through CacheDecorator.cache_result
+(pickles the returned Response) and cache_response (stored bytes) and
+reports hit latency and Redis memory per entry. An unrendered DRF Response
+cannot be pickled, so cache_result stores nothing for DRF views and every
+request recomputes - the benchmark reports that as "not stored"
+"""
+from datetime import timedelta
+from types import SimpleNamespace
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.http import QueryDict
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.authentication.backends import SimpleUser
+from apps.core.cache import CacheDecorator, ResponseCache, RedisService
+from apps.transactions.views import GetAdminTxnHistoryView
+
+
+class Command(BaseCommand):
+    help = 'Benchmark pickled vs pre-rendered response caching on an admin-history page'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Page size of the admin-history page')
+        parser.add_argument('--iterations', type=int, default=200, help='Cache hits timed per variant')
+        parser.add_argument('--days', type=int, default=30, help='Days (ending today) the page covers')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        params = {
+            'page_size': str(options['rows']),
+            'date_from': str(today - timedelta(days=options['days'])),
+            'date_to': str(today),
+        }
+        user = SimpleUser('cache-benchmark', role='ADMIN', role_id=1)
+        uncached_list = GetAdminTxnHistoryView.list.__wrapped__
+
+        variants = [
+            ('pickled Response (cache_result)', CacheDecorator.cache_result, 'bench_pickled',
+             lambda key: cache.make_key(key), 'gzip'),
+            ('rendered bytes (cache_response)', CacheDecorator.cache_response, 'bench_rendered',
+             ResponseCache.redis_key, 'gzip'),
+            ('rendered bytes, no gzip client', CacheDecorator.cache_response, 'bench_rendered',
+             ResponseCache.redis_key, ''),
+        ]
+
+        redis = ResponseCache.connection()
+        factory = APIRequestFactory()
+        key_request = SimpleNamespace(query_params=QueryDict(mutable=True), user=user)
+        key_request.query_params.update(params)
+
+        for label, decorate, prefix, redis_key, accept_encoding in variants:
+            view = type('BenchmarkView', (GetAdminTxnHistoryView,), {
+                'list': decorate(timeout=600, key_prefix=prefix)(uncached_list)
+            }).as_view()
+            key = CacheDecorator.build_key(uncached_list, prefix, (None, key_request), {})
+
+            def serve():
+                request = factory.get('/api/v1/transactions/admin-history/', params,
+                                      HTTP_ACCEPT_ENCODING=accept_encoding)
+                force_authenticate(request, user=user)
+                response = view(request)
+                if hasattr(response, 'render'):
+                    response.render()
+                return response
+
+            RedisService.delete(key)
+            redis.delete(ResponseCache.redis_key(key))
+
+            started = time.perf_counter()
+            response = serve()
+            miss_ms = (time.perf_counter() - started) * 1000
+            if response.status_code != 200:
+                self.stderr.write(f"{label}: admin-history returned {response.status_code}")
+                return
+
+            timings = []
+            for _ in range(options['iterations']):
+                started = time.perf_counter()
+                response = serve()
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+
+            # No entry means every "hit" above recomputed the page
+            memory = redis.memory_usage(redis_key(key))
+            stored = f"{memory:>9} bytes" if memory else 'not stored'
+            self.stdout.write(
+                f"{label:<34} | miss {miss_ms:8.1f}ms | hit p50 {statistics.median(timings):6.2f}ms "
+                f"p95 {timings[int(len(timings) * 0.95) - 1]:6.2f}ms | "
+                f"body {len(response.content):>9} bytes | redis {stored}"
+            )
+
+            RedisService.delete(key)
+            redis.delete(ResponseCache.redis_key(key))
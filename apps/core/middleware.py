@@ -8,6 +8,8 @@ from django.utils.deprecation import MiddlewareMixin
 from django.http import JsonResponse
 from django.core.cache import cache
 
+from apps.core.redis_breaker import RedisCircuitBreaker
+
 logger = logging.getLogger(__name__)
 
 
@@ -119,8 +121,12 @@ class RateLimitMiddleware(MiddlewareMixin):
         cache_key = f"rate_limit_{ip}"
         requests_count = cache.get(cache_key, 0)
 
-        # 10000 requests per hour per IP (global limit)
-        if requests_count > 10000:
+        # 10000 requests per hour per IP (global limit) - counted per worker
+        # while the Redis circuit is open
+        limit = 10000
+        if RedisCircuitBreaker.is_open():
+            limit = RedisCircuitBreaker.local_limit(limit)
+        if requests_count > limit:
             logger.warning(f"Rate limit exceeded for IP: {ip}")
             return JsonResponse(
                 {'error': 'Rate limit exceeded. Please try again later.'},
@@ -11,6 +11,8 @@ import hashlib
 import json
 import logging
 
+from apps.core.cache import CacheTags, SingleFlight
+
 logger = logging.getLogger(__name__)
 
 
@@ -29,23 +31,50 @@ class QueryOptimizer:
     CACHE_TTL_LONG = 1800  # 30 minutes for relatively static data
     CACHE_TTL_DAILY = 86400  # 24 hours for historical data
 
-    @staticmethod
-    def generate_cache_key(prefix: str, params: dict) -> str:
+    @classmethod
+    def generate_cache_key(cls, prefix: str, params: dict) -> str:
         """
         Generate deterministic cache key from query parameters
+        (with the generations of their invalidation tags)
         """
         # Sort params for consistent hashing
-        sorted_params = json.dumps(params, sort_keys=True)
-        param_hash = hashlib.md5(sorted_params.encode()).hexdigest()
+        sorted_params = json.dumps(params, sort_keys=True, default=str)
+        generation = CacheTags.version(cls.cache_tags(params))
+        param_hash = hashlib.md5(f"{sorted_params}:{generation}".encode()).hexdigest()
         return f"{prefix}:{param_hash}"
 
+    @staticmethod
+    def cache_tags(params: dict) -> list:
+        """
+        Invalidation tags (CacheTags) of query parameters - the merchant in
+        client_code / client and the dates in date_from / from .. date_to / to
+        """
+        def as_date(value):
+            if isinstance(value, datetime):
+                return value.date()
+            if isinstance(value, str):
+                try:
+                    return datetime.strptime(value[:10], '%Y-%m-%d').date()
+                except ValueError:
+                    return None
+            return value or None
+
+        client_code = params.get('client_code') or params.get('client')
+        tags = [CacheTags.merchant(client_code) if client_code else CacheTags.ALL_MERCHANTS]
+        tags += CacheTags.for_dates(
+            as_date(params.get('date_from') or params.get('from')),
+            as_date(params.get('date_to') or params.get('to'))
+        )
+        tags.append(CacheTags.table('transaction_detail'))
+        return tags
+
     @classmethod
     def get_cached_query(cls, cache_key: str):
         """
         Retrieve cached query result
         """
         result = cache.get(cache_key)
-        if result:
+        if result is not None:
             logger.info(f"Cache HIT: {cache_key}")
         else:
             logger.info(f"Cache MISS: {cache_key}")
@@ -60,21 +89,35 @@ class QueryOptimizer:
         logger.info(f"Cache SET: {cache_key} (TTL: {ttl}s)")
 
     @classmethod
-    def invalidate_cache_pattern(cls, pattern: str):
+    def cached_query(cls, cache_key: str, compute, ttl: int = CACHE_TTL_MEDIUM, refresh: bool = False):
+        """
+        Cached result of compute(), computed and stored on a miss
+        Concurrent misses are coalesced (SingleFlight.run): one caller
+        computes, the others wait for its result. The lock is released
+        whether compute() returns or raises. refresh recomputes without
+        reading the cache or waiting
+        """
+        def compute_and_store():
+            result = compute()
+            if result is not None:
+                cls.set_cached_query(cache_key, result, ttl)
+            return result
+
+        if refresh:
+            return compute_and_store()
+
+        result = cls.get_cached_query(cache_key)
+        if result is not None:
+            return result
+        return SingleFlight.run(cache_key, lambda: cache.get(cache_key), compute_and_store)
+
+    @classmethod
+    def invalidate_cache(cls, merchants=(), days=(), tables=()):
         """
-        Invalidate all cache keys matching pattern
+        Invalidate cached results for merchants, days (dates) or tables
+        Bumps their generations (CacheTags) - O(1), no key scans
         """
-        # Note: This requires Redis with key pattern support
-        # For local memory cache, we'd need to track keys separately
-        try:
-            from django_redis import get_redis_connection
-            redis_conn = get_redis_connection("default")
-            keys = redis_conn.keys(f"{pattern}*")
-            if keys:
-                redis_conn.delete(*keys)
-                logger.info(f"Cache invalidated: {len(keys)} keys matching {pattern}")
-        except Exception as e:
-            logger.warning(f"Could not invalidate cache pattern {pattern}: {e}")
+        return CacheTags.invalidate(merchants=merchants, days=days, tables=tables)
 
     @classmethod
     def optimize_transaction_query(cls, queryset, fields_needed: list = None):
@@ -115,12 +158,16 @@ class QueryOptimizer:
             'avg_amount': Decimal
         }
         """
-        from apps.transactions.models_aggregations import DailyTransactionSummary
-
         cache_key = cls.generate_cache_key('txn_summary', filters)
-        cached_result = cls.get_cached_query(cache_key)
-        if cached_result:
-            return cached_result
+        # Cache for 5 minutes
+        return cls.cached_query(cache_key, lambda: cls._transaction_summary(filters), cls.CACHE_TTL_MEDIUM)
+
+    @classmethod
+    def _transaction_summary(cls, filters: dict) -> dict:
+        """
+        Summary for get_transaction_summary_fast (cache miss)
+        """
+        from apps.transactions.models_aggregations import DailyTransactionSummary
 
         date_from = filters.get('date_from')
         date_to = filters.get('date_to')
@@ -151,8 +198,6 @@ class QueryOptimizer:
                     if aggregated['total_count'] else 0
                 )
 
-                # Cache for 5 minutes
-                cls.set_cached_query(cache_key, aggregated, cls.CACHE_TTL_MEDIUM)
                 return aggregated
 
             except Exception as e:
@@ -179,9 +224,6 @@ class QueryOptimizer:
             success_amount=Sum('paid_amount', filter=Q(status='SUCCESS')),
             avg_amount=Avg('paid_amount'),
         )
-
-        # Cache for 5 minutes
-        cls.set_cached_query(cache_key, summary, cls.CACHE_TTL_MEDIUM)
         return summary
 
     @classmethod
@@ -216,17 +258,16 @@ class QueryOptimizer:
             'txn_count',
             {'query': str(base_queryset.query)}
         )
-        total_count = cls.get_cached_query(count_cache_key)
 
-        if total_count is None:
+        def count():
             # Use raw SQL for faster count on large datasets
             with connection.cursor() as cursor:
                 count_query = f"SELECT COUNT(*) FROM ({base_queryset.query}) as subquery"
                 cursor.execute(count_query)
-                total_count = cursor.fetchone()[0]
+                return cursor.fetchone()[0]
 
-            # Cache count for 5 minutes
-            cls.set_cached_query(count_cache_key, total_count, cls.CACHE_TTL_MEDIUM)
+        # Cache count for 5 minutes
+        total_count = cls.cached_query(count_cache_key, count, cls.CACHE_TTL_MEDIUM)
 
         # Get paginated results
         results = list(
@@ -344,27 +385,23 @@ class QueryOptimizer:
             'client': client_code
         })
 
-        cached_result = cls.get_cached_query(cache_key)
-        if cached_result:
-            return cached_result
-
-        qs = DailyTransactionSummary.objects.filter(
-            date__gte=date_from,
-            date__lte=date_to
-        ).order_by('date')
+        def trends():
+            qs = DailyTransactionSummary.objects.filter(
+                date__gte=date_from,
+                date__lte=date_to
+            ).order_by('date')
 
-        if client_code:
-            qs = qs.filter(client_code=client_code)
+            if client_code:
+                qs = qs.filter(client_code=client_code)
 
-        results = list(qs.values(
-            'date',
-            'total_count',
-            'success_count',
-            'failed_count',
-            'total_amount',
-            'success_amount'
-        ))
+            return list(qs.values(
+                'date',
+                'total_count',
+                'success_count',
+                'failed_count',
+                'total_amount',
+                'success_amount'
+            ))
 
         # Cache for 30 minutes
-        cls.set_cached_query(cache_key, results, cls.CACHE_TTL_LONG)
-        return results
+        return cls.cached_query(cache_key, trends, cls.CACHE_TTL_LONG)
@@ -0,0 +1,338 @@
+"""
+Circuit breaker around Redis (CACHES['default'] CLIENT_CLASS)
+
+With IGNORE_EXCEPTIONS every cache call still waits out the socket
+timeouts while Redis is down or stalled. CircuitBreakerClient counts
+connection failures and, after FAILURE_THRESHOLD of them within
+FAILURE_WINDOW seconds (successful calls in between do not reset the
+count, so a flapping Redis still trips it), opens the circuit: from then
+on cache calls do not touch Redis but use a bounded in-process cache
+(LocMemCache, shared by the threads of a worker), so throttles and rate
+limits keep counting per worker, and raw connections
+(get_redis_connection) fail at once. A
+background thread pings Redis every PROBE_INTERVAL seconds and closes the
+circuit when it answers; the fallback entries are then dropped.
+
+OPTIONS:
+    CIRCUIT_BREAKER_FAILURES        failures that open the circuit (3)
+    CIRCUIT_BREAKER_WINDOW          seconds they are counted over (30)
+    CIRCUIT_BREAKER_PROBE_INTERVAL  seconds between recovery pings (5)
+    FALLBACK_MAX_ENTRIES            entries of the in-process cache (5000)
+"""
+from collections import deque
+import logging
+import math
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils import timezone
+from django_redis.client import DefaultClient
+from django_redis.exceptions import ConnectionInterrupted
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_NAME = 'sabpaisa-redis-fallback'
+
+
+class RedisUnavailable(RedisConnectionError):
+    """
+    Redis is not called while the circuit is open
+    """
+
+
+class RedisCircuitBreaker:
+    """
+    Per-process circuit state: 'closed' (Redis is used) or 'open'
+    """
+
+    FAILURE_THRESHOLD = 3
+    FAILURE_WINDOW = 30
+    PROBE_INTERVAL = 5
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+
+    _lock = threading.Lock()
+    _state = CLOSED
+    _failures = deque()
+    _opened_at = None
+    _last_error = None
+    _trips = 0
+    _short_circuited = 0
+    _probe = None
+    _probe_thread = None
+    _listeners = []
+
+    @classmethod
+    def configure(cls, failures=None, window=None, probe_interval=None):
+        if failures is not None:
+            cls.FAILURE_THRESHOLD = failures
+        if window is not None:
+            cls.FAILURE_WINDOW = window
+        if probe_interval is not None:
+            cls.PROBE_INTERVAL = probe_interval
+
+    @classmethod
+    def on_recovery(cls, callback):
+        """
+        Call callback() whenever the circuit closes again
+        """
+        cls._listeners.append(callback)
+
+    @staticmethod
+    def is_outage(error):
+        """
+        Connection failures and timeouts count, command errors do not
+        """
+        return isinstance(error, (RedisConnectionError, RedisTimeoutError, socket.timeout))
+
+    @classmethod
+    def is_open(cls):
+        return cls._state == cls.OPEN
+
+    @classmethod
+    def allow(cls):
+        """
+        True when Redis may be called
+        """
+        if cls._state == cls.CLOSED:
+            return True
+        cls._short_circuited += 1
+        # A probe thread inherited through fork is not running here
+        cls._ensure_probing()
+        return False
+
+    @classmethod
+    def record_failure(cls, error, probe):
+        """
+        Count a connection failure; probe() is called (in the background)
+        to test for recovery once the circuit opens
+        """
+        now = time.monotonic()
+        with cls._lock:
+            cls._last_error = str(error)
+            if cls._state == cls.OPEN:
+                return
+            cls._failures.append(now)
+            while cls._failures and cls._failures[0] < now - cls.FAILURE_WINDOW:
+                cls._failures.popleft()
+            if len(cls._failures) < cls.FAILURE_THRESHOLD:
+                return
+            cls._state = cls.OPEN
+            cls._opened_at = timezone.now()
+            cls._trips += 1
+            cls._probe = probe
+        logger.error(f"Redis circuit opened after {cls.FAILURE_THRESHOLD} failures: {error}")
+        cls._ensure_probing()
+
+    @classmethod
+    def _ensure_probing(cls):
+        thread = cls._probe_thread
+        if thread is not None and thread.is_alive():
+            return
+        with cls._lock:
+            if cls._state == cls.OPEN and (cls._probe_thread is None or not cls._probe_thread.is_alive()):
+                cls._probe_thread = threading.Thread(target=cls._run_probe, name='redis-circuit-probe', daemon=True)
+                cls._probe_thread.start()
+
+    @classmethod
+    def _run_probe(cls):
+        while cls._state == cls.OPEN:
+            time.sleep(cls.PROBE_INTERVAL)
+            try:
+                cls._probe()
+            except Exception as e:
+                cls._last_error = str(e)
+                logger.debug(f"Redis recovery probe failed: {e}")
+                continue
+            cls._close()
+
+    @classmethod
+    def _close(cls):
+        with cls._lock:
+            if cls._state == cls.CLOSED:
+                return
+            opened_at = cls._opened_at
+            cls._state = cls.CLOSED
+            cls._failures.clear()
+            cls._opened_at = None
+        logger.info(f"Redis circuit closed (open since {opened_at.isoformat()})")
+        for callback in cls._listeners:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Redis recovery callback error: {e}")
+
+    @staticmethod
+    def local_limit(limit):
+        """
+        A worker's share of a global rate limit, while counting locally
+        """
+        workers = getattr(settings, 'REDIS_FALLBACK_WORKERS', 1)
+        return max(1, math.ceil(limit / max(workers, 1)))
+
+    @classmethod
+    def snapshot(cls):
+        """
+        State for the health endpoint (this worker)
+        """
+        opened_at = cls._opened_at
+        return {
+            'state': cls._state,
+            'opened_at': opened_at.isoformat() if opened_at else None,
+            'open_seconds': round((timezone.now() - opened_at).total_seconds(), 1) if opened_at else 0,
+            'recent_failures': len(cls._failures),
+            'failure_threshold': cls.FAILURE_THRESHOLD,
+            'failure_window_seconds': cls.FAILURE_WINDOW,
+            'probe_interval_seconds': cls.PROBE_INTERVAL,
+            'trips': cls._trips,
+            'short_circuited_calls': cls._short_circuited,
+            'last_error': cls._last_error,
+        }
+
+
+def _clear_fallback():
+    # LocMemCache instances of one name share their entries
+    LocMemCache(FALLBACK_NAME, {}).clear()
+
+
+RedisCircuitBreaker.on_recovery(_clear_fallback)
+
+
+class CircuitBreakerClient(DefaultClient):
+    """
+    django-redis client that goes through RedisCircuitBreaker
+
+    Key operations fall back to the in-process cache while the circuit is
+    open or when Redis fails; everything else (including
+    get_redis_connection) raises ConnectionInterrupted at once, which
+    IGNORE_EXCEPTIONS turns into the usual default.
+    """
+
+    def __init__(self, server, params, backend):
+        super().__init__(server, params, backend)
+        options = params.get('OPTIONS', {})
+        RedisCircuitBreaker.configure(
+            failures=options.get('CIRCUIT_BREAKER_FAILURES'),
+            window=options.get('CIRCUIT_BREAKER_WINDOW'),
+            probe_interval=options.get('CIRCUIT_BREAKER_PROBE_INTERVAL'),
+        )
+        self.fallback = LocMemCache(FALLBACK_NAME, {
+            'TIMEOUT': backend.default_timeout,
+            'OPTIONS': {'MAX_ENTRIES': options.get('FALLBACK_MAX_ENTRIES', 5000)},
+        })
+
+    def get_client(self, write=True, tried=None, show_index=False):
+        if not RedisCircuitBreaker.allow():
+            raise ConnectionInterrupted(connection=None) from RedisUnavailable("Redis circuit is open")
+        return super().get_client(write=write, tried=tried, show_index=show_index)
+
+    def _ping(self):
+        # Bypasses the open circuit
+        DefaultClient.get_client(self, write=True).ping()
+
+    def _guarded(self, call, fallback, client):
+        """
+        call() against Redis, or fallback() when the circuit is open or
+        Redis fails. Calls on an explicit client (nested) pass through
+        """
+        if client is not None:
+            return call()
+        if not RedisCircuitBreaker.allow():
+            return fallback()
+        try:
+            result = call()
+        except ConnectionInterrupted as e:
+            if not RedisCircuitBreaker.is_outage(e.__cause__):
+                raise
+            RedisCircuitBreaker.record_failure(e.__cause__, self._ping)
+            return fallback()
+        return result
+
+    def get(self, key, default=None, version=None, client=None):
+        return self._guarded(
+            lambda: super(CircuitBreakerClient, self).get(key, default=default, version=version, client=client),
+            lambda: self.fallback.get(key, default, version=version),
+            client,
+        )
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, client=None, nx=False, xx=False):
+        def fallback():
+            if nx:
+                return self.fallback.add(key, value, timeout, version=version)
+            if xx and not self.fallback.has_key(key, version=version):
+                return False
+            self.fallback.set(key, value, timeout, version=version)
+            return True
+
+        return self._guarded(
+            lambda: super(CircuitBreakerClient, self).set(
+                key, value, timeout=timeout, version=version, client=client, nx=nx, xx=xx
+            ),
+            fallback,
+            client,
+        )
+
+    def delete(self, key, version=None, prefix=None, client=None):
+        return self._guarded(
+            lambda: super(CircuitBreakerClient, self).delete(key, version=version, prefix=prefix, client=client),
+            lambda: int(self.fallback.delete(key, version=version)),
+            client,
+        )
+
+    def delete_many(self, keys, version=None, client=None):
+        def fallback():
+            return sum(int(self.fallback.delete(key, version=version)) for key in keys)
+
+        return self._guarded(
+            lambda: super(CircuitBreakerClient, self).delete_many(keys, version=version, client=client),
+            fallback,
+            client,
+        )
+
+    def get_many(self, keys, version=None, client=None):
+        return self._guarded(
+            lambda: super(CircuitBreakerClient, self).get_many(keys, version=version, client=client),
+            lambda: self.fallback.get_many(keys, version=version),
+            client,
+        )
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None, client=None):
+        return self._guarded(
+            lambda: super(CircuitBreakerClient, self).set_many(data, timeout=timeout, version=version, client=client),
+            lambda: self.fallback.set_many(data, timeout, version=version),
+            client,
+        )
+
+    def _incr(self, key, delta=1, version=None, client=None, ignore_key_check=False):
+        def fallback():
+            if ignore_key_check and self.fallback.add(key, delta, version=version):
+                return delta
+            return self.fallback.incr(key, delta, version=version)
+
+        return self._guarded(
+            lambda: super(CircuitBreakerClient, self)._incr(
+                key, delta=delta, version=version, client=client, ignore_key_check=ignore_key_check
+            ),
+            fallback,
+            client,
+        )
+
+    def has_key(self, key, version=None, client=None):
+        return self._guarded(
+            lambda: super(CircuitBreakerClient, self).has_key(key, version=version, client=client),
+            lambda: self.fallback.has_key(key, version=version),
+            client,
+        )
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None, client=None):
+        return self._guarded(
+            lambda: super(CircuitBreakerClient, self).touch(key, timeout=timeout, version=version, client=client),
+            lambda: self.fallback.touch(key, timeout, version=version),
+            client,
+        )
@@ -14,7 +14,9 @@ import psutil
 import logging
 import time
 
+from apps.core.cache import CacheMetrics, LocalCache
 from apps.core.permissions import IsAdmin
+from apps.core.redis_breaker import RedisCircuitBreaker
 
 logger = logging.getLogger(__name__)
 
@@ -49,10 +51,12 @@ class SystemHealthView(APIView):
             if db_status['status'] != 'healthy':
                 overall_healthy = False
 
-        # Check Redis cache
+        # Check Redis cache (degraded - served from the in-process fallback -
+        # while its circuit is open)
         cache_status = self._check_redis()
         health_data['services']['redis_cache'] = cache_status
-        if cache_status['status'] != 'healthy':
+        degraded = cache_status['status'] == 'degraded'
+        if cache_status['status'] not in ('healthy', 'degraded'):
             overall_healthy = False
 
         # System resources
@@ -67,7 +71,10 @@ class SystemHealthView(APIView):
             health_data['system'] = {'status': 'unavailable'}
 
         # Set overall status
-        health_data['status'] = 'healthy' if overall_healthy else 'unhealthy'
+        if not overall_healthy:
+            health_data['status'] = 'unhealthy'
+        else:
+            health_data['status'] = 'degraded' if degraded else 'healthy'
 
         response_status = status.HTTP_200_OK if overall_healthy else status.HTTP_503_SERVICE_UNAVAILABLE
 
@@ -94,7 +101,16 @@ class SystemHealthView(APIView):
             }
 
     def _check_redis(self):
-        """Check Redis cache connection"""
+        """Check Redis cache connection and its circuit breaker"""
+        breaker = RedisCircuitBreaker.snapshot()
+        if breaker['state'] == RedisCircuitBreaker.OPEN:
+            # Not called until the background probe closes the circuit
+            return {
+                'status': 'degraded',
+                'error': breaker['last_error'],
+                'circuit_breaker': breaker,
+            }
+
         try:
             start_time = time.time()
             cache.set('health_check', 'ok', timeout=10)
@@ -102,10 +118,13 @@ class SystemHealthView(APIView):
             response_time = (time.time() - start_time) * 1000
 
             if result == 'ok':
+                # The roundtrip may have been served by the in-process fallback
+                from django_redis import get_redis_connection
+                redis_conn = get_redis_connection("default")
+                redis_conn.ping()
+
                 # Get cache stats if available
                 try:
-                    from django_redis import get_redis_connection
-                    redis_conn = get_redis_connection("default")
                     info = redis_conn.info('memory')
                     memory_used = info.get('used_memory_human', 'N/A')
                 except:
@@ -114,15 +133,21 @@ class SystemHealthView(APIView):
                 return {
                     'status': 'healthy',
                     'response_time_ms': round(response_time, 2),
-                    'memory_used': memory_used
+                    'memory_used': memory_used,
+                    'circuit_breaker': RedisCircuitBreaker.snapshot()
                 }
             else:
-                return {'status': 'unhealthy', 'error': 'Cache test failed'}
+                return {
+                    'status': 'unhealthy',
+                    'error': 'Cache test failed',
+                    'circuit_breaker': RedisCircuitBreaker.snapshot()
+                }
         except Exception as e:
             logger.error(f"Redis health check failed: {e}")
             return {
                 'status': 'unhealthy',
-                'error': str(e)
+                'error': str(e),
+                'circuit_breaker': RedisCircuitBreaker.snapshot()
             }
 
 
@@ -227,7 +252,11 @@ class SystemMetricsView(APIView):
             return {
                 'hit_rate': round(hit_rate, 2),
                 'miss_rate': round(miss_rate, 2),
-                'memory_used': memory_used
+                'memory_used': memory_used,
+                # hit / stale_hit / miss and background refresh counts of the response caches
+                'response_cache': CacheMetrics.snapshot(),
+                # In-process L1 (LocalCache) of the worker serving this request
+                'local': LocalCache.stats()
             }
         except Exception as e:
             logger.error(f"Error getting cache stats: {e}")
@@ -0,0 +1,130 @@
+"""
+Tests for the cache value codec
+"""
+from datetime import date, datetime, time
+from decimal import Decimal
+import pickle
+import unittest
+import uuid
+import zlib
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from apps.core.cache_codec import (
+    COMPRESSIONS, MAGIC, MSGPACK, PICKLE, CacheCodec, CacheCodecSerializer, Compression
+)
+
+
+class Opaque:
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return isinstance(other, Opaque) and other.value == self.value
+
+
+class CacheCodecRoundTripTests(SimpleTestCase):
+
+    def setUp(self):
+        self.codec = CacheCodec(compression='zlib', min_compress_bytes=1024)
+
+    def round_trip(self, value):
+        return CacheCodec.decode(self.codec.encode(value))
+
+    def test_plain_values_use_msgpack(self):
+        value = {
+            'success': True,
+            'data': {'count': 12, 'amount': 1250.5, 'client': None, 'modes': ['UPI', 'CARD'], 'raw': b'\x00\x01'},
+            1: 'int key',
+        }
+        payload = self.codec.encode(value)
+        self.assertEqual(payload[:3], MAGIC + MSGPACK)
+        self.assertEqual(CacheCodec.decode(payload), value)
+
+    def test_extension_types(self):
+        value = {
+            'at': timezone.make_aware(datetime(2024, 3, 1, 10, 30, 15, 123456)),
+            'naive': datetime(2024, 3, 1, 10, 30),
+            'day': date(2024, 3, 1),
+            'time': time(23, 59, 59),
+            'amount': Decimal('1234.50'),
+            'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'codes': {'M1', 'M2'},
+        }
+        self.assertEqual(self.round_trip(value), value)
+
+    def test_tuples_come_back_as_lists(self):
+        self.assertEqual(self.round_trip({'range': (1, 2)}), {'range': [1, 2]})
+
+    def test_unsafe_map_keys_are_pickled(self):
+        for value in ({(1, 2): 3}, {'nested': [{frozenset({'a'}): 1}]}, {date(2024, 3, 1): 5}):
+            payload = self.codec.encode(value)
+            self.assertEqual(payload[2:3], PICKLE, value)
+            self.assertEqual(CacheCodec.decode(payload), value)
+
+    def test_sets_of_tuples_are_pickled(self):
+        for value in ({(1, 2), (3, 4)}, {'pairs': [{('a', 1)}]}, {'sets': {frozenset({'a'})}}):
+            payload = self.codec.encode(value)
+            self.assertEqual(payload[2:3], PICKLE, value)
+            self.assertEqual(CacheCodec.decode(payload), value)
+
+    def test_unpackable_objects_are_pickled(self):
+        value = {'row': Opaque(3)}
+        payload = self.codec.encode(value)
+        self.assertEqual(payload[2:3], PICKLE)
+        self.assertEqual(CacheCodec.decode(payload), value)
+
+    def test_small_values_stay_uncompressed(self):
+        self.assertEqual(self.codec.encode({'a': 1})[3:4], COMPRESSIONS['none'])
+
+    def test_large_values_are_compressed(self):
+        value = {'rows': [{'txn_id': f'T{i}', 'status': 'SUCCESS'} for i in range(500)]}
+        payload = self.codec.encode(value)
+        self.assertEqual(payload[3:4], COMPRESSIONS['zlib'])
+        self.assertEqual(CacheCodec.decode(payload), value)
+
+    def test_every_available_compression(self):
+        value = {'rows': list(range(2000))}
+        for name in COMPRESSIONS:
+            if not Compression.available(name):
+                continue
+            payload = CacheCodec(compression=name, min_compress_bytes=0).encode(value)
+            self.assertEqual(payload[3:4], COMPRESSIONS[name], name)
+            self.assertEqual(CacheCodec.decode(payload), value, name)
+
+    @unittest.skipIf(Compression.available('zstd'), 'zstandard is installed')
+    def test_unavailable_compression_falls_back(self):
+        self.assertIn(CacheCodec(compression='zstd').compression, ('lz4', 'zlib'))
+
+
+class LegacyEntryTests(SimpleTestCase):
+    """
+    Entries written by django-redis PickleSerializer + ZlibCompressor
+    """
+
+    def test_zlib_pickle(self):
+        value = {'rows': [{'txn_id': f'T{i}'} for i in range(100)]}
+        self.assertEqual(CacheCodec.decode(zlib.compress(pickle.dumps(value))), value)
+
+    def test_uncompressed_pickle(self):
+        self.assertEqual(CacheCodec.decode(pickle.dumps(7)), 7)
+
+    def test_memoryview_payload(self):
+        self.assertEqual(CacheCodec.decode(memoryview(zlib.compress(pickle.dumps('x' * 50)))), 'x' * 50)
+
+
+class CacheCodecSerializerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.serializer = CacheCodecSerializer({'CODEC_COMPRESSION': 'zlib', 'CODEC_COMPRESS_MIN_BYTES': 64})
+
+    def test_round_trip(self):
+        value = {(1, 2): 3, 'day': date(2024, 3, 1)}
+        self.assertEqual(self.serializer.loads(self.serializer.dumps(value)), value)
+
+    def test_undecodable_entry_is_a_miss(self):
+        with self.assertLogs('apps.core.cache_codec', level='ERROR'):
+            self.assertIsNone(self.serializer.loads(MAGIC + MSGPACK + COMPRESSIONS['zlib'] + b'not zlib'))
+        with self.assertLogs('apps.core.cache_codec', level='ERROR'):
+            self.assertIsNone(self.serializer.loads(b'garbage'))
@@ -0,0 +1,146 @@
+"""
+Tests for the Redis circuit breaker
+"""
+from collections import deque
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from django_redis.cache import RedisCache
+from django_redis.client import DefaultClient
+from django_redis.exceptions import ConnectionInterrupted
+from redis.exceptions import ConnectionError as RedisConnectionError, ResponseError
+
+from apps.core.redis_breaker import CircuitBreakerClient, RedisCircuitBreaker, RedisUnavailable
+
+# Nothing listens on port 1: every call is refused at once
+UNREACHABLE = 'redis://127.0.0.1:1/0'
+
+
+class RedisCircuitBreakerTests(SimpleTestCase):
+
+    def setUp(self):
+        saved = {
+            name: getattr(RedisCircuitBreaker, name)
+            for name in ('FAILURE_THRESHOLD', 'FAILURE_WINDOW', 'PROBE_INTERVAL', '_state', '_opened_at',
+                         '_last_error', '_trips', '_short_circuited', '_probe', '_listeners')
+        }
+        RedisCircuitBreaker._failures = deque()
+        RedisCircuitBreaker._listeners = list(saved['_listeners'])
+        self.addCleanup(lambda: [setattr(RedisCircuitBreaker, name, value) for name, value in saved.items()])
+        self.addCleanup(setattr, RedisCircuitBreaker, '_failures', deque())
+
+        # No background probe thread; tests drive _run_probe themselves
+        patcher = mock.patch.object(RedisCircuitBreaker, '_ensure_probing')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.cache = RedisCache(UNREACHABLE, {
+            'TIMEOUT': 300,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'apps.core.redis_breaker.CircuitBreakerClient',
+                'CIRCUIT_BREAKER_FAILURES': 3,
+                'CIRCUIT_BREAKER_WINDOW': 30,
+                'CIRCUIT_BREAKER_PROBE_INTERVAL': 0,
+                'FALLBACK_MAX_ENTRIES': 100,
+                'SOCKET_CONNECT_TIMEOUT': 0.5,
+                'SOCKET_TIMEOUT': 0.5,
+            },
+        })
+        self.client = self.cache.client
+        self.assertIsInstance(self.client, CircuitBreakerClient)
+        self.client.fallback.clear()
+        self.addCleanup(self.client.fallback.clear)
+
+    def open_circuit(self):
+        for i in range(RedisCircuitBreaker.FAILURE_THRESHOLD):
+            self.cache.set(f'warmup:{i}', i)
+
+    def test_opens_after_threshold_failures(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.assertFalse(RedisCircuitBreaker.is_open())
+        self.cache.set('c', 3)
+        self.assertTrue(RedisCircuitBreaker.is_open())
+        self.assertEqual(RedisCircuitBreaker.snapshot()['trips'], RedisCircuitBreaker._trips)
+
+    def test_failed_calls_use_the_fallback(self):
+        self.cache.set('key', 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(self.cache.get_many(['key', 'missing']), {'key': 'value'})
+
+    def test_open_circuit_does_not_call_redis(self):
+        self.open_circuit()
+        with mock.patch.object(DefaultClient, 'get') as redis_get:
+            self.assertIsNone(self.cache.get('anything'))
+        redis_get.assert_not_called()
+        self.assertGreater(RedisCircuitBreaker.snapshot()['short_circuited_calls'], 0)
+
+    def test_counters_keep_counting_locally(self):
+        self.open_circuit()
+        self.assertTrue(self.cache.add('throttle', 0, 60))
+        self.assertFalse(self.cache.add('throttle', 0, 60))
+        self.assertEqual(self.cache.incr('throttle'), 1)
+        self.assertEqual(self.cache.incr('throttle', 2), 3)
+        self.cache.delete('throttle')
+        self.assertIsNone(self.cache.get('throttle'))
+
+    def test_raw_connections_fail_fast(self):
+        self.open_circuit()
+        with self.assertRaises(ConnectionInterrupted) as raised:
+            self.client.get_client()
+        self.assertIsInstance(raised.exception.__cause__, RedisUnavailable)
+
+    def test_recovery_closes_and_clears_fallback(self):
+        self.open_circuit()
+        self.cache.set('stale', 1)
+        listener = mock.Mock()
+        RedisCircuitBreaker.on_recovery(listener)
+
+        probes = iter([RedisConnectionError('still down'), None])
+
+        def probe():
+            error = next(probes)
+            if error:
+                raise error
+
+        RedisCircuitBreaker._probe = probe
+        RedisCircuitBreaker._run_probe()
+
+        self.assertFalse(RedisCircuitBreaker.is_open())
+        listener.assert_called_once_with()
+        self.assertFalse(self.client.fallback.has_key('stale'))
+        self.assertEqual(RedisCircuitBreaker.snapshot()['recent_failures'], 0)
+
+    def test_failures_outside_the_window_do_not_open(self):
+        with mock.patch('apps.core.redis_breaker.time.monotonic', side_effect=[0, 20, 40, 45]):
+            for _ in range(3):
+                RedisCircuitBreaker.record_failure(RedisConnectionError('refused'), probe=None)
+            self.assertFalse(RedisCircuitBreaker.is_open())
+            RedisCircuitBreaker.record_failure(RedisConnectionError('refused'), probe=None)
+        self.assertTrue(RedisCircuitBreaker.is_open())
+
+    def test_successes_in_between_do_not_reset_the_window(self):
+        flaky = iter([RedisConnectionError('refused'), 'ok', RedisConnectionError('refused'), 'ok',
+                      RedisConnectionError('refused')])
+
+        def get(*args, **kwargs):
+            result = next(flaky)
+            if isinstance(result, Exception):
+                raise ConnectionInterrupted(connection=None) from result
+            return result
+
+        with mock.patch.object(DefaultClient, 'get', side_effect=get):
+            for _ in range(4):
+                self.cache.get('flaky')
+            self.assertFalse(RedisCircuitBreaker.is_open())
+            self.cache.get('flaky')
+        self.assertTrue(RedisCircuitBreaker.is_open())
+
+    def test_command_errors_are_not_outages(self):
+        self.assertFalse(RedisCircuitBreaker.is_outage(ResponseError('WRONGTYPE')))
+        self.assertTrue(RedisCircuitBreaker.is_outage(RedisConnectionError('refused')))
+
+    @override_settings(REDIS_FALLBACK_WORKERS=4)
+    def test_local_limit_is_a_worker_share(self):
+        self.assertEqual(RedisCircuitBreaker.local_limit(10), 3)
+        self.assertEqual(RedisCircuitBreaker.local_limit(1), 1)
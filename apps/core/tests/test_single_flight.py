@@ -0,0 +1,114 @@
+"""
+Tests for single-flight cache computation
+"""
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from apps.core.cache import SingleFlight
+from apps.core.query_optimizer import QueryOptimizer
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'single-flight'}}
+
+
+class FakeRedis:
+    """
+    The SET NX / release-script subset of redis SingleFlight uses
+    """
+
+    def __init__(self):
+        self.store = {}
+
+    def set(self, key, value, nx=False, px=None):
+        if nx and key in self.store:
+            return None
+        self.store[key] = value
+        return True
+
+    def eval(self, script, numkeys, key, token):
+        if self.store.get(key) == token:
+            del self.store[key]
+            return 1
+        return 0
+
+
+class SingleFlightTests(SimpleTestCase):
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        patcher = mock.patch.object(SingleFlight, 'connection', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_run_releases_after_compute(self):
+        self.assertEqual(SingleFlight.run('k', read=lambda: None, compute=lambda: 42), 42)
+        self.assertEqual(self.redis.store, {})
+
+    def test_run_releases_when_compute_raises(self):
+        def compute():
+            raise RuntimeError('query failed')
+
+        with self.assertRaises(RuntimeError):
+            SingleFlight.run('k', read=lambda: None, compute=compute)
+        self.assertEqual(self.redis.store, {})
+        # The next caller takes the lock at once
+        self.assertIsNotNone(SingleFlight.acquire('k'))
+
+    def test_waiter_reads_the_holders_value(self):
+        token = SingleFlight.acquire('k')
+        reads = iter([None, 'computed'])
+        compute = mock.Mock()
+        with mock.patch.object(SingleFlight, 'POLL_INITIAL', 0):
+            value = SingleFlight.run('k', read=lambda: next(reads), compute=compute)
+        self.assertEqual(value, 'computed')
+        compute.assert_not_called()
+        # The holder's lock is left alone
+        self.assertEqual(self.redis.store[SingleFlight.LOCK_PREFIX + 'k'], token)
+
+    def test_waiter_computes_after_timeout(self):
+        SingleFlight.acquire('k')
+        with mock.patch.object(SingleFlight, 'POLL_INITIAL', 0):
+            value = SingleFlight.run('k', read=lambda: None, compute=lambda: 'own', wait_timeout=0)
+        self.assertEqual(value, 'own')
+
+    def test_release_ignores_foreign_lock(self):
+        token = SingleFlight.acquire('k')
+        SingleFlight.release('k', token='other')
+        self.assertEqual(self.redis.store[SingleFlight.LOCK_PREFIX + 'k'], token)
+
+    def test_redis_unavailable_computes(self):
+        self.redis.set = mock.Mock(side_effect=ConnectionError('down'))
+        self.assertEqual(SingleFlight.run('k', read=lambda: None, compute=lambda: 1), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CachedQueryTests(SimpleTestCase):
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.redis = FakeRedis()
+        patcher = mock.patch.object(SingleFlight, 'connection', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_computes_once_then_hits(self):
+        compute = mock.Mock(return_value={'total': 3})
+        self.assertEqual(QueryOptimizer.cached_query('summary:a', compute), {'total': 3})
+        self.assertEqual(QueryOptimizer.cached_query('summary:a', compute), {'total': 3})
+        compute.assert_called_once()
+        self.assertEqual(self.redis.store, {})
+
+    def test_failure_releases_the_lock(self):
+        with self.assertRaises(RuntimeError):
+            QueryOptimizer.cached_query('summary:b', mock.Mock(side_effect=RuntimeError('db down')))
+        self.assertEqual(self.redis.store, {})
+
+        # A retry computes at once instead of waiting out the lock
+        with mock.patch.object(SingleFlight, 'WAIT_TIMEOUT', 5):
+            self.assertEqual(QueryOptimizer.cached_query('summary:b', lambda: 7), 7)
+
+    def test_refresh_recomputes(self):
+        QueryOptimizer.cached_query('summary:c', lambda: 1)
+        self.assertEqual(QueryOptimizer.cached_query('summary:c', lambda: 2, refresh=True), 2)
+        self.assertEqual(QueryOptimizer.cached_query('summary:c', lambda: 3), 2)
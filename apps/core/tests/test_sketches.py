@@ -0,0 +1,142 @@
+"""
+Tests for the mergeable sketches' error bounds
+"""
+from bisect import bisect_left
+from collections import Counter
+import random
+
+from django.test import SimpleTestCase
+
+from apps.core.sketches import HyperLogLog, SpaceSaving, TDigest
+
+
+class HyperLogLogTests(SimpleTestCase):
+
+    def test_large_count_within_three_sigma(self):
+        hll = HyperLogLog()
+        for i in range(100000):
+            hll.add(f'payer{i}@example.com')
+        self.assertLess(abs(hll.count() - 100000) / 100000, 3 * hll.standard_error)
+
+    def test_small_count_within_three_sigma(self):
+        hll = HyperLogLog()
+        for i in range(1000):
+            hll.add(f'98765{i:05d}')
+        self.assertLess(abs(hll.count() - 1000) / 1000, 3 * hll.standard_error)
+
+    def test_duplicates_count_once(self):
+        once, twice = HyperLogLog(), HyperLogLog()
+        for i in range(5000):
+            once.add(i)
+            twice.add(i)
+            twice.add(i)
+        self.assertEqual(once.count(), twice.count())
+
+    def test_merge_equals_union(self):
+        left, right, union = HyperLogLog(), HyperLogLog(), HyperLogLog()
+        for i in range(30000):
+            (left if i % 2 else right).add(i)
+            union.add(i)
+        left.merge_bytes(right.to_bytes())
+        self.assertEqual(left.registers, union.registers)
+        self.assertEqual(HyperLogLog.from_bytes(left.to_bytes()).count(), union.count())
+
+    def test_precision_mismatch(self):
+        with self.assertRaises(ValueError):
+            HyperLogLog(12).merge(HyperLogLog(10))
+
+
+class TDigestTests(SimpleTestCase):
+
+    def setUp(self):
+        rng = random.Random(42)
+        self.values = [rng.lognormvariate(7, 1.2) for _ in range(50000)]
+        self.ordered = sorted(self.values)
+
+    def rank_error(self, digest, q):
+        return abs(bisect_left(self.ordered, digest.quantile(q)) / len(self.ordered) - q)
+
+    def test_quantile_rank_error(self):
+        digest = TDigest()
+        for value in self.values:
+            digest.add(value)
+        self.assertLess(self.rank_error(digest, 0.5), 0.005)
+        self.assertLess(self.rank_error(digest, 0.9), 0.005)
+        self.assertLess(self.rank_error(digest, 0.99), 0.002)
+
+    def test_exact_count_min_max(self):
+        digest = TDigest()
+        for value in self.values:
+            digest.add(value)
+        self.assertEqual(digest.count, len(self.values))
+        self.assertEqual(digest.quantile(0), min(self.values))
+        self.assertEqual(digest.quantile(1), max(self.values))
+
+    def test_merged_days_keep_the_bound(self):
+        merged = TDigest()
+        for day in range(10):
+            digest = TDigest()
+            for value in self.values[day::10]:
+                digest.add(value)
+            merged.merge_bytes(digest.to_bytes())
+        self.assertEqual(merged.count, len(self.values))
+        self.assertLess(self.rank_error(merged, 0.5), 0.005)
+        self.assertLess(self.rank_error(merged, 0.99), 0.002)
+
+    def test_empty(self):
+        self.assertIsNone(TDigest().quantile(0.5))
+
+
+class SpaceSavingTests(SimpleTestCase):
+
+    def setUp(self):
+        rng = random.Random(7)
+        # Zipf-like volumes: a few large merchants, a long tail
+        self.days = []
+        for _ in range(30):
+            day = Counter()
+            for _ in range(2000):
+                merchant = f'M{int(rng.paretovariate(1.2))}'
+                day[merchant] += rng.uniform(100, 1000)
+            self.days.append(day)
+        self.totals = Counter()
+        for day in self.days:
+            self.totals.update(day)
+
+    def merged(self, capacity):
+        summary = SpaceSaving(capacity)
+        for day in self.days:
+            summary.merge(SpaceSaving.from_exact([(key, weight, 1) for key, weight in day.items()], capacity))
+        return summary
+
+    def test_bounds_hold_after_merging(self):
+        summary = self.merged(capacity=20)
+        for key, weight, error, _ in summary.top():
+            self.assertLessEqual(weight - error, self.totals[key] + 1e-6)
+            self.assertGreaterEqual(weight, self.totals[key] - 1e-6)
+        for key, total in self.totals.items():
+            if key not in summary.counters:
+                self.assertLessEqual(total, summary.floor + 1e-6)
+
+    def test_candidates_cover_true_top(self):
+        summary = self.merged(capacity=20)
+        true_top = {key for key, _ in self.totals.most_common(5)}
+        self.assertLessEqual(true_top, set(summary.candidates(5)))
+
+    def test_exact_when_everything_fits(self):
+        summary = self.merged(capacity=len(self.totals) + 1)
+        self.assertTrue(summary.is_exact_for(5))
+        self.assertEqual([key for key, *_ in summary.top(5)], [key for key, _ in self.totals.most_common(5)])
+
+    def test_stream_error_bounded_by_floor(self):
+        summary = SpaceSaving(capacity=10)
+        stream = Counter()
+        rng = random.Random(3)
+        for _ in range(5000):
+            key = f'C{int(rng.paretovariate(1.0))}'
+            summary.add(key, 1.0)
+            stream[key] += 1
+        for key, weight, error, _ in summary.top():
+            self.assertLessEqual(error, summary.floor)
+            self.assertGreaterEqual(weight, stream[key])
+            self.assertLessEqual(weight - error, stream[key])
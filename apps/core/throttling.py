@@ -4,8 +4,22 @@ Custom throttling classes for intelligent rate limiting
 from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
 from django.core.cache import cache
 
+from apps.core.redis_breaker import RedisCircuitBreaker
 
-class CustomAnonThrottle(AnonRateThrottle):
+
+class LocalFallbackMixin:
+    """
+    While the Redis circuit is open request histories are kept per worker,
+    so each worker allows its share of the rate
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is not None and RedisCircuitBreaker.is_open():
+            self.num_requests = RedisCircuitBreaker.local_limit(self.num_requests)
+        return super().allow_request(request, view)
+
+
+class CustomAnonThrottle(LocalFallbackMixin, AnonRateThrottle):
     """
     Custom anonymous throttle with intelligent rate limiting
     """
@@ -24,7 +38,14 @@ class CustomAnonThrottle(AnonRateThrottle):
         }
 
 
-class MerchantRateThrottle(UserRateThrottle):
+class CustomUserThrottle(LocalFallbackMixin, UserRateThrottle):
+    """
+    Per-user rate limiting
+    """
+    scope = 'user'
+
+
+class MerchantRateThrottle(LocalFallbackMixin, UserRateThrottle):
     """
     Merchant-specific rate limiting
     """
@@ -49,7 +70,7 @@ class MerchantRateThrottle(UserRateThrottle):
         }
 
 
-class ReportGenerationThrottle(UserRateThrottle):
+class ReportGenerationThrottle(LocalFallbackMixin, UserRateThrottle):
     """
     Special throttle for report generation endpoints
     """
@@ -21,6 +21,24 @@ class MockTask:
         self.id = f"task_{datetime.now().strftime('%Y%m%d%H%M%S')}"
 
 
+def _filter_settlements(queryset, filters, user):
+    """
+    Apply report filters to settled transactions. With use_settlement_date the
+    date range applies to settlement_date, and the matching AggregateQuery is
+    returned so totals can be read from the settlement summary
+    """
+    from apps.transactions.filters import TransactionSearchFilter
+    from apps.transactions.aggregation_router import AggregateQuery
+
+    use_settlement_date = str(filters.get('use_settlement_date', 'false')).lower() == 'true'
+    if not use_settlement_date:
+        return TransactionSearchFilter.apply_filters(queryset, filters, user), None
+
+    params = TransactionSearchFilter.resolve_date_filter(filters)
+    queryset = TransactionSearchFilter.apply_filters(queryset, params, user, date_field='settlement_date')
+    return queryset, AggregateQuery.from_request(params, user)
+
+
 def generate_transaction_excel(user_id: int, filters: Dict[str, Any], report_type: str = 'merchant') -> MockTask:
     """
     Generate transaction Excel report with comprehensive filters
@@ -109,7 +127,6 @@ def generate_settlement_excel(user_id: int, filters: Dict[str, Any]) -> MockTask
 
     try:
         from apps.transactions.models import TransactionDetail
-        from apps.transactions.filters import TransactionSearchFilter
         from apps.authentication.models import User
 
         # Get user for filtering
@@ -119,30 +136,14 @@ def generate_settlement_excel(user_id: int, filters: Dict[str, Any]) -> MockTask
             logger.error(f"User {user_id} not found for settlement excel")
             return MockTask()
 
-        # Start with settled transactions
-        queryset = TransactionDetail.objects.filter(is_settled=True)
-
-        # Apply comprehensive filters
-        queryset = TransactionSearchFilter.apply_filters(
-            queryset,
+        # Start with settled transactions and apply comprehensive filters
+        # (settlement-date range if use_settlement_date is set)
+        queryset, _ = _filter_settlements(
+            TransactionDetail.objects.filter(is_settled=True),
             filters,
             user
         )
 
-        # Apply settlement-specific date filters if specified
-        use_settlement_date = filters.get('use_settlement_date', 'false').lower() == 'true'
-        if use_settlement_date:
-            date_filter = filters.get('date_filter', 'custom')
-            if date_filter != 'custom':
-                date_from, date_to = TransactionSearchFilter.get_date_range(date_filter)
-                if date_from and date_to:
-                    queryset = queryset.filter(settlement_date__range=[date_from, date_to])
-            else:
-                if filters.get('date_from'):
-                    queryset = queryset.filter(settlement_date__gte=filters['date_from'])
-                if filters.get('date_to'):
-                    queryset = queryset.filter(settlement_date__lte=filters['date_to'])
-
         # Create Excel similar to transaction excel
         wb = openpyxl.Workbook()
         ws = wb.active
@@ -192,7 +193,7 @@ def generate_settlement_excel_v2(user_id: int, filters: Dict[str, Any], include_
 
     try:
         from apps.transactions.models import TransactionDetail
-        from apps.transactions.filters import TransactionSearchFilter
+        from apps.transactions.aggregation_router import SettlementSummaryRouter
         from apps.authentication.models import User
         from openpyxl.chart import BarChart, Reference, PieChart
 
@@ -203,12 +204,10 @@ def generate_settlement_excel_v2(user_id: int, filters: Dict[str, Any], include_
             logger.error(f"User {user_id} not found for settlement excel v2")
             return MockTask()
 
-        # Start with settled transactions
-        queryset = TransactionDetail.objects.filter(is_settled=True)
-
-        # Apply comprehensive filters
-        queryset = TransactionSearchFilter.apply_filters(
-            queryset,
+        # Start with settled transactions and apply comprehensive filters
+        # (settlement-date range if use_settlement_date is set)
+        queryset, settlement_query = _filter_settlements(
+            TransactionDetail.objects.filter(is_settled=True),
             filters,
             user
         )
@@ -251,10 +250,26 @@ def generate_settlement_excel_v2(user_id: int, filters: Dict[str, Any], include_
 
         # Add summary sheet if requested
         if include_charts:
+            router = SettlementSummaryRouter(queryset, settlement_query)
+            totals = router.grouped()
+
             summary_ws = wb.create_sheet(title="Summary")
             summary_ws.append(['Settlement Summary'])
-            summary_ws.append(['Total Records', queryset.count()])
-            summary_ws.append(['Total Settlement Amount', queryset.aggregate(models.Sum('settlement_amount'))['settlement_amount__sum'] or 0])
+            summary_ws.append(['Total Records', totals['total_count']])
+            summary_ws.append(['Total Settlement Amount', round(totals['total_amount'], 2)])
+            summary_ws.append(['Total Charges', round(totals['total_charges'], 2)])
+            summary_ws.append(['Total Effective Amount', round(totals['total_effective'], 2)])
+
+            summary_ws.append([])
+            summary_ws.append(['Settlement Date', 'Count', 'Settlement Amount', 'Charges', 'Effective Amount'])
+            for day in reversed(router.grouped('date')):
+                summary_ws.append([
+                    day['date'].isoformat() if day['date'] else '',
+                    day['total_count'],
+                    round(day['total_amount'], 2),
+                    round(day['total_charges'], 2),
+                    round(day['total_effective'], 2)
+                ])
 
         # Save file
         os.makedirs('/tmp/reports', exist_ok=True)
@@ -267,7 +267,7 @@ class ReportListView(views.APIView):
     """
     permission_classes = [IsAuthenticated]
 
-    @CacheDecorator.cache_result(timeout=300, key_prefix='report_list')  # 5 min cache
+    @CacheDecorator.cache_response(timeout=300, key_prefix='report_list', per_user=True)  # 5 min cache
     def get(self, request):
         """
         Get list of user's generated reports
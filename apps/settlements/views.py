@@ -4,8 +4,7 @@ Settlement views for settlement processing APIs
 from rest_framework import generics, status, views
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q, Sum, Count, F, Value, FloatField, DecimalField
-from django.db.models.functions import Coalesce
+from django.db.models import Q, DecimalField
 from django.utils import timezone
 from datetime import datetime, timedelta
 
@@ -20,6 +19,7 @@ from apps.transactions.serializers import (
     ChargebackTransactionSerializer
 )
 from apps.transactions.filters import TransactionSearchFilter
+from apps.transactions.aggregation_router import AggregateQuery, SettlementSummaryRouter
 
 
 class GetSettledTxnHistoryView(generics.ListAPIView):
@@ -47,7 +47,7 @@ class GetSettledTxnHistoryView(generics.ListAPIView):
         )
         return queryset
 
-    @CacheDecorator.cache_result(timeout=300, key_prefix='settled_txn_history')  # 5 min cache
+    @CacheDecorator.cache_response(timeout=300, key_prefix='settled_txn_history')  # 5 min cache
     def list(self, request, *args, **kwargs):
         # Validate filters
         filter_errors = TransactionSearchFilter.validate_filters(request.query_params)
@@ -194,7 +194,7 @@ class SettledGroupedView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     pagination_class = CustomPostPagination
 
-    @CacheDecorator.cache_result(timeout=600, key_prefix='settled_grouped')  # 10 min cache
+    @CacheDecorator.cache_response(timeout=600, key_prefix='settled_grouped')  # 10 min cache
     def list(self, request):
         # Validate filters
         filter_errors = TransactionSearchFilter.validate_filters(request.query_params)
@@ -215,72 +215,38 @@ class SettledGroupedView(generics.ListAPIView):
             'convcharges', 'ep_charges', 'gst'
         )
 
-        # Apply comprehensive filters
-        queryset = TransactionSearchFilter.apply_filters(
-            queryset,
-            request.query_params,
-            request.user
-        )
-
-        # Use settlement_date for date filters if specified
+        # Date range applies to settlement_date instead of trans_date if specified
         use_settlement_date = request.query_params.get('use_settlement_date', 'false').lower() == 'true'
         if use_settlement_date:
-            date_filter = request.query_params.get('date_filter', 'custom')
-            if date_filter != 'custom':
-                date_from, date_to = TransactionSearchFilter.get_date_range(date_filter)
-                if date_from and date_to:
-                    queryset = queryset.filter(settlement_date__range=[date_from, date_to])
-            else:
-                date_from = request.query_params.get('date_from')
-                date_to = request.query_params.get('date_to')
-                if date_from:
-                    queryset = queryset.filter(settlement_date__gte=date_from)
-                if date_to:
-                    queryset = queryset.filter(settlement_date__lte=date_to)
+            filter_params = TransactionSearchFilter.resolve_date_filter(request.query_params)
+            queryset = TransactionSearchFilter.apply_filters(
+                queryset,
+                filter_params,
+                request.user,
+                date_field='settlement_date'
+            )
+            # Settlement-date ranges can be served from the settlement summary
+            aggregate_query = AggregateQuery.from_request(filter_params, request.user)
+        else:
+            queryset = TransactionSearchFilter.apply_filters(
+                queryset,
+                request.query_params,
+                request.user
+            )
+            aggregate_query = None
 
         group_by = request.query_params.get('group_by', 'date')
+        router = SettlementSummaryRouter(queryset, aggregate_query)
 
-        # Group data
+        # Group data (newest date first / largest amount first)
         if group_by == 'date':
-            from django.db.models.functions import TruncDate
-            grouped_data = queryset.values(
-                date=TruncDate('settlement_date')
-            ).annotate(
-                total_count=Count('txn_id'),
-                total_amount=Sum('settlement_amount'),
-                # Calculate effective amount as settlement_amount minus charges
-                total_effective=Sum(
-                    Coalesce(F('settlement_amount'), Value(0.0, output_field=FloatField())) -
-                    Coalesce(F('convcharges'), Value(0.0, output_field=FloatField())) -
-                    Coalesce(F('ep_charges'), Value(0.0, output_field=FloatField())) -
-                    Coalesce(F('gst'), Value(0.0, output_field=FloatField())),
-                    output_field=FloatField()
-                )
-            ).order_by('-date')
+            daily = router.grouped('date')
+            grouped_data = [row for row in reversed(daily) if row['date'] is not None] + \
+                [row for row in daily if row['date'] is None]
         elif group_by == 'merchant':
-            grouped_data = queryset.values('client_code', 'client_name').annotate(
-                total_count=Count('txn_id'),
-                total_amount=Sum('settlement_amount'),
-                total_effective=Sum(
-                    Coalesce(F('settlement_amount'), Value(0.0, output_field=FloatField())) -
-                    Coalesce(F('convcharges'), Value(0.0, output_field=FloatField())) -
-                    Coalesce(F('ep_charges'), Value(0.0, output_field=FloatField())) -
-                    Coalesce(F('gst'), Value(0.0, output_field=FloatField())),
-                    output_field=FloatField()
-                )
-            ).order_by('-total_amount')
+            grouped_data = sorted(router.grouped('merchant'), key=lambda row: row['total_amount'], reverse=True)
         else:
-            grouped_data = queryset.values('settlement_status').annotate(
-                total_count=Count('txn_id'),
-                total_amount=Sum('settlement_amount'),
-                total_effective=Sum(
-                    Coalesce(F('settlement_amount'), Value(0.0, output_field=FloatField())) -
-                    Coalesce(F('convcharges'), Value(0.0, output_field=FloatField())) -
-                    Coalesce(F('ep_charges'), Value(0.0, output_field=FloatField())) -
-                    Coalesce(F('gst'), Value(0.0, output_field=FloatField())),
-                    output_field=FloatField()
-                )
-            ).order_by('-total_amount')
+            grouped_data = sorted(router.grouped('status'), key=lambda row: row['total_amount'], reverse=True)
 
         return Response({
             'success': True,
@@ -309,7 +275,7 @@ class QfWiseSettledTxnHistoryView(generics.ListAPIView):
         )
         return queryset
 
-    @CacheDecorator.cache_result(timeout=300, key_prefix='qf_settled')  # 5 min cache
+    @CacheDecorator.cache_response(timeout=300, key_prefix='qf_settled')  # 5 min cache
     def list(self, request, *args, **kwargs):
         # Validate filters
         filter_errors = TransactionSearchFilter.validate_filters(request.query_params)
@@ -392,7 +358,7 @@ class GetRefundTxnHistoryView(generics.ListAPIView):
         )
         return queryset
 
-    @CacheDecorator.cache_result(timeout=300, key_prefix='refund_history')  # 5 min cache
+    @CacheDecorator.cache_response(timeout=300, key_prefix='refund_history')  # 5 min cache
     def list(self, request, *args, **kwargs):
         # Validate filters
         filter_errors = TransactionSearchFilter.validate_filters(request.query_params)
@@ -515,7 +481,7 @@ class GetMerchantRefundHistoryView(generics.ListAPIView):
 
         return queryset
 
-    @CacheDecorator.cache_result(timeout=300, key_prefix='merchant_refund_history')  # 5 min cache
+    @CacheDecorator.cache_response(timeout=300, key_prefix='merchant_refund_history', per_user=True)  # 5 min cache, summary names the user
     def list(self, request, *args, **kwargs):
         # Validate filters
         filter_errors = TransactionSearchFilter.validate_filters(request.query_params)
@@ -665,7 +631,7 @@ class GetChargebackTxnHistoryView(generics.ListAPIView):
         )
         return queryset
 
-    @CacheDecorator.cache_result(timeout=300, key_prefix='chargeback_history')  # 5 min cache
+    @CacheDecorator.cache_response(timeout=300, key_prefix='chargeback_history')  # 5 min cache
     def list(self, request, *args, **kwargs):
         # Validate filters
         filter_errors = TransactionSearchFilter.validate_filters(request.query_params)
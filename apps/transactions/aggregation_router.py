@@ -0,0 +1,950 @@
+"""
+Aggregate-aware query router for analytics endpoints
+Answers metric requests from the coarsest summary table that can satisfy them
+exactly and only scans transaction_detail for the parts summaries can't cover
+(partial boundary days, today, days not yet summarised, unsupported filters)
+"""
+from datetime import datetime, time, timedelta
+from functools import reduce
+import logging
+import operator
+
+from django.db.models import Q, F, Sum, Count, Max, Value, FloatField, ExpressionWrapper
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.transactions.local_time import LocalDate
+
+# A range ending this close to now still counts as "up to now" for live counters
+LIVE_END_TOLERANCE = timedelta(minutes=1)
+
+logger = logging.getLogger('apps.transactions')
+
+
+# Canonical measures the router can compute.
+# Each maps to the status it is restricted to (None = all statuses)
+MEASURES = {
+    'total_count': None,
+    'success_count': 'SUCCESS',
+    'failed_count': 'FAILED',
+    'pending_count': 'PENDING',
+    'total_amount': None,
+    'success_amount': 'SUCCESS',
+    'failed_amount': 'FAILED',
+    'settled_count': None,
+    'settled_amount': None,
+}
+
+# Measures that keep changing after the transaction date
+SETTLED_MEASURES = {'settled_count', 'settled_amount'}
+
+# Settlements land T+1 / T+2: closed days this recent are still filling in,
+# so settled measures for them are read from raw rows, not summaries
+SETTLEMENT_LAG_DAYS = 3
+
+# Request filters that no summary table carries - always answered from raw rows
+UNSUPPORTED_FILTERS = ('min_amount', 'max_amount', 'txn_id', 'client_txn_id', 'search', 'q')
+
+# Summary tables ordered coarsest first.
+# status_counts / status_amounts list the per-status columns available, so a
+# status filter can be answered by summing only the matching columns.
+SUMMARY_SOURCES = [
+    {
+        'name': 'merchant_monthly_stats',
+        'model': 'MerchantMonthlyStats',
+        'grain': 'month',
+        'dimensions': {'client_code'},
+        'columns': {
+            'total_count': 'total_count',
+            'total_amount': 'total_amount',
+            'settled_amount': 'settled_amount',
+        },
+        'status_counts': {'SUCCESS': 'success_count', 'FAILED': 'failed_count'},
+        'status_amounts': {'SUCCESS': 'success_amount'},
+    },
+    {
+        'name': 'daily_transaction_summary',
+        'model': 'DailyTransactionSummary',
+        'grain': 'day',
+        'dimensions': {'date', 'client_code'},
+        'columns': {
+            'total_count': 'total_count',
+            'total_amount': 'total_amount',
+            'settled_count': 'settled_count',
+            'settled_amount': 'settled_amount',
+        },
+        'status_counts': {'SUCCESS': 'success_count', 'FAILED': 'failed_count', 'PENDING': 'pending_count'},
+        'status_amounts': {'SUCCESS': 'success_amount', 'FAILED': 'failed_amount'},
+    },
+    {
+        'name': 'payment_mode_summary',
+        'model': 'PaymentModeSummary',
+        'grain': 'day',
+        'dimensions': {'date', 'client_code', 'payment_mode'},
+        'columns': {
+            'total_count': 'total_count',
+            'total_amount': 'total_amount',
+        },
+        'status_counts': {'SUCCESS': 'success_count', 'FAILED': 'failed_count'},
+        'status_amounts': {'SUCCESS': 'success_amount'},
+    },
+    {
+        'name': 'gateway_daily_summary',
+        'model': 'GatewayDailySummary',
+        'grain': 'day',
+        'dimensions': {'date', 'client_code', 'payment_mode', 'pg_name'},
+        'columns': {
+            'total_count': 'total_count',
+            'total_amount': 'total_amount',
+            'settled_count': 'settled_count',
+            'settled_amount': 'settled_amount',
+        },
+        'status_counts': {'SUCCESS': 'success_count', 'FAILED': 'failed_count', 'PENDING': 'pending_count'},
+        'status_amounts': {'SUCCESS': 'success_amount', 'FAILED': 'failed_amount'},
+        'status_settled_counts': {'SUCCESS': 'success_settled_count'},
+        'status_settled_amounts': {'SUCCESS': 'success_settled_amount'},
+    },
+]
+
+
+def _raw_measure(measure):
+    """
+    Build the transaction_detail aggregate for a canonical measure
+    """
+    if measure == 'settled_count':
+        return Count('txn_id', filter=Q(is_settled=True))
+    if measure == 'settled_amount':
+        return Sum('settlement_amount', filter=Q(is_settled=True))
+
+    status = MEASURES[measure]
+    status_filter = Q(status=status) if status else None
+    if measure.endswith('_count'):
+        return Count('txn_id', filter=status_filter)
+    return Sum('paid_amount', filter=status_filter)
+
+
+def settlement_charges_expression():
+    """
+    convcharges + ep_charges + gst with missing charges counted as 0
+    """
+    zero = Value(0.0, output_field=FloatField())
+    return ExpressionWrapper(
+        Coalesce(F('convcharges'), zero) + Coalesce(F('ep_charges'), zero) + Coalesce(F('gst'), zero),
+        output_field=FloatField()
+    )
+
+
+def settlement_effective_expression():
+    """
+    settlement_amount less charges - the amount actually paid out
+    """
+    zero = Value(0.0, output_field=FloatField())
+    return ExpressionWrapper(
+        Coalesce(F('settlement_amount'), zero) - settlement_charges_expression(),
+        output_field=FloatField()
+    )
+
+
+def _get_model(source):
+    from apps.transactions import models_aggregations
+    return getattr(models_aggregations, source['model'])
+
+
+# A day is treated as fully covered when the range ends at or after this time
+END_OF_DAY = time(23, 59, 59)
+
+
+def full_day_bounds(start, end, first_day, last_day):
+    """
+    First/last local days fully inside [start, end] that are already closed
+    Returns (None, None) when there are none
+    """
+    first_full = first_day
+    if start is not None and timezone.localtime(start).time() != time.min:
+        first_full = first_day + timedelta(days=1)
+
+    last_full = last_day
+    if end is not None and timezone.localtime(end).time() < END_OF_DAY:
+        last_full = last_day - timedelta(days=1)
+    # Today is never closed
+    last_full = min(last_full, timezone.localdate() - timedelta(days=1))
+
+    if first_full > last_full:
+        return None, None
+    return first_full, last_full
+
+
+def raw_windows(first_day, last_day, served):
+    """
+    Collapse days not served by pre-aggregated data into trans_date windows.
+    A None bound means "as far as the raw queryset already goes".
+    Returns None when everything is served
+    """
+    runs = day_runs([
+        first_day + timedelta(days=offset)
+        for offset in range((last_day - first_day).days + 1)
+        if first_day + timedelta(days=offset) not in served
+    ])
+    if not runs:
+        return None
+
+    tz = timezone.get_current_timezone()
+    windows = []
+    for run_first, run_last in runs:
+        lower = None if run_first == first_day else timezone.make_aware(datetime.combine(run_first, time.min), tz)
+        upper = None if run_last == last_day else timezone.make_aware(
+            datetime.combine(run_last + timedelta(days=1), time.min), tz
+        )
+        windows.append((lower, upper))
+    return windows
+
+
+def windows_filter(windows, field='trans_date'):
+    """
+    Q object selecting transaction_detail rows inside any of the windows
+    """
+    window_filters = []
+    for lower, upper in windows:
+        q = Q()
+        if lower is not None:
+            q &= Q(**{f'{field}__gte': lower})
+        if upper is not None:
+            q &= Q(**{f'{field}__lt': upper})
+        window_filters.append(q)
+    return reduce(operator.or_, window_filters)
+
+
+def day_runs(days):
+    """
+    Group sorted dates into contiguous [first, last] runs
+    """
+    runs = []
+    for day in days:
+        if runs and day == runs[-1][1] + timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return runs
+
+
+class AggregateQuery:
+    """
+    Effective filters of an analytics request, in a form both the summary
+    tables and the raw transaction table can be queried with
+    """
+
+    def __init__(self, start=None, end=None, client_codes=None, payment_modes=None,
+                 payment_mode_contains=None, statuses=None, unsupported=None):
+        self.start = start
+        self.end = end
+        self.client_codes = client_codes
+        self.payment_modes = payment_modes
+        self.payment_mode_contains = payment_mode_contains
+        self.statuses = statuses
+        self.unsupported = list(unsupported or [])
+
+    @classmethod
+    def from_request(cls, request_data, user):
+        """
+        Build the query a request resolves to under
+        TransactionSearchFilter.apply_filters (same defaults and mappings)
+        """
+        from apps.transactions.filters import TransactionSearchFilter
+
+        query = cls()
+
+        # Merchant scope
+        if user.role == 'ADMIN':
+            merchant_code = request_data.get('merchant_code') or request_data.get('client_code')
+            if merchant_code and merchant_code != 'ALL':
+                query.client_codes = [merchant_code]
+        elif getattr(user, 'client_code', None):
+            query.client_codes = [user.client_code]
+
+        # Date range - defaults to today, as apply_filters does
+        # (datetimes are passed through, see TransactionSearchFilter.resolve_date_filter)
+        now = timezone.now()
+        date_from = request_data.get('date_from')
+        date_to = request_data.get('date_to')
+        if isinstance(date_from, datetime):
+            query.start = date_from
+        elif date_from:
+            query.start = timezone.make_aware(datetime.strptime(date_from, '%Y-%m-%d'))
+        else:
+            query.start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        if isinstance(date_to, datetime):
+            query.end = date_to
+        elif date_to:
+            query.end = timezone.make_aware(
+                datetime.strptime(date_to, '%Y-%m-%d').replace(hour=23, minute=59, second=59)
+            )
+        else:
+            query.end = now.replace(hour=23, minute=59, second=59, microsecond=999999)
+
+        # Payment modes
+        payment_mode = request_data.get('payment_mode')
+        if payment_mode and payment_mode != 'ALL':
+            if ',' in payment_mode:
+                query.payment_modes = [mode.strip() for mode in payment_mode.split(',')]
+            else:
+                query.payment_modes = [
+                    TransactionSearchFilter.PAYMENT_MODE_MAPPING.get(payment_mode.upper(), payment_mode)
+                ]
+
+        # Statuses
+        status = request_data.get('status')
+        if status and status != 'ALL':
+            query.statuses = [s.strip().upper() for s in status.split(',')]
+
+        query.unsupported = [name for name in UNSUPPORTED_FILTERS if request_data.get(name)]
+        return query
+
+    def restrict(self, start=None, end=None):
+        """
+        Narrow the date range (views that add their own default window)
+        """
+        if start is not None and (self.start is None or start > self.start):
+            self.start = start
+        if end is not None and (self.end is None or end < self.end):
+            self.end = end
+        return self
+
+    @property
+    def required_dimensions(self):
+        dimensions = set()
+        if self.client_codes is not None:
+            dimensions.add('client_code')
+        if self.payment_modes is not None or self.payment_mode_contains:
+            dimensions.add('payment_mode')
+        return dimensions
+
+    def summary_filter(self):
+        """
+        Q object applying the non-date filters to a summary table
+        """
+        q = Q()
+        if self.client_codes is not None:
+            # Summaries store a missing client code as ''
+            q &= Q(client_code__in=['' if code is None else code for code in self.client_codes])
+        if self.payment_modes is not None:
+            q &= reduce(operator.or_, [Q(payment_mode__iexact=mode) for mode in self.payment_modes])
+        if self.payment_mode_contains:
+            q &= Q(payment_mode__icontains=self.payment_mode_contains)
+        return q
+
+
+class AggregationRouter:
+    """
+    Routes aggregate requests to summary tables where exact, raw rows otherwise
+
+    Closed full days are answered from summaries (whole closed months from
+    MerchantMonthlyStats when the request allows it); today comes from the
+    live counters when settings.LIVE_COUNTERS is set and the range covers
+    all of it; partial boundary days, today otherwise and days that have not
+    been summarised yet are answered by a single live query against the
+    caller's already-filtered raw queryset. Settled measures also read the
+    last SETTLEMENT_LAG_DAYS closed days live, while settlements still land.
+
+    Usage:
+        router = AggregationRouter(AggregateQuery.from_request(params, user), queryset)
+        totals = router.aggregate(['total_count', 'success_count', 'success_amount'])
+        trend = router.aggregate(['total_count', 'success_amount'], group_by='date')
+    """
+
+    def __init__(self, query, raw_queryset):
+        self.query = query
+        self.raw_queryset = raw_queryset
+        self.last_plan = None
+
+    def aggregate(self, measures, group_by=None):
+        """
+        Compute measures, optionally grouped by 'date', 'client_code',
+        'payment_mode' or 'pg_name'
+
+        Returns a dict of measures when group_by is None, otherwise a list of
+        dicts (group key + measures) ordered by the group key
+        """
+        plan = self._plan(measures, group_by)
+        self.last_plan = plan
+
+        rows = {}
+        for source, periods in plan['summary']:
+            self._merge(rows, self._summary_rows(source, periods, measures, group_by), measures)
+        if plan['live'] is not None:
+            live_source, day = plan['live']
+            self._merge(rows, live_source.rows(day, self.query, measures, group_by), measures)
+        if plan['raw_windows'] is not None:
+            self._merge(rows, self._raw_rows(plan['raw_windows'], measures, group_by), measures)
+
+        logger.debug(
+            f"Aggregation route | group_by: {group_by} | "
+            f"summaries: {[(s['name'], len(p)) for s, p in plan['summary']]} | "
+            f"live: {plan['live'][0].name if plan['live'] else None} | "
+            f"raw windows: {plan['raw_windows']}"
+        )
+
+        if group_by is None:
+            return rows.get(None, {measure: 0 for measure in measures})
+
+        results = []
+        for key in sorted(rows, key=lambda k: (k is None, k)):
+            row = {group_by: key}
+            row.update(rows[key])
+            results.append(row)
+        return results
+
+    # ------------------------------------------------------------------
+    # Planning
+    # ------------------------------------------------------------------
+
+    def _plan(self, measures, group_by):
+        """
+        Decide which days come from which summary and what is left for raw
+        """
+        full_raw = {'summary': [], 'live': None, 'raw_windows': [(None, None)]}
+        query = self.query
+
+        if query.unsupported:
+            return full_raw
+
+        day_source = self._pick_source(measures, group_by, grain='day')
+        if day_source is None:
+            return full_raw
+        month_source = self._pick_source(measures, group_by, grain='month')
+
+        first_day, last_day = self._day_bounds(day_source)
+        if first_day is None:
+            return full_raw
+        first_full, last_full = full_day_bounds(query.start, query.end, first_day, last_day)
+        if first_full is not None and SETTLED_MEASURES & set(measures):
+            settled_until = timezone.localdate() - timedelta(days=SETTLEMENT_LAG_DAYS + 1)
+            if last_full > settled_until:
+                last_full = settled_until
+                if first_full > last_full:
+                    first_full, last_full = None, None
+
+        served = set()
+        summary = []
+
+        if first_full is not None and month_source is not None:
+            months = self._covered_months(month_source, first_full, last_full)
+            if months:
+                summary.append((month_source, months))
+                for year, month in months:
+                    day = datetime(year, month, 1).date()
+                    while day.month == month:
+                        served.add(day)
+                        day += timedelta(days=1)
+
+        if first_full is not None:
+            days = self._covered_days(day_source, first_full, last_full) - served
+            if days:
+                summary.append((day_source, sorted(days)))
+                served |= days
+
+        live = self._live_day(measures, group_by, first_day, last_day)
+        if live is not None:
+            served.add(live[1])
+
+        return {'summary': summary, 'live': live, 'raw_windows': raw_windows(first_day, last_day, served)}
+
+    def _live_day(self, measures, group_by, first_day, last_day):
+        """
+        (live counter source, today) when today can be read from the counters
+        - the range must cover today from midnight up to now
+        """
+        from apps.transactions.live_counters import live_counter_source
+
+        source = live_counter_source()
+        if source is None or not source.supports(self.query, measures, group_by):
+            return None
+
+        today = timezone.localdate()
+        if not first_day <= today <= last_day:
+            return None
+
+        today_start = timezone.make_aware(datetime.combine(today, time.min), timezone.get_current_timezone())
+        if self.query.start is not None and self.query.start > today_start:
+            return None
+        if self.query.end is not None and self.query.end < timezone.now() - LIVE_END_TOLERANCE:
+            return None
+        if not source.available():
+            logger.debug(f"Live counters '{source.name}' not current - scanning today")
+            return None
+        return source, today
+
+    def _pick_source(self, measures, group_by, grain):
+        required = self.query.required_dimensions
+        if group_by:
+            required = required | {group_by}
+        for source in SUMMARY_SOURCES:
+            if source['grain'] != grain or not required <= source['dimensions']:
+                continue
+            if all(self._columns_for(source, measure) is not None for measure in measures):
+                return source
+        return None
+
+    def _columns_for(self, source, measure):
+        """
+        Summary columns whose sum equals the measure under the status filter
+        Returns None when the source can't answer the measure exactly
+        """
+        statuses = sorted(set(self.query.statuses)) if self.query.statuses else None
+
+        if measure in ('total_count', 'total_amount'):
+            if statuses is None:
+                column = source['columns'].get(measure)
+                return [column] if column else None
+            per_status = source['status_counts'] if measure == 'total_count' else source['status_amounts']
+            if not all(status in per_status for status in statuses):
+                return None
+            return [per_status[status] for status in statuses]
+
+        status = MEASURES[measure]
+        if status is None:
+            # Settlement measures span statuses; sliced only where the source
+            # keeps per-status settled columns
+            if statuses is None:
+                column = source['columns'].get(measure)
+                return [column] if column else None
+            per_status = source.get(
+                'status_settled_counts' if measure == 'settled_count' else 'status_settled_amounts', {}
+            )
+            if not all(status in per_status for status in statuses):
+                return None
+            return [per_status[status] for status in statuses]
+
+        per_status = source['status_counts'] if measure.endswith('_count') else source['status_amounts']
+        if status not in per_status:
+            return None
+        if statuses is not None and status not in statuses:
+            return []
+        return [per_status[status]]
+
+    def _day_bounds(self, day_source):
+        """
+        Local first/last calendar day of the requested range
+        """
+        start, end = self.query.start, self.query.end
+        if end is None:
+            end = timezone.now()
+        if start is None:
+            # Open-ended: summaries start where the table starts. The span
+            # begins a day earlier so rows older than the first summarised
+            # day fall into an unbounded raw window
+            earliest = _get_model(day_source).objects.order_by('date').values_list('date', flat=True).first()
+            if earliest is None:
+                return None, None
+            first_day = earliest - timedelta(days=1)
+        else:
+            first_day = timezone.localtime(start).date()
+        return first_day, timezone.localtime(end).date()
+
+    def _covered_days(self, source, first_full, last_full):
+        """
+        Days present in a daily summary (checked globally, not per merchant,
+        so a merchant with no rows on a summarised day reads as zero)
+        """
+        return set(
+            _get_model(source).objects.filter(
+                date__gte=first_full, date__lte=last_full
+            ).values_list('date', flat=True).distinct()
+        )
+
+    def _covered_months(self, source, first_full, last_full):
+        """
+        Whole calendar months inside [first_full, last_full] present in the monthly summary
+        """
+        months = []
+        month_start = first_full.replace(day=1)
+        if month_start < first_full:
+            month_start = (month_start + timedelta(days=32)).replace(day=1)
+        while True:
+            next_month = (month_start + timedelta(days=32)).replace(day=1)
+            if next_month - timedelta(days=1) > last_full:
+                break
+            months.append((month_start.year, month_start.month))
+            month_start = next_month
+
+        if not months:
+            return []
+
+        present = set(
+            _get_model(source).objects.filter(
+                reduce(operator.or_, [Q(year=y, month=m) for y, m in months])
+            ).values_list('year', 'month').distinct()
+        )
+        return [m for m in months if m in present]
+
+    # ------------------------------------------------------------------
+    # Execution
+    # ------------------------------------------------------------------
+
+    def _summary_rows(self, source, periods, measures, group_by):
+        model = _get_model(source)
+
+        if source['grain'] == 'month':
+            period_filter = reduce(operator.or_, [Q(year=y, month=m) for y, m in periods])
+        else:
+            period_filter = reduce(operator.or_, [
+                Q(date__gte=run_first, date__lte=run_last)
+                for run_first, run_last in day_runs(periods)
+            ])
+
+        qs = model.objects.filter(period_filter).filter(self.query.summary_filter())
+
+        annotations = {}
+        for measure in measures:
+            columns = self._columns_for(source, measure)
+            if columns:
+                annotations[measure] = reduce(operator.add, [Sum(column) for column in columns])
+
+        if not annotations:
+            return []
+
+        if group_by is None:
+            row = qs.aggregate(**annotations)
+            return [(None, row)]
+
+        return [
+            (row.pop(group_by), row)
+            for row in qs.values(group_by).annotate(**annotations).order_by()
+        ]
+
+    def _raw_rows(self, windows, measures, group_by):
+        qs = self.raw_queryset.filter(windows_filter(windows))
+
+        annotations = {measure: _raw_measure(measure) for measure in measures}
+
+        if group_by is None:
+            return [(None, qs.aggregate(**annotations))]
+
+        if group_by == 'date':
+            grouped = qs.values(date=LocalDate('trans_date'))
+        else:
+            grouped = qs.values(group_by)
+        return [(row.pop(group_by), row) for row in grouped.annotate(**annotations).order_by()]
+
+    @staticmethod
+    def _merge(rows, new_rows, measures):
+        for key, values in new_rows:
+            # Summaries store missing client/payment mode as ''
+            if key == '':
+                key = None
+            target = rows.setdefault(key, {measure: 0 for measure in measures})
+            for measure in measures:
+                value = values.get(measure) or 0
+                if measure.endswith('_amount'):
+                    target[measure] = float(target[measure]) + float(value)
+                else:
+                    target[measure] += int(value)
+
+
+# Settlement measures, all over settled rows (is_settled=True)
+SETTLEMENT_MEASURES = ('total_count', 'total_amount', 'total_charges', 'total_effective')
+
+# group_by values accepted by SettlementSummaryRouter -> summary column
+SETTLEMENT_GROUPS = {
+    'date': 'settlement_date',
+    'merchant': 'client_code',
+    'status': 'settlement_status',
+    'pg_name': 'pg_name',
+}
+
+
+class SettlementSummaryRouter:
+    """
+    Settlement-date grouped totals (count, gross, charges, effective)
+
+    Closed settlement days come from DailySettlementSummary; partial boundary
+    days, today and days not yet summarised come from the caller's settled
+    queryset. Without a query (or with filters the summary does not carry,
+    e.g. payment mode or transaction status) everything is computed live.
+
+    Usage:
+        params = TransactionSearchFilter.resolve_date_filter(request.query_params)
+        queryset = TransactionSearchFilter.apply_filters(
+            TransactionDetail.objects.filter(is_settled=True), params, user, date_field='settlement_date'
+        )
+        router = SettlementSummaryRouter(queryset, AggregateQuery.from_request(params, user))
+        daily = router.grouped('date')
+    """
+
+    def __init__(self, raw_queryset, query=None):
+        self.raw_queryset = raw_queryset
+        self.query = query
+        self.last_plan = None
+
+    def grouped(self, group_by=None):
+        """
+        Totals overall (group_by None) or per settlement date / merchant /
+        settlement status / pg_name. Returns a dict or a list of dicts ordered
+        by the group key; merchant rows also carry client_name
+        """
+        if group_by is not None and group_by not in SETTLEMENT_GROUPS:
+            raise ValueError(f"Unsupported settlement group_by: {group_by}")
+
+        served, windows = self._plan()
+        self.last_plan = {'summary_days': len(served), 'raw_windows': windows}
+
+        rows = {}
+        if served:
+            self._merge(rows, self._summary_rows(served, group_by))
+        if windows is not None:
+            self._merge(rows, self._raw_rows(windows, group_by))
+
+        logger.debug(
+            f"Settlement route | group_by: {group_by} | "
+            f"summary days: {len(served)} | raw windows: {windows}"
+        )
+
+        if group_by is None:
+            totals = rows.get(None, {measure: 0 for measure in SETTLEMENT_MEASURES})
+            totals.pop('client_name', None)
+            return totals
+
+        key_name = 'date' if group_by == 'date' else SETTLEMENT_GROUPS[group_by]
+        results = []
+        for key in sorted(rows, key=lambda k: (k is None, k)):
+            row = {key_name: key}
+            row.update(rows[key])
+            if group_by == 'merchant':
+                row.setdefault('client_name', None)
+            else:
+                row.pop('client_name', None)
+            results.append(row)
+        return results
+
+    def _plan(self):
+        query = self.query
+        if query is None or query.payment_modes or query.payment_mode_contains \
+                or query.statuses or query.unsupported or query.end is None:
+            return set(), [(None, None)]
+
+        from apps.transactions.models_aggregations import DailySettlementSummary
+
+        last_day = timezone.localtime(query.end).date()
+        if query.start is not None:
+            first_day = timezone.localtime(query.start).date()
+        else:
+            earliest = DailySettlementSummary.objects.order_by(
+                'settlement_date'
+            ).values_list('settlement_date', flat=True).first()
+            if earliest is None:
+                return set(), [(None, None)]
+            # A day earlier so older rows fall into an unbounded raw window
+            first_day = earliest - timedelta(days=1)
+        if first_day > last_day:
+            return set(), [(None, None)]
+
+        first_full, last_full = full_day_bounds(query.start, query.end, first_day, last_day)
+        if first_full is None:
+            return set(), [(None, None)]
+
+        served = set(
+            DailySettlementSummary.objects.filter(
+                settlement_date__gte=first_full, settlement_date__lte=last_full
+            ).values_list('settlement_date', flat=True).distinct()
+        )
+        return served, raw_windows(first_day, last_day, served)
+
+    def _summary_rows(self, served, group_by):
+        from apps.transactions.models_aggregations import DailySettlementSummary
+
+        qs = DailySettlementSummary.objects.filter(reduce(operator.or_, [
+            Q(settlement_date__gte=run_first, settlement_date__lte=run_last)
+            for run_first, run_last in day_runs(sorted(served))
+        ]))
+        if self.query.client_codes:
+            qs = qs.filter(client_code__in=[code or '' for code in self.query.client_codes])
+
+        annotations = {
+            'total_count': Sum('settled_count'),
+            'total_amount': Sum('gross_amount'),
+            'total_charges': Sum('charges_amount'),
+            'total_effective': Sum('effective_amount'),
+        }
+        return self._group(qs, SETTLEMENT_GROUPS.get(group_by), annotations, group_by)
+
+    def _raw_rows(self, windows, group_by):
+        qs = self.raw_queryset.filter(windows_filter(windows, field='settlement_date'))
+        annotations = {
+            'total_count': Count('txn_id'),
+            'total_amount': Sum('settlement_amount'),
+            'total_charges': Sum(settlement_charges_expression()),
+            'total_effective': Sum(settlement_effective_expression()),
+        }
+        if group_by == 'date':
+            return [
+                (row.pop('date'), row)
+                for row in qs.values(date=LocalDate('settlement_date')).annotate(**annotations).order_by()
+            ]
+        return self._group(qs, SETTLEMENT_GROUPS.get(group_by), annotations, group_by)
+
+    @staticmethod
+    def _group(qs, column, annotations, group_by):
+        if group_by is None:
+            return [(None, qs.aggregate(**annotations))]
+        if group_by == 'merchant':
+            annotations = dict(annotations, client_name=Max('client_name'))
+        return [(row.pop(column), row) for row in qs.values(column).annotate(**annotations).order_by()]
+
+    @staticmethod
+    def _merge(rows, new_rows):
+        for key, values in new_rows:
+            # Summaries store missing client/status/pg_name as ''
+            if key == '':
+                key = None
+            target = rows.setdefault(key, {measure: 0 for measure in SETTLEMENT_MEASURES})
+            for measure in SETTLEMENT_MEASURES:
+                value = values.get(measure) or 0
+                if measure == 'total_count':
+                    target[measure] += int(value)
+                else:
+                    target[measure] = float(target[measure]) + float(value)
+            if values.get('client_name'):
+                target['client_name'] = max(target.get('client_name') or '', values['client_name'])
+
+
+# Refund / chargeback measures (see refund_reasons.refund_measures)
+REFUND_MEASURES = ('refund_count', 'refund_amount', 'chargeback_count', 'chargeback_amount')
+
+# group_by values accepted by RefundSummaryRouter -> summary column
+REFUND_GROUPS = {
+    'refund_date': 'refund_date',
+    'chargeback_date': 'chargeback_date',
+    'reason': 'reason_code',
+}
+
+
+class RefundSummaryRouter:
+    """
+    Refund and chargeback totals for a transaction-date range, overall or
+    per refund date / chargeback date / normalised reason code
+
+    Closed transaction days come from DailyRefundReasonSummary; partial
+    boundary days, today and days not yet summarised come from the caller's
+    filtered queryset, with refund messages folded into reason codes the
+    same way. Filters the summary does not carry (payment mode, status,
+    amount, search) send everything to raw rows.
+
+    Usage:
+        router = RefundSummaryRouter(queryset, AggregateQuery.from_request(params, user))
+        totals = router.grouped()
+        reasons = router.grouped('reason')
+    """
+
+    def __init__(self, raw_queryset, query=None):
+        self.raw_queryset = raw_queryset
+        self.query = query
+        self.last_plan = None
+
+    def grouped(self, group_by=None):
+        """
+        Totals overall (group_by None) or a list of dicts keyed by
+        refund_date / chargeback_date / reason_code, ordered by the key
+        """
+        if group_by is not None and group_by not in REFUND_GROUPS:
+            raise ValueError(f"Unsupported refund group_by: {group_by}")
+
+        served, windows = self._plan()
+        self.last_plan = {'summary_days': len(served), 'raw_windows': windows}
+
+        rows = {}
+        if served:
+            self._merge(rows, self._summary_rows(served, group_by))
+        if windows is not None:
+            self._merge(rows, self._raw_rows(windows, group_by))
+
+        logger.debug(
+            f"Refund route | group_by: {group_by} | "
+            f"summary days: {len(served)} | raw windows: {windows}"
+        )
+
+        if group_by is None:
+            return rows.get(None, {measure: 0 for measure in REFUND_MEASURES})
+
+        key_name = REFUND_GROUPS[group_by]
+        results = []
+        for key in sorted(rows, key=lambda k: (k is None, k)):
+            row = {key_name: key}
+            row.update(rows[key])
+            results.append(row)
+        return results
+
+    def _plan(self):
+        query = self.query
+        if query is None or query.payment_modes or query.payment_mode_contains \
+                or query.statuses or query.unsupported or query.end is None:
+            return set(), [(None, None)]
+
+        from apps.transactions.models_aggregations import DailyRefundReasonSummary
+
+        last_day = timezone.localtime(query.end).date()
+        if query.start is not None:
+            first_day = timezone.localtime(query.start).date()
+        else:
+            earliest = DailyRefundReasonSummary.objects.order_by('date').values_list('date', flat=True).first()
+            if earliest is None:
+                return set(), [(None, None)]
+            # A day earlier so older rows fall into an unbounded raw window
+            first_day = earliest - timedelta(days=1)
+        if first_day > last_day:
+            return set(), [(None, None)]
+
+        first_full, last_full = full_day_bounds(query.start, query.end, first_day, last_day)
+        if first_full is None:
+            return set(), [(None, None)]
+
+        served = set(
+            DailyRefundReasonSummary.objects.filter(
+                date__gte=first_full, date__lte=last_full
+            ).values_list('date', flat=True).distinct()
+        )
+        return served, raw_windows(first_day, last_day, served)
+
+    def _summary_rows(self, served, group_by):
+        from apps.transactions.models_aggregations import DailyRefundReasonSummary
+
+        qs = DailyRefundReasonSummary.objects.filter(reduce(operator.or_, [
+            Q(date__gte=run_first, date__lte=run_last)
+            for run_first, run_last in day_runs(sorted(served))
+        ]))
+        if self.query.client_codes:
+            qs = qs.filter(client_code__in=[code or '' for code in self.query.client_codes])
+
+        annotations = {measure: Sum(measure) for measure in REFUND_MEASURES}
+        if group_by is None:
+            return [(None, qs.aggregate(**annotations))]
+        column = REFUND_GROUPS[group_by]
+        return [(row.pop(column), row) for row in qs.values(column).annotate(**annotations).order_by()]
+
+    def _raw_rows(self, windows, group_by):
+        from apps.transactions.refund_reasons import (
+            chargeback_condition, reason_code, refund_condition, refund_measures
+        )
+
+        qs = self.raw_queryset.filter(windows_filter(windows)).filter(refund_condition() | chargeback_condition())
+        if group_by is None:
+            return [(None, qs.aggregate(**refund_measures()))]
+        if group_by == 'reason':
+            return [
+                (reason_code(row.pop('refund_message')), row)
+                for row in qs.values('refund_message').annotate(**refund_measures()).order_by()
+            ]
+        source = 'refund_date' if group_by == 'refund_date' else 'charge_back_date'
+        return [
+            (row.pop('day'), row)
+            for row in qs.values(day=LocalDate(source)).annotate(**refund_measures()).order_by()
+        ]
+
+    @staticmethod
+    def _merge(rows, new_rows):
+        for key, values in new_rows:
+            target = rows.setdefault(key, {measure: 0 for measure in REFUND_MEASURES})
+            for measure in REFUND_MEASURES:
+                value = values.get(measure) or 0
+                if measure.endswith('_count'):
+                    target[measure] += int(value)
+                else:
+                    target[measure] = float(target[measure]) + float(value)
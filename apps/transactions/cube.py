@@ -0,0 +1,381 @@
+"""
+Declarative OLAP cube over transaction_detail
+Dimensions and measures are defined once; cuboids (dimension combinations)
+are materialised per local day into cube_cell and queries are answered from
+the smallest cuboid covering the requested group-by and filters, with live
+rows filling in whatever the cuboid has not been built for (today, partial
+boundary days, days not yet built)
+
+New analytics questions become a cuboid / measure entry here or in
+settings.ANALYTICS_CUBE_CUBOIDS / ANALYTICS_CUBE_MEASURES, not a new model
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Count, Sum, Min, Max, F
+from django.db.models.lookups import In
+from django.utils import timezone
+
+from apps.transactions.aggregation_router import (
+    full_day_bounds, raw_windows, windows_filter, day_runs
+)
+from apps.transactions.local_time import LocalDate, LocalHour
+
+logger = logging.getLogger('apps.transactions')
+
+
+# Dimensions - column is the cube_cell column, field the transaction_detail
+# source. Text dimensions store NULL as '' so cells stay unique per key.
+DIMENSIONS = {
+    'date': {'column': 'date', 'field': 'trans_date'},
+    'hour': {'column': 'hour', 'field': 'trans_date'},
+    'client_code': {'column': 'client_code', 'field': 'client_code'},
+    'payment_mode': {'column': 'payment_mode', 'field': 'payment_mode'},
+    'pg_name': {'column': 'pg_name', 'field': 'pg_name'},
+    'status': {'column': 'status', 'field': 'status'},
+    'settlement_status': {'column': 'settlement_status', 'field': 'settlement_status'},
+}
+
+
+def _combine_min(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a, b)
+
+
+def _combine_max(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return max(a, b)
+
+
+def _combine_add(a, b):
+    return (a or 0) + (b or 0)
+
+
+# Measure kinds - how a measure is computed in SQL and how two partial
+# values (cells from different days / cells plus live rows) are combined.
+# New kinds (e.g. sketches) register here.
+MEASURE_KINDS = {
+    'count': {'aggregate': Count, 'combine': _combine_add},
+    'sum': {'aggregate': Sum, 'combine': _combine_add},
+    'min': {'aggregate': Min, 'combine': _combine_min},
+    'max': {'aggregate': Max, 'combine': _combine_max},
+}
+
+DEFAULT_MEASURES = {
+    'txn_count': {'kind': 'count', 'field': 'txn_id'},
+    'success_count': {'kind': 'count', 'field': 'txn_id', 'filter': {'status': 'SUCCESS'}},
+    'failed_count': {'kind': 'count', 'field': 'txn_id', 'filter': {'status': 'FAILED'}},
+    'amount': {'kind': 'sum', 'field': 'paid_amount'},
+    'success_amount': {'kind': 'sum', 'field': 'paid_amount', 'filter': {'status': 'SUCCESS'}},
+    'settled_count': {'kind': 'count', 'field': 'txn_id', 'filter': {'is_settled': True}},
+    'settled_amount': {'kind': 'sum', 'field': 'settlement_amount', 'filter': {'is_settled': True}},
+    'min_amount': {'kind': 'min', 'field': 'paid_amount'},
+    'max_amount': {'kind': 'max', 'field': 'paid_amount'},
+}
+
+# Every cuboid is keyed by date; the rest are chosen by the queries they serve.
+# Settlement totals come from daily_settlement_summary (SettlementSummaryRouter)
+# and gateway totals from gateway_daily_summary (AggregationRouter), not
+# cuboids - settlement_status / pg_name queries here are answered from live rows
+DEFAULT_CUBOIDS = [
+    {'name': 'date_client', 'dimensions': ['date', 'client_code']},
+    {'name': 'date_client_mode_status', 'dimensions': ['date', 'client_code', 'payment_mode', 'status']},
+    {'name': 'date_hour_client_status', 'dimensions': ['date', 'hour', 'client_code', 'status']},
+]
+
+
+def get_measures():
+    return getattr(settings, 'ANALYTICS_CUBE_MEASURES', None) or DEFAULT_MEASURES
+
+
+def get_cuboids():
+    return getattr(settings, 'ANALYTICS_CUBE_CUBOIDS', None) or DEFAULT_CUBOIDS
+
+
+def register_measure_kind(kind, aggregate, combine):
+    """
+    Register a measure kind (aggregate: Django aggregate class taking the
+    field and filter=; combine: merges two partial values)
+    """
+    MEASURE_KINDS[kind] = {'aggregate': aggregate, 'combine': combine}
+
+
+def _days_filter(runs):
+    """
+    Q object selecting cube_cell rows on the given [first, last] date runs
+    """
+    q = Q()
+    for run_first, run_last in runs:
+        q |= Q(date__gte=run_first, date__lte=run_last)
+    return q
+
+
+class CubeError(ValueError):
+    """Raised for unknown dimensions / measures or an unanswerable query"""
+
+
+class Cube:
+    """
+    Builds and queries cuboids
+    """
+
+    def __init__(self, cuboids=None, measures=None):
+        self.cuboids = {c['name']: c for c in (cuboids or get_cuboids())}
+        self.measures = measures or get_measures()
+        self.last_plan = None
+        for cuboid in self.cuboids.values():
+            if 'date' not in cuboid['dimensions']:
+                raise CubeError(f"Cuboid {cuboid['name']} must include the date dimension")
+            unknown = set(cuboid['dimensions']) - set(DIMENSIONS)
+            if unknown:
+                raise CubeError(f"Cuboid {cuboid['name']} has unknown dimensions: {sorted(unknown)}")
+
+    # ------------------------------------------------------------------
+    # Raw aggregation (shared by build and live fill-in)
+    # ------------------------------------------------------------------
+
+    def _measure_aggregate(self, name):
+        spec = self.measures[name]
+        aggregate = MEASURE_KINDS[spec['kind']]['aggregate']
+        measure_filter = Q(**spec['filter']) if spec.get('filter') else None
+        return aggregate(spec.get('field', 'txn_id'), filter=measure_filter)
+
+    @staticmethod
+    def _dimension_expression(dimension):
+        if dimension == 'date':
+            return LocalDate('trans_date')
+        if dimension == 'hour':
+            return LocalHour('trans_date')
+        return F(DIMENSIONS[dimension]['field'])
+
+    @staticmethod
+    def _raw_filter(filters):
+        """
+        Dimension filters as a transaction_detail Q ('' matches NULL)
+        """
+        q = Q()
+        for dimension, values in filters.items():
+            if dimension == 'hour':
+                q &= Q(In(LocalHour('trans_date'), values))
+                continue
+            field = DIMENSIONS[dimension]['field']
+            condition = Q(**{f'{field}__in': values})
+            if '' in values:
+                condition |= Q(**{f'{field}__isnull': True})
+            q &= condition
+        return q
+
+    def _raw_rows(self, queryset, dimensions, measures):
+        """
+        Aggregate transaction_detail rows to the given dimensions
+        """
+        from apps.transactions.models import TransactionDetail
+
+        queryset = queryset if queryset is not None else TransactionDetail.objects.all()
+        aggregates = {f'cube_m_{m}': self._measure_aggregate(m) for m in measures}
+        if dimensions:
+            annotations = {f'cube_{d}': self._dimension_expression(d) for d in dimensions}
+            rows = queryset.order_by().annotate(**annotations).values(*annotations).annotate(**aggregates)
+        else:
+            rows = [queryset.order_by().aggregate(**aggregates)]
+        for row in rows:
+            key = {}
+            for dimension in dimensions:
+                value = row[f'cube_{dimension}']
+                key[dimension] = value if value is not None or dimension == 'hour' else ''
+            values = {}
+            for measure in measures:
+                value = row[f'cube_m_{measure}']
+                # Cells keep measures in JSON
+                values[measure] = float(value) if isinstance(value, Decimal) else value
+            yield key, values
+
+    # ------------------------------------------------------------------
+    # Build
+    # ------------------------------------------------------------------
+
+    def build_day(self, day, cuboids=None):
+        """
+        (Re)materialise one local day for the given cuboids (default: all)
+        Returns {cuboid_name: cell_count}
+        """
+        from apps.transactions.models import TransactionDetail
+        from apps.transactions.models_aggregations import CubeCell, CubeBuild
+
+        tz = timezone.get_current_timezone()
+        day_start = timezone.make_aware(datetime.combine(day, time.min), tz)
+        day_end = day_start + timedelta(days=1)
+        day_rows = TransactionDetail.objects.filter(trans_date__gte=day_start, trans_date__lt=day_end)
+        measure_names = sorted(self.measures)
+
+        results = {}
+        for name in (cuboids or self.cuboids):
+            dimensions = self.cuboids[name]['dimensions']
+            cells = []
+            for key, values in self._raw_rows(day_rows, dimensions, measure_names):
+                cell = CubeCell(cuboid=name, date=day, measures=values)
+                for dimension in dimensions:
+                    if dimension != 'date':
+                        setattr(cell, DIMENSIONS[dimension]['column'], key[dimension])
+                cells.append(cell)
+
+            with transaction.atomic():
+                CubeCell.objects.filter(cuboid=name, date=day).delete()
+                CubeCell.objects.bulk_create(cells, batch_size=1000)
+                CubeBuild.objects.update_or_create(
+                    cuboid=name, date=day,
+                    defaults={'cell_count': len(cells), 'measure_names': measure_names}
+                )
+            results[name] = len(cells)
+
+        logger.info(f"Cube build for {day}: {results}")
+        return results
+
+    # ------------------------------------------------------------------
+    # Query
+    # ------------------------------------------------------------------
+
+    def _built_days(self, name, first_full, last_full, measures):
+        """
+        Days of a cuboid built with every requested measure
+        Returns {date: cell_count}
+        """
+        from apps.transactions.models_aggregations import CubeBuild
+
+        if first_full is None:
+            return {}
+        builds = CubeBuild.objects.filter(
+            cuboid=name, date__gte=first_full, date__lte=last_full
+        ).values_list('date', 'cell_count', 'measure_names')
+        return {
+            day: cell_count for day, cell_count, measure_names in builds
+            if set(measures) <= set(measure_names or [])
+        }
+
+    def choose_cuboid(self, dimensions, first_full=None, last_full=None, measures=()):
+        """
+        Smallest cuboid covering the dimensions: fewest unbuilt days in the
+        range, then fewest cells to read, then fewest dimensions
+        Returns (name, built_days) or (None, {}) when no cuboid covers them
+        """
+        best = None
+        for name, cuboid in self.cuboids.items():
+            if not set(dimensions) <= set(cuboid['dimensions']):
+                continue
+            built = self._built_days(name, first_full, last_full, measures)
+            total_days = (last_full - first_full).days + 1 if first_full else 0
+            score = (total_days - len(built), sum(built.values()), len(cuboid['dimensions']))
+            if best is None or score < best[0]:
+                best = (score, name, built)
+        if best is None:
+            return None, {}
+        return best[1], best[2]
+
+    def query(self, measures, group_by=(), filters=None, start=None, end=None, queryset=None):
+        """
+        Aggregate measures grouped by dimensions over [start, end]
+
+        filters: {dimension: [values]} ('' selects missing values)
+        queryset: optional base TransactionDetail queryset for the live part;
+                  must not carry filters the cube can't express
+        Returns a dict for an empty group_by, else a list of dicts sorted by key
+        """
+        group_by = list(group_by)
+        filters = {d: list(v) if isinstance(v, (list, tuple, set)) else [v] for d, v in (filters or {}).items()}
+        unknown = (set(group_by) | set(filters)) - set(DIMENSIONS)
+        if unknown:
+            raise CubeError(f"Unknown dimensions: {sorted(unknown)}")
+        unknown = set(measures) - set(self.measures)
+        if unknown:
+            raise CubeError(f"Unknown measures: {sorted(unknown)}")
+        if 'date' in filters:
+            raise CubeError("Filter dates with start/end")
+
+        from apps.transactions.models import TransactionDetail
+        from apps.transactions.models_aggregations import CubeCell
+
+        live = queryset if queryset is not None else TransactionDetail.objects.all()
+        if start is not None:
+            live = live.filter(trans_date__gte=start)
+        if end is not None:
+            live = live.filter(trans_date__lte=end)
+        if filters:
+            live = live.filter(self._raw_filter(filters))
+
+        # Day span of the request. An open start begins the day before the
+        # first built day so older rows fall into an unbounded live window
+        end_day = timezone.localtime(end or timezone.now()).date()
+        if start is not None:
+            first_day = timezone.localtime(start).date()
+        else:
+            from apps.transactions.models_aggregations import CubeBuild
+            first_day = CubeBuild.objects.order_by('date').values_list('date', flat=True).first()
+            if first_day is not None:
+                first_day -= timedelta(days=1)
+
+        name, built = None, {}
+        windows = [(None, None)]
+        if first_day is not None and first_day <= end_day:
+            first_full, last_full = full_day_bounds(start, end, first_day, end_day)
+            name, built = self.choose_cuboid(set(group_by) | set(filters), first_full, last_full, measures)
+            if built:
+                windows = raw_windows(first_day, end_day, set(built))
+
+        self.last_plan = {'cuboid': name if built else None, 'cube_days': len(built), 'raw_windows': windows}
+
+        merged = {}
+        if built:
+            cells = CubeCell.objects.filter(cuboid=name).filter(
+                _days_filter(day_runs(sorted(built)))
+            )
+            for dimension, values in filters.items():
+                cells = cells.filter(**{f"{DIMENSIONS[dimension]['column']}__in": values})
+            columns = [DIMENSIONS[d]['column'] for d in group_by]
+            for cell in cells.values_list('measures', *columns).iterator():
+                key = {d: cell[1 + i] for i, d in enumerate(group_by)}
+                self._merge(merged, key, {m: cell[0].get(m) for m in measures}, measures)
+
+        if windows:
+            for key, values in self._raw_rows(live.filter(windows_filter(windows)), group_by, measures):
+                self._merge(merged, key, values, measures)
+
+        if not group_by:
+            row = merged.get((), {m: None for m in measures})
+            return self._finalise(row, measures)
+        return [
+            dict(zip(group_by, key_tuple), **self._finalise(values, measures))
+            for key_tuple, values in sorted(merged.items(), key=lambda item: tuple(
+                (v is None, v) for v in item[0]
+            ))
+        ]
+
+    def _merge(self, merged, key, values, measures):
+        key_tuple = tuple(key.values())
+        target = merged.get(key_tuple)
+        if target is None:
+            merged[key_tuple] = dict(values)
+            return
+        for measure in measures:
+            combine = MEASURE_KINDS[self.measures[measure]['kind']]['combine']
+            target[measure] = combine(target.get(measure), values.get(measure))
+
+    def _finalise(self, values, measures):
+        result = {}
+        for measure in measures:
+            value = values.get(measure)
+            if self.measures[measure]['kind'] in ('count', 'sum') and value is None:
+                value = 0
+            if isinstance(value, float):
+                value = round(value, 2)
+            result[measure] = value
+        return result
+
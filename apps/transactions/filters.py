@@ -16,6 +16,22 @@ class TransactionSearchFilter:
     Comprehensive transaction search filter handling all business cases
     """
 
+    # Map common payment mode abbreviations to actual DB values
+    PAYMENT_MODE_MAPPING = {
+        'UPI': 'UPI',
+        'CC': 'Credit Card',
+        'DC': 'Debit Card',
+        'NB': 'Net Banking',
+        'WALLET': 'WALLET',
+        'INTENT': 'UPI INTENT',
+        'CASH': 'CASH',
+        'NEFT': 'NEFT',
+        'RUPAY': 'Rupay Card',
+        'RUPAYCREDIT': 'RuPayCreditCard',
+        'BHIM_UPI_QR': 'BHIM UPI QR',
+        'BHIM': 'BHIM UPI QR'
+    }
+
     @staticmethod
     def get_date_range(date_filter):
         """
@@ -57,9 +73,27 @@ class TransactionSearchFilter:
         return None, None
 
     @staticmethod
-    def apply_filters(queryset, request_data, user):
+    def resolve_date_filter(request_data):
+        """
+        Copy of the request params with a date_filter preset (today/week/...)
+        resolved into date_from / date_to, for callers whose date range is
+        not the transaction date
+        """
+        params = request_data.dict() if hasattr(request_data, 'dict') else dict(request_data)
+        date_filter = params.get('date_filter', 'custom')
+        if date_filter != 'custom':
+            date_from, date_to = TransactionSearchFilter.get_date_range(date_filter)
+            if date_from and date_to:
+                params['date_from'] = date_from
+                params['date_to'] = date_to
+        return params
+
+    @staticmethod
+    def apply_filters(queryset, request_data, user, date_field='trans_date'):
         """
         Apply all search filters based on the cases
+        date_field selects the column the date range applies to
+        (settlement screens pass 'settlement_date')
 
         Cases:
         1. Admin can search merchant-wise or all merchants
@@ -102,12 +136,12 @@ class TransactionSearchFilter:
             if isinstance(date_from, str):
                 date_from = datetime.strptime(date_from, '%Y-%m-%d')
                 date_from = timezone.make_aware(date_from.replace(hour=0, minute=0, second=0))
-            queryset = queryset.filter(trans_date__gte=date_from)
+            queryset = queryset.filter(**{f'{date_field}__gte': date_from})
             filter_summary.append(f"From: {request_data.get('date_from')}")
             logger.debug(f"Applied date_from filter: {date_from}")
         else:
             # Default to today's start
-            queryset = queryset.filter(trans_date__gte=today_start)
+            queryset = queryset.filter(**{f'{date_field}__gte': today_start})
             filter_summary.append(f"From: {now.strftime('%Y-%m-%d')} (today)")
             logger.debug(f"Applied default date_from: {today_start}")
 
@@ -116,12 +150,12 @@ class TransactionSearchFilter:
             if isinstance(date_to, str):
                 date_to = datetime.strptime(date_to, '%Y-%m-%d')
                 date_to = timezone.make_aware(date_to.replace(hour=23, minute=59, second=59))
-            queryset = queryset.filter(trans_date__lte=date_to)
+            queryset = queryset.filter(**{f'{date_field}__lte': date_to})
             filter_summary.append(f"To: {request_data.get('date_to')}")
             logger.debug(f"Applied date_to filter: {date_to}")
         else:
             # Default to today's end
-            queryset = queryset.filter(trans_date__lte=today_end)
+            queryset = queryset.filter(**{f'{date_field}__lte': today_end})
             filter_summary.append(f"To: {now.strftime('%Y-%m-%d')} (today)")
             logger.debug(f"Applied default date_to: {today_end}")
 
@@ -139,23 +173,8 @@ class TransactionSearchFilter:
                 filter_summary.append(f"Payment modes: {payment_mode}")
                 logger.debug(f"Applied payment mode filter: {payment_modes}")
             else:
-                # Map common abbreviations to actual DB values
-                payment_mode_mapping = {
-                    'UPI': 'UPI',
-                    'CC': 'Credit Card',
-                    'DC': 'Debit Card',
-                    'NB': 'Net Banking',
-                    'WALLET': 'WALLET',
-                    'INTENT': 'UPI INTENT',
-                    'CASH': 'CASH',
-                    'NEFT': 'NEFT',
-                    'RUPAY': 'Rupay Card',
-                    'RUPAYCREDIT': 'RuPayCreditCard',
-                    'BHIM_UPI_QR': 'BHIM UPI QR',
-                    'BHIM': 'BHIM UPI QR'
-                }
                 # Try to map first, otherwise use the value as-is
-                mapped_mode = payment_mode_mapping.get(payment_mode.upper(), payment_mode)
+                mapped_mode = TransactionSearchFilter.PAYMENT_MODE_MAPPING.get(payment_mode.upper(), payment_mode)
                 # Use case-insensitive exact match to handle any case variations
                 queryset = queryset.filter(payment_mode__iexact=mapped_mode)
                 filter_summary.append(f"Payment mode: {payment_mode}")
@@ -0,0 +1,453 @@
+"""
+Live counters for today's transactions
+Two interchangeable sources keep per-status counts and paid_amount for the
+current day, so today's part of an analytics range is a read of a few
+hundred counters instead of a scan of transaction_detail:
+
+- 'triggers': MySQL triggers on transaction_detail maintain
+  live_transaction_counter (one row per IST date, hour, client_code,
+  payment_mode and status)
+- 'redis': the change-data-capture poller (manage.py run_live_counter_poller)
+  tails transaction_detail into Redis hashes per (day, client_code) and
+  (day, payment_mode), for databases where the legacy table can't be altered
+
+The AggregationRouter reads today from the configured source
+(settings.LIVE_COUNTERS) whenever the request covers the whole of today and
+only needs measures / dimensions the counters carry.
+"""
+from datetime import datetime, time, timedelta
+import logging
+import time as time_module
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from apps.transactions.local_time import LocalHour, local_offset_minutes
+
+logger = logging.getLogger('apps.transactions')
+
+COUNTER_TABLE = 'live_transaction_counter'
+
+TRIGGERS = {
+    'insert': 'trg_txn_live_counter_insert',
+    'update': 'trg_txn_live_counter_update',
+    'delete': 'trg_txn_live_counter_delete',
+}
+
+# Router measures the counters can answer, and the status each is restricted to
+LIVE_MEASURES = {
+    'total_count': None,
+    'success_count': 'SUCCESS',
+    'failed_count': 'FAILED',
+    'pending_count': 'PENDING',
+    'total_amount': None,
+    'success_amount': 'SUCCESS',
+    'failed_amount': 'FAILED',
+}
+
+# Router group_by values the counters carry (None = totals)
+LIVE_GROUPS = (None, 'date', 'client_code', 'payment_mode')
+
+# Counter key, in unique-key order
+KEY_COLUMNS = ('date', 'hour', 'client_code', 'payment_mode', 'status')
+
+# Days of counters kept by prune_counters
+COUNTER_KEEP_DAYS = 7
+
+# Seconds a trigger presence check is trusted before information_schema is re-read
+TRIGGER_CHECK_TTL = 60
+
+
+def _key_values(row, offset):
+    """
+    SQL expressions for the counter key of the OLD / NEW trigger row
+    """
+    return (
+        f"DATE({row}.trans_date + INTERVAL {offset} MINUTE)",
+        f"HOUR({row}.trans_date + INTERVAL {offset} MINUTE)",
+        f"IFNULL({row}.client_code, '')",
+        f"IFNULL({row}.payment_mode, '')",
+        f"IFNULL({row}.status, '')",
+    )
+
+
+def _increment_sql(row, offset):
+    return (
+        f"INSERT INTO {COUNTER_TABLE} "
+        f"({', '.join(KEY_COLUMNS)}, txn_count, amount, last_updated) "
+        f"VALUES ({', '.join(_key_values(row, offset))}, 1, IFNULL({row}.paid_amount, 0), NOW(6)) "
+        f"ON DUPLICATE KEY UPDATE txn_count = txn_count + 1, "
+        f"amount = amount + IFNULL({row}.paid_amount, 0), last_updated = NOW(6);"
+    )
+
+
+def _decrement_sql(row, offset):
+    key_match = ' AND '.join(
+        f"{column} = {value}" for column, value in zip(KEY_COLUMNS, _key_values(row, offset))
+    )
+    return (
+        f"UPDATE {COUNTER_TABLE} SET txn_count = txn_count - 1, "
+        f"amount = amount - IFNULL({row}.paid_amount, 0), last_updated = NOW(6) "
+        f"WHERE {key_match};"
+    )
+
+
+def trigger_statements():
+    """
+    {event: CREATE TRIGGER statement} for the installed TIME_ZONE offset
+    """
+    offset = local_offset_minutes()
+    if offset is None:
+        raise ValueError("TIME_ZONE observes DST - counters need a fixed offset")
+
+    changed = (
+        "NOT (OLD.trans_date <=> NEW.trans_date AND OLD.client_code <=> NEW.client_code "
+        "AND OLD.payment_mode <=> NEW.payment_mode AND OLD.status <=> NEW.status "
+        "AND OLD.paid_amount <=> NEW.paid_amount)"
+    )
+    return {
+        'insert': (
+            f"CREATE TRIGGER {TRIGGERS['insert']} AFTER INSERT ON transaction_detail FOR EACH ROW "
+            f"BEGIN IF NEW.trans_date IS NOT NULL THEN {_increment_sql('NEW', offset)} END IF; END"
+        ),
+        # Status transitions (e.g. PENDING -> SUCCESS) move the row between counters
+        'update': (
+            f"CREATE TRIGGER {TRIGGERS['update']} AFTER UPDATE ON transaction_detail FOR EACH ROW "
+            f"BEGIN IF {changed} THEN "
+            f"IF OLD.trans_date IS NOT NULL THEN {_decrement_sql('OLD', offset)} END IF; "
+            f"IF NEW.trans_date IS NOT NULL THEN {_increment_sql('NEW', offset)} END IF; "
+            f"END IF; END"
+        ),
+        'delete': (
+            f"CREATE TRIGGER {TRIGGERS['delete']} AFTER DELETE ON transaction_detail FOR EACH ROW "
+            f"BEGIN IF OLD.trans_date IS NOT NULL THEN {_decrement_sql('OLD', offset)} END IF; END"
+        ),
+    }
+
+
+def installed_triggers():
+    """
+    Names of the counter triggers present on transaction_detail
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT trigger_name FROM information_schema.triggers "
+            "WHERE trigger_schema = DATABASE() AND event_object_table = 'transaction_detail' "
+            "AND trigger_name IN (%s, %s, %s)",
+            list(TRIGGERS.values())
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def prune_counters(keep_days=COUNTER_KEEP_DAYS):
+    """
+    Delete counters older than `keep_days`. Returns (rows deleted, cutoff date)
+    """
+    from apps.transactions.models_aggregations import LiveTransactionCounter
+
+    cutoff = timezone.localdate() - timedelta(days=keep_days)
+    deleted, _ = LiveTransactionCounter.objects.filter(date__lt=cutoff).delete()
+    return deleted, cutoff
+
+
+def _day_window(day):
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, time.min), tz)
+    return start, start + timedelta(days=1)
+
+
+def raw_counter_rows(day):
+    """
+    {(hour, client_code, payment_mode, status): (count, amount)} computed
+    from transaction_detail for one IST day
+    """
+    from apps.transactions.models import TransactionDetail
+
+    day_start, day_end = _day_window(day)
+    rows = TransactionDetail.objects.filter(
+        trans_date__gte=day_start, trans_date__lt=day_end
+    ).values(
+        'client_code', 'payment_mode', 'status', hour=LocalHour('trans_date')
+    ).annotate(txn_count=Count('txn_id'), amount=Sum('paid_amount')).order_by()
+
+    return {
+        (row['hour'], row['client_code'] or '', row['payment_mode'] or '', row['status'] or ''):
+            (row['txn_count'], round(float(row['amount'] or 0), 2))
+        for row in rows
+    }
+
+
+def check_day(day, tolerance=0.005):
+    """
+    Compare the day's counters with transaction_detail
+    Amounts may differ by `tolerance` per transaction (counters round each
+    delta to paise). Returns a list of (key, counter (count, amount), raw (count, amount))
+    """
+    from apps.transactions.models_aggregations import LiveTransactionCounter
+
+    counters = {
+        (c.hour, c.client_code, c.payment_mode, c.status): (c.txn_count, round(float(c.amount), 2))
+        for c in LiveTransactionCounter.objects.filter(date=day)
+    }
+    raw = raw_counter_rows(day)
+
+    mismatches = []
+    for key in sorted(counters.keys() | raw.keys(), key=str):
+        counter = counters.get(key, (0, 0.0))
+        actual = raw.get(key, (0, 0.0))
+        if counter[0] != actual[0] or abs(counter[1] - actual[1]) > tolerance * max(actual[0], 1):
+            mismatches.append((key, counter, actual))
+    return mismatches
+
+
+def rebuild_day(day):
+    """
+    Reset the day's counters from transaction_detail. Returns rows written
+    Rows written by the triggers while this runs may be lost - re-run
+    check_day afterwards
+    """
+    from apps.transactions.models_aggregations import LiveTransactionCounter
+
+    counters = [
+        LiveTransactionCounter(
+            date=day, hour=hour, client_code=client_code, payment_mode=payment_mode,
+            status=status, txn_count=count, amount=amount
+        )
+        for (hour, client_code, payment_mode, status), (count, amount) in raw_counter_rows(day).items()
+    ]
+    with transaction.atomic():
+        LiveTransactionCounter.objects.filter(date=day).delete()
+        LiveTransactionCounter.objects.bulk_create(counters, batch_size=1000)
+    return len(counters)
+
+
+class TriggerCounterSource:
+    """
+    Router source reading live_transaction_counter
+    """
+    name = 'triggers'
+
+    # (checked at, all triggers installed)
+    _trigger_check = (0.0, False)
+
+    @classmethod
+    def available(cls):
+        """
+        All three counter triggers are installed (re-checked every
+        TRIGGER_CHECK_TTL seconds) - without them the counters go stale
+        """
+        checked_at, installed = cls._trigger_check
+        now = time_module.monotonic()
+        if checked_at and now - checked_at < TRIGGER_CHECK_TTL:
+            return installed
+        try:
+            installed = installed_triggers() == set(TRIGGERS.values())
+            if not installed:
+                logger.warning("Live counter triggers missing - reading today from transaction_detail")
+        except Exception as e:
+            logger.warning(f"Live counter triggers unavailable: {e}")
+            installed = False
+        cls._trigger_check = (now, installed)
+        return installed
+
+    @staticmethod
+    def supports(query, measures, group_by):
+        return group_by in LIVE_GROUPS and all(measure in LIVE_MEASURES for measure in measures)
+
+    @staticmethod
+    def rows(day, query, measures, group_by):
+        """
+        [(group key, {measure: value})] for one IST day under the query's
+        merchant / payment mode / status filters
+        """
+        from apps.transactions.models_aggregations import LiveTransactionCounter
+
+        qs = LiveTransactionCounter.objects.filter(date=day).filter(query.summary_filter())
+        if query.statuses:
+            qs = qs.filter(status__in=query.statuses)
+
+        annotations = {}
+        for measure in measures:
+            status = LIVE_MEASURES[measure]
+            column = 'txn_count' if measure.endswith('_count') else 'amount'
+            annotations[measure] = Sum(column, filter=Q(status=status) if status else None)
+
+        if group_by is None:
+            return [(None, qs.aggregate(**annotations))]
+        if group_by == 'date':
+            return [(day, qs.aggregate(**annotations))]
+        return [
+            (row.pop(group_by), row)
+            for row in qs.values(group_by).annotate(**annotations).order_by()
+        ]
+
+
+# ----------------------------------------------------------------------
+# Redis counters (fed by apps.transactions.live_poller)
+# ----------------------------------------------------------------------
+
+REDIS_PREFIX = 'sabpaisa:live'
+
+# Counter hashes expire a few days after their last write
+REDIS_COUNTER_TTL = 3 * 86400
+
+# Hash per dimension value; sets list the values seen that day
+REDIS_DIMENSIONS = {'client_code': 'client', 'payment_mode': 'mode'}
+
+
+def redis_connection():
+    from django_redis import get_redis_connection
+    return get_redis_connection("default")
+
+
+def redis_counter_key(day, dimension, value):
+    """
+    Hash with '<status>:count' / '<status>:paise' fields for one dimension value
+    """
+    return f"{REDIS_PREFIX}:{day.isoformat()}:{REDIS_DIMENSIONS[dimension]}:{value}"
+
+
+def redis_members_key(day, dimension):
+    return f"{REDIS_PREFIX}:{day.isoformat()}:{REDIS_DIMENSIONS[dimension]}s"
+
+
+def redis_ready_key(day):
+    """
+    Set once the poller's counters for `day` are complete
+    """
+    return f"{REDIS_PREFIX}:{day.isoformat()}:ready"
+
+
+REDIS_STATE_KEY = f"{REDIS_PREFIX}:poller"
+
+
+def to_paise(amount):
+    return int(round(float(amount or 0) * 100))
+
+
+class RedisCounterSource:
+    """
+    Router source reading the poller's Redis hashes
+
+    Counters exist per (day, client_code) and per (day, payment_mode), so a
+    request may filter / group by one of the two but not both.
+    """
+    name = 'redis'
+
+    @staticmethod
+    def available():
+        """
+        The poller is alive and today's counters are complete
+        """
+        try:
+            conn = redis_connection()
+            heartbeat, ready = conn.pipeline().hget(REDIS_STATE_KEY, 'heartbeat').get(
+                redis_ready_key(timezone.localdate())
+            ).execute()
+        except Exception as e:
+            logger.warning(f"Live counters unavailable: {e}")
+            return False
+        if not heartbeat or not ready:
+            return False
+        return time_module.time() - float(heartbeat) <= settings.LIVE_COUNTER_MAX_LAG
+
+    @staticmethod
+    def _dimension(query, group_by):
+        by_client = group_by == 'client_code' or query.client_codes is not None
+        by_mode = group_by == 'payment_mode' or query.payment_modes is not None or bool(query.payment_mode_contains)
+        if by_client and by_mode:
+            return None
+        return 'client_code' if by_client else 'payment_mode'
+
+    @classmethod
+    def supports(cls, query, measures, group_by):
+        return (
+            group_by in LIVE_GROUPS
+            and all(measure in LIVE_MEASURES for measure in measures)
+            and cls._dimension(query, group_by) is not None
+        )
+
+    @classmethod
+    def rows(cls, day, query, measures, group_by):
+        """
+        [(group key, {measure: value})] for one IST day
+        """
+        dimension = cls._dimension(query, group_by)
+        conn = redis_connection()
+        members = sorted(m.decode() for m in conn.smembers(redis_members_key(day, dimension)))
+
+        if dimension == 'client_code' and query.client_codes is not None:
+            wanted = {'' if code is None else code for code in query.client_codes}
+            members = [m for m in members if m in wanted]
+        if query.payment_modes is not None:
+            wanted = {mode.lower() for mode in query.payment_modes}
+            members = [m for m in members if m.lower() in wanted]
+        if query.payment_mode_contains:
+            members = [m for m in members if query.payment_mode_contains.lower() in m.lower()]
+
+        pipe = conn.pipeline(transaction=False)
+        for member in members:
+            pipe.hgetall(redis_counter_key(day, dimension, member))
+        counters = pipe.execute() if members else []
+
+        rows = [
+            (member, cls._measures(fields, query.statuses, measures))
+            for member, fields in zip(members, counters)
+        ]
+        if group_by == dimension:
+            return rows
+        totals = {measure: sum(values[measure] for _, values in rows) for measure in measures}
+        return [(day if group_by == 'date' else None, totals)]
+
+    @staticmethod
+    def _measures(fields, statuses, measures):
+        """
+        Router measures from one hash's '<status>:count' / '<status>:paise' fields
+        """
+        counts, paise = {}, {}
+        for field, value in fields.items():
+            status, _, kind = field.decode().rpartition(':')
+            if statuses and status not in statuses:
+                continue
+            (counts if kind == 'count' else paise)[status] = int(value)
+
+        values = {}
+        for measure in measures:
+            status = LIVE_MEASURES[measure]
+            if measure.endswith('_count'):
+                values[measure] = counts.get(status, 0) if status else sum(counts.values())
+            else:
+                values[measure] = (paise.get(status, 0) if status else sum(paise.values())) / 100
+        return values
+
+
+def live_cache_timeout(timeout):
+    """
+    Cache TTL for a response that includes today - shortened to
+    LIVE_COUNTER_CACHE_TTL while live counters keep today current
+    """
+    source = live_counter_source()
+    if source is None or not source.available():
+        return timeout
+    return min(timeout, settings.LIVE_COUNTER_CACHE_TTL)
+
+
+LIVE_COUNTER_SOURCES = {
+    TriggerCounterSource.name: TriggerCounterSource,
+    RedisCounterSource.name: RedisCounterSource,
+}
+
+
+def live_counter_source():
+    """
+    The configured live counter source, or None when today is scanned
+    """
+    name = getattr(settings, 'LIVE_COUNTERS', '')
+    if not name:
+        return None
+    source = LIVE_COUNTER_SOURCES.get(name)
+    if source is None:
+        logger.warning(f"Unknown LIVE_COUNTERS source '{name}' - reading today from transaction_detail")
+    return source
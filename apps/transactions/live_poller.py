@@ -0,0 +1,278 @@
+"""
+Change-data-capture poller feeding the Redis live counters
+Tails transaction_detail by a (trans_date, txn_id) watermark and re-scans a
+short trailing window for status changes, applying count / paise deltas to
+the hashes read by live_counters.RedisCounterSource. Needs no DDL on the
+legacy table - the alternative to the live_counter_triggers triggers.
+
+State of the rows inside the re-scan window is kept in memory, so a restart
+(or a periodic reconcile) re-seeds today's counters from one grouped query
+and carries on from there. Changes to rows older than the window are picked
+up by the next reconcile.
+"""
+from datetime import datetime, time, timedelta
+import logging
+import os
+import socket
+import time as time_module
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from apps.transactions.live_counters import (
+    REDIS_COUNTER_TTL, REDIS_PREFIX, REDIS_STATE_KEY, redis_connection, redis_counter_key,
+    redis_members_key, redis_ready_key, to_paise
+)
+
+logger = logging.getLogger('apps.transactions')
+
+LOCK_KEY = f"{REDIS_PREFIX}:poller:lock"
+
+ROW_FIELDS = ('txn_id', 'trans_date', 'client_code', 'payment_mode', 'status', 'paid_amount')
+
+
+def _counter_key(trans_date, client_code, payment_mode, status, paid_amount):
+    """
+    (IST day, client_code, payment_mode, status, paise) a row is counted under
+    """
+    return (
+        timezone.localtime(trans_date).date(),
+        client_code or '',
+        payment_mode or '',
+        status or '',
+        to_paise(paid_amount),
+    )
+
+
+class LiveCounterPoller:
+    """
+    Single-process tailer of transaction_detail into Redis
+
+    Usage:
+        LiveCounterPoller(interval=2).run()
+    """
+
+    def __init__(self, interval=2.0, rescan_window=timedelta(minutes=10), rescan_every=30,
+                 reconcile_every=900, batch_size=5000):
+        self.interval = interval
+        self.rescan_window = rescan_window
+        self.rescan_every = rescan_every
+        self.reconcile_every = reconcile_every
+        self.batch_size = batch_size
+
+        self.conn = redis_connection()
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.watermark = None
+        self.seen = {}
+        self.ready_day = None
+        self.last_rescan = 0
+        self.last_reconcile = 0
+        self.stopped = False
+
+    # ------------------------------------------------------------------
+    # Loop
+    # ------------------------------------------------------------------
+
+    def run(self):
+        """
+        Poll until stop() is called; waits while another process holds the lock
+        """
+        while not self.stopped:
+            if not self.hold_lock():
+                self.watermark = None
+                time_module.sleep(self.interval)
+                continue
+
+            try:
+                self.tick()
+            except Exception as e:
+                # Counters are rebuilt from scratch after any failure
+                logger.error(f"Live counter poller tick failed: {e}")
+                self.watermark = None
+            time_module.sleep(self.interval)
+
+        self.release_lock()
+
+    def stop(self, *args):
+        self.stopped = True
+
+    def tick(self):
+        """
+        One poll: seed / reconcile when due, tail new rows, re-scan the window
+        """
+        now = time_module.monotonic()
+        if self.watermark is None or now - self.last_reconcile >= self.reconcile_every:
+            self.seed()
+            self.last_reconcile = self.last_rescan = now
+
+        applied = self.tail()
+        if now - self.last_rescan >= self.rescan_every:
+            applied += self.rescan()
+            self.last_rescan = now
+
+        today = timezone.localdate()
+        if self.ready_day != today:
+            # Running continuously since the seed, so the new day is complete
+            self.conn.set(redis_ready_key(today), 1, ex=REDIS_COUNTER_TTL)
+            self.ready_day = today
+
+        self.conn.hset(REDIS_STATE_KEY, mapping={
+            'heartbeat': time_module.time(),
+            'watermark': self.watermark[0].isoformat(),
+            'owner': self.owner,
+        })
+        if applied:
+            logger.debug(f"Live counter poller applied {applied} changes")
+        return applied
+
+    def hold_lock(self):
+        """
+        Take or renew the single-poller lock (long enough to cover a seed)
+        """
+        ttl = max(int(self.interval * 5), 60)
+        if self.conn.set(LOCK_KEY, self.owner, nx=True, ex=ttl):
+            return True
+        holder = self.conn.get(LOCK_KEY)
+        if holder is not None and holder.decode() == self.owner:
+            self.conn.expire(LOCK_KEY, ttl)
+            return True
+        return False
+
+    def release_lock(self):
+        self.conn.eval(
+            "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0",
+            1, LOCK_KEY, self.owner
+        )
+
+    # ------------------------------------------------------------------
+    # Seeding
+    # ------------------------------------------------------------------
+
+    def seed(self):
+        """
+        Reset today's counters from transaction_detail and reload the
+        re-scan window state, then tail from now
+        """
+        from apps.transactions.models import TransactionDetail
+
+        today = timezone.localdate()
+        day_start = timezone.make_aware(datetime.combine(today, time.min), timezone.get_current_timezone())
+        cutoff = timezone.now()
+
+        # One snapshot for the counters and the window state (REPEATABLE READ)
+        with transaction.atomic():
+            today_rows = TransactionDetail.objects.filter(trans_date__gte=day_start, trans_date__lt=cutoff)
+            counters = list(
+                today_rows.values('client_code', 'payment_mode', 'status').annotate(
+                    txn_count=Count('txn_id'), amount=Sum('paid_amount')
+                ).order_by()
+            )
+            window = list(
+                TransactionDetail.objects.filter(
+                    trans_date__gte=cutoff - self.rescan_window, trans_date__lt=cutoff
+                ).values_list(*ROW_FIELDS)
+            )
+
+        pipe = self.conn.pipeline(transaction=True)
+        for dimension in ('client_code', 'payment_mode'):
+            members_key = redis_members_key(today, dimension)
+            for member in self.conn.smembers(members_key):
+                pipe.delete(redis_counter_key(today, dimension, member.decode()))
+            pipe.delete(members_key)
+
+        for row in counters:
+            status = row['status'] or ''
+            for dimension in ('client_code', 'payment_mode'):
+                member = row[dimension] or ''
+                key = redis_counter_key(today, dimension, member)
+                pipe.hincrby(key, f"{status}:count", row['txn_count'])
+                pipe.hincrby(key, f"{status}:paise", to_paise(row['amount']))
+                pipe.expire(key, REDIS_COUNTER_TTL)
+                pipe.sadd(redis_members_key(today, dimension), member)
+                pipe.expire(redis_members_key(today, dimension), REDIS_COUNTER_TTL)
+        pipe.set(redis_ready_key(today), 1, ex=REDIS_COUNTER_TTL)
+        pipe.execute()
+
+        self.seen = {txn_id: (trans_date, _counter_key(trans_date, *rest)) for txn_id, trans_date, *rest in window}
+        self.watermark = (cutoff, '')
+        self.ready_day = today
+        logger.info(f"Live counters seeded for {today}: {len(counters)} groups, {len(self.seen)} rows in window")
+
+    # ------------------------------------------------------------------
+    # Change capture
+    # ------------------------------------------------------------------
+
+    def tail(self):
+        """
+        Apply rows past the watermark, in (trans_date, txn_id) order
+        """
+        from apps.transactions.models import TransactionDetail
+
+        applied = 0
+        while True:
+            wm_date, wm_txn = self.watermark
+            batch = list(
+                TransactionDetail.objects.filter(
+                    Q(trans_date__gt=wm_date) | Q(trans_date=wm_date, txn_id__gt=wm_txn)
+                ).order_by('trans_date', 'txn_id').values_list(*ROW_FIELDS)[:self.batch_size]
+            )
+            if not batch:
+                return applied
+
+            applied += self._apply(batch)
+            self.watermark = (batch[-1][1], batch[-1][0])
+            if len(batch) < self.batch_size:
+                return applied
+
+    def rescan(self):
+        """
+        Re-read the trailing window: status / amount changes and rows that
+        committed behind the watermark
+        """
+        from apps.transactions.models import TransactionDetail
+
+        wm_date, wm_txn = self.watermark
+        lower = wm_date - self.rescan_window
+        rows = list(
+            TransactionDetail.objects.filter(trans_date__gte=lower).filter(
+                Q(trans_date__lt=wm_date) | Q(trans_date=wm_date, txn_id__lte=wm_txn)
+            ).values_list(*ROW_FIELDS)
+        )
+        applied = self._apply(rows)
+
+        self.seen = {txn_id: state for txn_id, state in self.seen.items() if state[0] >= lower}
+        return applied
+
+    def _apply(self, rows):
+        """
+        Move each changed row from its previous counter key to its current one
+        """
+        pipe = self.conn.pipeline(transaction=False)
+        applied = 0
+        for txn_id, trans_date, *rest in rows:
+            if trans_date is None:
+                continue
+            key = _counter_key(trans_date, *rest)
+            previous = self.seen.get(txn_id)
+            if previous is not None and previous[1] == key:
+                continue
+            if previous is not None:
+                self._increment(pipe, previous[1], -1)
+            self._increment(pipe, key, 1)
+            self.seen[txn_id] = (trans_date, key)
+            applied += 1
+        if applied:
+            pipe.execute()
+        return applied
+
+    @staticmethod
+    def _increment(pipe, key, sign):
+        day, client_code, payment_mode, status, paise = key
+        for dimension, member in (('client_code', client_code), ('payment_mode', payment_mode)):
+            counter_key = redis_counter_key(day, dimension, member)
+            pipe.hincrby(counter_key, f"{status}:count", sign)
+            pipe.hincrby(counter_key, f"{status}:paise", sign * paise)
+            pipe.expire(counter_key, REDIS_COUNTER_TTL)
+            pipe.sadd(redis_members_key(day, dimension), member)
+            pipe.expire(redis_members_key(day, dimension), REDIS_COUNTER_TTL)
@@ -0,0 +1,90 @@
+"""
+Local (IST) date / hour bucketing for transaction_detail
+TruncDate / ExtractHour on MySQL wrap the column in CONVERT_TZ, which needs
+the timezone tables and blocks index use. LocalDate / LocalHour read the
+generated trans_date_ist_date / trans_date_ist_hour columns when they are
+installed (manage.py install_ist_columns, TRANSACTION_IST_COLUMNS = True),
+and otherwise add the fixed TIME_ZONE offset - IST has no DST.
+Other backends fall back to TruncDate / ExtractHour.
+"""
+from datetime import datetime
+import zoneinfo
+
+from django.conf import settings
+from django.db.models import DateField, Func, IntegerField
+from django.db.models.expressions import Col
+from django.db.models.functions import ExtractHour, TruncDate
+
+# Generated columns on transaction_detail (see install_ist_columns)
+IST_DATE_COLUMN = 'trans_date_ist_date'
+IST_HOUR_COLUMN = 'trans_date_ist_hour'
+IST_SOURCE_COLUMN = 'trans_date'
+
+
+def local_offset_minutes():
+    """
+    Fixed UTC offset of TIME_ZONE in minutes (None if the zone has DST)
+    """
+    tz = zoneinfo.ZoneInfo(settings.TIME_ZONE)
+    offsets = {datetime(2024, month, 1, tzinfo=tz).utcoffset() for month in (1, 7)}
+    if len(offsets) != 1:
+        return None
+    return int(offsets.pop().total_seconds() // 60)
+
+
+def ist_columns_enabled():
+    return getattr(settings, 'TRANSACTION_IST_COLUMNS', False)
+
+
+class _LocalPart(Func):
+    """
+    Local date / hour of a DateTimeField
+    """
+    arity = 1
+    generated_column = None
+    mysql_function = None
+
+    def fallback(self, expression):
+        raise NotImplementedError
+
+    def as_sql(self, compiler, connection, **extra_context):
+        return compiler.compile(self.fallback(self.source_expressions[0]))
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        source = self.source_expressions[0]
+        if ist_columns_enabled() and isinstance(source, Col) \
+                and source.target.column == IST_SOURCE_COLUMN \
+                and source.target.model._meta.db_table == 'transaction_detail':
+            column = connection.ops.quote_name(self.generated_column)
+            return f"{compiler.quote_name_unless_alias(source.alias)}.{column}", []
+
+        offset = local_offset_minutes()
+        if offset is None:
+            return self.as_sql(compiler, connection, **extra_context)
+
+        sql, params = compiler.compile(source)
+        return f"{self.mysql_function}({sql} + INTERVAL {offset} MINUTE)", params
+
+
+class LocalDate(_LocalPart):
+    """
+    IST calendar date, e.g. .values(date=LocalDate('trans_date'))
+    """
+    output_field = DateField()
+    generated_column = IST_DATE_COLUMN
+    mysql_function = 'DATE'
+
+    def fallback(self, expression):
+        return TruncDate(expression)
+
+
+class LocalHour(_LocalPart):
+    """
+    IST hour of day (0-23)
+    """
+    output_field = IntegerField()
+    generated_column = IST_HOUR_COLUMN
+    mysql_function = 'HOUR'
+
+    def fallback(self, expression):
+        return ExtractHour(expression)
@@ -0,0 +1,80 @@
+"""
+Management command to benchmark unique-payer sketches against exact counts
+Compares merged HyperLogLog estimates with COUNT(DISTINCT) over the same
+closed days and reports error and timings
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from apps.core.sketches import HyperLogLog
+from apps.transactions.models import TransactionDetail
+from apps.transactions.aggregation_router import AggregateQuery
+from apps.transactions.sketch_summaries import (
+    UniquePayerEstimator, payer_email_key, payer_mobile_key
+)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark unique-payer HyperLogLog sketches against exact distinct counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, nargs='+', default=[7, 30, 90],
+                            help='Range lengths (closed days ending yesterday) to test')
+        parser.add_argument('--client-code', help='Restrict to one merchant')
+
+    def handle(self, *args, **options):
+        client_code = options.get('client_code')
+        today_start = timezone.make_aware(
+            timezone.datetime.combine(timezone.localdate(), timezone.datetime.min.time())
+        )
+        end = today_start - timedelta(microseconds=1)
+
+        self.stdout.write(
+            f"Expected relative standard error: {HyperLogLog().standard_error:.2%} "
+            f"(95% of estimates within {2 * HyperLogLog().standard_error:.2%})"
+        )
+
+        for days in options['days']:
+            start = today_start - timedelta(days=days)
+            queryset = TransactionDetail.objects.filter(trans_date__gte=start, trans_date__lte=end)
+            if client_code:
+                queryset = queryset.filter(client_code=client_code)
+
+            # Exact: COUNT(DISTINCT) as the monthly task does it
+            started = time.time()
+            sql_distinct = queryset.aggregate(emails=Count('payee_email', distinct=True))['emails']
+            sql_ms = (time.time() - started) * 1000
+
+            # Exact with the sketch normalisation (ground truth for the error)
+            emails, mobiles = set(), set()
+            for email, mobile in queryset.values_list('payee_email', 'payee_mob').order_by().iterator(chunk_size=5000):
+                email, mobile = payer_email_key(email), payer_mobile_key(mobile)
+                if email:
+                    emails.add(email)
+                if mobile:
+                    mobiles.add(mobile)
+
+            query = AggregateQuery(start, end, client_codes=[client_code] if client_code else None)
+            estimator = UniquePayerEstimator(query, queryset)
+            started = time.time()
+            estimate = estimator.estimate()
+            sketch_ms = (time.time() - started) * 1000
+
+            self.stdout.write(
+                f"{days:>4}d | sketch days {estimator.last_plan['sketch_days']:>4} | "
+                f"emails exact {len(emails)} est {estimate['unique_emails']} "
+                f"({self._error(estimate['unique_emails'], len(emails))}) | "
+                f"mobiles exact {len(mobiles)} est {estimate['unique_mobiles']} "
+                f"({self._error(estimate['unique_mobiles'], len(mobiles))}) | "
+                f"COUNT(DISTINCT) {sql_distinct} in {sql_ms:.1f}ms vs sketches {sketch_ms:.1f}ms"
+            )
+
+    @staticmethod
+    def _error(estimate, exact):
+        if not exact:
+            return 'n/a'
+        return f"{(estimate - exact) / exact:+.2%}"
@@ -0,0 +1,48 @@
+"""
+Management command to materialise analytics cube cuboids
+Backfills a range of local days (default: yesterday)
+"""
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.transactions.cube import Cube, CubeError
+
+
+class Command(BaseCommand):
+    help = 'Build analytics cube cuboids for a range of days'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Single day to build (YYYY-MM-DD)')
+        parser.add_argument('--days', type=int, default=1,
+                            help='Number of days ending yesterday to build (default: 1)')
+        parser.add_argument('--cuboid', action='append', dest='cuboids',
+                            help='Cuboid to build (repeatable, default: all)')
+
+    def handle(self, *args, **options):
+        try:
+            cube = Cube()
+        except CubeError as e:
+            raise CommandError(str(e))
+
+        cuboids = options['cuboids']
+        if cuboids:
+            unknown = set(cuboids) - set(cube.cuboids)
+            if unknown:
+                raise CommandError(f"Unknown cuboids: {', '.join(sorted(unknown))}")
+
+        if options['date']:
+            try:
+                days = [datetime.strptime(options['date'], '%Y-%m-%d').date()]
+            except ValueError:
+                raise CommandError('Invalid --date. Use YYYY-MM-DD')
+        else:
+            yesterday = timezone.localdate() - timedelta(days=1)
+            days = [yesterday - timedelta(days=offset) for offset in range(options['days'])][::-1]
+
+        for day in days:
+            cells = cube.build_day(day, cuboids=cuboids)
+            self.stdout.write(f"{day}: {', '.join(f'{name}={count}' for name, count in cells.items())}")
+
+        self.stdout.write(self.style.SUCCESS(f'Built {len(days)} day(s)'))
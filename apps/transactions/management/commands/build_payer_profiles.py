@@ -0,0 +1,45 @@
+"""
+Management command maintaining payer_profile (apps.transactions.payer_profiles)
+Without options re-folds the recent days and applies the closed days not
+yet folded in (what the scheduler runs nightly); --rebuild reloads
+everything from --from
+"""
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.transactions.payer_profiles import PayerProfileBuilder
+
+
+class Command(BaseCommand):
+    help = 'Build or catch up the per-merchant payer profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Reload all profiles from --from into staging tables and swap them in')
+        parser.add_argument('--from', dest='start', help='First day to load (YYYY-MM-DD) for --rebuild')
+        parser.add_argument('--days', type=int, default=365,
+                            help='Days to load for --rebuild when --from is not given')
+        parser.add_argument('--max-days', type=int, default=31, help='Days applied per catch-up run')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            if options['start']:
+                try:
+                    start = datetime.strptime(options['start'], '%Y-%m-%d').date()
+                except ValueError:
+                    raise CommandError('--from must be YYYY-MM-DD')
+            else:
+                start = timezone.localdate() - timedelta(days=options['days'])
+            days = PayerProfileBuilder.rebuild(start)
+            self.stdout.write(self.style.SUCCESS(f'Payer profiles rebuilt from {start} ({days} days)'))
+            return
+
+        if PayerProfileBuilder.last_applied() is None:
+            raise CommandError('Payer profiles have never been built - run with --rebuild first')
+
+        applied = PayerProfileBuilder.catch_up(max_days=options['max_days'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Applied {len(applied)} day(s), profiles current to {PayerProfileBuilder.last_applied()}"
+        ))
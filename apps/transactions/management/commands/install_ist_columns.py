@@ -0,0 +1,139 @@
+"""
+Management command to install the IST date / hour generated columns on
+transaction_detail (read by apps.transactions.local_time when
+TRANSACTION_IST_COLUMNS = True)
+Columns are VIRTUAL, so adding them does not rebuild the table; only the
+two indexes are materialised
+"""
+from datetime import timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from apps.transactions.local_time import (
+    IST_DATE_COLUMN, IST_HOUR_COLUMN, IST_SOURCE_COLUMN, local_offset_minutes
+)
+
+TABLE = 'transaction_detail'
+
+INDEXES = {
+    'idx_txn_ist_date_client_status': (IST_DATE_COLUMN, 'client_code', 'status'),
+    'idx_txn_ist_date_hour': (IST_DATE_COLUMN, IST_HOUR_COLUMN, 'client_code'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Install, verify or remove the IST date/hour generated columns on transaction_detail'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='Only check the columns, indexes and a sample of values')
+        parser.add_argument('--uninstall', action='store_true', help='Drop the columns and indexes')
+        parser.add_argument('--sample', type=int, default=1000,
+                            help='Latest rows compared against Python local time when verifying')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'mysql':
+            raise CommandError(f"Generated IST columns need MySQL (connected to {connection.vendor})")
+
+        offset = local_offset_minutes()
+        if offset is None:
+            raise CommandError("TIME_ZONE observes DST - a fixed-offset generated column would be wrong")
+
+        if options['uninstall']:
+            self._uninstall()
+        elif not options['verify']:
+            self._install(offset)
+
+        if not options['uninstall']:
+            self._verify(options['sample'])
+
+    def _existing(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT column_name FROM information_schema.columns "
+                "WHERE table_schema = DATABASE() AND table_name = %s",
+                [TABLE]
+            )
+            columns = {row[0] for row in cursor.fetchall()}
+            cursor.execute(
+                "SELECT DISTINCT index_name FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND table_name = %s",
+                [TABLE]
+            )
+            indexes = {row[0] for row in cursor.fetchall()}
+        return columns, indexes
+
+    def _install(self, offset):
+        columns, indexes = self._existing()
+        statements = []
+        if IST_DATE_COLUMN not in columns:
+            statements.append(
+                f"ALTER TABLE {TABLE} ADD COLUMN {IST_DATE_COLUMN} DATE "
+                f"AS (DATE({IST_SOURCE_COLUMN} + INTERVAL {offset} MINUTE)) VIRTUAL"
+            )
+        if IST_HOUR_COLUMN not in columns:
+            statements.append(
+                f"ALTER TABLE {TABLE} ADD COLUMN {IST_HOUR_COLUMN} TINYINT "
+                f"AS (HOUR({IST_SOURCE_COLUMN} + INTERVAL {offset} MINUTE)) VIRTUAL"
+            )
+        for name, index_columns in INDEXES.items():
+            if name not in indexes:
+                statements.append(f"CREATE INDEX {name} ON {TABLE} ({', '.join(index_columns)})")
+
+        if not statements:
+            self.stdout.write('IST columns and indexes already installed')
+            return
+
+        with connection.cursor() as cursor:
+            for sql in statements:
+                self.stdout.write(f'Executing: {sql}')
+                cursor.execute(sql)
+        self.stdout.write(self.style.SUCCESS(f'Installed {len(statements)} column(s)/index(es)'))
+
+    def _uninstall(self):
+        columns, indexes = self._existing()
+        with connection.cursor() as cursor:
+            for name in INDEXES:
+                if name in indexes:
+                    cursor.execute(f"DROP INDEX {name} ON {TABLE}")
+                    self.stdout.write(f'Dropped index {name}')
+            for column in (IST_HOUR_COLUMN, IST_DATE_COLUMN):
+                if column in columns:
+                    cursor.execute(f"ALTER TABLE {TABLE} DROP COLUMN {column}")
+                    self.stdout.write(f'Dropped column {column}')
+        self.stdout.write(self.style.WARNING('Set TRANSACTION_IST_COLUMNS = False before serving traffic'))
+
+    def _verify(self, sample):
+        columns, indexes = self._existing()
+        missing = [c for c in (IST_DATE_COLUMN, IST_HOUR_COLUMN) if c not in columns]
+        missing += [i for i in INDEXES if i not in indexes]
+        if missing:
+            raise CommandError(f"Missing: {', '.join(missing)}")
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT txn_id, {IST_SOURCE_COLUMN}, {IST_DATE_COLUMN}, {IST_HOUR_COLUMN} FROM {TABLE} "
+                f"WHERE {IST_SOURCE_COLUMN} IS NOT NULL ORDER BY {IST_SOURCE_COLUMN} DESC LIMIT %s",
+                [sample]
+            )
+            rows = cursor.fetchall()
+
+        mismatches = 0
+        for txn_id, trans_date, ist_date, ist_hour in rows:
+            # Stored naive in UTC (USE_TZ with no database TIME_ZONE)
+            local = timezone.localtime(trans_date.replace(tzinfo=dt_timezone.utc))
+            if (local.date(), local.hour) != (ist_date, ist_hour):
+                mismatches += 1
+                if mismatches <= 5:
+                    self.stdout.write(self.style.ERROR(
+                        f'{txn_id}: {trans_date} -> column {ist_date} {ist_hour}h, '
+                        f'expected {local.date()} {local.hour}h'
+                    ))
+
+        if mismatches:
+            raise CommandError(f"{mismatches} of {len(rows)} sampled rows disagree with local time")
+        self.stdout.write(self.style.SUCCESS(
+            f'IST columns verified on {len(rows)} rows - set TRANSACTION_IST_COLUMNS = True to use them'
+        ))
@@ -0,0 +1,112 @@
+"""
+Management command to manage the live_transaction_counter triggers
+    install    create the counter table and triggers, seed today's counters
+    uninstall  drop the triggers (the table is kept)
+    verify     check the triggers exist and today's counters match raw data
+    check      compare counters with transaction_detail for --date
+    rebuild    reset counters for --date from transaction_detail
+    prune      delete counters older than --keep-days
+"""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from apps.transactions.live_counters import (
+    COUNTER_KEEP_DAYS, COUNTER_TABLE, TRIGGERS, check_day, installed_triggers, prune_counters, rebuild_day,
+    trigger_statements
+)
+
+CREATE_TABLE = f"""
+CREATE TABLE IF NOT EXISTS {COUNTER_TABLE} (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    date DATE NOT NULL,
+    hour SMALLINT NOT NULL,
+    client_code VARCHAR(255) NOT NULL DEFAULT '',
+    payment_mode VARCHAR(255) NOT NULL DEFAULT '',
+    status VARCHAR(50) NOT NULL DEFAULT '',
+    txn_count INT NOT NULL DEFAULT 0,
+    amount DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    last_updated DATETIME(6) NOT NULL,
+    UNIQUE KEY live_counter_key (date, hour, client_code, payment_mode, status),
+    INDEX live_counter_date_client (date, client_code)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+
+class Command(BaseCommand):
+    help = 'Install, verify, check or remove the live transaction counter triggers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['install', 'uninstall', 'verify', 'check', 'rebuild', 'prune'])
+        parser.add_argument('--date', help='Date (YYYY-MM-DD) for check / rebuild (default: today)')
+        parser.add_argument('--keep-days', type=int, default=COUNTER_KEEP_DAYS, help='Days of counters kept by prune')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'mysql' and options['action'] in ('install', 'uninstall', 'verify'):
+            raise CommandError(f"Counter triggers need MySQL (connected to {connection.vendor})")
+
+        if options['date']:
+            day = datetime.strptime(options['date'], '%Y-%m-%d').date()
+        else:
+            day = timezone.localdate()
+
+        getattr(self, f"_{options['action']}")(day, options)
+
+    def _install(self, day, options):
+        with connection.cursor() as cursor:
+            cursor.execute(CREATE_TABLE)
+            existing = installed_triggers()
+            for event, sql in trigger_statements().items():
+                if TRIGGERS[event] in existing:
+                    self.stdout.write(f'Trigger {TRIGGERS[event]} already installed')
+                    continue
+                cursor.execute(sql)
+                self.stdout.write(f'Created trigger {TRIGGERS[event]}')
+
+        # Seed today so the counters start complete; anything written while
+        # seeding is reported by the check below
+        rows = rebuild_day(day)
+        self.stdout.write(f'Seeded {rows} counter rows for {day}')
+        self._check(day, options)
+        self.stdout.write(self.style.SUCCESS("Installed - set LIVE_COUNTERS = 'triggers' to serve today from counters"))
+
+    def _uninstall(self, day, options):
+        with connection.cursor() as cursor:
+            for name in TRIGGERS.values():
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+                self.stdout.write(f'Dropped trigger {name}')
+        self.stdout.write(self.style.WARNING(
+            f"Triggers removed ({COUNTER_TABLE} kept) - unset LIVE_COUNTERS before serving traffic"
+        ))
+
+    def _verify(self, day, options):
+        missing = set(TRIGGERS.values()) - installed_triggers()
+        if missing:
+            raise CommandError(f"Missing triggers: {', '.join(sorted(missing))}")
+        self.stdout.write(self.style.SUCCESS('All counter triggers installed'))
+        self._check(day, options)
+
+    def _check(self, day, options):
+        mismatches = check_day(day)
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS(f'Counters for {day} match transaction_detail'))
+            return
+
+        for (hour, client_code, payment_mode, status), counter, actual in mismatches[:20]:
+            self.stdout.write(self.style.ERROR(
+                f'{day} {hour:02d}h {client_code or "-"} / {payment_mode or "-"} / {status or "-"}: '
+                f'counter {counter[0]} / {counter[1]:.2f}, raw {actual[0]} / {actual[1]:.2f}'
+            ))
+        raise CommandError(
+            f"{len(mismatches)} counter keys differ for {day} - run 'live_counter_triggers rebuild --date {day}'"
+        )
+
+    def _rebuild(self, day, options):
+        rows = rebuild_day(day)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} counter rows for {day}'))
+
+    def _prune(self, day, options):
+        deleted, cutoff = prune_counters(options['keep_days'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} counter rows before {cutoff}'))
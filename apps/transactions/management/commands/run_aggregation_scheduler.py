@@ -0,0 +1,61 @@
+"""
+Management command running the aggregation scheduler daemon
+Run one on each app node under the process supervisor; a Redis lock elects
+the node that schedules, the rest take over if it dies.
+"""
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.transactions.scheduler import JOBS, AggregationScheduler
+
+
+class Command(BaseCommand):
+    help = 'Run the summary aggregation jobs on their schedules (leader-elected)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll', type=int, default=30, help='Seconds between schedule checks')
+        parser.add_argument('--once', action='store_true', help='Run whatever is due once, then exit')
+        parser.add_argument('--list', action='store_true', help='Show the jobs and their next pending slots')
+        parser.add_argument('--run', metavar='JOB', help='Run one job for its latest slot now')
+
+    def handle(self, *args, **options):
+        scheduler = AggregationScheduler(poll_interval=options['poll'])
+
+        if options['list']:
+            for job in JOBS:
+                pending = scheduler.pending_slots(job)
+                self.stdout.write(
+                    f"{job.name:<18} {str(job.schedule):<32} "
+                    f"pending: {', '.join(str(slot) for slot in pending) or '-'}"
+                )
+                self.stdout.write(f"{'':<18} {job.description}")
+            return
+
+        if options['run'] or options['once']:
+            job = None
+            if options['run']:
+                job = next((job for job in JOBS if job.name == options['run']), None)
+                if job is None:
+                    raise CommandError(f"Unknown job {options['run']} (one of {', '.join(j.name for j in JOBS)})")
+            runs = scheduler.run_once(job)
+            if runs is None:
+                raise CommandError(
+                    'Another node holds the scheduler lock and runs the due jobs - stop its scheduler to run jobs by hand'
+                )
+            self._report(runs)
+            return
+
+        signal.signal(signal.SIGTERM, scheduler.stop)
+        signal.signal(signal.SIGINT, scheduler.stop)
+        self.stdout.write('Aggregation scheduler started')
+        scheduler.run()
+        self.stdout.write('Aggregation scheduler stopped')
+
+    def _report(self, runs):
+        runs = [run for run in runs if run is not None]
+        if not runs:
+            self.stdout.write('Nothing to run')
+        for run in runs:
+            style = self.style.SUCCESS if run.status == run.STATUS_SUCCESS else self.style.ERROR
+            self.stdout.write(style(f"{run.job} @ {run.slot}: {run.status} ({run.duration_seconds:.1f}s)"))
@@ -0,0 +1,51 @@
+"""
+Management command running the change-data-capture poller that feeds the
+Redis live counters (settings.LIVE_COUNTERS = 'redis')
+Run one per environment under the process supervisor; extra instances wait
+on the Redis lock and take over if the active one dies.
+"""
+from datetime import timedelta
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.transactions.live_poller import LiveCounterPoller
+
+
+class Command(BaseCommand):
+    help = 'Tail transaction_detail into the Redis live counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between polls')
+        parser.add_argument('--rescan-minutes', type=int, default=10,
+                            help='Trailing window re-read for status changes')
+        parser.add_argument('--rescan-every', type=int, default=30, help='Seconds between window re-scans')
+        parser.add_argument('--reconcile-every', type=int, default=900,
+                            help="Seconds between full re-seeds of today's counters")
+        parser.add_argument('--once', action='store_true', help='Seed and run a single poll, then exit')
+
+    def handle(self, *args, **options):
+        poller = LiveCounterPoller(
+            interval=options['interval'],
+            rescan_window=timedelta(minutes=options['rescan_minutes']),
+            rescan_every=options['rescan_every'],
+            reconcile_every=options['reconcile_every'],
+        )
+
+        if options['once']:
+            if not poller.hold_lock():
+                raise CommandError('Another poller holds the lock')
+            try:
+                applied = poller.tick()
+            finally:
+                poller.release_lock()
+            self.stdout.write(self.style.SUCCESS(
+                f"Seeded live counters, applied {applied} changes (watermark {poller.watermark[0]})"
+            ))
+            return
+
+        signal.signal(signal.SIGTERM, poller.stop)
+        signal.signal(signal.SIGINT, poller.stop)
+        self.stdout.write(f'Live counter poller started ({poller.owner})')
+        poller.run()
+        self.stdout.write('Live counter poller stopped')
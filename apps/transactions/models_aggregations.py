@@ -2,6 +2,7 @@
 Aggregation models for pre-calculated statistics
 Handles 100K+ daily transactions efficiently with materialized views
 """
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils import timezone
 
@@ -108,6 +109,151 @@ class PaymentModeSummary(models.Model):
         return f"{self.payment_mode} - {self.date}"
 
 
+
+class GatewayDailySummary(models.Model):
+    """
+    Daily gateway (pg_name) statistics per merchant and payment mode
+    Serves gateway health and bank-wise settlement screens
+    """
+    date = models.DateField(db_index=True)
+    client_code = models.CharField(max_length=255, db_index=True)
+    pg_name = models.CharField(max_length=255, db_index=True)
+    payment_mode = models.CharField(max_length=255)
+
+    # Counts
+    total_count = models.IntegerField(default=0)
+    success_count = models.IntegerField(default=0)
+    failed_count = models.IntegerField(default=0)
+    pending_count = models.IntegerField(default=0)
+
+    # Amounts
+    total_amount = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    success_amount = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    failed_amount = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+
+    # Settlement totals (all settled rows / settled SUCCESS rows)
+    settled_count = models.IntegerField(default=0)
+    settled_amount = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    success_settled_count = models.IntegerField(default=0)
+    success_settled_amount = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+
+    # Metadata
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'gateway_daily_summary'
+        unique_together = ('date', 'client_code', 'pg_name', 'payment_mode')
+        indexes = [
+            models.Index(fields=['date', 'pg_name']),
+            models.Index(fields=['client_code', 'date', 'pg_name']),
+        ]
+        ordering = ['-date', 'pg_name']
+
+    def __str__(self):
+        return f"{self.pg_name} - {self.date}"
+
+
+class DailyPayerSketch(models.Model):
+    """
+    HyperLogLog sketches of payer emails / mobiles per day and merchant
+    Unique payers for any range = merge of the day sketches
+    (client_code '*' holds the all-merchant sketch for the day)
+    """
+    date = models.DateField(db_index=True)
+    client_code = models.CharField(max_length=255, db_index=True)
+
+    # Serialised apps.core.sketches.HyperLogLog
+    email_sketch = models.BinaryField()
+    mobile_sketch = models.BinaryField()
+
+    # Exact distinct counts for the day
+    email_count = models.IntegerField(default=0)
+    mobile_count = models.IntegerField(default=0)
+
+    # Metadata
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'daily_payer_sketch'
+        unique_together = ('date', 'client_code')
+        indexes = [
+            models.Index(fields=['client_code', 'date']),
+        ]
+        ordering = ['-date', 'client_code']
+
+    def __str__(self):
+        return f"{self.client_code} payers - {self.date}"
+
+
+class DailyQuantileSketch(models.Model):
+    """
+    t-digest quantile sketches per day and merchant (SUCCESS transactions)
+    amount_digest - paid_amount; tat_digest - settlement TAT in seconds
+    (settlement_date - trans_complete_date) for settled transactions
+    (client_code '*' holds the all-merchant digests for the day)
+    """
+    date = models.DateField(db_index=True)
+    client_code = models.CharField(max_length=255, db_index=True)
+
+    # Serialised apps.core.sketches.TDigest
+    amount_digest = models.BinaryField()
+    tat_digest = models.BinaryField()
+
+    # Exact number of values in each digest
+    amount_count = models.IntegerField(default=0)
+    tat_count = models.IntegerField(default=0)
+
+    # Metadata
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'daily_quantile_sketch'
+        unique_together = ('date', 'client_code')
+        indexes = [
+            models.Index(fields=['client_code', 'date']),
+        ]
+        ordering = ['-date', 'client_code']
+
+    def __str__(self):
+        return f"{self.client_code} quantiles - {self.date}"
+
+
+class DailyTopList(models.Model):
+    """
+    Exact top-K list for one day (SUCCESS volume), merged as Space-Saving
+    summaries for longer ranges
+    kind 'merchant' - merchants by volume (client_code '*')
+    kind 'customer' - payer emails by volume per merchant ('*' = all merchants)
+    """
+    KIND_MERCHANT = 'merchant'
+    KIND_CUSTOMER = 'customer'
+
+    date = models.DateField(db_index=True)
+    kind = models.CharField(max_length=20)
+    client_code = models.CharField(max_length=255)
+
+    # [[key, volume, error, count], ...] - see apps.core.sketches.SpaceSaving
+    entries = models.JSONField(default=list)
+    # Largest volume left off the list (0 when the list is complete)
+    floor = models.FloatField(default=0)
+    # Distinct keys seen that day and display names of listed keys
+    key_count = models.IntegerField(default=0)
+    labels = models.JSONField(default=dict)
+
+    # Metadata
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'daily_top_list'
+        unique_together = ('date', 'kind', 'client_code')
+        indexes = [
+            models.Index(fields=['kind', 'client_code', 'date']),
+        ]
+        ordering = ['-date', 'kind', 'client_code']
+
+    def __str__(self):
+        return f"Top {self.kind}s {self.client_code} - {self.date}"
+
 class HourlyTransactionStats(models.Model):
     """
     Hourly transaction statistics for real-time dashboards
@@ -221,3 +367,361 @@ class TransactionSearchCache(models.Model):
         """Increment cache hit counter"""
         self.hit_count += 1
         self.save(update_fields=['hit_count'])
+
+
+class CubeCell(models.Model):
+    """
+    One cell of a materialised cuboid (see apps.transactions.cube)
+    Dimensions not in the cuboid are left at their defaults; measures are
+    stored as JSON so new measures need no schema change
+    """
+    cuboid = models.CharField(max_length=64)
+    date = models.DateField()
+    hour = models.IntegerField(null=True, blank=True)
+    client_code = models.CharField(max_length=255, default='', blank=True)
+    payment_mode = models.CharField(max_length=255, default='', blank=True)
+    pg_name = models.CharField(max_length=255, default='', blank=True)
+    status = models.CharField(max_length=50, default='', blank=True)
+    settlement_status = models.CharField(max_length=255, default='', blank=True)
+
+    measures = models.JSONField(default=dict)
+
+    # Metadata
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'cube_cell'
+        indexes = [
+            models.Index(fields=['cuboid', 'date']),
+            models.Index(fields=['cuboid', 'client_code', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.cuboid} - {self.date}"
+
+
+class CubeBuild(models.Model):
+    """
+    Build log per cuboid and day - a day is served from cube_cell only once
+    it has a build record carrying the requested measures
+    """
+    cuboid = models.CharField(max_length=64)
+    date = models.DateField()
+    cell_count = models.IntegerField(default=0)
+    measure_names = models.JSONField(default=list)
+    built_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'cube_build'
+        unique_together = ('cuboid', 'date')
+        ordering = ['-date', 'cuboid']
+
+    def __str__(self):
+        return f"{self.cuboid} built {self.date}"
+
+
+class DailySettlementSummary(models.Model):
+    """
+    Daily settled amounts keyed by settlement date (not transaction date)
+    Serves settlement screens that group by settlement_date
+    """
+    settlement_date = models.DateField(db_index=True)
+    client_code = models.CharField(max_length=255, db_index=True)
+    client_name = models.CharField(max_length=255, null=True, blank=True)
+    settlement_status = models.CharField(max_length=255, default='', blank=True)
+    pg_name = models.CharField(max_length=255, default='', blank=True)
+
+    # Counts
+    settled_count = models.IntegerField(default=0)
+
+    # Amounts - effective = gross - (convcharges + ep_charges + gst)
+    gross_amount = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    convcharges = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    ep_charges = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    gst = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    charges_amount = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    effective_amount = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    # Metadata
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'daily_settlement_summary'
+        unique_together = ('settlement_date', 'client_code', 'settlement_status', 'pg_name')
+        indexes = [
+            models.Index(fields=['settlement_date', 'client_code']),
+            models.Index(fields=['client_code', 'settlement_date']),
+        ]
+        ordering = ['-settlement_date', 'client_code']
+
+    def __str__(self):
+        return f"{self.client_code} - settled {self.settlement_date}"
+
+
+class DailyRefundReasonSummary(models.Model):
+    """
+    Refund and chargeback totals per transaction date, merchant and
+    normalised refund reason (see apps.transactions.refund_reasons)
+    refund_date / chargeback_date carry the event dates for the trends
+    """
+    date = models.DateField(db_index=True)
+    client_code = models.CharField(max_length=255)
+    reason_code = models.CharField(max_length=64)
+    refund_date = models.DateField(null=True, blank=True)
+    chargeback_date = models.DateField(null=True, blank=True)
+
+    # Refunds (paid_amount as the refunded amount)
+    refund_count = models.IntegerField(default=0)
+    refund_amount = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    # Chargebacks
+    chargeback_count = models.IntegerField(default=0)
+    chargeback_amount = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    # Metadata
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'daily_refund_reason_summary'
+        indexes = [
+            models.Index(fields=['date', 'client_code']),
+            models.Index(fields=['client_code', 'date']),
+        ]
+        ordering = ['-date', 'client_code', 'reason_code']
+
+    def __str__(self):
+        return f"{self.client_code} - {self.date} - {self.reason_code}"
+
+
+class PayerProfileFields(models.Model):
+    """
+    Lifetime profile of one payer at one merchant
+    payer_key is the normalised email, or the 10-digit mobile when the payer
+    gave no email. Maintained day by day by apps.transactions.payer_profiles
+    """
+    client_code = models.CharField(max_length=255)
+    payer_key = models.CharField(max_length=255)
+    email = models.CharField(max_length=255, null=True, blank=True)
+    mobile = models.CharField(max_length=20, null=True, blank=True)
+
+    first_seen = models.DateTimeField()
+    last_seen = models.DateTimeField()
+
+    # Counts (all statuses / SUCCESS) and SUCCESS volume
+    txn_count = models.IntegerField(default=0)
+    success_count = models.IntegerField(default=0)
+    success_volume = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    # SUCCESS transactions per payment mode; the most used one is kept apart
+    mode_counts = models.JSONField(default=dict)
+    preferred_payment_mode = models.CharField(max_length=255, default='', blank=True)
+
+    # Metadata
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+        unique_together = ('client_code', 'payer_key')
+
+    def __str__(self):
+        return f"{self.client_code} - {self.payer_key}"
+
+
+class PayerProfile(PayerProfileFields):
+
+    class Meta(PayerProfileFields.Meta):
+        db_table = 'payer_profile'
+        indexes = [
+            models.Index(fields=['payer_key']),
+            models.Index(fields=['mobile']),
+            models.Index(fields=['client_code', 'success_volume']),
+            models.Index(fields=['client_code', 'last_seen']),
+        ]
+        ordering = ['client_code', '-success_volume']
+
+
+class PayerProfileDayFields(models.Model):
+    """
+    Days folded into payer_profile, in date order (recent days are re-folded)
+    merchant_counts: {client_code: {'active': payers whose first transaction
+    in the day's month it was, 'new': payers seen for the first time}}
+    """
+    date = models.DateField(unique=True)
+    payers = models.IntegerField(default=0)
+    merchant_counts = models.JSONField(default=dict)
+    applied_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"Payer profiles applied {self.date}"
+
+
+class PayerProfileDay(PayerProfileDayFields):
+
+    class Meta(PayerProfileDayFields.Meta):
+        db_table = 'payer_profile_day'
+
+
+class PayerProfileDayPayerFields(models.Model):
+    """
+    One payer's totals for one applied day, kept for the days still re-folded
+    (PAYER_REFOLD_DAYS) so a re-fold can take the old contribution back out
+    """
+    date = models.DateField()
+    client_code = models.CharField(max_length=255)
+    payer_key = models.CharField(max_length=255)
+    txn_count = models.IntegerField(default=0)
+    success_count = models.IntegerField(default=0)
+    success_volume = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    mode_counts = models.JSONField(default=dict)
+
+    class Meta:
+        abstract = True
+        unique_together = ('date', 'client_code', 'payer_key')
+
+    def __str__(self):
+        return f"{self.date} - {self.client_code} - {self.payer_key}"
+
+
+class PayerProfileDayPayer(PayerProfileDayPayerFields):
+
+    class Meta(PayerProfileDayPayerFields.Meta):
+        db_table = 'payer_profile_day_payer'
+
+
+# Staging tables PayerProfileBuilder.rebuild() fills before swapping them in
+# (created LIKE the live tables)
+
+class PayerProfileBuild(PayerProfileFields):
+
+    class Meta(PayerProfileFields.Meta):
+        db_table = 'payer_profile_build'
+
+
+class PayerProfileDayBuild(PayerProfileDayFields):
+
+    class Meta(PayerProfileDayFields.Meta):
+        db_table = 'payer_profile_day_build'
+
+
+class PayerProfileDayPayerBuild(PayerProfileDayPayerFields):
+
+    class Meta(PayerProfileDayPayerFields.Meta):
+        db_table = 'payer_profile_day_payer_build'
+
+
+class LiveTransactionCounter(models.Model):
+    """
+    Running counters for recent IST hours, maintained by MySQL triggers on
+    transaction_detail (manage.py live_counter_triggers install)
+    Missing client_code / payment_mode / status are stored as ''
+    """
+    date = models.DateField()
+    hour = models.SmallIntegerField()
+    client_code = models.CharField(max_length=255, default='', blank=True)
+    payment_mode = models.CharField(max_length=255, default='', blank=True)
+    status = models.CharField(max_length=50, default='', blank=True)
+
+    # Deltas applied by the triggers
+    txn_count = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    # Metadata
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'live_transaction_counter'
+        unique_together = ('date', 'hour', 'client_code', 'payment_mode', 'status')
+        indexes = [
+            models.Index(fields=['date', 'client_code']),
+        ]
+        ordering = ['-date', '-hour']
+
+    def __str__(self):
+        return f"{self.client_code} {self.date} {self.hour}h {self.status}"
+
+
+class ScheduledJobRun(models.Model):
+    """
+    Run history of the aggregation scheduler (apps.transactions.scheduler)
+    One row per attempt at a job's scheduled slot; a slot counts as done
+    once an attempt succeeded, so missed slots are caught up after downtime
+    """
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCESS = 'success'
+    STATUS_FAILED = 'failed'
+
+    job = models.CharField(max_length=64)
+    slot = models.DateTimeField()  # Scheduled time the run belongs to
+    attempt = models.SmallIntegerField(default=1)
+    status = models.CharField(max_length=16, default=STATUS_RUNNING)
+    node = models.CharField(max_length=255, blank=True, default='')
+
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    duration_seconds = models.FloatField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True, default='')
+
+    class Meta:
+        db_table = 'scheduled_job_run'
+        unique_together = ('job', 'slot', 'attempt')
+        indexes = [
+            models.Index(fields=['job', 'status', 'slot']),
+        ]
+        ordering = ['-slot', 'job']
+
+    def __str__(self):
+        return f"{self.job} @ {self.slot} #{self.attempt}: {self.status}"
+
+
+class TransactionSample(models.Model):
+    """
+    Deterministic 1% sample of transaction_detail for approximate analytics
+    (apps.transactions.sampling) - rows whose MOD(CRC32(txn_id), 10000) is
+    below 100, with the columns the sampled aggregates read
+    Missing client_code / payment_mode / pg_name / status are stored as ''
+    """
+    txn_id = models.CharField(max_length=255, unique=True)
+    bucket = models.SmallIntegerField()
+    trans_date = models.DateTimeField()
+    date = models.DateField()  # Local (IST) day of trans_date
+    hour = models.SmallIntegerField()
+    client_code = models.CharField(max_length=255, default='', blank=True)
+    payment_mode = models.CharField(max_length=255, default='', blank=True)
+    pg_name = models.CharField(max_length=255, default='', blank=True)
+    status = models.CharField(max_length=50, default='', blank=True)
+    paid_amount = models.FloatField(default=0)
+    is_settled = models.BooleanField(default=False)
+    settlement_amount = models.FloatField(default=0)
+
+    class Meta:
+        db_table = 'transaction_sample'
+        indexes = [
+            models.Index(fields=['date', 'bucket']),
+            models.Index(fields=['client_code', 'date', 'bucket']),
+        ]
+
+    def __str__(self):
+        return f"Sample {self.txn_id} ({self.date})"
+
+
+class TransactionSampleDay(models.Model):
+    """
+    Days with a built transaction_sample; only these are answered from the
+    sample, everything else is read exactly
+    """
+    date = models.DateField(unique=True)
+    rows = models.IntegerField(default=0)  # Sampled rows
+    population = models.IntegerField(default=0)  # Transactions in the day when built
+    built_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'transaction_sample_day'
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"Sample built {self.date}"
@@ -0,0 +1,495 @@
+"""
+Payer (customer) profiles per merchant
+payer_profile keeps one row per (client_code, payer_key) - first / last
+seen, transaction counts, SUCCESS volume and preferred payment mode - so
+customer lookups and lifetime rankings read a handful of indexed rows
+instead of grouping transaction_detail by payee_email.
+
+Profiles are maintained incrementally: each closed local day is folded in,
+in date order (payer_profile_day records the days applied). Because days
+arrive in order, folding a day also tells which payers are active in its
+month for the first time, which gives MerchantMonthlyStats its unique
+customer counts without a COUNT(DISTINCT) over the month.
+
+Each day's per-payer totals are kept in payer_profile_day_payer for
+PAYER_REFOLD_DAYS, and catch-up re-folds those days - taking the old totals
+out and the current ones in - so late status updates reach the profiles.
+Older changes are picked up by a rebuild (manage.py build_payer_profiles
+--rebuild), which fills staging tables and swaps them in.
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+import logging
+
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.utils import timezone
+
+from apps.transactions.sketch_summaries import payer_email_key, payer_mobile_key
+
+logger = logging.getLogger('apps.transactions')
+
+# Existing profiles fetched per query while folding a day
+LOOKUP_CHUNK = 1000
+
+# Days applied per catch-up run at most
+MAX_CATCH_UP_DAYS = 31
+
+# Trailing applied days re-folded by each catch-up (status updates settle
+# within a few days of the transaction)
+PAYER_REFOLD_DAYS = 7
+
+# Live table -> staging table filled by rebuild()
+BUILD_TABLES = {
+    'payer_profile': 'payer_profile_build',
+    'payer_profile_day': 'payer_profile_day_build',
+    'payer_profile_day_payer': 'payer_profile_day_payer_build',
+}
+
+
+def payer_key(email, mobile):
+    """
+    Profile key: normalised email, else normalised mobile (None for neither)
+    """
+    return payer_email_key(email) or payer_mobile_key(mobile)
+
+
+def preferred_mode(mode_counts):
+    """
+    Most used payment mode ('' when none), ties broken by name
+    """
+    if not mode_counts:
+        return ''
+    return max(sorted(mode_counts), key=lambda mode: mode_counts[mode])
+
+
+def day_payers(day):
+    """
+    {(client_code, payer_key): the payer's totals} for one local day of
+    transaction_detail
+    """
+    from apps.transactions.models import TransactionDetail
+
+    day_start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+    day_end = day_start + timedelta(days=1)
+
+    success = Q(status='SUCCESS')
+    rows = TransactionDetail.objects.filter(
+        trans_date__gte=day_start, trans_date__lt=day_end
+    ).values('client_code', 'payee_email', 'payee_mob', 'payment_mode').annotate(
+        txn_count=Count('txn_id'),
+        success_count=Count('txn_id', filter=success),
+        success_volume=Sum('paid_amount', filter=success),
+        first_seen=Min('trans_date'),
+        last_seen=Max('trans_date'),
+    ).order_by()
+
+    payers = {}
+    for row in rows.iterator(chunk_size=5000):
+        key = payer_key(row['payee_email'], row['payee_mob'])
+        if key is None:
+            continue
+        payer = payers.setdefault((row['client_code'] or '', key), {
+            'email': None, 'mobile': None, 'first_seen': row['first_seen'], 'last_seen': row['last_seen'],
+            'txn_count': 0, 'success_count': 0, 'success_volume': 0, 'mode_counts': {},
+        })
+        payer['email'] = payer_email_key(row['payee_email']) or payer['email']
+        payer['mobile'] = payer_mobile_key(row['payee_mob']) or payer['mobile']
+        payer['first_seen'] = min(payer['first_seen'], row['first_seen'])
+        payer['last_seen'] = max(payer['last_seen'], row['last_seen'])
+        payer['txn_count'] += row['txn_count']
+        payer['success_count'] += row['success_count']
+        payer['success_volume'] += float(row['success_volume'] or 0)
+        if row['success_count']:
+            mode = row['payment_mode'] or 'Unknown'
+            payer['mode_counts'][mode] = payer['mode_counts'].get(mode, 0) + row['success_count']
+
+    for payer in payers.values():
+        payer['success_volume'] = Decimal(str(round(payer['success_volume'], 2)))
+    return payers
+
+
+def fold_payer(profile, new, old):
+    """
+    Replace a payer's `old` day totals in `profile` with `new` (either may be
+    None). Returns False when no transactions are left in the profile
+    """
+    for field in ('txn_count', 'success_count', 'success_volume'):
+        setattr(profile, field, getattr(profile, field) + (new[field] if new else 0) - (old[field] if old else 0))
+
+    mode_counts = dict(profile.mode_counts or {})
+    for totals, sign in ((new, 1), (old, -1)):
+        for mode, count in (totals['mode_counts'] if totals else {}).items():
+            mode_counts[mode] = mode_counts.get(mode, 0) + sign * count
+    profile.mode_counts = {mode: count for mode, count in mode_counts.items() if count > 0}
+    profile.preferred_payment_mode = preferred_mode(profile.mode_counts)
+
+    # first / last seen only widen - transactions keep their trans_date
+    if new:
+        profile.email = new['email'] or profile.email
+        profile.mobile = new['mobile'] or profile.mobile
+        profile.first_seen = min(profile.first_seen, new['first_seen'])
+        profile.last_seen = max(profile.last_seen, new['last_seen'])
+    return profile.txn_count > 0
+
+
+class PayerProfileBuilder:
+    """
+    Folds closed days of transaction_detail into PayerProfile
+
+    Usage:
+        PayerProfileBuilder.catch_up()                       # nightly
+        PayerProfileBuilder.rebuild(date(2024, 1, 1))        # initial load / repair
+    """
+    # Models written to - StagingPayerProfileBuilder points them at the build tables
+    profile_model = 'PayerProfile'
+    day_model = 'PayerProfileDay'
+    day_payer_model = 'PayerProfileDayPayer'
+
+    @classmethod
+    def _models(cls):
+        from apps.transactions import models_aggregations
+
+        return (
+            getattr(models_aggregations, cls.profile_model),
+            getattr(models_aggregations, cls.day_model),
+            getattr(models_aggregations, cls.day_payer_model),
+        )
+
+    @classmethod
+    def last_applied(cls):
+        _, Day, _ = cls._models()
+        return Day.objects.order_by('-date').values_list('date', flat=True).first()
+
+    @classmethod
+    def catch_up(cls, until=None, max_days=MAX_CATCH_UP_DAYS):
+        """
+        Re-fold the last PAYER_REFOLD_DAYS applied days, then apply the days
+        after the last applied one up to `until` (yesterday).
+        Returns the days applied; needs an initial rebuild() to start from
+        """
+        until = until or timezone.localdate() - timedelta(days=1)
+        last = cls.last_applied()
+        if last is None:
+            logger.warning("Payer profiles have never been built - run build_payer_profiles --rebuild")
+            return []
+
+        day = last - timedelta(days=PAYER_REFOLD_DAYS - 1)
+        while day <= last:
+            cls.refold_day(day)
+            day += timedelta(days=1)
+
+        applied = []
+        day = last + timedelta(days=1)
+        while day <= until and len(applied) < max_days:
+            cls.apply_day(day)
+            applied.append(day)
+            day += timedelta(days=1)
+
+        cls.prune_day_payers()
+        return applied
+
+    @classmethod
+    def rebuild(cls, start, until=None):
+        """
+        Fold every day from `start` to `until` into the staging tables, then
+        swap them in; the live profiles stay readable throughout.
+        Returns the number of days applied
+        """
+        until = until or timezone.localdate() - timedelta(days=1)
+        if connection.vendor != 'mysql':
+            logger.warning(f"Payer profile swap needs MySQL ({connection.vendor}) - rebuilding in place")
+            return cls._rebuild_in_place(start, until)
+
+        with connection.cursor() as cursor:
+            for table, build_table in BUILD_TABLES.items():
+                cursor.execute(f"CREATE TABLE IF NOT EXISTS {build_table} LIKE {table}")
+                cursor.execute(f"TRUNCATE TABLE {build_table}")
+
+        days = StagingPayerProfileBuilder._fold_range(start, until)
+
+        # One RENAME TABLE statement swaps all three atomically
+        renames = []
+        for table, build_table in BUILD_TABLES.items():
+            renames += [f"{table} TO {table}_old", f"{build_table} TO {table}", f"{table}_old TO {build_table}"]
+        with connection.cursor() as cursor:
+            cursor.execute(f"RENAME TABLE {', '.join(renames)}")
+            for build_table in BUILD_TABLES.values():
+                cursor.execute(f"TRUNCATE TABLE {build_table}")
+
+        logger.info(f"Payer profiles rebuilt from {start} to {until} ({days} days) and swapped in")
+        return days
+
+    @classmethod
+    def _rebuild_in_place(cls, start, until):
+        Profile, Day, DayPayer = cls._models()
+        with transaction.atomic():
+            DayPayer.objects.all().delete()
+            Day.objects.all().delete()
+            Profile.objects.all().delete()
+        return cls._fold_range(start, until)
+
+    @classmethod
+    def _fold_range(cls, start, until):
+        days = 0
+        day = start
+        while day <= until:
+            cls.apply_day(day)
+            days += 1
+            day += timedelta(days=1)
+        cls.prune_day_payers()
+        return days
+
+    @classmethod
+    def prune_day_payers(cls):
+        """
+        Drop per-payer day totals older than the re-fold window
+        """
+        _, _, DayPayer = cls._models()
+        last = cls.last_applied()
+        if last is not None:
+            DayPayer.objects.filter(date__lte=last - timedelta(days=PAYER_REFOLD_DAYS)).delete()
+
+    @classmethod
+    def apply_day(cls, day):
+        """
+        Fold one local day into the profiles. Returns the number of payers
+        in the day, or None when the day was already applied
+        """
+        _, Day, _ = cls._models()
+
+        last = cls.last_applied()
+        if last is not None and day <= last:
+            if Day.objects.filter(date=day).exists():
+                return None
+            raise ValueError(f"Payer profiles are applied up to {last}; {day} needs a rebuild")
+        return cls._fold_day(day, previous={})
+
+    @classmethod
+    def refold_day(cls, day):
+        """
+        Replace an applied day's contribution with its current transactions.
+        Returns the number of payers in the day, or None when the day was
+        never applied or its per-payer totals were pruned
+        """
+        _, Day, DayPayer = cls._models()
+
+        applied = Day.objects.filter(date=day).first()
+        if applied is None:
+            return None
+        previous = {
+            (row.client_code, row.payer_key): {
+                'txn_count': row.txn_count, 'success_count': row.success_count,
+                'success_volume': row.success_volume, 'mode_counts': row.mode_counts or {},
+            }
+            for row in DayPayer.objects.filter(date=day)
+        }
+        if not previous and applied.payers:
+            return None
+        return cls._fold_day(day, previous, applied.merchant_counts)
+
+    @classmethod
+    def _fold_day(cls, day, previous, merchant_counts=None):
+        """
+        Fold the day's current totals in and `previous` ones (a re-fold) out
+        """
+        Profile, Day, DayPayer = cls._models()
+
+        start_time = timezone.now()
+        month_start = timezone.make_aware(datetime.combine(day.replace(day=1), datetime.min.time()))
+        current = day_payers(day)
+
+        by_merchant = {}
+        for client_code, key in current.keys() | previous.keys():
+            by_merchant.setdefault(client_code, []).append(key)
+
+        merchant_counts = {code: dict(counts) for code, counts in (merchant_counts or {}).items()}
+        created, updated, emptied = [], [], []
+        for client_code, keys in by_merchant.items():
+            counts = merchant_counts.setdefault(client_code, {'active': 0, 'new': 0})
+            for offset in range(0, len(keys), LOOKUP_CHUNK):
+                chunk = keys[offset:offset + LOOKUP_CHUNK]
+                existing = {
+                    profile.payer_key: profile
+                    for profile in Profile.objects.filter(client_code=client_code, payer_key__in=chunk)
+                }
+
+                for key in chunk:
+                    new, old = current.get((client_code, key)), previous.get((client_code, key))
+                    profile = existing.get(key)
+                    if profile is None:
+                        if new is None:
+                            continue
+                        counts['active'] += 1
+                        counts['new'] += 1
+                        created.append(Profile(
+                            client_code=client_code,
+                            payer_key=key,
+                            preferred_payment_mode=preferred_mode(new['mode_counts']),
+                            **new
+                        ))
+                        continue
+
+                    # Days are applied in order, so this is the first time in the month
+                    # (on a re-fold, a later day of the month has already counted them)
+                    if new is not None and old is None and profile.last_seen < month_start:
+                        counts['active'] += 1
+                    if not fold_payer(profile, new, old):
+                        # All its transactions were on this day, which counted it
+                        counts['active'] -= 1
+                        counts['new'] -= 1
+                        emptied.append(profile.pk)
+                        continue
+                    # bulk_update skips auto_now
+                    profile.last_updated = start_time
+                    updated.append(profile)
+
+        day_rows = [
+            DayPayer(
+                date=day, client_code=client_code, payer_key=key, txn_count=payer['txn_count'],
+                success_count=payer['success_count'], success_volume=payer['success_volume'],
+                mode_counts=payer['mode_counts']
+            )
+            for (client_code, key), payer in current.items()
+        ]
+
+        with transaction.atomic():
+            Profile.objects.bulk_create(created, batch_size=1000)
+            Profile.objects.bulk_update(updated, [
+                'email', 'mobile', 'first_seen', 'last_seen', 'txn_count', 'success_count',
+                'success_volume', 'mode_counts', 'preferred_payment_mode', 'last_updated'
+            ], batch_size=1000)
+            Profile.objects.filter(pk__in=emptied).delete()
+            DayPayer.objects.filter(date=day).delete()
+            DayPayer.objects.bulk_create(day_rows, batch_size=1000)
+            Day.objects.update_or_create(
+                date=day, defaults={'payers': len(current), 'merchant_counts': merchant_counts}
+            )
+
+        duration = (timezone.now() - start_time).total_seconds()
+        logger.info(
+            f"Payer profiles {'re-folded' if previous else 'applied'} for {day} in {duration:.2f}s | "
+            f"Payers: {len(current)} | New: {len(created)}"
+        )
+        return len(current)
+
+
+class StagingPayerProfileBuilder(PayerProfileBuilder):
+    """
+    PayerProfileBuilder writing to the staging tables rebuild() swaps in
+    """
+    profile_model = 'PayerProfileBuild'
+    day_model = 'PayerProfileDayBuild'
+    day_payer_model = 'PayerProfileDayPayerBuild'
+
+
+def monthly_active_payers(year, month):
+    """
+    {client_code: payers with a transaction in the month} from the applied
+    days, or None unless every day of the month has been applied
+    """
+    from apps.transactions.models_aggregations import PayerProfileDay
+
+    first = datetime(year, month, 1).date()
+    last = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    days = list(
+        PayerProfileDay.objects.filter(date__gte=first, date__lte=last).values_list('merchant_counts', flat=True)
+    )
+    if len(days) != (last - first).days + 1:
+        return None
+
+    active = {}
+    for merchant_counts in days:
+        for client_code, counts in merchant_counts.items():
+            active[client_code] = active.get(client_code, 0) + counts['active']
+    return active
+
+
+def _profile_dict(profile):
+    return {
+        'client_code': profile.client_code,
+        'payer_key': profile.payer_key,
+        'email': profile.email,
+        'mobile': profile.mobile,
+        'first_seen': profile.first_seen.isoformat(),
+        'last_seen': profile.last_seen.isoformat(),
+        'transaction_count': profile.txn_count,
+        'success_count': profile.success_count,
+        'success_volume': float(profile.success_volume),
+        'preferred_payment_mode': profile.preferred_payment_mode or None,
+    }
+
+
+class PayerProfileStore:
+    """
+    Reads over payer_profile
+    client_codes None means every merchant (admins)
+    """
+
+    ORDERINGS = {
+        'volume': '-success_volume',
+        'count': '-txn_count',
+        'recent': '-last_seen',
+    }
+
+    @staticmethod
+    def _scoped(client_codes):
+        from apps.transactions.models_aggregations import PayerProfile
+
+        queryset = PayerProfile.objects.all()
+        if client_codes is not None:
+            queryset = queryset.filter(client_code__in=['' if code is None else code for code in client_codes])
+        return queryset
+
+    @classmethod
+    def lookup(cls, email=None, mobile=None, client_codes=None):
+        """
+        Profiles of one payer (by email or mobile) across the merchants in scope
+        """
+        q = Q()
+        email, mobile = payer_email_key(email), payer_mobile_key(mobile)
+        if email:
+            q |= Q(payer_key=email)
+        if mobile:
+            q |= Q(payer_key=mobile) | Q(mobile=mobile)
+        if not q:
+            return []
+        profiles = cls._scoped(client_codes).filter(q).order_by('-last_seen')
+        return [_profile_dict(profile) for profile in profiles]
+
+    @classmethod
+    def top(cls, client_codes=None, order='volume', limit=20):
+        """
+        Payers ranked by lifetime volume, transaction count or recency
+        """
+        profiles = cls._scoped(client_codes).order_by(cls.ORDERINGS[order])[:limit]
+        return [_profile_dict(profile) for profile in profiles]
+
+    @classmethod
+    def summaries(cls, keys, client_codes=None):
+        """
+        {payer_key: lifetime totals merged over the merchants in scope}
+        """
+        merged = {}
+        for profile in cls._scoped(client_codes).filter(payer_key__in=list(keys)):
+            entry = merged.setdefault(profile.payer_key, {
+                'first_seen': profile.first_seen, 'last_seen': profile.last_seen,
+                'transaction_count': 0, 'success_volume': 0.0, 'mode_counts': {},
+            })
+            entry['first_seen'] = min(entry['first_seen'], profile.first_seen)
+            entry['last_seen'] = max(entry['last_seen'], profile.last_seen)
+            entry['transaction_count'] += profile.txn_count
+            entry['success_volume'] += float(profile.success_volume)
+            for mode, count in (profile.mode_counts or {}).items():
+                entry['mode_counts'][mode] = entry['mode_counts'].get(mode, 0) + count
+
+        return {
+            key: {
+                'first_seen': entry['first_seen'].isoformat(),
+                'last_seen': entry['last_seen'].isoformat(),
+                'lifetime_transactions': entry['transaction_count'],
+                'lifetime_volume': round(entry['success_volume'], 2),
+                'preferred_payment_mode': preferred_mode(entry['mode_counts']) or None,
+            }
+            for key, entry in merged.items()
+        }
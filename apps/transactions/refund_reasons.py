@@ -0,0 +1,207 @@
+"""
+Refund reason normalization and the daily refund / chargeback summary
+refund_message is free text typed by merchants and ops ("Duplicate payment",
+"duplicate  Payment ", "DUPLICATE TXN 88213", ...). reason_code() folds it
+into a small reason-code dimension: case and whitespace are normalised,
+known patterns map to fixed codes and anything else keeps its normalised
+text without digit runs (order / txn ids), so variants of the same message
+share one bucket.
+
+RefundSummaryBuilder stores refund and chargeback totals per
+(transaction date, client_code, reason_code) - with the refund and
+chargeback dates as extra columns for the trends - in
+DailyRefundReasonSummary, read by aggregation_router.RefundSummaryRouter.
+"""
+from datetime import datetime, timedelta
+import logging
+import re
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from apps.transactions.local_time import LocalDate
+
+logger = logging.getLogger('apps.transactions')
+
+NOT_SPECIFIED = 'NOT_SPECIFIED'
+
+# Longest stored code; unmatched messages are cut to fit
+REASON_CODE_LENGTH = 64
+
+# Checked in order, first match wins (against the normalised message)
+REASON_PATTERNS = [
+    ('DUPLICATE_PAYMENT', 'Duplicate payment', (
+        r'\bdup(licate)?\b', r'\bdouble (debit|payment|charge|deduction)', r'\b(charged|debited|paid) twice\b',
+    )),
+    ('DEBITED_NOT_CONFIRMED', 'Amount debited, transaction failed', (
+        r'\bdebited but\b', r'\bamount (deducted|debited)\b', r'\b(txn|transaction|payment) (failed|unsuccessful)\b',
+        r'\bfailed (txn|transaction|payment)\b',
+    )),
+    ('CUSTOMER_REQUEST', 'Customer request', (
+        r'\b(customer|user|payer|client) (request|requested|cancel\w*)\b',
+        r'\brequested by (the )?(customer|user|payer)\b', r'\bon (customer|user) request\b',
+    )),
+    ('ORDER_CANCELLED', 'Order / booking cancelled', (
+        r'\b(order|booking|ticket|subscription|admission|application) cancel\w*\b',
+        r'\bcancel\w* (order|booking|ticket|subscription|admission|application)\b',
+    )),
+    ('NOT_DELIVERED', 'Goods / service not delivered', (
+        r'\bnot (delivered|received|provided|rendered)\b', r'\bnon[ -]?delivery\b', r'\bservice unavailable\b',
+    )),
+    ('EXCESS_AMOUNT', 'Excess / partial amount', (
+        r'\bexcess\b', r'\bover ?charg\w*\b', r'\bextra (amount|charge|payment)\b', r'\bpartial\b',
+        r'\bwrong amount\b',
+    )),
+    ('FRAUD', 'Fraud / unauthorised', (
+        r'\bfraud\w*\b', r'\bunauthori[sz]ed\b', r'\bnot done by (me|customer|cardholder)\b',
+    )),
+    ('TECHNICAL_ISSUE', 'Technical issue', (
+        r'\btechnical\b', r'\btime ?out\b', r'\bserver (error|issue|down)\b', r'\bsystem (error|issue)\b',
+    )),
+    ('AUTO_REVERSAL', 'Auto refund / reversal', (
+        r'\bauto[ -]?(refund|reversal|reversed)\b', r'\breversal\b',
+    )),
+    ('MERCHANT_INITIATED', 'Merchant initiated', (
+        r'\bmerchant (initiated|request\w*|refund)\b', r'\binitiated by merchant\b',
+    )),
+]
+
+_COMPILED = [(code, re.compile('|'.join(patterns))) for code, _, patterns in REASON_PATTERNS]
+REASON_LABELS = {code: label for code, label, _ in REASON_PATTERNS}
+REASON_LABELS[NOT_SPECIFIED] = 'Not specified'
+
+_SEPARATORS = re.compile(r'[\s_\-./,:;|]+')
+_NOISE = re.compile(r'[^a-z0-9# ]')
+_DIGITS = re.compile(r'\d+')
+_EMPTY = {'', 'na', 'n a', 'nil', 'none', 'null', 'refund', 'refunded', '#'}
+
+
+def normalize_reason(message):
+    """
+    Lower-cased, single-spaced message with punctuation dropped and digit
+    runs masked as '#'
+    """
+    if not message:
+        return ''
+    text = _SEPARATORS.sub(' ', str(message).lower())
+    text = _DIGITS.sub('#', _NOISE.sub('', text))
+    return ' '.join(text.split())
+
+
+def reason_code(message):
+    """
+    Reason code for a refund_message: a known code, NOT_SPECIFIED, or the
+    normalised text (ids dropped) upper-cased for messages no pattern knows
+    """
+    text = normalize_reason(message)
+    if text in _EMPTY:
+        return NOT_SPECIFIED
+    for code, pattern in _COMPILED:
+        if pattern.search(text):
+            return code
+    words = text.replace('#', ' ').split()
+    if not words:
+        return NOT_SPECIFIED
+    return '_'.join(words).upper()[:REASON_CODE_LENGTH]
+
+
+def reason_label(code):
+    """
+    Display text for a reason code
+    """
+    if code in REASON_LABELS:
+        return REASON_LABELS[code]
+    return code.replace('_', ' ').capitalize()
+
+
+def refund_condition():
+    """
+    Rows counted as refunds (there is no refund amount column)
+    """
+    return Q(refund_date__isnull=False) | Q(refund_status_code__isnull=False)
+
+
+def chargeback_condition():
+    return Q(charge_back_amount__gt=0) | Q(charge_back_status__isnull=False)
+
+
+def refund_measures():
+    """
+    Refund / chargeback annotations over raw rows; paid_amount stands in for
+    the refunded amount
+    """
+    refunds, chargebacks = refund_condition(), chargeback_condition()
+    return {
+        'refund_count': Count('txn_id', filter=refunds),
+        'refund_amount': Sum('paid_amount', filter=refunds),
+        'chargeback_count': Count('txn_id', filter=chargebacks),
+        'chargeback_amount': Sum('charge_back_amount', filter=chargebacks),
+    }
+
+
+def refund_event_days(since):
+    """
+    Local transaction days holding a refund or chargeback dated on or after
+    the local day `since` - the days whose refund summaries a late event changed
+    """
+    from apps.transactions.models import TransactionDetail
+
+    since_start = timezone.make_aware(datetime.combine(since, datetime.min.time()))
+    return set(
+        TransactionDetail.objects.filter(
+            Q(refund_date__gte=since_start) | Q(charge_back_date__gte=since_start)
+        ).values_list(LocalDate('trans_date'), flat=True).distinct()
+    )
+
+
+class RefundSummaryBuilder:
+    """
+    Builds DailyRefundReasonSummary rows for one transaction date
+    """
+
+    @staticmethod
+    def build_day(target_date):
+        """
+        Rebuild one local day; returns the number of summary rows
+        """
+        from apps.transactions.models import TransactionDetail
+        from apps.transactions.models_aggregations import DailyRefundReasonSummary
+
+        day_start = timezone.make_aware(datetime.combine(target_date, datetime.min.time()))
+        day_end = day_start + timedelta(days=1)
+
+        grouped = TransactionDetail.objects.filter(
+            trans_date__gte=day_start, trans_date__lt=day_end
+        ).filter(refund_condition() | chargeback_condition()).values(
+            'client_code', 'refund_message',
+            refund_day=LocalDate('refund_date'), chargeback_day=LocalDate('charge_back_date')
+        ).annotate(**refund_measures()).order_by()
+
+        # Messages fold into reason codes here, so near-duplicates merge
+        cells = {}
+        for row in grouped:
+            key = (row['client_code'] or '', reason_code(row['refund_message']),
+                   row['refund_day'], row['chargeback_day'])
+            cell = cells.setdefault(key, {
+                'refund_count': 0, 'refund_amount': 0, 'chargeback_count': 0, 'chargeback_amount': 0
+            })
+            for measure in cell:
+                cell[measure] += row[measure] or 0
+
+        summaries = [
+            DailyRefundReasonSummary(
+                date=target_date,
+                client_code=client_code,
+                reason_code=code,
+                refund_date=refund_day,
+                chargeback_date=chargeback_day,
+                **cell
+            )
+            for (client_code, code, refund_day, chargeback_day), cell in cells.items()
+        ]
+
+        with transaction.atomic():
+            DailyRefundReasonSummary.objects.filter(date=target_date).delete()
+            DailyRefundReasonSummary.objects.bulk_create(summaries, batch_size=1000)
+        return len(summaries)
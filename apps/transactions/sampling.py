@@ -0,0 +1,389 @@
+"""
+Deterministic transaction sample for approximate analytics (approx=true)
+transaction_sample keeps every transaction whose txn_id hashes
+(CRC32 mod SAMPLE_BUCKETS) into the first SAMPLE_MAX_BUCKET buckets - a
+fixed 1% of transaction_detail, the same rows on every rebuild. Buckets
+nest, so reading buckets < k is itself a k / SAMPLE_BUCKETS sample and a
+query can widen its sample bucket range by bucket range.
+
+SampledAggregator answers AggregationRouter-style requests from the sample:
+a small pilot sizes the sample to the latency target, closed sampled days
+are scaled up by the sampling rate (Horvitz-Thompson) with 95% margins,
+and the rest of the range (partial days, today, unsampled days) is added
+exactly from raw rows.
+"""
+from datetime import datetime, timedelta
+import logging
+import math
+import time as time_module
+import zlib
+
+from django.db import connection, transaction
+from django.db.models import Count, F, FloatField, Func, IntegerField, Q, Sum
+from django.db.utils import NotSupportedError
+from django.utils import timezone
+
+from apps.transactions.aggregation_router import day_runs, full_day_bounds, raw_windows, windows_filter
+from apps.transactions.local_time import LocalDate, LocalHour
+
+logger = logging.getLogger('apps.transactions')
+
+# Hash space and the part of it stored (1%)
+SAMPLE_BUCKETS = 10000
+SAMPLE_MAX_BUCKET = 100
+
+# Buckets read by the pilot query (0.1%)
+PILOT_BUCKETS = 10
+
+# Default latency target per aggregate call
+TARGET_MS = 300
+
+# Two-sided 95% normal quantile
+Z_95 = 1.96
+
+# measure -> (row filter, summed column; None counts rows)
+SAMPLE_MEASURES = {
+    'total_count': (None, None),
+    'success_count': (Q(status='SUCCESS'), None),
+    'failed_count': (Q(status='FAILED'), None),
+    'pending_count': (Q(status='PENDING'), None),
+    'settled_count': (Q(is_settled=True), None),
+    'total_amount': (None, 'paid_amount'),
+    'success_amount': (Q(status='SUCCESS'), 'paid_amount'),
+    'failed_amount': (Q(status='FAILED'), 'paid_amount'),
+    'settled_amount': (Q(is_settled=True), 'settlement_amount'),
+    'pending_settlement_amount': (Q(status='SUCCESS', is_settled=False), 'paid_amount'),
+}
+
+# group_by -> (sample column, raw transaction_detail expression)
+SAMPLE_GROUPS = {
+    'date': ('date', lambda: LocalDate('trans_date')),
+    'hour': ('hour', lambda: LocalHour('trans_date')),
+    'client_code': ('client_code', None),
+    'payment_mode': ('payment_mode', None),
+    'pg_name': ('pg_name', None),
+}
+
+
+def approx_requested(params):
+    """
+    True when the request asks for approximate analytics (approx=true)
+    """
+    return str(params.get('approx', '')).lower() in ('true', '1', 'yes')
+
+
+def sample_bucket(txn_id):
+    """
+    Hash bucket of a txn_id - equals MySQL MOD(CRC32(txn_id), SAMPLE_BUCKETS)
+    """
+    return zlib.crc32(str(txn_id).encode('utf-8')) % SAMPLE_BUCKETS
+
+
+class SampleBucket(Func):
+    """
+    sample_bucket() in SQL (MySQL only)
+    """
+    arity = 1
+    output_field = IntegerField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        raise NotSupportedError('SampleBucket needs MySQL CRC32')
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.source_expressions[0])
+        return f"MOD(CRC32({sql}), {SAMPLE_BUCKETS})", params
+
+
+class SampleBuilder:
+    """
+    Builds transaction_sample rows for one local day
+    """
+
+    FIELDS = ('txn_id', 'trans_date', 'client_code', 'payment_mode', 'pg_name', 'status',
+              'paid_amount', 'is_settled', 'settlement_amount')
+
+    @classmethod
+    def build_day(cls, day):
+        """
+        Rebuild the day's sample. Returns the number of sampled rows
+        """
+        from apps.transactions.models import TransactionDetail
+        from apps.transactions.models_aggregations import TransactionSample, TransactionSampleDay
+
+        day_start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+        day_end = day_start + timedelta(days=1)
+        rows = TransactionDetail.objects.filter(trans_date__gte=day_start, trans_date__lt=day_end)
+        population = rows.count()
+
+        if connection.vendor == 'mysql':
+            # Only the sampled 1% leaves the database
+            picked = rows.annotate(bucket=SampleBucket('txn_id')).filter(
+                bucket__lt=SAMPLE_MAX_BUCKET
+            ).values_list(*cls.FIELDS).order_by()
+        else:
+            picked = (
+                row for row in rows.values_list(*cls.FIELDS).order_by().iterator(chunk_size=5000)
+                if sample_bucket(row[0]) < SAMPLE_MAX_BUCKET
+            )
+
+        samples = []
+        for txn_id, trans_date, client_code, payment_mode, pg_name, status, paid_amount, \
+                is_settled, settlement_amount in picked:
+            local = timezone.localtime(trans_date)
+            samples.append(TransactionSample(
+                txn_id=txn_id,
+                bucket=sample_bucket(txn_id),
+                trans_date=trans_date,
+                date=local.date(),
+                hour=local.hour,
+                client_code=client_code or '',
+                payment_mode=payment_mode or '',
+                pg_name=pg_name or '',
+                status=status or '',
+                paid_amount=paid_amount or 0,
+                is_settled=bool(is_settled),
+                settlement_amount=settlement_amount or 0,
+            ))
+
+        with transaction.atomic():
+            TransactionSample.objects.filter(date=day).delete()
+            TransactionSample.objects.bulk_create(samples, batch_size=1000)
+            TransactionSampleDay.objects.update_or_create(
+                date=day, defaults={'rows': len(samples), 'population': population}
+            )
+        return len(samples)
+
+
+class SampledAggregator:
+    """
+    Approximate AggregationRouter.aggregate() over the transaction sample
+
+    Rows carry the usual measures (estimates) plus 'margin': {measure: 95%
+    half-width}, and 'success_rate' / its margin when both success_count
+    and total_count are requested. The sample size is fixed by the first
+    call: a PILOT_BUCKETS pilot is timed and the sample widened (up to 1%)
+    to what fits in target_ms. Unsupported filters (amount, search) make
+    every call exact over raw rows.
+
+    Usage:
+        aggregator = SampledAggregator(AggregateQuery.from_request(params, user), queryset)
+        totals = aggregator.aggregate(['total_count', 'success_count', 'success_amount'])
+        aggregator.describe()
+    """
+
+    def __init__(self, query, raw_queryset, target_ms=TARGET_MS):
+        self.query = query
+        self.raw_queryset = raw_queryset
+        self.target_ms = target_ms
+        self.buckets = None
+        self.sample_rows = 0
+        self.elapsed_ms = 0.0
+        self.last_plan = None
+        self._plan_cache = None
+
+    @property
+    def rate(self):
+        return (self.buckets or 0) / SAMPLE_BUCKETS
+
+    def describe(self):
+        """
+        Sampling details for the response
+        """
+        served, windows = self._plan()
+        return {
+            'sample_rate': self.rate,
+            'sample_rows_read': self.sample_rows,
+            'sampled_days': len(served),
+            'exact_windows': len(windows or []),
+            'confidence': 0.95,
+            'elapsed_ms': round(self.elapsed_ms, 1),
+        }
+
+    def aggregate(self, measures, group_by=None):
+        """
+        Estimates for measures, optionally grouped by 'date', 'hour',
+        'client_code', 'payment_mode' or 'pg_name'. Same shape as
+        AggregationRouter.aggregate()
+        """
+        unknown = [m for m in measures if m not in SAMPLE_MEASURES]
+        if unknown or group_by not in (None, *SAMPLE_GROUPS):
+            raise ValueError(f"Unsupported sampled aggregate: {unknown or group_by}")
+
+        started = time_module.monotonic()
+        served, windows = self._plan()
+        self.last_plan = {'sample_days': len(served), 'raw_windows': windows, 'buckets': self.buckets}
+
+        # key -> {measure: [sum, sum of squares]} over sampled rows
+        sampled = {}
+        if served:
+            if self.buckets is None:
+                self._choose_buckets(served, measures, group_by, sampled)
+            else:
+                self._accumulate(sampled, self._sample_rows(served, 0, self.buckets, measures, group_by), measures)
+
+        exact = {}
+        if windows is not None:
+            for key, values in self._raw_rows(windows, measures, group_by):
+                target = exact.setdefault(key, {measure: 0 for measure in measures})
+                for measure in measures:
+                    target[measure] += float(values.get(measure) or 0)
+
+        self.elapsed_ms += (time_module.monotonic() - started) * 1000
+
+        rows = {}
+        for key in set(sampled) | set(exact):
+            rows[key] = self._estimate(sampled.get(key, {}), exact.get(key, {}), measures)
+
+        if group_by is None:
+            return rows.get(None) or self._estimate({}, {}, measures)
+
+        results = []
+        for key in sorted(rows, key=lambda k: (k is None, k)):
+            row = {group_by: key}
+            row.update(rows[key])
+            results.append(row)
+        return results
+
+    # ------------------------------------------------------------------
+    # Planning
+    # ------------------------------------------------------------------
+
+    def _plan(self):
+        """
+        (sampled days, exact raw windows) - days fully inside the range with
+        a built sample are sampled, the rest is read exactly
+        """
+        if self._plan_cache is not None:
+            return self._plan_cache
+
+        from apps.transactions.models_aggregations import TransactionSampleDay
+
+        query = self.query
+        plan = (set(), [(None, None)])
+        if not query.unsupported and query.start is not None:
+            first_day = timezone.localtime(query.start).date()
+            last_day = timezone.localtime(query.end or timezone.now()).date()
+            if first_day <= last_day:
+                first_full, last_full = full_day_bounds(query.start, query.end, first_day, last_day)
+                if first_full is not None:
+                    served = set(
+                        TransactionSampleDay.objects.filter(
+                            date__gte=first_full, date__lte=last_full
+                        ).values_list('date', flat=True)
+                    )
+                    plan = (served, raw_windows(first_day, last_day, served))
+
+        self._plan_cache = plan
+        return plan
+
+    def _choose_buckets(self, served, measures, group_by, sampled):
+        """
+        Time a pilot and widen the sample to fit target_ms; the pilot's
+        buckets are kept and only the added range is read
+        """
+        started = time_module.monotonic()
+        self._accumulate(sampled, self._sample_rows(served, 0, PILOT_BUCKETS, measures, group_by), measures)
+        pilot_ms = max((time_module.monotonic() - started) * 1000, 1.0)
+
+        # Cost grows about linearly with the buckets read; keep some headroom
+        affordable = int(PILOT_BUCKETS * (self.target_ms * 0.8) / pilot_ms)
+        self.buckets = max(PILOT_BUCKETS, min(SAMPLE_MAX_BUCKET, affordable))
+        if self.buckets > PILOT_BUCKETS:
+            self._accumulate(
+                sampled, self._sample_rows(served, PILOT_BUCKETS, self.buckets, measures, group_by), measures
+            )
+        logger.debug(f"Sampled aggregate: pilot {pilot_ms:.1f}ms, using {self.buckets} buckets")
+
+    # ------------------------------------------------------------------
+    # Execution
+    # ------------------------------------------------------------------
+
+    def _sample_rows(self, served, low, high, measures, group_by):
+        from apps.transactions.models_aggregations import TransactionSample
+
+        qs = TransactionSample.objects.filter(bucket__gte=low, bucket__lt=high).filter(
+            self._days_filter(served)
+        ).filter(self.query.summary_filter())
+        if self.query.statuses:
+            qs = qs.filter(status__in=self.query.statuses)
+
+        annotations = {'_rows': Count('id')}
+        for measure in measures:
+            row_filter, column = SAMPLE_MEASURES[measure]
+            if column is None:
+                annotations[measure] = Count('id', filter=row_filter)
+            else:
+                annotations[measure] = Sum(column, filter=row_filter)
+                annotations[f'{measure}__sq'] = Sum(
+                    F(column) * F(column), filter=row_filter, output_field=FloatField()
+                )
+
+        if group_by is None:
+            return [(None, qs.aggregate(**annotations))]
+        column = SAMPLE_GROUPS[group_by][0]
+        return [(row.pop(column), row) for row in qs.values(column).annotate(**annotations).order_by()]
+
+    @staticmethod
+    def _days_filter(served):
+        q = Q()
+        for run_first, run_last in day_runs(sorted(served)):
+            q |= Q(date__gte=run_first, date__lte=run_last)
+        return q
+
+    def _accumulate(self, sampled, rows, measures):
+        for key, values in rows:
+            if key == '':
+                key = None
+            self.sample_rows += values.get('_rows') or 0
+            target = sampled.setdefault(key, {measure: [0.0, 0.0] for measure in measures})
+            for measure in measures:
+                value = float(values.get(measure) or 0)
+                target[measure][0] += value
+                # Counts are sums of 0/1 indicators, so their squares sum to the count
+                target[measure][1] += float(values.get(f'{measure}__sq') or 0) if f'{measure}__sq' in values else value
+
+    def _raw_rows(self, windows, measures, group_by):
+        qs = self.raw_queryset.filter(windows_filter(windows))
+        annotations = {}
+        for measure in measures:
+            row_filter, column = SAMPLE_MEASURES[measure]
+            annotations[measure] = Count('txn_id', filter=row_filter) if column is None \
+                else Sum(column, filter=row_filter)
+
+        if group_by is None:
+            return [(None, qs.aggregate(**annotations))]
+        column, expression = SAMPLE_GROUPS[group_by]
+        grouped = qs.values(**{column: expression()}) if expression else qs.values(column)
+        return [(row.pop(column), row) for row in grouped.annotate(**annotations).order_by()]
+
+    def _estimate(self, sampled, exact, measures):
+        """
+        Scaled sample plus exact part, with 95% margins from the sampled part
+        Var(Y) = (1 - p) / p^2 * sum(y^2) for Bernoulli sampling at rate p
+        """
+        p = self.rate
+        row, margin = {}, {}
+        for measure in measures:
+            total, squares = sampled.get(measure, (0.0, 0.0))
+            estimate = (total / p if p else 0.0) + exact.get(measure, 0)
+            variance = (1 - p) / (p * p) * squares if p else 0.0
+            if measure.endswith('_count'):
+                row[measure] = int(round(estimate))
+                margin[measure] = int(math.ceil(Z_95 * math.sqrt(variance)))
+            else:
+                row[measure] = round(estimate, 2)
+                margin[measure] = round(Z_95 * math.sqrt(variance), 2)
+
+        if 'success_count' in measures and 'total_count' in measures:
+            total = row['total_count']
+            rate = row['success_count'] / total if total else 0.0
+            # Delta method on the sampled rows: sum((y - R x)^2) with y the success indicator
+            successes = sampled.get('success_count', (0.0, 0.0))[0]
+            rows = sampled.get('total_count', (0.0, 0.0))[0]
+            residual = successes * (1 - rate) ** 2 + (rows - successes) * rate ** 2
+            variance = (1 - p) / (p * p) * residual / (total * total) if p and total else 0.0
+            row['success_rate'] = round(rate * 100, 2)
+            margin['success_rate'] = round(Z_95 * math.sqrt(variance) * 100, 2)
+
+        row['margin'] = margin
+        return row
@@ -0,0 +1,378 @@
+"""
+Self-scheduling runner for the aggregation tasks
+Runs the hourly, daily, monthly, cleanup and checksum jobs from
+tasks_aggregation on their schedules without Celery beat
+(manage.py run_aggregation_scheduler). Start it on every app node: a Redis
+lock elects one leader, the others stand by and take over when its lock
+lapses. Every attempt is recorded in scheduled_job_run; slots missed while
+no leader was running are caught up (oldest first, up to the job's
+catch-up limit) and failed slots are retried a few times.
+"""
+from datetime import timedelta
+import logging
+import os
+import random
+import socket
+import threading
+import time as time_module
+import traceback
+
+from django.db import IntegrityError, close_old_connections
+from django.utils import timezone
+
+logger = logging.getLogger('apps.transactions')
+
+LEADER_KEY = 'sabpaisa:scheduler:leader'
+
+
+class Schedule:
+    """
+    Fixed local (IST) slots: hourly at `minute`, daily at `hour`:`minute`,
+    or monthly on `day` at `hour`:`minute`
+    """
+
+    def __init__(self, minute=0, hour=None, day=None):
+        self.minute = minute
+        self.hour = hour
+        self.day = day
+
+    def latest(self, now=None):
+        """
+        Most recent slot at or before `now`
+        """
+        local = timezone.localtime(now)
+        slot = local.replace(minute=self.minute, second=0, microsecond=0)
+        if self.hour is not None:
+            slot = slot.replace(hour=self.hour)
+        if self.day is not None:
+            slot = slot.replace(day=self.day)
+        return slot if slot <= local else self.previous(slot)
+
+    def previous(self, slot):
+        if self.hour is None:
+            return slot - timedelta(hours=1)
+        if self.day is None:
+            return slot - timedelta(days=1)
+        return (slot.replace(day=1) - timedelta(days=1)).replace(day=self.day)
+
+    def __str__(self):
+        if self.hour is None:
+            return f"hourly at :{self.minute:02d}"
+        if self.day is None:
+            return f"daily at {self.hour:02d}:{self.minute:02d}"
+        return f"monthly on day {self.day} at {self.hour:02d}:{self.minute:02d}"
+
+
+class Job:
+    """
+    A scheduled callable taking the slot it runs for
+    """
+
+    def __init__(self, name, schedule, func, description, catch_up=1):
+        self.name = name
+        self.schedule = schedule
+        self.func = func
+        self.description = description
+        self.catch_up = catch_up
+
+
+def _hourly_stats(slot):
+    from apps.transactions.tasks_aggregation import update_hourly_transaction_stats
+
+    # The hour that just closed, then the (partial) hour the slot falls in
+    closed = update_hourly_transaction_stats((slot - timedelta(hours=1)).strftime('%Y-%m-%d %H'))
+    current = update_hourly_transaction_stats(slot.strftime('%Y-%m-%d %H'))
+    return [closed, current]
+
+
+def _daily_summaries(slot):
+    from apps.core.cache import CacheTags
+    from apps.transactions.tasks_aggregation import (
+        QUANTILE_SETTLEMENT_LAG_DAYS, refund_days_to_rebuild, update_daily_transaction_summaries,
+        update_gateway_summaries, update_payment_mode_summaries, update_quantile_sketches,
+        update_refund_summaries, update_summaries_for_day, update_transaction_sample
+    )
+
+    target = slot.date() - timedelta(days=1)
+    result = update_summaries_for_day(str(target))
+    # Status transitions (PENDING -> SUCCESS), settlement flags, settlement
+    # TAT digests and refunds keep filling in after the transaction date
+    for lag in range(1, QUANTILE_SETTLEMENT_LAG_DAYS):
+        day = str(target - timedelta(days=lag))
+        update_daily_transaction_summaries(day)
+        update_payment_mode_summaries(day)
+        update_gateway_summaries(day)
+        update_quantile_sketches(day)
+        update_transaction_sample(day)
+    # Late chargebacks also reach days older than the refund window
+    refund_days = [day for day in refund_days_to_rebuild(target) if day != target]
+    for day in refund_days:
+        update_refund_summaries(str(day))
+    # Cached responses over the rebuilt days (target itself is invalidated
+    # by update_summaries_for_day)
+    CacheTags.invalidate(days=sorted(
+        {target - timedelta(days=lag) for lag in range(1, QUANTILE_SETTLEMENT_LAG_DAYS)} | set(refund_days)
+    ))
+    return {'date': str(target), **result}
+
+
+def _payer_profiles(slot):
+    from apps.transactions.tasks_aggregation import update_payer_profiles
+
+    return update_payer_profiles()
+
+
+def _monthly_stats(slot):
+    from apps.transactions.tasks_aggregation import update_monthly_merchant_stats
+
+    last_month = slot.date().replace(day=1) - timedelta(days=1)
+    return update_monthly_merchant_stats(last_month.year, last_month.month)
+
+
+def _cleanup(slot):
+    from apps.transactions.tasks_aggregation import cleanup_expired_search_cache
+
+    return cleanup_expired_search_cache()
+
+
+def _live_counter_prune(slot):
+    from django.conf import settings
+    from apps.transactions.live_counters import TriggerCounterSource, prune_counters
+
+    if getattr(settings, 'LIVE_COUNTERS', '') != TriggerCounterSource.name:
+        return {'skipped': 'live counters are not trigger-maintained'}
+    deleted, cutoff = prune_counters()
+    return {'deleted': deleted, 'before': str(cutoff)}
+
+
+def _summary_checksum(slot):
+    from apps.transactions.tasks_aggregation import verify_daily_summaries
+
+    return verify_daily_summaries(str(slot.date() - timedelta(days=1)))
+
+
+JOBS = [
+    Job('hourly_stats', Schedule(minute=5), _hourly_stats,
+        'Hourly stats for the closed and the current hour', catch_up=24),
+    Job('daily_summaries', Schedule(minute=30, hour=0), _daily_summaries,
+        "All daily summaries, sketches and cube cuboids for the previous day", catch_up=7),
+    Job('payer_profiles', Schedule(minute=45, hour=0), _payer_profiles,
+        'Re-fold the recent days and fold the closed days not yet applied into the payer profiles'),
+    Job('monthly_stats', Schedule(minute=30, hour=1, day=1), _monthly_stats,
+        'Merchant monthly stats for the previous month', catch_up=2),
+    Job('cleanup', Schedule(minute=0, hour=2), _cleanup,
+        'Delete expired transaction search cache entries'),
+    Job('live_counter_prune', Schedule(minute=15, hour=2), _live_counter_prune,
+        'Delete live transaction counters older than COUNTER_KEEP_DAYS'),
+    Job('summary_checksum', Schedule(minute=0, hour=3), _summary_checksum,
+        'Checksum the last 7 days of summaries and their closed months against raw data, rebuild drifted ones'),
+]
+
+
+class LeaderLock:
+    """
+    Redis lock held by the scheduling node, renewed from a background
+    thread so long jobs don't let it lapse
+    """
+
+    def __init__(self, ttl=120):
+        from django_redis import get_redis_connection
+
+        self.conn = get_redis_connection("default")
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.held = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def acquire(self):
+        """
+        Take the lock, or confirm we still hold it
+        """
+        if self.conn.set(LEADER_KEY, self.owner, nx=True, ex=self.ttl):
+            if not self.held:
+                logger.info(f"Scheduler leadership acquired by {self.owner}")
+            self.held = True
+        else:
+            self.held = self._renew()
+
+        if self.held and (self._thread is None or not self._thread.is_alive()):
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._keep_alive, name='scheduler-leader', daemon=True)
+            self._thread.start()
+        return self.held
+
+    def release(self):
+        self._stop.set()
+        self.conn.eval(
+            "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0",
+            1, LEADER_KEY, self.owner
+        )
+        self.held = False
+
+    def _renew(self):
+        return bool(self.conn.eval(
+            "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('expire', KEYS[1], ARGV[2]) end return 0",
+            1, LEADER_KEY, self.owner, self.ttl
+        ))
+
+    def _keep_alive(self):
+        while not self._stop.wait(self.ttl / 3):
+            try:
+                self.held = self._renew()
+            except Exception as e:
+                logger.warning(f"Scheduler leader renewal failed: {e}")
+                self.held = False
+            if not self.held:
+                logger.warning(f"Scheduler leadership lost by {self.owner}")
+                return
+
+
+class AggregationScheduler:
+    """
+    Leader-elected loop running due JOBS
+
+    Usage:
+        AggregationScheduler().run()           # daemon
+        AggregationScheduler().run_once()      # one pass (cron)
+    """
+
+    def __init__(self, jobs=None, poll_interval=30, jitter=10, max_attempts=3, retry_after=timedelta(minutes=10)):
+        self.jobs = jobs or JOBS
+        self.poll_interval = poll_interval
+        self.jitter = jitter
+        self.max_attempts = max_attempts
+        self.retry_after = retry_after
+        self.lock = None
+        self.stopped = False
+
+    def run(self):
+        """
+        Poll until stop(); only the lock holder runs jobs
+        """
+        self.lock = LeaderLock()
+        # Nodes started together don't all race for the lock at once
+        time_module.sleep(random.uniform(0, self.jitter))
+        try:
+            while not self.stopped:
+                try:
+                    if self.lock.acquire():
+                        self.run_due()
+                except Exception as e:
+                    logger.error(f"Scheduler pass failed: {e}")
+                close_old_connections()
+                time_module.sleep(self.poll_interval + random.uniform(0, self.jitter))
+        finally:
+            self.lock.release()
+
+    def stop(self, *args):
+        self.stopped = True
+
+    def run_once(self, job=None, now=None):
+        """
+        One manual pass under the leader lock: every due slot, or `job` for
+        its latest slot. Returns the runs made, or None while another node
+        holds the lock
+        """
+        self.lock = LeaderLock()
+        if not self.lock.acquire():
+            logger.warning("Scheduler lock held by another node - manual pass not run")
+            return None
+        try:
+            if job is None:
+                return self.run_due(now)
+            return [self.execute(job, job.schedule.latest(timezone.now() if now is None else now))]
+        finally:
+            self.lock.release()
+
+    def run_due(self, now=None):
+        """
+        Run every pending slot of every job, oldest first, while the leader
+        lock is held. Returns the runs made
+        """
+        runs = []
+        for job in self.jobs:
+            for slot in self.pending_slots(job, now):
+                if self.stopped or self.lock is None or not self.lock.held:
+                    return runs
+                runs.append(self.execute(job, slot))
+        return runs
+
+    def pending_slots(self, job, now=None):
+        """
+        Slots of `job` due up to `now` that have not succeeded: the latest
+        plus missed ones back to the last success (at most job.catch_up),
+        skipping slots out of attempts or failed within retry_after
+        """
+        from apps.transactions.models_aggregations import ScheduledJobRun
+
+        slots = [job.schedule.latest(now)]
+        while len(slots) < job.catch_up:
+            slots.append(job.schedule.previous(slots[-1]))
+
+        history = {}
+        for run in ScheduledJobRun.objects.filter(job=job.name, slot__gte=slots[-1]).only(
+            'slot', 'status', 'attempt', 'finished_at', 'started_at'
+        ):
+            history.setdefault(run.slot, []).append(run)
+
+        last_success = ScheduledJobRun.objects.filter(
+            job=job.name, status=ScheduledJobRun.STATUS_SUCCESS
+        ).order_by('-slot').values_list('slot', flat=True).first()
+
+        current = timezone.now() if now is None else now
+        pending = []
+        for slot in slots:
+            if last_success is not None and slot <= last_success:
+                break
+            if last_success is None and slot != slots[0]:
+                # First run ever: start from the latest slot, no backfill
+                break
+            runs = history.get(slot, [])
+            if any(run.status == ScheduledJobRun.STATUS_SUCCESS for run in runs):
+                continue
+            if len(runs) >= self.max_attempts:
+                continue
+            last = max(runs, key=lambda run: run.attempt, default=None)
+            if last is not None and last.status == ScheduledJobRun.STATUS_RUNNING \
+                    and current - last.started_at < timedelta(hours=6):
+                # Still running (or its node died recently) - leave it alone
+                continue
+            if last is not None and last.finished_at and current - last.finished_at < self.retry_after:
+                continue
+            pending.append(slot)
+        return list(reversed(pending))
+
+    def execute(self, job, slot):
+        """
+        Record an attempt at `slot` and run the job; a concurrent attempt
+        on the same slot (split leadership) loses on the unique key
+        """
+        from apps.transactions.models_aggregations import ScheduledJobRun
+
+        attempt = ScheduledJobRun.objects.filter(job=job.name, slot=slot).count() + 1
+        try:
+            run = ScheduledJobRun.objects.create(
+                job=job.name, slot=slot, attempt=attempt,
+                node=self.lock.owner if self.lock else socket.gethostname(),
+                started_at=timezone.now()
+            )
+        except IntegrityError:
+            logger.info(f"Job {job.name} @ {slot} already started elsewhere")
+            return None
+
+        logger.info(f"Running {job.name} for slot {slot} (attempt {attempt})")
+        started = time_module.monotonic()
+        try:
+            run.result = job.func(slot)
+            run.status = ScheduledJobRun.STATUS_SUCCESS
+        except Exception as e:
+            run.status = ScheduledJobRun.STATUS_FAILED
+            run.error = traceback.format_exc()[-4000:]
+            logger.error(f"Job {job.name} for slot {slot} failed: {e}")
+
+        run.finished_at = timezone.now()
+        run.duration_seconds = round(time_module.monotonic() - started, 3)
+        run.save(update_fields=['status', 'result', 'error', 'finished_at', 'duration_seconds'])
+        logger.info(f"{job.name} for slot {slot}: {run.status} in {run.duration_seconds:.1f}s")
+        return run
@@ -0,0 +1,604 @@
+"""
+Sketch-based summaries (unique payers, amount / settlement TAT quantiles,
+top merchants / customers)
+Day-level sketches are built by the aggregation tasks and merged at query
+time, so any date range is answered without a COUNT(DISTINCT) scan.
+Days without sketches (today, partial boundary days, unbuilt days) are read
+from transaction_detail and folded into the same sketches.
+"""
+from datetime import datetime, time, timedelta
+import logging
+import re
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.core.sketches import HyperLogLog, SpaceSaving, TDigest
+from apps.transactions.aggregation_router import full_day_bounds, raw_windows, windows_filter
+
+logger = logging.getLogger('apps.transactions')
+
+# client_code of the per-day all-merchant rows
+ALL_MERCHANTS = '*'
+
+# Entries kept per daily top list (and per merged range summary)
+TOP_MERCHANTS_CAPACITY = 100
+TOP_CUSTOMERS_CAPACITY = 50
+
+_NON_DIGITS = re.compile(r'\D')
+
+
+def payer_email_key(email):
+    """
+    Normalised payer email (None when missing)
+    """
+    if not email:
+        return None
+    email = email.strip().lower()
+    return email or None
+
+
+def payer_mobile_key(mobile):
+    """
+    Normalised payer mobile - digits only, last 10 (drops +91 / 0 prefixes)
+    """
+    if not mobile:
+        return None
+    digits = _NON_DIGITS.sub('', str(mobile))
+    return digits[-10:] or None
+
+
+def settlement_tat_seconds(trans_complete_date, settlement_date):
+    """
+    Settlement turnaround in seconds (None unless both dates are known)
+    """
+    if not trans_complete_date or not settlement_date:
+        return None
+    return (settlement_date - trans_complete_date).total_seconds()
+
+
+def _day_window(day):
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, time.min), tz)
+    return start, start + timedelta(days=1)
+
+
+def _sketch_plan(query, coverage):
+    """
+    (served days, raw windows) for a per-day sketch table - days are served
+    once their all-merchant row in `coverage` (a queryset of the table)
+    exists and they are fully inside the range
+    """
+    if query.start is None:
+        return set(), [(None, None)]
+
+    first_day = timezone.localtime(query.start).date()
+    last_day = timezone.localtime(query.end or timezone.now()).date()
+    if first_day > last_day:
+        return set(), [(None, None)]
+
+    first_full, last_full = full_day_bounds(query.start, query.end, first_day, last_day)
+    if first_full is None:
+        return set(), [(None, None)]
+
+    served = set(
+        coverage.filter(
+            client_code=ALL_MERCHANTS, date__gte=first_full, date__lte=last_full
+        ).values_list('date', flat=True)
+    )
+    return served, raw_windows(first_day, last_day, served)
+
+
+def _sketch_client_codes(query):
+    if query.client_codes is None:
+        return [ALL_MERCHANTS]
+    return ['' if code is None else code for code in query.client_codes]
+
+
+class PayerSketchBuilder:
+    """
+    Builds DailyPayerSketch rows for one local day
+    """
+
+    @staticmethod
+    def build_day(day):
+        """
+        Rebuild the day's payer sketches. Returns the number of merchants
+        """
+        from apps.transactions.models import TransactionDetail
+        from apps.transactions.models_aggregations import DailyPayerSketch
+
+        day_start, day_end = _day_window(day)
+        rows = TransactionDetail.objects.filter(
+            trans_date__gte=day_start, trans_date__lt=day_end
+        ).values_list('client_code', 'payee_email', 'payee_mob').order_by()
+
+        emails = {ALL_MERCHANTS: set()}
+        mobiles = {ALL_MERCHANTS: set()}
+        for client_code, email, mobile in rows.iterator(chunk_size=5000):
+            client_code = client_code or ''
+            email = payer_email_key(email)
+            mobile = payer_mobile_key(mobile)
+            if email:
+                emails.setdefault(client_code, set()).add(email)
+                emails[ALL_MERCHANTS].add(email)
+            if mobile:
+                mobiles.setdefault(client_code, set()).add(mobile)
+                mobiles[ALL_MERCHANTS].add(mobile)
+
+        sketches = []
+        for client_code in set(emails) | set(mobiles):
+            email_values = emails.get(client_code, set())
+            mobile_values = mobiles.get(client_code, set())
+            email_hll, mobile_hll = HyperLogLog(), HyperLogLog()
+            for value in email_values:
+                email_hll.add(value)
+            for value in mobile_values:
+                mobile_hll.add(value)
+            sketches.append(DailyPayerSketch(
+                date=day,
+                client_code=client_code,
+                email_sketch=email_hll.to_bytes(),
+                mobile_sketch=mobile_hll.to_bytes(),
+                email_count=len(email_values),
+                mobile_count=len(mobile_values),
+            ))
+
+        # The all-merchant row is always written - it marks the day as built
+        with transaction.atomic():
+            DailyPayerSketch.objects.filter(date=day).delete()
+            DailyPayerSketch.objects.bulk_create(sketches, batch_size=500)
+
+        return len(sketches) - 1
+
+
+class UniquePayerEstimator:
+    """
+    Unique payers (emails / mobiles) for an AggregateQuery
+
+    Closed days with sketches are merged; the rest of the range is read from
+    the caller's filtered raw queryset. Filters other than merchant and date
+    (status, payment mode, amount, search) make the whole range live.
+
+    Usage:
+        estimate = UniquePayerEstimator(AggregateQuery.from_request(params, user), queryset).estimate()
+        estimate['unique_emails'], estimate['relative_error']
+    """
+
+    def __init__(self, query, raw_queryset):
+        self.query = query
+        self.raw_queryset = raw_queryset
+        self.last_plan = None
+
+    def estimate(self):
+        from apps.transactions.models_aggregations import DailyPayerSketch
+
+        served, windows = self._plan()
+        self.last_plan = {'sketch_days': len(served), 'raw_windows': windows}
+
+        email_hll, mobile_hll = HyperLogLog(), HyperLogLog()
+
+        if served:
+            sketches = DailyPayerSketch.objects.filter(
+                date__in=sorted(served), client_code__in=_sketch_client_codes(self.query)
+            ).values_list('email_sketch', 'mobile_sketch')
+            for email_sketch, mobile_sketch in sketches.iterator():
+                email_hll.merge_bytes(email_sketch)
+                mobile_hll.merge_bytes(mobile_sketch)
+
+        if windows is not None:
+            rows = self.raw_queryset.filter(windows_filter(windows)).values_list(
+                'payee_email', 'payee_mob'
+            ).order_by()
+            for email, mobile in rows.iterator(chunk_size=5000):
+                email = payer_email_key(email)
+                mobile = payer_mobile_key(mobile)
+                if email:
+                    email_hll.add(email)
+                if mobile:
+                    mobile_hll.add(mobile)
+
+        return {
+            'unique_emails': email_hll.count(),
+            'unique_mobiles': mobile_hll.count(),
+            'relative_error': round(email_hll.standard_error, 4),
+        }
+
+    def _plan(self):
+        from apps.transactions.models_aggregations import DailyPayerSketch
+
+        query = self.query
+        if query.payment_modes or query.payment_mode_contains or query.statuses or query.unsupported:
+            return set(), [(None, None)]
+        return _sketch_plan(query, DailyPayerSketch.objects.all())
+
+
+class QuantileSketchBuilder:
+    """
+    Builds DailyQuantileSketch rows for one local day
+    """
+
+    @staticmethod
+    def build_day(day):
+        """
+        Rebuild the day's amount / TAT digests. Returns the number of merchants
+        """
+        from apps.transactions.models import TransactionDetail
+        from apps.transactions.models_aggregations import DailyQuantileSketch
+
+        day_start, day_end = _day_window(day)
+        rows = TransactionDetail.objects.filter(
+            trans_date__gte=day_start, trans_date__lt=day_end, status='SUCCESS'
+        ).values_list(
+            'client_code', 'paid_amount', 'is_settled', 'trans_complete_date', 'settlement_date'
+        ).order_by()
+
+        amounts = {ALL_MERCHANTS: TDigest()}
+        tats = {ALL_MERCHANTS: TDigest()}
+        for client_code, amount, is_settled, completed, settled in rows.iterator(chunk_size=5000):
+            client_code = client_code or ''
+            if amount is not None:
+                amounts.setdefault(client_code, TDigest()).add(amount)
+                amounts[ALL_MERCHANTS].add(amount)
+            tat = settlement_tat_seconds(completed, settled) if is_settled else None
+            if tat is not None:
+                tats.setdefault(client_code, TDigest()).add(tat)
+                tats[ALL_MERCHANTS].add(tat)
+
+        sketches = []
+        for client_code in set(amounts) | set(tats):
+            amount_digest = amounts.get(client_code) or TDigest()
+            tat_digest = tats.get(client_code) or TDigest()
+            sketches.append(DailyQuantileSketch(
+                date=day,
+                client_code=client_code,
+                amount_digest=amount_digest.to_bytes(),
+                tat_digest=tat_digest.to_bytes(),
+                amount_count=amount_digest.count,
+                tat_count=tat_digest.count,
+            ))
+
+        # The all-merchant row is always written - it marks the day as built
+        with transaction.atomic():
+            DailyQuantileSketch.objects.filter(date=day).delete()
+            DailyQuantileSketch.objects.bulk_create(sketches, batch_size=500)
+
+        return len(sketches) - 1
+
+
+class QuantileEstimator:
+    """
+    Percentiles of ticket size (paid_amount) and settlement TAT for an
+    AggregateQuery, over SUCCESS transactions
+
+    Closed days with digests are merged; the rest of the range is read from
+    the caller's filtered raw queryset. Status filters other than SUCCESS,
+    payment mode and unsupported filters make the whole range live.
+
+    Usage:
+        estimator = QuantileEstimator(AggregateQuery.from_request(params, user), queryset)
+        estimator.percentiles('tat', scale=1 / 3600)  # hours
+    """
+
+    PERCENTILES = (50, 90, 99)
+    METRICS = ('amount', 'tat')
+
+    def __init__(self, query, raw_queryset):
+        self.query = query
+        self.raw_queryset = raw_queryset
+        self.last_plan = None
+        self._digests = None
+
+    def digests(self):
+        """
+        {'amount': TDigest, 'tat': TDigest} for the query range
+        """
+        if self._digests is not None:
+            return self._digests
+
+        from apps.transactions.models_aggregations import DailyQuantileSketch
+
+        served, windows = self._plan()
+        self.last_plan = {'sketch_days': len(served), 'raw_windows': windows}
+
+        amount_digest, tat_digest = TDigest(), TDigest()
+
+        if served:
+            sketches = DailyQuantileSketch.objects.filter(
+                date__in=sorted(served), client_code__in=_sketch_client_codes(self.query)
+            ).values_list('amount_digest', 'tat_digest')
+            for amount_sketch, tat_sketch in sketches.iterator():
+                amount_digest.merge_bytes(amount_sketch)
+                tat_digest.merge_bytes(tat_sketch)
+
+        if windows is not None:
+            rows = self.raw_queryset.filter(windows_filter(windows), status='SUCCESS').values_list(
+                'paid_amount', 'is_settled', 'trans_complete_date', 'settlement_date'
+            ).order_by()
+            for amount, is_settled, completed, settled in rows.iterator(chunk_size=5000):
+                amount_digest.add(amount)
+                if is_settled:
+                    tat_digest.add(settlement_tat_seconds(completed, settled))
+
+        self._digests = {'amount': amount_digest, 'tat': tat_digest}
+        return self._digests
+
+    def percentiles(self, metric, scale=1.0):
+        """
+        {'p50', 'p90', 'p99', 'mean', 'count'} for one metric, values
+        multiplied by scale (e.g. 1 / 3600 for TAT in hours)
+        """
+        if metric not in self.METRICS:
+            raise ValueError(f"Unknown quantile metric: {metric}")
+
+        digest = self.digests()[metric]
+        result = {
+            f'p{p}': self._scaled(digest.quantile(p / 100), scale) for p in self.PERCENTILES
+        }
+        result['mean'] = self._scaled(digest.mean, scale)
+        result['count'] = digest.count
+        return result
+
+    @staticmethod
+    def _scaled(value, scale):
+        return round(value * scale, 2) if value is not None else None
+
+    def _plan(self):
+        from apps.transactions.models_aggregations import DailyQuantileSketch
+
+        query = self.query
+        if query.payment_modes or query.payment_mode_contains or query.unsupported \
+                or (query.statuses and list(query.statuses) != ['SUCCESS']):
+            return set(), [(None, None)]
+        return _sketch_plan(query, DailyQuantileSketch.objects.all())
+
+
+def _merchant_totals(queryset):
+    """
+    Exact (client_code, volume, count) and names for SUCCESS rows
+    """
+    from django.db.models import Count, Max, Sum
+
+    rows = queryset.filter(status='SUCCESS').values('client_code').annotate(
+        volume=Sum('paid_amount'), count=Count('txn_id'), name=Max('client_name')
+    ).order_by()
+    items, labels = [], {}
+    for row in rows:
+        code = row['client_code'] or ''
+        items.append((code, float(row['volume'] or 0), row['count']))
+        labels[code] = row['name']
+    return items, labels
+
+
+def _customer_totals(queryset):
+    """
+    Exact per-merchant {client_code: {email: [volume, count]}} for SUCCESS rows
+    """
+    from django.db.models import Count, Sum
+
+    rows = queryset.filter(status='SUCCESS', payee_email__isnull=False).values(
+        'client_code', 'payee_email'
+    ).annotate(volume=Sum('paid_amount'), count=Count('txn_id')).order_by()
+    totals = {}
+    for row in rows:
+        email = payer_email_key(row['payee_email'])
+        if not email:
+            continue
+        customer = totals.setdefault(row['client_code'] or '', {}).setdefault(email, [0.0, 0])
+        customer[0] += float(row['volume'] or 0)
+        customer[1] += row['count']
+    return totals
+
+
+class HeavyHitterBuilder:
+    """
+    Builds DailyTopList rows (exact daily top merchants / customers)
+    """
+
+    @staticmethod
+    def build_day(day):
+        """
+        Rebuild the day's top lists. Returns the number of lists written
+        """
+        from apps.transactions.models import TransactionDetail
+        from apps.transactions.models_aggregations import DailyTopList
+
+        day_start, day_end = _day_window(day)
+        queryset = TransactionDetail.objects.filter(trans_date__gte=day_start, trans_date__lt=day_end)
+
+        merchant_items, merchant_names = _merchant_totals(queryset)
+        merchants = SpaceSaving.from_exact(merchant_items, TOP_MERCHANTS_CAPACITY)
+        lists = [DailyTopList(
+            date=day,
+            kind=DailyTopList.KIND_MERCHANT,
+            client_code=ALL_MERCHANTS,
+            entries=merchants.to_entries(),
+            floor=merchants.floor,
+            key_count=len(merchant_items),
+            labels={code: merchant_names.get(code) for code in merchants.counters},
+        )]
+
+        customer_totals = _customer_totals(queryset)
+        all_customers = {}
+        for client_code, customers in customer_totals.items():
+            for email, (volume, count) in customers.items():
+                total = all_customers.setdefault(email, [0.0, 0])
+                total[0] += volume
+                total[1] += count
+        customer_totals[ALL_MERCHANTS] = all_customers
+
+        for client_code, customers in customer_totals.items():
+            capacity = TOP_MERCHANTS_CAPACITY if client_code == ALL_MERCHANTS else TOP_CUSTOMERS_CAPACITY
+            summary = SpaceSaving.from_exact(
+                [(email, volume, count) for email, (volume, count) in customers.items()], capacity
+            )
+            lists.append(DailyTopList(
+                date=day,
+                kind=DailyTopList.KIND_CUSTOMER,
+                client_code=client_code,
+                entries=summary.to_entries(),
+                floor=summary.floor,
+                key_count=len(customers),
+            ))
+
+        # Both all-merchant lists are always written - they mark the day as built
+        with transaction.atomic():
+            DailyTopList.objects.filter(date=day).delete()
+            DailyTopList.objects.bulk_create(lists, batch_size=500)
+
+        return len(lists)
+
+
+class TopListEstimator:
+    """
+    Top merchants / customers by SUCCESS volume for an AggregateQuery
+
+    Closed days merge their DailyTopList summaries (at most one small list
+    per day and merchant); the rest of the range is aggregated live. Top
+    merchants are then re-totalled exactly through the AggregationRouter for
+    the few candidate codes. Status filters other than SUCCESS, payment mode
+    and unsupported filters make the whole range live.
+
+    Usage:
+        estimator = TopListEstimator(AggregateQuery(start, end), queryset)
+        estimator.top_merchants(10)
+        estimator.top_customers(10)
+    """
+
+    def __init__(self, query, raw_queryset):
+        self.query = query
+        self.raw_queryset = raw_queryset
+        self.last_plan = None
+
+    def top_merchants(self, n=10):
+        """
+        [{'client_code', 'client_name', 'volume', 'count'}] - exact totals
+        """
+        from apps.transactions.aggregation_router import AggregateQuery, AggregationRouter
+        from apps.transactions.models_aggregations import DailyTopList
+
+        if self.query.client_codes is not None:
+            # Already a handful of merchants - total them directly
+            candidates, labels = list(self.query.client_codes), {}
+        else:
+            summary, labels = self._summary(DailyTopList.KIND_MERCHANT, TOP_MERCHANTS_CAPACITY)
+            # Rows without a client code are not a merchant but may hold a top slot
+            candidates = [code for code in summary.candidates(n + 1) if code]
+            if not summary.is_exact_for(n):
+                logger.debug(f"Top {n} merchants: list floor {summary.floor} may hide candidates")
+
+        if not candidates:
+            return []
+
+        query = AggregateQuery(
+            self.query.start, self.query.end,
+            client_codes=candidates,
+            payment_modes=self.query.payment_modes,
+            payment_mode_contains=self.query.payment_mode_contains,
+            statuses=self.query.statuses,
+            unsupported=self.query.unsupported,
+        )
+        rows = AggregationRouter(query, self.raw_queryset.filter(client_code__in=candidates)).aggregate(
+            ['success_count', 'success_amount'], group_by='client_code'
+        )
+        return self.rank_merchants(rows, n, labels)
+
+    @staticmethod
+    def rank_merchants(rows, n, labels=None):
+        """
+        Top n of exact router rows grouped by client_code (with
+        success_count / success_amount), shaped like top_merchants()
+        """
+        labels = dict(labels or {})
+        rows = sorted(
+            [row for row in rows if row['client_code'] and row['success_count'] > 0],
+            key=lambda row: row['success_amount'],
+            reverse=True
+        )[:n]
+
+        missing = [row['client_code'] for row in rows if not labels.get(row['client_code'])]
+        if missing:
+            from apps.transactions.models import ClientDataTable
+            labels.update(
+                ClientDataTable.objects.filter(client_code__in=missing).values_list('client_code', 'client_name')
+            )
+
+        return [
+            {
+                'client_code': row['client_code'],
+                'client_name': labels.get(row['client_code']),
+                'volume': float(row['success_amount'] or 0),
+                'count': row['success_count'],
+            }
+            for row in rows
+        ]
+
+    def top_customers(self, n=10):
+        """
+        [{'email', 'transaction_count', 'total_amount'}] - amounts are the
+        guaranteed part of the merged summary (exact unless a daily list
+        was truncated)
+        """
+        from apps.transactions.models_aggregations import DailyTopList
+
+        summary, _ = self._summary(DailyTopList.KIND_CUSTOMER, TOP_MERCHANTS_CAPACITY)
+        candidates = set(summary.candidates(n))
+        ranked = sorted(
+            [(key, weight - error, hits) for key, weight, error, hits in summary.top() if key in candidates],
+            key=lambda item: item[1],
+            reverse=True
+        )[:n]
+        return [
+            {'email': email, 'transaction_count': hits, 'total_amount': round(volume, 2)}
+            for email, volume, hits in ranked
+        ]
+
+    def _summary(self, kind, capacity):
+        """
+        Merged SpaceSaving summary (and merchant labels) for the query range
+        """
+        from apps.transactions.models_aggregations import DailyTopList
+
+        served, windows = self._plan()
+        self.last_plan = {'list_days': len(served), 'raw_windows': windows}
+
+        summary, labels = SpaceSaving(capacity), {}
+
+        if served:
+            if kind == DailyTopList.KIND_MERCHANT:
+                client_codes = [ALL_MERCHANTS]
+            else:
+                client_codes = _sketch_client_codes(self.query)
+            lists = DailyTopList.objects.filter(
+                kind=kind, date__in=sorted(served), client_code__in=client_codes
+            ).values_list('entries', 'floor', 'labels').order_by('date')
+            for entries, floor, day_labels in lists.iterator():
+                summary.merge(SpaceSaving.from_entries(entries, floor, capacity))
+                labels.update(day_labels or {})
+
+        if windows is not None:
+            live = self.raw_queryset.filter(windows_filter(windows))
+            if kind == DailyTopList.KIND_MERCHANT:
+                items, live_labels = _merchant_totals(live)
+                labels.update(live_labels)
+            else:
+                items = {}
+                for customers in _customer_totals(live).values():
+                    for email, (volume, count) in customers.items():
+                        total = items.setdefault(email, [0.0, 0])
+                        total[0] += volume
+                        total[1] += count
+                items = [(email, volume, count) for email, (volume, count) in items.items()]
+            summary.merge(SpaceSaving.from_exact(items, max(capacity, len(items))))
+
+        return summary, labels
+
+    def _plan(self):
+        from apps.transactions.models_aggregations import DailyTopList
+
+        query = self.query
+        if query.payment_modes or query.payment_mode_contains or query.unsupported \
+                or (query.statuses and list(query.statuses) != ['SUCCESS']):
+            return set(), [(None, None)]
+        return _sketch_plan(query, DailyTopList.objects.filter(kind=DailyTopList.KIND_MERCHANT))
+
@@ -2,15 +2,51 @@
 Celery tasks for maintaining aggregation tables
 Runs periodically to pre-calculate statistics for fast queries
 """
-from celery import shared_task
+try:
+    from celery import shared_task
+except ImportError:
+    # Celery is optional (config/__init__.py) - without it the tasks are
+    # plain functions, run by run_aggregation_scheduler
+    def shared_task(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
 from django.db import transaction, connection
-from django.db.models import Count, Sum, Avg, Q, F
+from django.db.models import Count, Sum, Avg, Max, Q, F
 from django.utils import timezone
 from datetime import datetime, timedelta, date
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Days rebuilt by the scheduled quantile task (settlements land T+1 / T+2)
+QUANTILE_SETTLEMENT_LAG_DAYS = 3
+
+# Per-merchant measures checksummed by verify_daily_summaries against
+# DailyTransactionSummary and MerchantMonthlyStats columns of the same name
+DAILY_CHECKSUM_MEASURES = {
+    'total_count': Count('txn_id'),
+    'success_count': Count('txn_id', filter=Q(status='SUCCESS')),
+    'failed_count': Count('txn_id', filter=Q(status='FAILED')),
+    'pending_count': Count('txn_id', filter=Q(status='PENDING')),
+    'settled_count': Count('txn_id', filter=Q(is_settled=True)),
+    'total_amount': Sum('paid_amount'),
+    'success_amount': Sum('paid_amount', filter=Q(status='SUCCESS')),
+    'failed_amount': Sum('paid_amount', filter=Q(status='FAILED')),
+    'settled_amount': Sum('settlement_amount', filter=Q(is_settled=True)),
+}
+MONTHLY_CHECKSUM_MEASURES = (
+    'total_count', 'success_count', 'failed_count', 'total_amount', 'success_amount', 'settled_amount'
+)
+
+# Days rebuilt by the scheduled refund task - refunds and chargebacks are
+# recorded against the transaction date, often weeks later
+REFUND_SUMMARY_LAG_DAYS = 30
+
+# Older transaction days are rebuilt when a refund or chargeback dated within
+# this many days lands on them (chargebacks arrive months later)
+REFUND_EVENT_LOOKBACK_DAYS = 7
+
 
 @shared_task(name='update_daily_summaries')
 def update_daily_transaction_summaries(date_str: str = None):
@@ -27,20 +63,23 @@ def update_daily_transaction_summaries(date_str: str = None):
     if date_str:
         target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
     else:
-        # Default to yesterday
-        target_date = (timezone.now() - timedelta(days=1)).date()
+        # Default to yesterday (local date - summaries are keyed by IST day)
+        target_date = timezone.localdate() - timedelta(days=1)
 
     logger.info(f"Updating daily summaries for {target_date}")
 
     start_time = timezone.now()
+    day_start = timezone.make_aware(datetime.combine(target_date, datetime.min.time()))
+    day_end = day_start + timedelta(days=1)
 
-    # Get all transactions for the target date
-    transactions = TransactionDetail.objects.filter(
-        trans_date__date=target_date
-    )
+    # Get all transactions for the target date (a range on trans_date keeps the index usable)
+    transactions = TransactionDetail.objects.filter(trans_date__gte=day_start, trans_date__lt=day_end)
 
     # Group by client_code and calculate aggregations
-    summary_data = transactions.values('client_code', 'client_name').annotate(
+    # (client_name is not grouped on - a renamed merchant would split into
+    # two groups and the second would overwrite the first)
+    summary_data = transactions.values('client_code').annotate(
+        client_name=Max('client_name'),
         total_count=Count('txn_id'),
         success_count=Count('txn_id', filter=Q(status='SUCCESS')),
         failed_count=Count('txn_id', filter=Q(status='FAILED')),
@@ -62,9 +101,9 @@ def update_daily_transaction_summaries(date_str: str = None):
     summaries_updated = 0
 
     for data in summary_data:
-        client_code = data['client_code']
-        if not client_code:
-            continue
+        # Transactions without a client code are kept under '' so that
+        # all-merchant totals read from summaries match the raw table
+        client_code = data['client_code'] or ''
 
         # Calculate unsettled amount
         unsettled_amount = (data['success_amount'] or 0) - (data['settled_amount'] or 0)
@@ -123,13 +162,13 @@ def update_payment_mode_summaries(date_str: str = None):
     if date_str:
         target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
     else:
-        target_date = (timezone.now() - timedelta(days=1)).date()
+        target_date = timezone.localdate() - timedelta(days=1)
 
     logger.info(f"Updating payment mode summaries for {target_date}")
 
-    transactions = TransactionDetail.objects.filter(
-        trans_date__date=target_date
-    )
+    day_start = timezone.make_aware(datetime.combine(target_date, datetime.min.time()))
+    day_end = day_start + timedelta(days=1)
+    transactions = TransactionDetail.objects.filter(trans_date__gte=day_start, trans_date__lt=day_end)
 
     # Group by client_code and payment_mode
     summary_data = transactions.values('client_code', 'payment_mode').annotate(
@@ -144,13 +183,11 @@ def update_payment_mode_summaries(date_str: str = None):
     summaries_processed = 0
 
     for data in summary_data:
-        if not data['client_code'] or not data['payment_mode']:
-            continue
-
+        # Missing client code / payment mode kept under '' (see daily summaries)
         PaymentModeSummary.objects.update_or_create(
             date=target_date,
-            client_code=data['client_code'],
-            payment_mode=data['payment_mode'],
+            client_code=data['client_code'] or '',
+            payment_mode=data['payment_mode'] or '',
             defaults={
                 'total_count': data['total_count'] or 0,
                 'success_count': data['success_count'] or 0,
@@ -166,16 +203,352 @@ def update_payment_mode_summaries(date_str: str = None):
     return {'date': str(target_date), 'processed': summaries_processed}
 
 
+@shared_task(name='update_gateway_summaries')
+def update_gateway_summaries(date_str: str = None):
+    """
+    Rebuild the gateway (pg_name) summary for one local day
+    If no date provided, updates yesterday's data
+    """
+    from apps.transactions.models import TransactionDetail
+    from apps.transactions.models_aggregations import GatewayDailySummary
+
+    if date_str:
+        target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+    else:
+        target_date = timezone.localdate() - timedelta(days=1)
+
+    logger.info(f"Updating gateway summaries for {target_date}")
+
+    start_time = timezone.now()
+    day_start = timezone.make_aware(datetime.combine(target_date, datetime.min.time()))
+    day_end = day_start + timedelta(days=1)
+
+    # A range on trans_date itself keeps the index usable (__date wraps it in CONVERT_TZ)
+    transactions = TransactionDetail.objects.filter(trans_date__gte=day_start, trans_date__lt=day_end)
+
+    summary_data = transactions.values('client_code', 'pg_name', 'payment_mode').annotate(
+        total_count=Count('txn_id'),
+        success_count=Count('txn_id', filter=Q(status='SUCCESS')),
+        failed_count=Count('txn_id', filter=Q(status='FAILED')),
+        pending_count=Count('txn_id', filter=Q(status='PENDING')),
+        total_amount=Sum('paid_amount'),
+        success_amount=Sum('paid_amount', filter=Q(status='SUCCESS')),
+        failed_amount=Sum('paid_amount', filter=Q(status='FAILED')),
+        settled_count=Count('txn_id', filter=Q(is_settled=True)),
+        settled_amount=Sum('settlement_amount', filter=Q(is_settled=True)),
+        success_settled_count=Count('txn_id', filter=Q(is_settled=True, status='SUCCESS')),
+        success_settled_amount=Sum('settlement_amount', filter=Q(is_settled=True, status='SUCCESS')),
+    ).order_by()
+
+    # Rebuilt wholesale so groups that no longer exist don't linger
+    summaries = [
+        GatewayDailySummary(
+            date=target_date,
+            client_code=data['client_code'] or '',
+            pg_name=data['pg_name'] or '',
+            payment_mode=data['payment_mode'] or '',
+            total_count=data['total_count'] or 0,
+            success_count=data['success_count'] or 0,
+            failed_count=data['failed_count'] or 0,
+            pending_count=data['pending_count'] or 0,
+            total_amount=data['total_amount'] or 0,
+            success_amount=data['success_amount'] or 0,
+            failed_amount=data['failed_amount'] or 0,
+            settled_count=data['settled_count'] or 0,
+            settled_amount=data['settled_amount'] or 0,
+            success_settled_count=data['success_settled_count'] or 0,
+            success_settled_amount=data['success_settled_amount'] or 0,
+        )
+        for data in summary_data
+    ]
+
+    with transaction.atomic():
+        GatewayDailySummary.objects.filter(date=target_date).delete()
+        GatewayDailySummary.objects.bulk_create(summaries, batch_size=1000)
+
+    duration = (timezone.now() - start_time).total_seconds()
+
+    logger.info(
+        f"Gateway summary update completed for {target_date} in {duration:.2f}s | "
+        f"Rows: {len(summaries)}"
+    )
+
+    return {
+        'date': str(target_date),
+        'processed': len(summaries),
+        'duration_seconds': duration
+    }
+
+
+@shared_task(name='update_settlement_summaries')
+def update_settlement_summaries(date_str: str = None):
+    """
+    Rebuild the settlement summary for one settlement date (local day)
+    If no date provided, updates yesterday's settlements
+    """
+    from apps.transactions.models import TransactionDetail
+    from apps.transactions.models_aggregations import DailySettlementSummary
+    from apps.transactions.aggregation_router import (
+        settlement_charges_expression, settlement_effective_expression
+    )
+
+    if date_str:
+        target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+    else:
+        target_date = timezone.localdate() - timedelta(days=1)
+
+    logger.info(f"Updating settlement summaries for {target_date}")
+
+    start_time = timezone.now()
+    day_start = timezone.make_aware(datetime.combine(target_date, datetime.min.time()))
+    day_end = day_start + timedelta(days=1)
+
+    settlements = TransactionDetail.objects.filter(
+        is_settled=True,
+        settlement_date__gte=day_start,
+        settlement_date__lt=day_end
+    )
+
+    summary_data = settlements.values('client_code', 'settlement_status', 'pg_name').annotate(
+        client_name=Max('client_name'),
+        settled_count=Count('txn_id'),
+        gross_amount=Sum('settlement_amount'),
+        convcharges_sum=Sum('convcharges'),
+        ep_charges_sum=Sum('ep_charges'),
+        gst_sum=Sum('gst'),
+        charges_amount=Sum(settlement_charges_expression()),
+        effective_amount=Sum(settlement_effective_expression()),
+    ).order_by()
+
+    # Rebuilt wholesale so groups that no longer exist don't linger
+    summaries = [
+        DailySettlementSummary(
+            settlement_date=target_date,
+            client_code=data['client_code'] or '',
+            client_name=data['client_name'],
+            settlement_status=data['settlement_status'] or '',
+            pg_name=data['pg_name'] or '',
+            settled_count=data['settled_count'] or 0,
+            gross_amount=data['gross_amount'] or 0,
+            convcharges=data['convcharges_sum'] or 0,
+            ep_charges=data['ep_charges_sum'] or 0,
+            gst=data['gst_sum'] or 0,
+            charges_amount=data['charges_amount'] or 0,
+            effective_amount=data['effective_amount'] or 0,
+        )
+        for data in summary_data
+    ]
+
+    with transaction.atomic():
+        DailySettlementSummary.objects.filter(settlement_date=target_date).delete()
+        DailySettlementSummary.objects.bulk_create(summaries, batch_size=1000)
+
+    duration = (timezone.now() - start_time).total_seconds()
+
+    logger.info(
+        f"Settlement summary update completed for {target_date} in {duration:.2f}s | "
+        f"Rows: {len(summaries)}"
+    )
+
+    return {
+        'date': str(target_date),
+        'processed': len(summaries),
+        'duration_seconds': duration
+    }
+
+
+@shared_task(name='update_payer_sketches')
+def update_payer_sketches(date_str: str = None):
+    """
+    Rebuild unique-payer HyperLogLog sketches for one local day
+    If no date provided, updates yesterday's data
+    """
+    from apps.transactions.sketch_summaries import PayerSketchBuilder
+
+    if date_str:
+        target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+    else:
+        target_date = timezone.localdate() - timedelta(days=1)
+
+    start_time = timezone.now()
+    merchants = PayerSketchBuilder.build_day(target_date)
+    duration = (timezone.now() - start_time).total_seconds()
+
+    logger.info(f"Payer sketches updated for {target_date} in {duration:.2f}s | Merchants: {merchants}")
+
+    return {
+        'date': str(target_date),
+        'processed': merchants,
+        'duration_seconds': duration
+    }
+
+
+@shared_task(name='update_quantile_sketches')
+def update_quantile_sketches(date_str: str = None):
+    """
+    Rebuild ticket-size and settlement-TAT t-digests for one local day
+    If no date provided, rebuilds the last QUANTILE_SETTLEMENT_LAG_DAYS days -
+    a day's TAT digest keeps changing until its transactions are settled
+    """
+    from apps.transactions.sketch_summaries import QuantileSketchBuilder
+
+    if date_str:
+        target_dates = [datetime.strptime(date_str, '%Y-%m-%d').date()]
+    else:
+        yesterday = timezone.localdate() - timedelta(days=1)
+        target_dates = [yesterday - timedelta(days=offset) for offset in range(QUANTILE_SETTLEMENT_LAG_DAYS)]
+
+    start_time = timezone.now()
+    merchants = sum(QuantileSketchBuilder.build_day(target_date) for target_date in target_dates)
+    duration = (timezone.now() - start_time).total_seconds()
+
+    logger.info(
+        f"Quantile sketches updated for {', '.join(str(d) for d in target_dates)} "
+        f"in {duration:.2f}s | Merchant days: {merchants}"
+    )
+
+    return {
+        'date': str(target_dates[0]),
+        'processed': merchants,
+        'duration_seconds': duration
+    }
+
+
+@shared_task(name='update_top_lists')
+def update_top_lists(date_str: str = None):
+    """
+    Rebuild exact daily top merchant / customer lists for one local day
+    If no date provided, updates yesterday's data
+    """
+    from apps.transactions.sketch_summaries import HeavyHitterBuilder
+
+    if date_str:
+        target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+    else:
+        target_date = timezone.localdate() - timedelta(days=1)
+
+    start_time = timezone.now()
+    lists = HeavyHitterBuilder.build_day(target_date)
+    duration = (timezone.now() - start_time).total_seconds()
+
+    logger.info(f"Top lists updated for {target_date} in {duration:.2f}s | Lists: {lists}")
+
+    return {
+        'date': str(target_date),
+        'processed': lists,
+        'duration_seconds': duration
+    }
+
+
+def refund_days_to_rebuild(end_date):
+    """
+    Transaction days whose refund summaries the scheduled run rebuilds:
+    the REFUND_SUMMARY_LAG_DAYS ending on end_date, plus older days that
+    received a refund or chargeback in the last REFUND_EVENT_LOOKBACK_DAYS
+    """
+    from apps.transactions.refund_reasons import refund_event_days
+
+    days = {end_date - timedelta(days=offset) for offset in range(REFUND_SUMMARY_LAG_DAYS)}
+    late = refund_event_days(end_date - timedelta(days=REFUND_EVENT_LOOKBACK_DAYS))
+    days |= {day for day in late if day <= end_date}
+    return sorted(days, reverse=True)
+
+
+@shared_task(name='update_refund_summaries')
+def update_refund_summaries(date_str: str = None):
+    """
+    Rebuild refund / chargeback reason summaries for one local transaction day
+    If no date provided, rebuilds refund_days_to_rebuild(yesterday)
+    """
+    from apps.transactions.refund_reasons import RefundSummaryBuilder
+
+    if date_str:
+        target_dates = [datetime.strptime(date_str, '%Y-%m-%d').date()]
+    else:
+        target_dates = refund_days_to_rebuild(timezone.localdate() - timedelta(days=1))
+
+    start_time = timezone.now()
+    rows = sum(RefundSummaryBuilder.build_day(target_date) for target_date in target_dates)
+    duration = (timezone.now() - start_time).total_seconds()
+
+    logger.info(
+        f"Refund summaries updated for {len(target_dates)} day(s) from {target_dates[-1]} "
+        f"in {duration:.2f}s | Rows: {rows}"
+    )
+
+    return {
+        'date': str(target_dates[0]),
+        'processed': rows,
+        'duration_seconds': duration
+    }
+
+
+@shared_task(name='update_transaction_sample')
+def update_transaction_sample(date_str: str = None):
+    """
+    Rebuild the approximate-analytics transaction sample for one local day
+    If no date provided, updates yesterday's data
+    """
+    from apps.transactions.sampling import SampleBuilder
+
+    if date_str:
+        target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+    else:
+        target_date = timezone.localdate() - timedelta(days=1)
+
+    start_time = timezone.now()
+    rows = SampleBuilder.build_day(target_date)
+    duration = (timezone.now() - start_time).total_seconds()
+
+    logger.info(f"Transaction sample updated for {target_date} in {duration:.2f}s | Rows: {rows}")
+
+    return {
+        'date': str(target_date),
+        'processed': rows,
+        'duration_seconds': duration
+    }
+
+
+@shared_task(name='update_payer_profiles')
+def update_payer_profiles():
+    """
+    Re-fold the recent days and fold the closed days not yet applied into
+    the payer profiles
+    """
+    from apps.core.cache import CacheTags
+    from apps.transactions.payer_profiles import PayerProfileBuilder
+
+    start_time = timezone.now()
+    applied = PayerProfileBuilder.catch_up()
+    duration = (timezone.now() - start_time).total_seconds()
+    # Re-folded days change the profiles even when no new day was applied
+    CacheTags.invalidate(tables=['payer_profile'])
+
+    logger.info(f"Payer profiles caught up {len(applied)} day(s) in {duration:.2f}s")
+
+    return {
+        'days': [str(day) for day in applied],
+        'duration_seconds': duration
+    }
+
+
 @shared_task(name='update_hourly_stats')
-def update_hourly_transaction_stats():
+def update_hourly_transaction_stats(hour_str: str = None):
     """
-    Update hourly statistics for the current hour
+    Update hourly statistics for one IST hour ('YYYY-MM-DD HH')
+    If no hour provided, updates the current hour
     Should run every hour
     """
     from apps.transactions.models import TransactionDetail
     from apps.transactions.models_aggregations import HourlyTransactionStats
 
-    current_time = timezone.now()
+    # Buckets are IST date / hour, like every other summary
+    if hour_str:
+        current_time = timezone.make_aware(
+            datetime.strptime(hour_str, '%Y-%m-%d %H'), timezone.get_current_timezone()
+        )
+    else:
+        current_time = timezone.localtime()
     current_date = current_time.date()
     current_hour = current_time.hour
 
@@ -250,10 +623,11 @@ def update_monthly_merchant_stats(year: int = None, month: int = None):
     """
     from apps.transactions.models import TransactionDetail
     from apps.transactions.models_aggregations import MerchantMonthlyStats
+    from apps.transactions.payer_profiles import monthly_active_payers
 
     if year is None or month is None:
         # Default to last month
-        last_month = timezone.now().replace(day=1) - timedelta(days=1)
+        last_month = timezone.localdate().replace(day=1) - timedelta(days=1)
         year = last_month.year
         month = last_month.month
 
@@ -271,6 +645,13 @@ def update_monthly_merchant_stats(year: int = None, month: int = None):
         trans_date__lt=month_end
     )
 
+    # Unique customers come from the payer profiles once the whole month is
+    # applied - the COUNT(DISTINCT) is only the fallback
+    active_payers = monthly_active_payers(year, month)
+    annotations = {}
+    if active_payers is None:
+        annotations['unique_customers'] = Count('payee_email', distinct=True)
+
     # Group by merchant
     merchant_stats = transactions.values('client_code').annotate(
         total_count=Count('txn_id'),
@@ -280,21 +661,20 @@ def update_monthly_merchant_stats(year: int = None, month: int = None):
         success_amount=Sum('paid_amount', filter=Q(status='SUCCESS')),
         settled_amount=Sum('settlement_amount', filter=Q(is_settled=True)),
         avg_amount=Avg('paid_amount'),
-        unique_customers=Count('payee_email', distinct=True),
+        **annotations
     )
 
     stats_processed = 0
 
     for stats in merchant_stats:
-        if not stats['client_code']:
-            continue
-
         pending_settlement = (stats['success_amount'] or 0) - (stats['settled_amount'] or 0)
+        if active_payers is not None:
+            stats['unique_customers'] = active_payers.get(stats['client_code'] or '', 0)
 
         MerchantMonthlyStats.objects.update_or_create(
             year=year,
             month=month,
-            client_code=stats['client_code'],
+            client_code=stats['client_code'] or '',
             defaults={
                 'total_count': stats['total_count'] or 0,
                 'success_count': stats['success_count'] or 0,
@@ -329,6 +709,160 @@ def cleanup_expired_search_cache():
     return {'deleted': expired_count}
 
 
+@shared_task(name='refresh_analytics_cube')
+def refresh_analytics_cube(date_str: str = None, cuboids: list = None):
+    """
+    Materialise analytics cube cuboids for one local day
+    If no date provided, builds yesterday
+    """
+    from apps.transactions.cube import Cube
+
+    if date_str:
+        target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+    else:
+        target_date = timezone.localdate() - timedelta(days=1)
+
+    start_time = timezone.now()
+    cells = Cube().build_day(target_date, cuboids=cuboids)
+    duration = (timezone.now() - start_time).total_seconds()
+
+    logger.info(f"Analytics cube refreshed for {target_date} in {duration:.2f}s")
+
+    return {
+        'date': str(target_date),
+        'cells': cells,
+        'duration_seconds': duration
+    }
+
+
+@shared_task(name='update_summaries_for_day')
+def update_summaries_for_day(date_str: str):
+    """
+    Rebuild every daily summary, sketch and cube cuboid for one date
+    Returns rows processed per summary
+    """
+    processed = {}
+
+    result = update_daily_transaction_summaries(date_str)
+    processed['daily_summaries'] = result['created'] + result['updated']
+    processed['payment_mode_summaries'] = update_payment_mode_summaries(date_str)['processed']
+    processed['gateway_summaries'] = update_gateway_summaries(date_str)['processed']
+    processed['settlement_summaries'] = update_settlement_summaries(date_str)['processed']
+    processed['payer_sketches'] = update_payer_sketches(date_str)['processed']
+    processed['quantile_sketches'] = update_quantile_sketches(date_str)['processed']
+    processed['top_lists'] = update_top_lists(date_str)['processed']
+    processed['refund_summaries'] = update_refund_summaries(date_str)['processed']
+    processed['transaction_sample'] = update_transaction_sample(date_str)['processed']
+    processed['cube_cells'] = sum(refresh_analytics_cube(date_str)['cells'].values())
+
+    # Cached responses covering the day were built from the old summaries
+    from apps.core.cache import CacheTags
+    CacheTags.invalidate(days=[datetime.strptime(date_str, '%Y-%m-%d').date()])
+
+    return processed
+
+
+def _checksum(raw_queryset, summary_queryset, measures):
+    """
+    Client codes whose summary row differs from the raw rows in any of
+    `measures` (counts exactly, amounts to the paise per transaction)
+    """
+    raw = {
+        row.pop('client_code') or '': row
+        for row in raw_queryset.values('client_code').annotate(
+            **{measure: DAILY_CHECKSUM_MEASURES[measure] for measure in measures}
+        ).order_by()
+    }
+    summary = {row.pop('client_code'): row for row in summary_queryset.values('client_code', *measures)}
+
+    drifted = []
+    for code in raw.keys() | summary.keys():
+        raw_row, summary_row = raw.get(code, {}), summary.get(code, {})
+        # Summary amounts are stored rounded to paise
+        tolerance = 0.01 * max(raw_row.get('total_count') or 0, 1)
+        for measure in measures:
+            raw_value = float(raw_row.get(measure) or 0)
+            summary_value = float(summary_row.get(measure) or 0)
+            if measure.endswith('_count'):
+                if raw_value != summary_value:
+                    break
+            elif abs(raw_value - summary_value) > tolerance:
+                break
+        else:
+            continue
+        drifted.append(code)
+    return drifted, set(raw)
+
+
+@shared_task(name='verify_daily_summaries')
+def verify_daily_summaries(date_str: str = None, days: int = 7):
+    """
+    Checksum daily_transaction_summary against transaction_detail
+    Compares per-merchant counts and amounts by status and settlement for
+    `days` days ending on date_str (default yesterday) and rebuilds every
+    summary for a day that drifted (late inserts, status, amount or
+    settlement updates). Closed months the days fall in are checked the same
+    way against merchant_monthly_stats
+    """
+    from apps.transactions.models import TransactionDetail
+    from apps.transactions.models_aggregations import DailyTransactionSummary, MerchantMonthlyStats
+
+    if date_str:
+        end_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+    else:
+        end_date = timezone.localdate() - timedelta(days=1)
+
+    rebuilt = []
+    for offset in range(days):
+        target_date = end_date - timedelta(days=offset)
+        day_start = timezone.make_aware(datetime.combine(target_date, datetime.min.time()))
+        day_end = day_start + timedelta(days=1)
+
+        drifted, raw_codes = _checksum(
+            TransactionDetail.objects.filter(trans_date__gte=day_start, trans_date__lt=day_end),
+            DailyTransactionSummary.objects.filter(date=target_date),
+            list(DAILY_CHECKSUM_MEASURES)
+        )
+        if not drifted:
+            continue
+
+        logger.warning(f"Summaries for {target_date} drifted for {len(drifted)} merchants - rebuilding")
+        DailyTransactionSummary.objects.filter(date=target_date).exclude(client_code__in=list(raw_codes)).delete()
+        update_summaries_for_day(str(target_date))
+        rebuilt.append(str(target_date))
+
+    # Monthly stats are built once the month has closed
+    current_month = timezone.localdate().replace(day=1)
+    months = sorted({
+        (day.year, day.month)
+        for day in (end_date - timedelta(days=offset) for offset in range(days))
+        if day < current_month
+    })
+    rebuilt_months = []
+    for year, month in months:
+        month_start = timezone.make_aware(datetime(year, month, 1))
+        month_end = timezone.make_aware(datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1))
+
+        drifted, raw_codes = _checksum(
+            TransactionDetail.objects.filter(trans_date__gte=month_start, trans_date__lt=month_end),
+            MerchantMonthlyStats.objects.filter(year=year, month=month),
+            MONTHLY_CHECKSUM_MEASURES
+        )
+        if not drifted:
+            continue
+
+        logger.warning(f"Monthly stats for {year}-{month:02d} drifted for {len(drifted)} merchants - rebuilding")
+        MerchantMonthlyStats.objects.filter(year=year, month=month).exclude(client_code__in=list(raw_codes)).delete()
+        update_monthly_merchant_stats(year, month)
+        rebuilt_months.append(f"{year}-{month:02d}")
+
+    logger.info(
+        f"Summary checksum for {days} days to {end_date}: rebuilt {rebuilt or 'none'}, "
+        f"months {rebuilt_months or 'none'}"
+    )
+    return {'end_date': str(end_date), 'days': days, 'rebuilt': rebuilt, 'rebuilt_months': rebuilt_months}
+
+
 @shared_task(name='batch_update_all_summaries')
 def batch_update_all_summaries(date_range_days: int = 30):
     """
@@ -346,6 +880,14 @@ def batch_update_all_summaries(date_range_days: int = 30):
     results = {
         'daily_summaries': 0,
         'payment_mode_summaries': 0,
+        'gateway_summaries': 0,
+        'settlement_summaries': 0,
+        'payer_sketches': 0,
+        'quantile_sketches': 0,
+        'top_lists': 0,
+        'refund_summaries': 0,
+        'transaction_sample': 0,
+        'cube_cells': 0,
         'errors': []
     }
 
@@ -354,13 +896,8 @@ def batch_update_all_summaries(date_range_days: int = 30):
         date_str = current_date.strftime('%Y-%m-%d')
 
         try:
-            # Update daily summaries
-            result = update_daily_transaction_summaries(date_str)
-            results['daily_summaries'] += result['created'] + result['updated']
-
-            # Update payment mode summaries
-            pm_result = update_payment_mode_summaries(date_str)
-            results['payment_mode_summaries'] += pm_result['processed']
+            for name, processed in update_summaries_for_day(date_str).items():
+                results[name] += processed
 
         except Exception as e:
             error_msg = f"Error processing {date_str}: {str(e)}"
@@ -0,0 +1,133 @@
+"""
+Tests for the aggregation router's day splitting
+"""
+from datetime import date, datetime, time, timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from apps.transactions.aggregation_router import (
+    SETTLEMENT_LAG_DAYS, SUMMARY_SOURCES, AggregateQuery, AggregationRouter, day_runs, full_day_bounds,
+    raw_windows
+)
+
+DAILY_SOURCE = next(source for source in SUMMARY_SOURCES if source['name'] == 'daily_transaction_summary')
+
+
+def local(day, hour=0, minute=0, second=0):
+    return timezone.make_aware(datetime.combine(day, time(hour, minute, second)))
+
+
+class FullDayBoundsTests(SimpleTestCase):
+
+    def test_whole_days(self):
+        bounds = full_day_bounds(local(date(2024, 3, 1)), local(date(2024, 3, 3), 23, 59, 59),
+                                 date(2024, 3, 1), date(2024, 3, 3))
+        self.assertEqual(bounds, (date(2024, 3, 1), date(2024, 3, 3)))
+
+    def test_partial_boundary_days_are_excluded(self):
+        bounds = full_day_bounds(local(date(2024, 3, 1), 10), local(date(2024, 3, 4), 12),
+                                 date(2024, 3, 1), date(2024, 3, 4))
+        self.assertEqual(bounds, (date(2024, 3, 2), date(2024, 3, 3)))
+
+    def test_today_is_never_full(self):
+        today = timezone.localdate()
+        bounds = full_day_bounds(local(today - timedelta(days=2)), None, today - timedelta(days=2), today)
+        self.assertEqual(bounds, (today - timedelta(days=2), today - timedelta(days=1)))
+
+    def test_single_partial_day(self):
+        bounds = full_day_bounds(local(date(2024, 3, 1), 9), local(date(2024, 3, 1), 17),
+                                 date(2024, 3, 1), date(2024, 3, 1))
+        self.assertEqual(bounds, (None, None))
+
+
+class RawWindowsTests(SimpleTestCase):
+
+    def test_everything_served(self):
+        days = {date(2024, 3, 1), date(2024, 3, 2)}
+        self.assertIsNone(raw_windows(date(2024, 3, 1), date(2024, 3, 2), days))
+
+    def test_edges_stay_open(self):
+        windows = raw_windows(date(2024, 3, 1), date(2024, 3, 3), {date(2024, 3, 2)})
+        self.assertEqual(windows, [(None, local(date(2024, 3, 2))), (local(date(2024, 3, 3)), None)])
+
+    def test_gap_inside_range_is_bounded(self):
+        served = {date(2024, 3, 1), date(2024, 3, 4)}
+        windows = raw_windows(date(2024, 3, 1), date(2024, 3, 4), served)
+        self.assertEqual(windows, [(local(date(2024, 3, 2)), local(date(2024, 3, 4)))])
+
+    def test_day_runs(self):
+        runs = day_runs([date(2024, 3, 1), date(2024, 3, 2), date(2024, 3, 4)])
+        self.assertEqual(runs, [[date(2024, 3, 1), date(2024, 3, 2)], [date(2024, 3, 4), date(2024, 3, 4)]])
+
+
+class AggregationRouterPlanTests(SimpleTestCase):
+
+    def plan(self, query, covered, measures=('total_count',)):
+        router = AggregationRouter(query, raw_queryset=None)
+
+        def pick(measures, group_by, grain):
+            return DAILY_SOURCE if grain == 'day' else None
+
+        with mock.patch.object(AggregationRouter, '_pick_source', side_effect=pick), \
+                mock.patch.object(AggregationRouter, '_covered_days', side_effect=lambda s, a, b: {
+                    day for day in covered if a <= day <= b
+                }), \
+                mock.patch.object(AggregationRouter, '_live_day', return_value=None), \
+                mock.patch('apps.transactions.aggregation_router._get_model') as get_model:
+            get_model.return_value.objects.order_by.return_value.values_list.return_value.first.return_value = \
+                min(covered) if covered else None
+            return router._plan(list(measures), None)
+
+    def test_full_days_from_summary_partial_days_raw(self):
+        covered = {date(2024, 3, day) for day in range(1, 6)}
+        query = AggregateQuery(start=local(date(2024, 3, 1), 10), end=local(date(2024, 3, 4), 12))
+        plan = self.plan(query, covered)
+
+        self.assertEqual(plan['summary'], [(DAILY_SOURCE, [date(2024, 3, 2), date(2024, 3, 3)])])
+        self.assertEqual(plan['raw_windows'], [(None, local(date(2024, 3, 2))), (local(date(2024, 3, 4)), None)])
+
+    def test_unsummarised_days_are_raw(self):
+        covered = {date(2024, 3, 1), date(2024, 3, 3)}
+        query = AggregateQuery(start=local(date(2024, 3, 1)), end=local(date(2024, 3, 3), 23, 59, 59))
+        plan = self.plan(query, covered)
+
+        self.assertEqual(plan['summary'], [(DAILY_SOURCE, [date(2024, 3, 1), date(2024, 3, 3)])])
+        self.assertEqual(plan['raw_windows'], [(local(date(2024, 3, 2)), local(date(2024, 3, 3)))])
+
+    def test_open_start_reads_rows_before_first_summary_day(self):
+        covered = {date(2024, 3, 1), date(2024, 3, 2)}
+        query = AggregateQuery(start=None, end=local(date(2024, 3, 2), 23, 59, 59))
+        plan = self.plan(query, covered)
+
+        self.assertEqual(plan['summary'], [(DAILY_SOURCE, [date(2024, 3, 1), date(2024, 3, 2)])])
+        self.assertEqual(plan['raw_windows'], [(None, local(date(2024, 3, 1)))])
+
+    def test_unsupported_filter_is_all_raw(self):
+        query = AggregateQuery(start=local(date(2024, 3, 1)), end=local(date(2024, 3, 3)), unsupported=['search'])
+        plan = self.plan(query, {date(2024, 3, 1)})
+        self.assertEqual(plan, {'summary': [], 'live': None, 'raw_windows': [(None, None)]})
+
+    def test_recent_days_settled_measures_are_raw(self):
+        today = timezone.localdate()
+        first = today - timedelta(days=SETTLEMENT_LAG_DAYS + 3)
+        covered = {first + timedelta(days=offset) for offset in range((today - first).days)}
+        query = AggregateQuery(start=local(first), end=local(today - timedelta(days=1), 23, 59, 59))
+
+        settled_until = today - timedelta(days=SETTLEMENT_LAG_DAYS + 1)
+        plan = self.plan(query, covered, measures=('total_count', 'settled_amount'))
+        self.assertEqual(plan['summary'][0][1][-1], settled_until)
+        self.assertEqual(plan['raw_windows'], [(local(settled_until + timedelta(days=1)), None)])
+
+        # Status measures of the same days come from the summary
+        plan = self.plan(query, covered)
+        self.assertEqual(plan['summary'][0][1][-1], today - timedelta(days=1))
+        self.assertIsNone(plan['raw_windows'])
+
+    def test_range_inside_the_settlement_lag_is_raw(self):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        query = AggregateQuery(start=local(yesterday), end=local(yesterday, 23, 59, 59))
+        plan = self.plan(query, {yesterday}, measures=('settled_count',))
+        self.assertEqual(plan['summary'], [])
+        self.assertEqual(plan['raw_windows'], [(None, None)])
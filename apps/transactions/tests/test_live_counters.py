@@ -0,0 +1,38 @@
+"""
+Tests for the trigger counter source's availability check
+"""
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apps.transactions.live_counters import TRIGGERS, TriggerCounterSource
+
+
+class TriggerCounterAvailableTests(SimpleTestCase):
+
+    def setUp(self):
+        TriggerCounterSource._trigger_check = (0.0, False)
+
+    def tearDown(self):
+        TriggerCounterSource._trigger_check = (0.0, False)
+
+    def test_all_triggers_installed(self):
+        with mock.patch('apps.transactions.live_counters.installed_triggers', return_value=set(TRIGGERS.values())):
+            self.assertTrue(TriggerCounterSource.available())
+
+    def test_missing_trigger_falls_back_to_raw(self):
+        installed = set(TRIGGERS.values()) - {TRIGGERS['update']}
+        with mock.patch('apps.transactions.live_counters.installed_triggers', return_value=installed):
+            self.assertFalse(TriggerCounterSource.available())
+
+    def test_lookup_error_falls_back_to_raw(self):
+        with mock.patch('apps.transactions.live_counters.installed_triggers', side_effect=Exception('no schema')):
+            self.assertFalse(TriggerCounterSource.available())
+
+    def test_check_is_cached(self):
+        with mock.patch(
+            'apps.transactions.live_counters.installed_triggers', return_value=set(TRIGGERS.values())
+        ) as lookup:
+            TriggerCounterSource.available()
+            TriggerCounterSource.available()
+        self.assertEqual(lookup.call_count, 1)
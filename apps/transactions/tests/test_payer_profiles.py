@@ -0,0 +1,56 @@
+"""
+Tests for re-folding a day's payer totals into a profile
+"""
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase
+
+from apps.transactions.payer_profiles import fold_payer
+
+
+def totals(txn_count, success_count, volume, mode_counts, day=1):
+    return {
+        'email': 'a@x.com', 'mobile': None,
+        'first_seen': datetime(2024, 3, day, 10), 'last_seen': datetime(2024, 3, day, 11),
+        'txn_count': txn_count, 'success_count': success_count,
+        'success_volume': Decimal(volume), 'mode_counts': mode_counts,
+    }
+
+
+def profile(**fields):
+    values = {
+        'email': 'a@x.com', 'mobile': None,
+        'first_seen': datetime(2024, 3, 1, 10), 'last_seen': datetime(2024, 3, 2, 11),
+        'txn_count': 3, 'success_count': 1, 'success_volume': Decimal('20.00'),
+        'mode_counts': {'Card': 1}, 'preferred_payment_mode': 'Card',
+    }
+    values.update(fields)
+    return SimpleNamespace(**values)
+
+
+class FoldPayerTests(SimpleTestCase):
+
+    def test_status_change_replaces_old_totals(self):
+        # Day 1 had two PENDING transactions, one has since succeeded by UPI
+        p = profile()
+        self.assertTrue(fold_payer(p, totals(2, 1, '100.00', {'UPI': 1}), totals(2, 0, '0.00', {})))
+        self.assertEqual((p.txn_count, p.success_count, p.success_volume), (3, 2, Decimal('120.00')))
+        self.assertEqual(p.mode_counts, {'Card': 1, 'UPI': 1})
+
+    def test_modes_dropping_to_zero_are_removed(self):
+        p = profile(mode_counts={'Card': 1, 'UPI': 2}, success_count=3, preferred_payment_mode='UPI')
+        fold_payer(p, totals(1, 0, '0.00', {}), totals(1, 2, '40.00', {'UPI': 2}))
+        self.assertEqual(p.mode_counts, {'Card': 1})
+        self.assertEqual(p.preferred_payment_mode, 'Card')
+
+    def test_new_payer_on_refold_widens_seen_range(self):
+        p = profile()
+        fold_payer(p, totals(1, 1, '5.00', {'UPI': 1}, day=3), None)
+        self.assertEqual(p.last_seen, datetime(2024, 3, 3, 11))
+        self.assertEqual(p.first_seen, datetime(2024, 3, 1, 10))
+
+    def test_profile_emptied_when_all_transactions_are_gone(self):
+        p = profile(txn_count=2, success_count=1, success_volume=Decimal('50.00'), mode_counts={'UPI': 1})
+        self.assertFalse(fold_payer(p, None, totals(2, 1, '50.00', {'UPI': 1})))
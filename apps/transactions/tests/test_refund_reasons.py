@@ -0,0 +1,100 @@
+"""
+Tests for refund reason normalisation and the refund rebuild window
+"""
+from datetime import date, timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apps.transactions.refund_reasons import (
+    NOT_SPECIFIED, REASON_CODE_LENGTH, normalize_reason, reason_code, reason_label
+)
+from apps.transactions.tasks_aggregation import (
+    REFUND_EVENT_LOOKBACK_DAYS, REFUND_SUMMARY_LAG_DAYS, refund_days_to_rebuild
+)
+
+
+class NormalizeReasonTests(SimpleTestCase):
+
+    def test_case_whitespace_and_punctuation(self):
+        self.assertEqual(normalize_reason('  Duplicate   Payment!! '), 'duplicate payment')
+        self.assertEqual(normalize_reason('order_cancelled/by-user'), 'order cancelled by user')
+
+    def test_digit_runs_are_masked(self):
+        self.assertEqual(normalize_reason('DUPLICATE TXN 88213'), 'duplicate txn #')
+        self.assertEqual(normalize_reason('Ref 12, order 3456'), 'ref # order #')
+
+    def test_empty(self):
+        self.assertEqual(normalize_reason(None), '')
+        self.assertEqual(normalize_reason(''), '')
+
+
+class ReasonCodeTests(SimpleTestCase):
+
+    def test_variants_share_a_code(self):
+        for message in ('Duplicate payment', 'duplicate  Payment ', 'DUPLICATE TXN 88213', 'double debit',
+                        'Customer charged twice'):
+            self.assertEqual(reason_code(message), 'DUPLICATE_PAYMENT', message)
+
+    def test_known_patterns(self):
+        cases = {
+            'Amount debited but transaction failed': 'DEBITED_NOT_CONFIRMED',
+            'Refund as per customer request': 'CUSTOMER_REQUEST',
+            'Booking cancelled': 'ORDER_CANCELLED',
+            'Product not delivered': 'NOT_DELIVERED',
+            'Excess amount paid': 'EXCESS_AMOUNT',
+            'Unauthorised transaction': 'FRAUD',
+            'Gateway timeout': 'TECHNICAL_ISSUE',
+            'Auto reversal': 'AUTO_REVERSAL',
+            'Merchant initiated refund': 'MERCHANT_INITIATED',
+        }
+        for message, code in cases.items():
+            self.assertEqual(reason_code(message), code, message)
+
+    def test_first_pattern_wins(self):
+        # Matches both duplicate and customer request; duplicate is listed first
+        self.assertEqual(reason_code('Duplicate payment, customer request'), 'DUPLICATE_PAYMENT')
+
+    def test_not_specified(self):
+        for message in (None, '', '   ', 'NA', 'n/a', 'Refund', 'null', '12345'):
+            self.assertEqual(reason_code(message), NOT_SPECIFIED, repr(message))
+
+    def test_unknown_messages_keep_text_without_ids(self):
+        self.assertEqual(reason_code('Seat upgrade 4411'), 'SEAT_UPGRADE')
+        self.assertEqual(reason_code('seat  upgrade #9'), 'SEAT_UPGRADE')
+
+    def test_unknown_codes_fit_the_column(self):
+        code = reason_code('lorem ipsum ' * 20)
+        self.assertEqual(len(code), REASON_CODE_LENGTH)
+
+    def test_labels(self):
+        self.assertEqual(reason_label('DUPLICATE_PAYMENT'), 'Duplicate payment')
+        self.assertEqual(reason_label(NOT_SPECIFIED), 'Not specified')
+        self.assertEqual(reason_label('SEAT_UPGRADE'), 'Seat upgrade')
+
+
+class RefundDaysToRebuildTests(SimpleTestCase):
+
+    def days(self, end, event_days):
+        with mock.patch('apps.transactions.refund_reasons.refund_event_days', return_value=event_days) as events:
+            days = refund_days_to_rebuild(end)
+        events.assert_called_once_with(end - timedelta(days=REFUND_EVENT_LOOKBACK_DAYS))
+        return days
+
+    def test_lag_window(self):
+        end = date(2024, 3, 10)
+        days = self.days(end, set())
+        self.assertEqual(len(days), REFUND_SUMMARY_LAG_DAYS)
+        self.assertEqual(days[0], end)
+        self.assertEqual(days[-1], end - timedelta(days=REFUND_SUMMARY_LAG_DAYS - 1))
+
+    def test_late_chargeback_adds_old_day(self):
+        end = date(2024, 3, 10)
+        old = end - timedelta(days=120)
+        days = self.days(end, {old, end - timedelta(days=2)})
+        self.assertEqual(len(days), REFUND_SUMMARY_LAG_DAYS + 1)
+        self.assertEqual(days[-1], old)
+
+    def test_days_after_end_are_left_out(self):
+        end = date(2024, 3, 10)
+        self.assertNotIn(end + timedelta(days=1), self.days(end, {end + timedelta(days=1)}))
@@ -0,0 +1,93 @@
+"""
+Tests for the aggregation scheduler's slot arithmetic and manual passes
+"""
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from apps.transactions.scheduler import AggregationScheduler, Job, Schedule
+
+
+def local(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+class ScheduleLatestTests(SimpleTestCase):
+
+    def test_hourly(self):
+        schedule = Schedule(minute=5)
+        self.assertEqual(schedule.latest(local(2024, 3, 10, 10, 4)), local(2024, 3, 10, 9, 5))
+        self.assertEqual(schedule.latest(local(2024, 3, 10, 10, 5)), local(2024, 3, 10, 10, 5))
+        self.assertEqual(schedule.latest(local(2024, 3, 10, 0, 2)), local(2024, 3, 9, 23, 5))
+
+    def test_daily(self):
+        schedule = Schedule(minute=30, hour=0)
+        self.assertEqual(schedule.latest(local(2024, 3, 10, 0, 20)), local(2024, 3, 9, 0, 30))
+        self.assertEqual(schedule.latest(local(2024, 3, 10, 18)), local(2024, 3, 10, 0, 30))
+        self.assertEqual(schedule.latest(local(2024, 3, 1, 0, 10)), local(2024, 2, 29, 0, 30))
+
+    def test_monthly(self):
+        schedule = Schedule(minute=30, hour=1, day=1)
+        self.assertEqual(schedule.latest(local(2024, 3, 15)), local(2024, 3, 1, 1, 30))
+        self.assertEqual(schedule.latest(local(2024, 3, 1, 1)), local(2024, 2, 1, 1, 30))
+        self.assertEqual(schedule.latest(local(2024, 1, 1, 0, 45)), local(2023, 12, 1, 1, 30))
+
+    def test_slots_are_local_time(self):
+        # 2024-03-09 20:00 UTC is 2024-03-10 01:30 IST
+        now = datetime(2024, 3, 9, 20, 0, tzinfo=dt_timezone.utc)
+        self.assertEqual(Schedule(minute=30, hour=1).latest(now), local(2024, 3, 10, 1, 30))
+
+
+class SchedulePreviousTests(SimpleTestCase):
+
+    def test_hourly(self):
+        self.assertEqual(Schedule(minute=5).previous(local(2024, 3, 10, 0, 5)), local(2024, 3, 9, 23, 5))
+
+    def test_daily(self):
+        self.assertEqual(Schedule(minute=0, hour=2).previous(local(2024, 3, 1, 2)), local(2024, 2, 29, 2))
+
+    def test_monthly_across_year(self):
+        schedule = Schedule(minute=30, hour=1, day=1)
+        self.assertEqual(schedule.previous(local(2024, 1, 1, 1, 30)), local(2023, 12, 1, 1, 30))
+        self.assertEqual(schedule.previous(local(2024, 3, 1, 1, 30)), local(2024, 2, 1, 1, 30))
+
+    def test_catch_up_walks_back(self):
+        schedule = Schedule(minute=30, hour=0)
+        slot = schedule.latest(local(2024, 3, 10, 12))
+        slots = [slot]
+        for _ in range(2):
+            slots.append(schedule.previous(slots[-1]))
+        self.assertEqual(slots, [local(2024, 3, 10, 0, 30), local(2024, 3, 9, 0, 30), local(2024, 3, 8, 0, 30)])
+
+
+class RunOnceTests(SimpleTestCase):
+
+    def setUp(self):
+        self.job = Job('noop', Schedule(minute=0, hour=2), lambda slot: None, 'No-op')
+        self.scheduler = AggregationScheduler(jobs=[self.job])
+
+    def lock(self, acquired):
+        lock = mock.Mock(held=acquired)
+        lock.acquire.return_value = acquired
+        return mock.patch('apps.transactions.scheduler.LeaderLock', return_value=lock)
+
+    def test_refuses_while_another_node_leads(self):
+        with self.lock(False) as leader_lock, mock.patch.object(self.scheduler, 'execute') as execute:
+            self.assertIsNone(self.scheduler.run_once(self.job))
+        execute.assert_not_called()
+        leader_lock.return_value.release.assert_not_called()
+
+    def test_runs_job_under_the_lock(self):
+        now = local(2024, 3, 10, 12)
+        with self.lock(True) as leader_lock, mock.patch.object(self.scheduler, 'execute', return_value='run') as execute:
+            self.assertEqual(self.scheduler.run_once(self.job, now=now), ['run'])
+        execute.assert_called_once_with(self.job, local(2024, 3, 10, 2))
+        leader_lock.return_value.release.assert_called_once()
+
+    def test_run_due_needs_the_lock(self):
+        with mock.patch.object(self.scheduler, 'pending_slots', return_value=[local(2024, 3, 10, 2)]), \
+                mock.patch.object(self.scheduler, 'execute') as execute:
+            self.assertEqual(self.scheduler.run_due(), [])
+        execute.assert_not_called()
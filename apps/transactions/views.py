@@ -4,14 +4,14 @@ Transaction views implementing all transaction-related API endpoints
 from rest_framework import generics, status, views
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q, Sum, Count, Avg
+from django.db.models import Q
 from django.utils import timezone
 from datetime import datetime, timedelta
 import logging
 
 from apps.core.permissions import IsAdmin, IsMerchant, MerchantZonePermission
 from apps.core.pagination import CustomPostPagination, LargeResultsSetPagination
-from apps.core.cache import RedisService, CacheDecorator
+from apps.core.cache import RedisService, CacheDecorator, CacheTags
 from apps.core.throttling import ReportGenerationThrottle
 
 from .models import TransactionDetail, ClientDataTable, MerchantWhitelist
@@ -25,6 +25,8 @@ from .serializers import (
     TransactionExportSerializer, TransactionSummarySerializer
 )
 from .filters import TransactionSearchFilter
+from .aggregation_router import AggregateQuery, AggregationRouter
+from .live_counters import live_cache_timeout
 
 logger = logging.getLogger(__name__)
 
@@ -139,7 +141,7 @@ class GetMerchantTransactionHistoryView(BaseMerchantTransactionView):
     """
     serializer_class = TransactionListSerializer
 
-    @CacheDecorator.cache_result(timeout=300, key_prefix='merchant_txn_history')  # 5 min cache
+    @CacheDecorator.cache_response(timeout=300, key_prefix='merchant_txn_history')  # 5 min cache
     def list(self, request, *args, **kwargs):
         start_time = timezone.now()
         client_ip = request.META.get('REMOTE_ADDR', 'unknown')
@@ -277,7 +279,7 @@ class GetAdminTxnHistoryView(BaseMerchantTransactionView):
             'settlement_date', 'settlement_amount'
         )
 
-    @CacheDecorator.cache_result(timeout=300, key_prefix='admin_txn_history')  # 5 min cache
+    @CacheDecorator.cache_response(timeout=300, key_prefix='admin_txn_history')  # 5 min cache
     def list(self, request, *args, **kwargs):
         # Validate filters
         filter_errors = TransactionSearchFilter.validate_filters(request.query_params)
@@ -493,7 +495,9 @@ class GetSuccessGraphView(views.APIView):
     """
     permission_classes = [IsAuthenticated]
 
-    @CacheDecorator.cache_result(timeout=3600)
+    # Today's point comes from the live counters when configured, so the
+    # hour-long cache drops to seconds while they are current
+    @CacheDecorator.cache_response(timeout=lambda: live_cache_timeout(3600))
     def get(self, request):
         # Get date range from query params
         try:
@@ -509,30 +513,29 @@ class GetSuccessGraphView(views.APIView):
             trans_date__lte=end_date
         )
 
+        aggregate_query = AggregateQuery(start_date, end_date)
+
         # If not admin, filter by merchant
         if request.user.role != 'ADMIN':
             transactions = transactions.filter(client_code=request.user.client_code)
+            aggregate_query.client_codes = [request.user.client_code]
 
-        # Group by date and calculate success rate
-        from django.db.models.functions import TruncDate
-        daily_stats = transactions.values(
-            date=TruncDate('trans_date')
-        ).annotate(
-            total=Count('txn_id'),
-            successful=Count('txn_id', filter=Q(status='SUCCESS')),
-            failed=Count('txn_id', filter=Q(status='FAILED')),
-            total_amount=Sum('paid_amount')
-        ).order_by('date')
+        # Group by date - closed days from daily summaries, the rest scanned live
+        router = AggregationRouter(aggregate_query, transactions)
+        daily_stats = router.aggregate(
+            ['total_count', 'success_count', 'failed_count', 'total_amount'],
+            group_by='date'
+        )
 
         # Calculate success rates
         graph_data = []
         for stat in daily_stats:
-            success_rate = (stat['successful'] / stat['total'] * 100) if stat['total'] > 0 else 0
+            success_rate = (stat['success_count'] / stat['total_count'] * 100) if stat['total_count'] > 0 else 0
             graph_data.append({
                 'date': stat['date'],
-                'total_transactions': stat['total'],
-                'successful': stat['successful'],
-                'failed': stat['failed'],
+                'total_transactions': stat['total_count'],
+                'successful': stat['success_count'],
+                'failed': stat['failed_count'],
                 'success_rate': round(success_rate, 2),
                 'total_amount': float(stat['total_amount'] or 0)
             })
@@ -565,7 +568,10 @@ class MerchantWhiteListView(generics.ListCreateAPIView):
         if serializer.is_valid():
             # Safely get user ID
             user_id = getattr(request.user, 'id', None) or getattr(request.user, 'login_master_id', 'unknown')
-            serializer.save(created_by=str(user_id))
+            entry = serializer.save(created_by=str(user_id))
+            # Cached whitelist data - in Redis and every worker's L1
+            client_code = getattr(entry, 'client_code', None)
+            CacheTags.invalidate(merchants=[client_code] if client_code else [], tables=['merchant_whitelist'])
             return Response({
                 'success': True,
                 'message': 'Whitelist entry added successfully',
@@ -585,7 +591,7 @@ class TransactionSummaryView(views.APIView):
     """
     permission_classes = [IsAuthenticated]
 
-    @CacheDecorator.cache_result(timeout=600, key_prefix='txn_summary')  # 10 min cache
+    @CacheDecorator.cache_response(timeout=600, key_prefix='txn_summary', hard_timeout=1800)  # Fresh 10 min, served stale up to 30 min
     def get(self, request):
         # Get date range
         date_from = request.query_params.get('date_from')
@@ -594,33 +600,52 @@ class TransactionSummaryView(views.APIView):
         # Base queryset
         queryset = TransactionDetail.objects.all()
 
+        aggregate_query = AggregateQuery()
+
         # Filter by merchant if not admin
         if request.user.role != 'ADMIN':
             queryset = queryset.filter(client_code=request.user.client_code)
+            aggregate_query.client_codes = [request.user.client_code]
 
         # Apply date filters
-        if date_from:
-            queryset = queryset.filter(trans_date__gte=date_from)
-        if date_to:
-            queryset = queryset.filter(trans_date__lte=date_to)
+        try:
+            if date_from:
+                queryset = queryset.filter(trans_date__gte=date_from)
+                aggregate_query.start = timezone.make_aware(datetime.strptime(date_from, '%Y-%m-%d'))
+            if date_to:
+                queryset = queryset.filter(trans_date__lte=date_to)
+                aggregate_query.end = timezone.make_aware(datetime.strptime(date_to, '%Y-%m-%d'))
+        except ValueError:
+            # Not a plain date - let the raw queryset interpret it
+            aggregate_query.unsupported.append('date_format')
+
+        # Closed days are served from summary tables, only the rest is scanned
+        router = AggregationRouter(aggregate_query, queryset)
+        totals = router.aggregate([
+            'total_count', 'total_amount', 'success_count', 'failed_count', 'pending_count'
+        ])
 
         # Calculate summary
         summary = {
-            'total_transactions': queryset.count(),
-            'total_amount': queryset.aggregate(Sum('paid_amount'))['paid_amount__sum'] or 0,
-            'successful_transactions': queryset.filter(status='SUCCESS').count(),
-            'failed_transactions': queryset.filter(status='FAILED').count(),
-            'pending_transactions': queryset.filter(status='PENDING').count(),
-            'average_transaction_amount': queryset.aggregate(Avg('paid_amount'))['paid_amount__avg'] or 0,
+            'total_transactions': totals['total_count'],
+            'total_amount': totals['total_amount'],
+            'successful_transactions': totals['success_count'],
+            'failed_transactions': totals['failed_count'],
+            'pending_transactions': totals['pending_count'],
+            'average_transaction_amount': (
+                totals['total_amount'] / totals['total_count'] if totals['total_count'] > 0 else 0
+            ),
         }
 
         # Payment mode distribution
-        payment_modes = queryset.values('payment_mode').annotate(
-            count=Count('txn_id')
-        ).order_by('-count')
+        payment_modes = sorted(
+            router.aggregate(['total_count'], group_by='payment_mode'),
+            key=lambda pm: pm['total_count'],
+            reverse=True
+        )
 
         summary['payment_mode_distribution'] = {
-            pm['payment_mode']: pm['count'] for pm in payment_modes
+            pm['payment_mode']: pm['total_count'] for pm in payment_modes
         }
 
         summary['date_from'] = date_from or 'All time'
@@ -641,7 +666,7 @@ class TransactionSearchView(views.APIView):
     """
     permission_classes = [IsAuthenticated]
 
-    @CacheDecorator.cache_result(timeout=1800, key_prefix='txn_search')  # 30 min cache
+    @CacheDecorator.cache_response(timeout=1800, key_prefix='txn_search')  # 30 min cache
     def get(self, request):
         """
         Search for transaction by txn_id or client_txn_id
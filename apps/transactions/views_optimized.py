@@ -69,11 +69,18 @@ class OptimizedTransactionListView(generics.ListAPIView):
             {**params, 'user': request.user.username}
         )
 
-        cached_response = QueryOptimizer.get_cached_query(cache_key)
-        if cached_response and not request.GET.get('refresh'):
-            logger.info(f"Serving from cache: {cache_key}")
-            return Response(cached_response)
+        # Concurrent misses wait for one computation; refresh=1 recomputes
+        # right away instead of reading the cache
+        response_data = QueryOptimizer.cached_query(
+            cache_key,
+            lambda: self._build_response(request, params, start_time),
+            QueryOptimizer.CACHE_TTL_SHORT,
+            refresh=bool(request.GET.get('refresh'))
+        )
+        return Response(response_data)
 
+    def _build_response(self, request, params, start_time) -> dict:
+        """Query the page and summary (cache miss)"""
         # Build base queryset
         queryset = self._build_queryset(request, params)
 
@@ -124,20 +131,12 @@ class OptimizedTransactionListView(generics.ListAPIView):
             }
         }
 
-        # Cache response for 2 minutes (real-time data)
-        QueryOptimizer.set_cached_query(
-            cache_key,
-            response_data,
-            QueryOptimizer.CACHE_TTL_SHORT
-        )
-
         logger.info(
             f"Transaction list query completed in "
             f"{response_data['performance']['query_time_ms']}ms | "
             f"Results: {len(paginated_data['results'])}"
         )
-
-        return Response(response_data)
+        return response_data
 
     def _extract_params(self, request) -> dict:
         """Extract and validate query parameters"""
@@ -266,10 +265,24 @@ class FastTransactionSummaryView(views.APIView):
             'granularity': granularity
         })
 
-        cached_result = QueryOptimizer.get_cached_query(cache_key)
-        if cached_result:
-            return Response(cached_result)
+        # Cache for 5 minutes; concurrent misses wait for one computation
+        try:
+            response_data = QueryOptimizer.cached_query(
+                cache_key,
+                lambda: self._build_summary(date_from, date_to, client_code, granularity, start_time),
+                QueryOptimizer.CACHE_TTL_MEDIUM
+            )
+        except Exception as e:
+            logger.error(f"Error in fast summary: {e}", exc_info=True)
+            return Response({
+                'success': False,
+                'message': 'Error fetching summary',
+                'error': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(response_data)
 
+    def _build_summary(self, date_from, date_to, client_code, granularity, start_time) -> dict:
+        """Read the breakdown from the aggregation tables (cache miss)"""
         # Get summary from aggregation tables
         from apps.transactions.models_aggregations import (
             DailyTransactionSummary,
@@ -277,109 +290,93 @@ class FastTransactionSummaryView(views.APIView):
             MerchantMonthlyStats
         )
 
-        try:
-            if granularity == 'hourly':
-                # Hourly data (limited to recent data)
-                qs = HourlyTransactionStats.objects.filter(
-                    date__gte=date_from,
-                    date__lte=date_to
-                )
-                if client_code:
-                    qs = qs.filter(client_code=client_code)
-
-                data = list(qs.values(
-                    'date', 'hour', 'total_count', 'success_count',
-                    'failed_count', 'total_amount', 'success_amount'
-                ))
-
-            elif granularity == 'monthly':
-                # Monthly data
-                year_from = int(date_from[:4])
-                month_from = int(date_from[5:7])
-                year_to = int(date_to[:4])
-                month_to = int(date_to[5:7])
-
-                qs = MerchantMonthlyStats.objects.filter(
-                    year__gte=year_from,
-                    year__lte=year_to
-                )
-                if client_code:
-                    qs = qs.filter(client_code=client_code)
-
-                data = list(qs.values(
-                    'year', 'month', 'total_count', 'success_count',
-                    'total_amount', 'success_amount', 'settled_amount'
-                ))
-
-            else:  # daily
-                qs = DailyTransactionSummary.objects.filter(
-                    date__gte=date_from,
-                    date__lte=date_to
-                )
-                if client_code:
-                    qs = qs.filter(client_code=client_code)
-
-                data = list(qs.values(
-                    'date', 'client_code', 'total_count', 'success_count',
-                    'failed_count', 'total_amount', 'success_amount',
-                    'settled_count', 'settled_amount'
-                ))
-
-            # Calculate overall summary
-            if data:
-                overall_summary = {
-                    'total_transactions': sum(d.get('total_count', 0) for d in data),
-                    'success_transactions': sum(d.get('success_count', 0) for d in data),
-                    'failed_transactions': sum(d.get('failed_count', 0) for d in data),
-                    'total_amount': float(sum(d.get('total_amount', 0) for d in data)),
-                    'success_amount': float(sum(d.get('success_amount', 0) for d in data)),
-                }
-                overall_summary['success_rate'] = (
-                    (overall_summary['success_transactions'] / overall_summary['total_transactions'] * 100)
-                    if overall_summary['total_transactions'] > 0 else 0
-                )
-            else:
-                overall_summary = {
-                    'total_transactions': 0,
-                    'success_transactions': 0,
-                    'failed_transactions': 0,
-                    'total_amount': 0,
-                    'success_amount': 0,
-                    'success_rate': 0
-                }
-
-            query_time_ms = int((timezone.now() - start_time).total_seconds() * 1000)
-
-            response_data = {
-                'success': True,
-                'data': {
-                    'summary': overall_summary,
-                    'breakdown': data,
-                    'granularity': granularity
-                },
-                'performance': {
-                    'query_time_ms': query_time_ms,
-                    'records': len(data)
-                }
+        if granularity == 'hourly':
+            # Hourly data (limited to recent data)
+            qs = HourlyTransactionStats.objects.filter(
+                date__gte=date_from,
+                date__lte=date_to
+            )
+            if client_code:
+                qs = qs.filter(client_code=client_code)
+
+            data = list(qs.values(
+                'date', 'hour', 'total_count', 'success_count',
+                'failed_count', 'total_amount', 'success_amount'
+            ))
+
+        elif granularity == 'monthly':
+            # Monthly data
+            year_from = int(date_from[:4])
+            month_from = int(date_from[5:7])
+            year_to = int(date_to[:4])
+            month_to = int(date_to[5:7])
+
+            qs = MerchantMonthlyStats.objects.filter(
+                year__gte=year_from,
+                year__lte=year_to
+            )
+            if client_code:
+                qs = qs.filter(client_code=client_code)
+
+            data = list(qs.values(
+                'year', 'month', 'total_count', 'success_count',
+                'total_amount', 'success_amount', 'settled_amount'
+            ))
+
+        else:  # daily
+            qs = DailyTransactionSummary.objects.filter(
+                date__gte=date_from,
+                date__lte=date_to
+            )
+            if client_code:
+                qs = qs.filter(client_code=client_code)
+
+            data = list(qs.values(
+                'date', 'client_code', 'total_count', 'success_count',
+                'failed_count', 'total_amount', 'success_amount',
+                'settled_count', 'settled_amount'
+            ))
+
+        # Calculate overall summary
+        if data:
+            overall_summary = {
+                'total_transactions': sum(d.get('total_count', 0) for d in data),
+                'success_transactions': sum(d.get('success_count', 0) for d in data),
+                'failed_transactions': sum(d.get('failed_count', 0) for d in data),
+                'total_amount': float(sum(d.get('total_amount', 0) for d in data)),
+                'success_amount': float(sum(d.get('success_amount', 0) for d in data)),
             }
-
-            # Cache for 5 minutes
-            QueryOptimizer.set_cached_query(
-                cache_key,
-                response_data,
-                QueryOptimizer.CACHE_TTL_MEDIUM
+            overall_summary['success_rate'] = (
+                (overall_summary['success_transactions'] / overall_summary['total_transactions'] * 100)
+                if overall_summary['total_transactions'] > 0 else 0
             )
+        else:
+            overall_summary = {
+                'total_transactions': 0,
+                'success_transactions': 0,
+                'failed_transactions': 0,
+                'total_amount': 0,
+                'success_amount': 0,
+                'success_rate': 0
+            }
 
-            logger.info(f"Fast summary completed in {query_time_ms}ms")
-            return Response(response_data)
+        query_time_ms = int((timezone.now() - start_time).total_seconds() * 1000)
 
-        except Exception as e:
-            logger.error(f"Error in fast summary: {e}", exc_info=True)
-            return Response({
-                'success': False,
-                'message': 'Error fetching summary',
-                'error': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        response_data = {
+            'success': True,
+            'data': {
+                'summary': overall_summary,
+                'breakdown': data,
+                'granularity': granularity
+            },
+            'performance': {
+                'query_time_ms': query_time_ms,
+                'records': len(data)
+            }
+        }
+
+        logger.info(f"Fast summary completed in {query_time_ms}ms")
+        return response_data
 
 
 class BulkTransactionExportView(views.APIView):
@@ -34,6 +34,7 @@ INSTALLED_APPS = [
     'drf_spectacular',
 
     # Local apps
+    'apps.core',
     'apps.authentication',
     'apps.transactions',
     'apps.settlements',
@@ -214,7 +215,7 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_THROTTLE_CLASSES': [
         'apps.core.throttling.CustomAnonThrottle',
-        'rest_framework.throttling.UserRateThrottle',
+        'apps.core.throttling.CustomUserThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/hour',
@@ -259,21 +260,36 @@ CACHES = {
         'BACKEND': 'django_redis.cache.RedisCache',
         'LOCATION': config('REDIS_URL', default='redis://127.0.0.1:6379/1'),
         'OPTIONS': {
-            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            # Fails fast and falls back to an in-process cache while Redis is
+            # down (apps/core/redis_breaker.py)
+            'CLIENT_CLASS': 'apps.core.redis_breaker.CircuitBreakerClient',
             'CONNECTION_POOL_CLASS_KWARGS': {
                 'max_connections': 50,
                 'retry_on_timeout': True,
             },
             'SOCKET_CONNECT_TIMEOUT': 5,
             'SOCKET_TIMEOUT': 5,
-            'COMPRESSOR': 'django_redis.compressors.zlib.ZlibCompressor',
+            # msgpack + zstd, compressing values from 1 KB (apps/core/cache_codec.py);
+            # the codec compresses itself and still reads pickle + zlib entries
+            'SERIALIZER': 'apps.core.cache_codec.CacheCodecSerializer',
+            'COMPRESSOR': 'django_redis.compressors.identity.IdentityCompressor',
+            'CODEC_COMPRESSION': config('CACHE_CODEC_COMPRESSION', default='zstd'),
+            'CODEC_COMPRESS_MIN_BYTES': config('CACHE_CODEC_COMPRESS_MIN_BYTES', default=1024, cast=int),
             'IGNORE_EXCEPTIONS': True,  # Don't break if Redis is down
+            'CIRCUIT_BREAKER_FAILURES': config('REDIS_BREAKER_FAILURES', default=3, cast=int),
+            'CIRCUIT_BREAKER_WINDOW': config('REDIS_BREAKER_WINDOW', default=30, cast=int),
+            'CIRCUIT_BREAKER_PROBE_INTERVAL': config('REDIS_BREAKER_PROBE_INTERVAL', default=5, cast=int),
+            'FALLBACK_MAX_ENTRIES': config('REDIS_FALLBACK_MAX_ENTRIES', default=5000, cast=int),
         },
         'KEY_PREFIX': 'sabpaisa',
         'TIMEOUT': config('CACHE_TTL', default=300, cast=int),  # 5 minutes default
     }
 }
 
+# Workers per host (gunicorn --workers): while Redis is down, rate limits are
+# counted per worker and each worker allows its share of the limit
+REDIS_FALLBACK_WORKERS = config('REDIS_FALLBACK_WORKERS', default=4, cast=int)
+
 # Session Configuration
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 SESSION_COOKIE_AGE = 86400  # 24 hours
@@ -292,12 +308,9 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes
-CELERY_BEAT_SCHEDULE = {
-    'cleanup-old-reports': {
-        'task': 'apps.reports.tasks.cleanup_old_reports',
-        'schedule': timedelta(days=1),
-    },
-}
+# Aggregation jobs are scheduled by `manage.py run_aggregation_scheduler`
+# (apps/transactions/scheduler.py), not by beat
+CELERY_BEAT_SCHEDULE = {}
 
 # Logging Configuration
 LOGGING = {
@@ -525,6 +538,22 @@ SPECTACULAR_SETTINGS = {
 # Application-specific settings
 MAX_UPLOAD_SIZE = config('MAX_UPLOAD_SIZE', default=52428800, cast=int)  # 50MB
 REPORT_GENERATION_TIMEOUT = config('REPORT_GENERATION_TIMEOUT', default=300, cast=int)  # 5 minutes
+# Read IST date/hour from the generated transaction_detail columns (manage.py install_ist_columns)
+TRANSACTION_IST_COLUMNS = config('TRANSACTION_IST_COLUMNS', default=False, cast=bool)
+# Source for today's analytics counters: '' (scan transaction_detail),
+# 'triggers' (manage.py live_counter_triggers install) or 'redis' (manage.py run_live_counter_poller)
+LIVE_COUNTERS = config('LIVE_COUNTERS', default='')
+# Redis counters are ignored once the poller heartbeat is older than this (seconds)
+LIVE_COUNTER_MAX_LAG = config('LIVE_COUNTER_MAX_LAG', default=30, cast=int)
+# Response cache TTL for today's dashboards while live counters are current
+LIVE_COUNTER_CACHE_TTL = config('LIVE_COUNTER_CACHE_TTL', default=10, cast=int)
+# Live dashboard stream (/api/v1/analytics/live-stream/): seconds between frames,
+# stream lifetime before the client reconnects, open streams per worker process
+LIVE_STREAM_INTERVAL = config('LIVE_STREAM_INTERVAL', default=2, cast=float)
+LIVE_STREAM_MAX_SECONDS = config('LIVE_STREAM_MAX_SECONDS', default=300, cast=int)
+LIVE_STREAM_MAX_CONNECTIONS = config('LIVE_STREAM_MAX_CONNECTIONS', default=100, cast=int)
+# Lifetime of the signed ticket from live-stream/ticket/ that opens the stream
+LIVE_STREAM_TICKET_SECONDS = config('LIVE_STREAM_TICKET_SECONDS', default=60, cast=int)
 
 # AWS Configuration (for production)
 AWS_ACCESS_KEY_ID = config('AWS_ACCESS_KEY_ID', default='')